@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Program: capri_lib
+File:    capri_lib.py
+
+Version:  V1.0
+Date:     19.10.26
+Function:   Library: CAPRI quality measures (Fnat, L-RMSD, I-RMSD) and CAPRI classes of docked antibody-antigen complexes.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+The native complex is parsed once into a CapriReference holding its residue contacts (heavy atoms within 5 Angstroms), its 10 Angstrom interface and the backbone atoms used for fitting. Each docked model is then parsed once and all of the CAPRI measures are taken from that one parse:
+   Fnat     fraction of the native residue contacts found in the model (Fnonnat: fraction of model contacts not in the native)
+   L-RMSD   backbone RMSD of the antigen (ligand) after fitting the antibody (receptor) backbone
+   I-RMSD   backbone RMSD of the native interface residues (any atom within 10 Angstroms of the other side) after fitting on them
+and the CAPRI class (Incorrect, Acceptable, Medium, High) is assigned as in dockingstats_lib.capri_class. Model atoms are matched to the native by chain, residue number and atom name.
+
+Decoys sharing one topology (e.g. a decoy archive, see decoyarchive_lib.py) are evaluated in batches, with the atom matching done once and the superpositions done with one batched SVD per batch (see superpose_lib.py).
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import numpy as np
+from typing import NamedTuple
+from pdbstructure_lib import PDBStructure, read_pdb
+from dockingtools_lib import getantigenchainid
+from contacts_lib import AB_CHAINS, residue_numbering, pairs_from_arrays
+from superpose_lib import fit_rmsd, fitted_rmsd
+from dockingstats_lib import capri_class, CAPRI_CLASSES
+from decoyarchive_lib import open_decoys, DecoyArchive
+
+#*************************************************************************
+
+# Backbone atoms used for the RMSDs
+BACKBONE = ("N", "CA", "C", "O")
+
+# Contact and interface cutoffs (Angstroms)
+FNAT_CUTOFF = 5.0
+INTERFACE_CUTOFF = 10.0
+
+# Number of decoys evaluated at once in a batch
+BATCH_SIZE = 500
+
+#*************************************************************************
+
+class CapriResult(NamedTuple):
+   """
+   CAPRI evaluation of one docked model.
+   """
+   name: str
+   fnat: float
+   fnonnat: float
+   lrmsd: float
+   irmsd: float
+   capri_class: str
+
+#*************************************************************************
+
+class _Topology:
+   """
+   The atoms of a model matched to the native: model and native indices of the common atoms within each RMSD selection, and the model masks and residue numbering used to find its contacts.
+
+   """
+   def __init__(self, reference, structure):
+      model_keys = structure.atom_keys()
+      matched = [(i, reference.key_index[key]) for i, key in enumerate(model_keys) if key in reference.key_index]
+      model_index = np.array([i for i, _ in matched], dtype=np.intp)
+      native_index = np.array([j for _, j in matched], dtype=np.intp)
+      self.selections = {}
+      for name, mask in (("receptor", reference.receptor_bb), ("ligand", reference.ligand_bb), ("interface", reference.interface_bb)):
+         keep = mask[native_index] if len(native_index) else np.zeros(0, dtype=bool)
+         self.selections[name] = (model_index[keep], native_index[keep])
+      heavy = structure.heavy_mask()
+      self.ab_mask = structure.chain_mask(AB_CHAINS) & heavy
+      self.ag_mask = structure.chain_mask(reference.agchainid) & heavy
+      self.numbering = residue_numbering(structure.residue_labels())
+
+#*************************************************************************
+
+class CapriReference:
+   """
+   A native complex prepared for CAPRI evaluation of docked models.
+
+   >>> reference = CapriReference('test/test8_OG.pdb')
+   >>> len(reference.contacts), int(reference.interface_bb.sum())
+   (57, 416)
+   >>> result = reference.evaluate(read_pdb('test/test8_OG.pdb'), 'native')
+   >>> result.fnat, round(result.lrmsd, 6), round(result.irmsd, 6), result.capri_class
+   (1.0, 0.0, 0.0, 'High')
+
+   """
+   def __init__(self, OG_file, agchainid=None):
+      self.structure = read_pdb(OG_file)
+      self.agchainid = agchainid or getantigenchainid(OG_file)
+      structure = self.structure
+      heavy = structure.heavy_mask()
+      ab_mask = structure.chain_mask(AB_CHAINS)
+      ag_mask = structure.chain_mask(self.agchainid)
+      # One search gives both the contacts and the interface
+      pairs = pairs_from_arrays(structure.coords, ab_mask & heavy, ag_mask & heavy, residue_numbering(structure.residue_labels()), INTERFACE_CUTOFF)
+      self.contacts = set(pairs.contacts(FNAT_CUTOFF).res_pairs)
+      backbone = np.isin(structure.atomnames, BACKBONE)
+      self.receptor_bb = ab_mask & backbone
+      self.ligand_bb = ag_mask & backbone
+      self.interface_bb = pairs.interface_atom_mask(INTERFACE_CUTOFF) & backbone
+      self.key_index = {key: i for i, key in enumerate(structure.atom_keys())}
+
+   def topology(self, structure):
+      """
+      Match the atoms of a model (or of a topology shared by many decoys) to the native.
+
+      """
+      return _Topology(self, structure)
+
+   def _fnat(self, topology, coords):
+      """
+      Return Fnat and Fnonnat of one set of model coordinates.
+
+      """
+      model_contacts = set(pairs_from_arrays(coords, topology.ab_mask, topology.ag_mask, topology.numbering, FNAT_CUTOFF).contacts(FNAT_CUTOFF).res_pairs)
+      common = len(model_contacts & self.contacts)
+      fnat = common / len(self.contacts) if self.contacts else float('nan')
+      fnonnat = 1 - common / len(model_contacts) if model_contacts else 0.0
+      return fnat, fnonnat
+
+   def evaluate_batch(self, topology, coords, names):
+      """
+      Evaluate a batch of models sharing a topology (from self.topology), given their (N, atoms, 3) coordinates. Returns a list of CapriResult.
+
+      """
+      coords = np.asarray(coords, dtype=np.float64)
+      native = self.structure.coords
+      nan = np.full(len(coords), np.nan)
+      model_rec, native_rec = topology.selections["receptor"]
+      model_lig, native_lig = topology.selections["ligand"]
+      model_int, native_int = topology.selections["interface"]
+      lrmsd = fitted_rmsd(coords[:, model_rec], native[native_rec], coords[:, model_lig], native[native_lig]) if len(model_rec) >= 3 and len(model_lig) else nan
+      irmsd = fit_rmsd(coords[:, model_int], native[native_int]) if len(model_int) >= 3 else nan
+      fnat, fnonnat = np.array([self._fnat(topology, model_coords) for model_coords in coords]).reshape(-1, 2).T
+      classes = capri_class(fnat, lrmsd, irmsd)
+      return [CapriResult(name, float(f), float(fn), float(l), float(i), CAPRI_CLASSES[c]) for name, f, fn, l, i, c in zip(names, fnat, fnonnat, lrmsd, irmsd, classes.tolist())]
+
+   def evaluate(self, structure, name=""):
+      """
+      Evaluate one model (a PDBStructure). Returns a CapriResult.
+
+      """
+      return self.evaluate_batch(self.topology(structure), structure.coords[None], [name])[0]
+
+#*************************************************************************
+
+def combine_structures(*structures):
+   """
+   Join structures (e.g. a separate antibody and docked antigen) into one PDBStructure.
+
+   >>> len(combine_structures(read_pdb('test/test8_ab.pdb'), read_pdb('test/test8_Dag.pdb')))
+   2710
+
+   """
+   return PDBStructure([line for structure in structures for line in structure.records], np.vstack([structure.coords for structure in structures]))
+
+#*************************************************************************
+
+def evaluate_capri(OG_file, *docked_files, reference=None):
+   """
+   Evaluate a docked complex, given as a single PDB file or as separate antibody and antigen files, against OG_file. A CapriReference can be given to avoid preparing the native again. Returns a CapriResult.
+
+   >>> result = evaluate_capri('test/test8_OG.pdb', 'test/test8_ab.pdb', 'test/test8_Dag.pdb')
+   >>> round(result.fnat, 3), round(result.lrmsd, 3), round(result.irmsd, 3), result.capri_class
+   (0.965, 1.625, 0.425, 'High')
+   >>> evaluate_capri('test/test8_OG.pdb', 'test/test8_single.pdb').capri_class
+   'Acceptable'
+
+   """
+   if reference is None:
+      reference = CapriReference(OG_file)
+   structure = combine_structures(*[read_pdb(docked_file) for docked_file in docked_files])
+   return reference.evaluate(structure, docked_files[0])
+
+#*************************************************************************
+
+def evaluate_decoy_set(OG_file, decoy_path, batch_size=BATCH_SIZE):
+   """
+   Evaluate every decoy in a decoy archive or directory of decoy.N.pdb files against OG_file. Archive decoys are evaluated in batches sharing one atom matching. Returns a list of CapriResult in decoy order.
+
+   >>> import tempfile
+   >>> from generate_decoys_lib import write_decoy_archive
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    results = evaluate_decoy_set('test/test8_OG.pdb', write_decoy_archive('test/test8_OG.pdb', [0.5, 3.0, 15.0], tmp + '/decoys', seed=4))
+   >>> [(result.name, round(result.lrmsd, 1), result.capri_class) for result in results]
+   [('decoy.1', 0.5, 'High'), ('decoy.2', 3.0, 'Medium'), ('decoy.3', 14.8, 'Incorrect')]
+
+   """
+   reference = CapriReference(OG_file)
+   decoys = open_decoys(decoy_path)
+   if not isinstance(decoys, DecoyArchive):
+      return [reference.evaluate(decoys.structure(i), decoys.names[i]) for i in range(len(decoys))]
+   topology = reference.topology(decoys.topology)
+   results = []
+   for start in range(0, len(decoys), batch_size):
+      stop = min(start + batch_size, len(decoys))
+      coords = np.stack([decoys.coords(i) for i in range(start, stop)])
+      results += reference.evaluate_batch(topology, coords, decoys.names[start:stop])
+   return results
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
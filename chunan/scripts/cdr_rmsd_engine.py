@@ -0,0 +1,307 @@
+"""
+Batched framework fitting and CDR loop RMSD of bound/unbound antibody pairs.
+
+Replaces the per-pair, per-zone ProFit runs behind
+data/20220324.24Mar2022.ProFit.onVHVLseparately/results.json with NumPy:
+every structure is read once, the CA atoms of the framework and CDR zones
+of all pairs are stacked into padded arrays, and all pairs are fitted at
+once (weighted Kabsch, batched SVD).
+
+Three fits are made for each pair, as in results.json
+- FR:   framework of both chains -> fr_rmsd, l1_rmsd ... h3_rmsd
+- L_FR: light chain framework    -> l_rmsd, l_l1_rmsd, l_l2_rmsd, l_l3_rmsd
+- H_FR: heavy chain framework    -> h_rmsd, h_h1_rmsd, h_h2_rmsd, h_h3_rmsd
+Zones are Chothia numbered (AbDb files); the frameworks are L3-L105 and
+H3-H108 without the CDRs, which reproduces the ProFit zones of
+results.json. Only residues present in both structures are used.
+
+The returned DataFrame has the columns of `ub_df` in cdr.ub.ipynb
+(line_id, ub_name, *_rmsd, angle_dif, *_num_atm_aln) and per-line
+weights, so it can be passed to `plot_cdr_rmsd_hist` and
+`plot_cdr_rmsd_violin` directly.
+
+Usage:
+    python cdr_rmsd_engine.py --abdb <AbDb dir> --results <results.json> -o ub.cdr.csv
+    python cdr_rmsd_engine.py --abdb <AbDb dir> --pairs pairs.tsv -o ub.cdr.csv
+pairs.tsv: one pair per line, "line_id unbound bound", e.g. "149 3V6F_3 3V6Z_2"
+"""
+import os
+import json
+import argparse
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# (chain, residue number, insertion code)
+ResidueKey = Tuple[str, int, str]
+
+# Chothia CDR definitions, (chain, first, last) including insertions
+CDR_ZONES = {
+    'l1': ('L', 24, 34), 'l2': ('L', 50, 56), 'l3': ('L', 89, 97),
+    'h1': ('H', 26, 32), 'h2': ('H', 52, 56), 'h3': ('H', 95, 102),
+}
+# framework zones, the CDRs of the same chain are excluded
+FR_ZONES = {'l': ('L', 3, 105), 'h': ('H', 3, 108)}
+
+# fitted zone: (chains of its framework, CDRs reported, column prefix)
+FITS = {
+    'fr': ('lh', ('l1', 'l2', 'l3', 'h1', 'h2', 'h3'), ''),
+    'h': ('h', ('h1', 'h2', 'h3'), 'h_'),
+    'l': ('l', ('l1', 'l2', 'l3'), 'l_'),
+}
+
+# column order of ub_df in cdr.ub.ipynb
+COLUMNS = ['line_id', 'ub_name',
+           'fr_rmsd', 'h1_rmsd', 'h2_rmsd', 'h3_rmsd', 'l1_rmsd', 'l2_rmsd', 'l3_rmsd',
+           'h_rmsd', 'h_h1_rmsd', 'h_h2_rmsd', 'h_h3_rmsd',
+           'l_rmsd', 'l_l1_rmsd', 'l_l2_rmsd', 'l_l3_rmsd',
+           'angle_dif',
+           'fr_num_atm_aln', 'h_num_atm_aln', 'l_num_atm_aln',
+           'h1_num_atm_aln', 'h2_num_atm_aln', 'h3_num_atm_aln',
+           'l1_num_atm_aln', 'l2_num_atm_aln', 'l3_num_atm_aln',
+           'weights']
+
+
+# --------------------
+# Structures
+# --------------------
+@lru_cache(maxsize=None)
+def read_ca(pdb_file: str) -> Dict[ResidueKey, np.ndarray]:
+    """
+    Read the CA atoms of an AbDb file (first alternate location only).
+    Args:
+        pdb_file: (str) path to a Chothia numbered PDB file
+    Returns:
+        ca: (Dict) (chain, resnum, icode) => xyz coordinates
+    """
+    ca = {}
+    with open(pdb_file, 'r') as f:
+        for l in f:
+            if l.startswith('ATOM') and l[12:16] == ' CA ' and l[16] in ' A':
+                key = (l[21], int(l[22:26]), l[26].strip())
+                if key not in ca:
+                    ca[key] = np.array([float(l[30:38]), float(l[38:46]), float(l[46:54])])
+    return ca
+
+
+def _in_zone(key: ResidueKey, zone: Tuple[str, int, int]) -> bool:
+    chain, first, last = zone
+    return key[0] == chain and first <= key[1] <= last
+
+
+def zone_residues(keys: Iterable[ResidueKey]) -> Dict[str, List[ResidueKey]]:
+    """
+    Split residue keys into the CDR zones and the L and H framework zones.
+    Args:
+        keys: (Iterable) residues present in both structures of a pair
+    Returns:
+        zones: (Dict) zone name ('l1' ... 'h3', 'l', 'h') => sorted residue keys
+    """
+    keys = sorted(keys)
+    zones = {cdr: [k for k in keys if _in_zone(k, zone)] for cdr, zone in CDR_ZONES.items()}
+    for fr, zone in FR_ZONES.items():
+        zones[fr] = [k for k in keys if _in_zone(k, zone) and
+                     not any(_in_zone(k, CDR_ZONES[c]) for c in CDR_ZONES if c[0] == fr)]
+    return zones
+
+
+def _pad(blocks: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """ Stack (n_i, 3) coordinate blocks into a (N, max n_i, 3) array and its mask. """
+    size = max([len(b) for b in blocks] + [1])
+    coords = np.zeros((len(blocks), size, 3))
+    mask = np.zeros((len(blocks), size))
+    for i, b in enumerate(blocks):
+        coords[i, :len(b)] = b
+        mask[i, :len(b)] = 1.
+    return coords, mask
+
+
+# --------------------
+# Batched fitting
+# --------------------
+def batch_superpose(mobile: np.ndarray,
+                    target: np.ndarray,
+                    mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Least squares fit of each mobile set on its target set (Kabsch).
+    Args:
+        mobile: (np.ndarray) shape (N, M, 3), padded coordinates
+        target: (np.ndarray) shape (N, M, 3), padded coordinates
+        mask: (np.ndarray) shape (N, M), 1 for atoms used, 0 for padding
+    Returns:
+        rotation: (np.ndarray) shape (N, 3, 3), applied as x @ rotation + translation
+        translation: (np.ndarray) shape (N, 1, 3)
+    """
+    w = mask[..., None]
+    n = np.maximum(w.sum(axis=1, keepdims=True), 1.)
+    mobile_c = (mobile * w).sum(axis=1, keepdims=True) / n
+    target_c = (target * w).sum(axis=1, keepdims=True) / n
+    cov = np.einsum('nmi,nmj->nij', (mobile - mobile_c) * w, target - target_c)
+    u, _, vt = np.linalg.svd(cov)
+    # avoid reflections
+    d = np.sign(np.linalg.det(u @ vt))
+    u[:, :, -1] *= d[:, None]
+    rotation = u @ vt
+    return rotation, target_c - mobile_c @ rotation
+
+
+def batch_rmsd(a: np.ndarray, b: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    RMSD of each pair of padded coordinate sets, NaN for empty sets.
+    Args:
+        a, b: (np.ndarray) shape (N, M, 3)
+        mask: (np.ndarray) shape (N, M)
+    Returns:
+        rmsd: (np.ndarray) shape (N,)
+    """
+    n = mask.sum(axis=1)
+    sd = (((a - b) ** 2).sum(axis=2) * mask).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, np.sqrt(sd / n), np.nan)
+
+
+def pair_rmsd(pairs: Sequence[Tuple[str, str]],
+              abdb_dir: str = '.',
+              decimals: Optional[int] = 3) -> Dict[str, np.ndarray]:
+    """
+    Fit each bound structure on its unbound structure and compute CDR RMSDs.
+    Args:
+        pairs: (Sequence) (unbound, bound) AbDb ids, e.g. ('3V6F_3', '3V6Z_2')
+        abdb_dir: (str) directory of the AbDb files (<id>.pdb)
+        decimals: (int) round RMSDs as ProFit reports them, None to keep all
+    Returns:
+        columns: (Dict) column name (e.g. 'h_h3_rmsd', 'fr_num_atm_aln') => values, one per pair
+    """
+    zones = []
+    unbound, bound = [], []
+    for u_id, b_id in pairs:
+        u = read_ca(os.path.join(abdb_dir, f'{u_id}.pdb'))
+        b = read_ca(os.path.join(abdb_dir, f'{b_id}.pdb'))
+        zones.append(zone_residues(u.keys() & b.keys()))
+        unbound.append(u)
+        bound.append(b)
+
+    def stack(names):
+        blocks = [[k for name in names for k in z[name]] for z in zones]
+        u, mask = _pad([np.array([s[k] for k in keys]).reshape(-1, 3) for s, keys in zip(unbound, blocks)])
+        b, _ = _pad([np.array([s[k] for k in keys]).reshape(-1, 3) for s, keys in zip(bound, blocks)])
+        return b, u, mask
+
+    columns = {}
+    for fit, (chains, cdrs, prefix) in FITS.items():
+        b, u, mask = stack(chains)
+        rotation, translation = batch_superpose(b, u, mask)
+        columns[f'{fit}_rmsd'] = batch_rmsd(b @ rotation + translation, u, mask)
+        columns[f'{fit}_num_atm_aln'] = mask.sum(axis=1).astype(int)
+        for cdr in cdrs:
+            b, u, mask = stack([cdr])
+            columns[f'{prefix}{cdr}_rmsd'] = batch_rmsd(b @ rotation + translation, u, mask)
+            columns[f'{cdr}_num_atm_aln'] = mask.sum(axis=1).astype(int)
+    if decimals is not None:
+        columns = {k: v.round(decimals) if k.endswith('_rmsd') else v for k, v in columns.items()}
+    return columns
+
+
+# --------------------
+# DataFrame
+# --------------------
+def add_weights(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Weight each pair by 1 / number of pairs of its line, normalised to sum to 1,
+    so every line contributes equally. Recompute after filtering the DataFrame.
+    Args:
+        df: (DataFrame) with a line_id column
+    Returns:
+        df: (DataFrame) copy with a weights column
+    """
+    df = df.copy()
+    weights = 1 / df.groupby('line_id')['line_id'].transform('size')
+    df['weights'] = weights / weights.sum()
+    return df
+
+
+def cdr_rmsd_df(pairs: Iterable[Tuple[int, str, str]],
+                abdb_dir: str = '.',
+                packing_angles: Optional[Dict[str, float]] = None,
+                batch_size: int = 2048) -> pd.DataFrame:
+    """
+    CDR RMSD table of bound/unbound pairs, laid out as ub_df in cdr.ub.ipynb.
+    Args:
+        pairs: (Iterable) (line_id, unbound id, bound id)
+        abdb_dir: (str) directory of the AbDb files (<id>.pdb)
+        packing_angles: (Dict) AbDb id => VH/VL packing angle, for angle_dif (NaN without)
+        batch_size: (int) number of pairs fitted at once
+    Returns:
+        df: (DataFrame) one row per pair, consumable by plot_cdr_rmsd_hist and plot_cdr_rmsd_violin
+    """
+    pairs = list(pairs)
+    packing_angles = packing_angles or {}
+    parts = []
+    for i in range(0, len(pairs), batch_size):
+        batch = pairs[i:i + batch_size]
+        part = pd.DataFrame(pair_rmsd([(u, b) for _, u, b in batch], abdb_dir))
+        part.insert(0, 'line_id', [int(line_id) for line_id, _, _ in batch])
+        part.insert(1, 'ub_name', [f'{u},{b}' for _, u, b in batch])
+        part['angle_dif'] = [abs(packing_angles[u] - packing_angles[b])
+                             if u in packing_angles and b in packing_angles else np.nan
+                             for _, u, b in batch]
+        parts.append(part)
+    df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=COLUMNS)
+    return add_weights(df)[COLUMNS]
+
+
+def pairs_from_results(results_file: str,
+                       kind: str = 'ub') -> Tuple[List[Tuple[int, str, str]], Dict[str, float]]:
+    """
+    Read the pairs and packing angles of a ProFit results.json.
+    Args:
+        results_file: (str) path to results.json
+        kind: (str) 'ub', 'uu' or 'bb' pairs
+    Returns:
+        pairs: (List) (line_id, first id, second id)
+        packing_angles: (Dict) AbDb id => VH/VL packing angle
+    """
+    with open(results_file, 'r') as f:
+        data = json.load(f)
+    pairs, packing_angles = [], {}
+    for line_id, v in data.items():
+        for state in ('unbound', 'bound'):
+            packing_angles.update(v['abpackingangle'][state])
+        pairs += [(int(line_id), *name.split(',')) for name in v[kind]]
+    return pairs, packing_angles
+
+
+def read_pairs(pairs_file: str) -> List[Tuple[int, str, str]]:
+    """ Read "line_id unbound bound" lines, '#' for comments. """
+    pairs = []
+    with open(pairs_file, 'r') as f:
+        for l in f:
+            if l.strip() and not l.startswith('#'):
+                line_id, u, b = l.split()[:3]
+                pairs.append((int(line_id), u, b))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Framework fitted CDR RMSDs of bound/unbound AbDb pairs.')
+    parser.add_argument('--abdb', required=True, help='directory of the Chothia numbered AbDb files')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--pairs', help='file of "line_id unbound bound" lines')
+    source.add_argument('--results', help='ProFit results.json to recompute (pairs and packing angles)')
+    parser.add_argument('--kind', default='ub', choices=['ub', 'uu', 'bb'], help='pairs of results.json to use')
+    parser.add_argument('-o', '--output', default='ub.cdr.csv', help='output csv file')
+    args = parser.parse_args()
+
+    if args.results:
+        pairs, packing_angles = pairs_from_results(args.results, args.kind)
+    else:
+        pairs, packing_angles = read_pairs(args.pairs), None
+    df = cdr_rmsd_df(pairs, args.abdb, packing_angles)
+    df.to_csv(args.output, index=False)
+    print(f'{df.shape[0]} pairs written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
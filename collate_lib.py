@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Program: collate_lib
+File:    collate_lib.py
+
+Version:  V1.1
+Date:     19.10.26
+Function:   Library: Functions for extract_pdbs, collects the result PDB files of a docking run into one place.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+The native structure and the result PDB files of every method (Megadock, Piper, Rosetta, Haddock with and without waters) for each complex and run are gathered into <OUTPath>/run<N>/. Files are placed without starting any processes: as a reflink (copy-on-write clone) or an in-kernel copy_file_range copy where the file system supports them, and as a normal copy otherwise. Complexes are handled in a thread pool and every file is recorded in a manifest (manifest.tsv) with its source, size, how it was placed, or why it is missing. The collected files can also be packed into a single zip archive whose central directory acts as an index, so the results can be moved off the cluster as one file and individual structures read without unpacking.
+
+Each of these is an independent copy, so the collation is a snapshot of the results that later reruns cannot change. Mode 'hardlink' places files as hard links instead, which is faster and takes no space, but then the collated files share their contents with the docking results: a rerun that rewrites a result in place changes its collated copy too, and editing a collated file changes the result.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   Mode 'auto' only makes independent copies (reflink, copy_file_range, copy); hard links opt-in   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import errno
+import shutil
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+#*************************************************************************
+
+# ioctl request number of FICLONE (Linux reflink)
+FICLONE = 0x40049409
+
+# Ways of placing files
+PLACE_METHODS = ("hardlink", "reflink", "copy_file_range", "copy")
+
+# Ways tried in turn by mode 'auto' (independent copies only)
+AUTO_METHODS = ("reflink", "copy_file_range", "copy")
+
+# Errors meaning a method is not possible for these files (rather than a real failure)
+_UNSUPPORTED = {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS, errno.EMLINK}
+
+# Methods found not to work between two devices, so they are not tried for every file
+_failed = set()
+
+#*************************************************************************
+
+def _reflink(src, dst):
+   """
+   Clone src to dst with the FICLONE ioctl (Btrfs, XFS, ...).
+
+   """
+   import fcntl
+   with open(src, "rb") as infile, open(dst, "wb") as outfile:
+      fcntl.ioctl(outfile.fileno(), FICLONE, infile.fileno())
+
+def _copy_file_range(src, dst):
+   """
+   Copy src to dst inside the kernel with os.copy_file_range (server-side copy on NFS 4.2).
+
+   """
+   if not hasattr(os, "copy_file_range"):
+      raise OSError(errno.ENOSYS, "copy_file_range not available")
+   with open(src, "rb") as infile, open(dst, "wb") as outfile:
+      remaining = os.fstat(infile.fileno()).st_size
+      while remaining > 0:
+         copied = os.copy_file_range(infile.fileno(), outfile.fileno(), remaining)
+         if copied == 0:
+            break
+         remaining -= copied
+
+_PLACERS = {"hardlink": os.link, "reflink": _reflink, "copy_file_range": _copy_file_range, "copy": shutil.copyfile}
+
+#*************************************************************************
+
+def link_or_copy(src, dst, mode="auto"):
+   """
+   Place src at dst, replacing any existing dst. mode is 'auto' (try each of AUTO_METHODS in turn, the fastest independent copy the file system allows) or one of PLACE_METHODS. Returns the method used.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _ = open(f"{tmp}/a.pdb", "w").write("ATOM\\n")
+   ...    link_or_copy(f"{tmp}/a.pdb", f"{tmp}/b.pdb") in AUTO_METHODS, link_or_copy(f"{tmp}/a.pdb", f"{tmp}/c.pdb", mode="hardlink"), open(f"{tmp}/b.pdb").read()
+   ...    os.path.samefile(f"{tmp}/a.pdb", f"{tmp}/b.pdb"), os.path.samefile(f"{tmp}/a.pdb", f"{tmp}/c.pdb")
+   (True, 'hardlink', 'ATOM\\n')
+   (False, True)
+
+   """
+   methods = AUTO_METHODS if mode == "auto" else (mode,)
+   devices = (os.stat(src).st_dev, os.stat(os.path.dirname(os.path.abspath(dst))).st_dev)
+   for method in methods:
+      if mode == "auto" and (method, devices) in _failed:
+         continue
+      if os.path.lexists(dst):
+         os.remove(dst)
+      try:
+         _PLACERS[method](src, dst)
+         return method
+      except OSError as error:
+         if mode != "auto" or method == "copy" or error.errno not in _UNSUPPORTED:
+            raise
+         _failed.add((method, devices))
+   raise OSError(f"Could not place {src}")
+
+#*************************************************************************
+
+def result_files(docking_results, pdb_id, run):
+   """
+   Return the (native, Megadock, Piper, Rosetta, Haddock waters, Haddock no waters) files of one complex and run.
+
+   >>> [os.path.basename(file) for file in result_files('/data/docking_results', '1abc_0P', 1)][:3]
+   ['1abc_0P.pdb', '1abc_0P_MegadockRanked_result.pdb', '1abc_0P_nohydrogens_Piper_result.pdb']
+
+   """
+   run_dir = os.path.join(docking_results, pdb_id, f"run{run}")
+   haddock_dir = os.path.join(run_dir, "haddock_out")
+   return [os.path.join(docking_results, pdb_id, f"{pdb_id}.pdb"),
+           os.path.join(run_dir, f"{pdb_id}_MegadockRanked_result.pdb"),
+           os.path.join(run_dir, f"{pdb_id}_nohydrogens_Piper_result.pdb"),
+           os.path.join(run_dir, f"{pdb_id}_Rosetta_result.pdb"),
+           os.path.join(haddock_dir, f"{pdb_id}_nohydrogens_Haddock_waters_result.pdb_split_labelled.pdb"),
+           os.path.join(haddock_dir, f"{pdb_id}_nohydrogens_Haddock_nowaters_result.pdb_split_labelled.pdb")]
+
+#*************************************************************************
+
+def collate_complex(docking_results, pdb_id, runs, OUTPath, mode="auto"):
+   """
+   Place the result files of one complex for each run in OUTPath/run<N>/. Returns manifest rows (run, pdb_id, source, destination, size, method or 'missing'/'error: ...').
+
+   """
+   rows = []
+   for run in runs:
+      run_dir = os.path.join(docking_results, pdb_id, f"run{run}")
+      if not os.path.isdir(run_dir):
+         rows += [(run, pdb_id, run_dir, "", 0, "missing")]
+         continue
+      out_dir = os.path.join(OUTPath, f"run{run}")
+      for src in result_files(docking_results, pdb_id, run):
+         dst = os.path.join(out_dir, os.path.basename(src))
+         try:
+            size = os.stat(src).st_size
+         except FileNotFoundError:
+            rows += [(run, pdb_id, src, "", 0, "missing")]
+            continue
+         try:
+            rows += [(run, pdb_id, src, dst, size, link_or_copy(src, dst, mode))]
+         except OSError as error:
+            rows += [(run, pdb_id, src, dst, size, f"error: {error}")]
+   return rows
+
+#*************************************************************************
+
+def collate(docking_results, pdb_ids, OUTPath, runs=(0, 1, 2), mode="auto", workers=16):
+   """
+   Collate the result files of every complex in parallel and write OUTPath/manifest.tsv. Returns the manifest rows, in complex order.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    os.makedirs(f"{tmp}/docking_results/1abc_0P/run0")
+   ...    _ = open(f"{tmp}/docking_results/1abc_0P/1abc_0P.pdb", "w").write("ATOM\\n")
+   ...    _ = open(f"{tmp}/docking_results/1abc_0P/run0/1abc_0P_Rosetta_result.pdb", "w").write("ATOM\\n")
+   ...    rows = collate(f"{tmp}/docking_results", ['1abc_0P'], f"{tmp}/out", runs=(0, 1), mode="copy")
+   ...    sorted(os.listdir(f"{tmp}/out/run0"))
+   ['1abc_0P.pdb', '1abc_0P_Rosetta_result.pdb']
+   >>> [row[5] for row in rows]
+   ['copy', 'missing', 'missing', 'copy', 'missing', 'missing', 'missing']
+
+   """
+   for run in runs:
+      os.makedirs(os.path.join(OUTPath, f"run{run}"), exist_ok=True)
+   with ThreadPoolExecutor(max_workers=workers) as executor:
+      per_complex = list(executor.map(lambda pdb_id: collate_complex(docking_results, pdb_id, runs, OUTPath, mode), pdb_ids))
+   rows = [row for complex_rows in per_complex for row in complex_rows]
+   with open(os.path.join(OUTPath, "manifest.tsv"), "w") as file:
+      file.write("run\tpdb_id\tsource\tdestination\tsize\tmethod\n")
+      file.writelines("\t".join(str(value) for value in row) + "\n" for row in rows)
+   return rows
+
+#*************************************************************************
+
+def pack_archive(rows, archive_file, compress=False):
+   """
+   Write the collated files (manifest rows that were placed) to a single zip archive, stored as run<N>/<file>, together with the manifest. Files are stored uncompressed unless compress is True, so that single structures can be read straight from the archive. Returns the number of files packed.
+
+   """
+   compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+   packed = 0
+   manifest = ["run\tpdb_id\tsource\tarchive_name\tsize"]
+   with zipfile.ZipFile(archive_file, "w", compression=compression, allowZip64=True) as archive:
+      written = set()
+      for run, pdb_id, src, dst, size, method in rows:
+         if not dst or method == "missing" or method.startswith("error"):
+            continue
+         name = f"run{run}/{os.path.basename(dst)}"
+         if name not in written:
+            archive.write(dst, name)
+            written.add(name)
+            packed += 1
+         manifest += [f"{run}\t{pdb_id}\t{src}\t{name}\t{size}"]
+      archive.writestr("manifest.tsv", "\n".join(manifest) + "\n")
+   return packed
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
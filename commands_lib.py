@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Program: commands_lib
+File:    commands_lib.py
+
+Version:  V1.0
+Date:     19.10.26
+Function:   Library: The commands of dockingtools.py, each one of the ab-docking-scripts run in-process.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+Each docking and evaluation script has a main(argv) function taking its command line arguments, and only runs it when started as a program, so it can be imported. COMMANDS names these scripts, and run_command() runs one of them in the current interpreter with the same arguments as on the command line, rather than starting a new Python interpreter and importing every library again as toolrunner_lib.run_script does. dockingtools.py is the command line entry point (dockingtools.py <command> [arguments]); the scripts themselves still run as before.
+
+Running a command in-process shares the working directory, environment and output of the caller, so scripts that need their own working directory or thread count (the docking methods in the orchestrator) are still better run with run_script.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import sys
+import importlib
+import traceback
+
+#*************************************************************************
+
+# Command name: (script module, description)
+COMMANDS = {
+   "megadock": ("runmegadockranked", "Dock with Megadock, keeping the top ZRANK pose"),
+   "megadock-filtered": ("runmegadockranked_filtered", "Dock with Megadock, keeping the best ZRANK pose at the combining site"),
+   "piper": ("runpiper", "Dock with Piper"),
+   "rosetta": ("runrosetta", "Dock with RosettaDock"),
+   "haddock": ("runhaddock", "Dock with HADDOCK"),
+   "profit": ("runprofit_single", "RMSD of a docked complex from the original with ProFit"),
+   "interface": ("evaluate_interface", "Correctly predicted interface residues and contacts of a docked complex"),
+   "relabel": ("fix_chain_labelling", "Split and relabel the chains of a directory of HADDOCK results"),
+}
+
+#*************************************************************************
+
+def command_script(command):
+   """
+   Return the script run by a command.
+
+   >>> command_script('interface')
+   'evaluate_interface.py'
+
+   """
+   if command not in COMMANDS:
+      raise ValueError(f"Unknown command: {command} (one of {', '.join(COMMANDS)})")
+   return COMMANDS[command][0] + ".py"
+
+def command_main(command):
+   """
+   Import the script of a command and return its main function.
+
+   >>> command_main('interface').__module__
+   'evaluate_interface'
+
+   """
+   command_script(command)
+   return importlib.import_module(COMMANDS[command][0]).main
+
+def run_command(command, args=()):
+   """
+   Run a command in-process with the given arguments (converted to strings, as by run_script). Returns its exit status as the script would give it: 0 on success, the code given to sys.exit (2 for bad arguments), or 1 if it raised an exception (whose traceback is printed to stderr).
+
+   >>> run_command('interface', ['test/test8_OG.pdb', 'test/test8_single.pdb', '-r', 4])  # doctest: +ELLIPSIS
+   Proportion of correctly predicted interface residues (0-1):
+   ...
+   0
+
+   """
+   main = command_main(command)
+   try:
+      main([str(arg) for arg in args])
+   except SystemExit as error:
+      if error.code is None or isinstance(error.code, int):
+         return error.code or 0
+      print(error.code, file=sys.stderr)
+      return 1
+   except Exception:
+      traceback.print_exc()
+      return 1
+   return 0
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Program: contacts_lib
+File:    contacts_lib.py
+
+Version:  V1.1
+Date:     19.10.26
+Function:   Library: Find antibody-antigen interface contacts in-process and compare the interfaces of a native and a docked complex.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+Contacts are found as in chaincontacts (BiopTools): two residues are in contact if any pair of their atoms is within the cutoff distance (4.0 Angstroms by default), and the number of such atom pairs is the number of contacts of the residue pair. The search is done with NumPy on the coordinates of a PDBStructure, so no files are written and no program is run for each structure. Only atoms inside the bounding box of the other side of the interface (grown by the cutoff) are compared, in blocks, so the memory used stays small.
+
+Several cutoffs can be analysed from one search (e.g. 4 Angstrom contacts, 5 Angstrom DockQ contacts and the 10 Angstrom interface used for interface RMSD): find_interface_pairs() searches once at the largest cutoff and keeps the distance of every atom pair, and the contacts, interface residues and interface atoms at any smaller cutoff are then taken from those pairs without searching again.
+
+The interface of a docked complex is compared with that of the native in the same way as evaluate_interface.py, and the report lines printed by evaluate_interface.py can be produced with interface_report().
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   CDR reference parsed once per process (cdr_reference) rather than on every evaluation   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import json
+import numpy as np
+from typing import NamedTuple
+from pdbstructure_lib import read_pdb
+from dockingtools_lib import getantigenchainid
+
+#*************************************************************************
+
+# Antibody chain IDs
+AB_CHAINS = "LH"
+
+# Reference file of the CDR residues of each complex
+CDR_REFERENCE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "nr1797_cdr_identifiers.json")
+
+# Number of atoms compared at a time in the distance search
+BLOCK_SIZE = 2048
+
+#*************************************************************************
+
+class InterfaceContacts(NamedTuple):
+   """
+   Contacts between the antibody and the antigen of a complex. res_pairs maps 'ab_res-ag_res' (e.g. 'H52A-Y120') to the number of atom contacts, and ab_residues/ag_residues list the interface residues of each side, in order of first contact.
+   """
+   res_pairs: dict
+   ab_residues: list
+   ag_residues: list
+
+class InterfaceComparison(NamedTuple):
+   """
+   Comparison of the interface of a docked complex with the native, as reported by evaluate_interface.py. The CDR fields are 'No reference' when there is no CDR reference for the complex.
+   """
+   res_pair_proportion: float
+   ab_res_proportion: float
+   ag_res_proportion: float
+   cdr_proportion: object
+   correct_num_contacts: int
+   correct_res_pairs: int
+   correct_ab_res: int
+   correct_ag_res: int
+   total_ab_res: int
+   total_ag_res: int
+   total_res_pairs: int
+   true_cdr_res: object
+   predicted_true_cdr_res: object
+   predicted_false_cdr_res: object
+
+#*************************************************************************
+
+def atom_pairs_within(coords_a, coords_b, cutoff):
+   """
+   Return the indices (i, j) of every pair of atoms coords_a[i], coords_b[j] within cutoff of each other, and their distances, ordered by i then j.
+
+   >>> a = np.array([[0.0, 0.0, 0.0], [10.0, 0.0, 0.0]])
+   >>> b = np.array([[3.0, 0.0, 0.0], [0.0, 4.0, 0.0], [50.0, 0.0, 0.0]])
+   >>> i, j, distances = atom_pairs_within(a, b, 4.0)
+   >>> i.tolist(), j.tolist(), distances.tolist()
+   ([0, 0], [0, 1], [3.0, 4.0])
+
+   """
+   coords_a = np.asarray(coords_a, dtype=np.float64)
+   coords_b = np.asarray(coords_b, dtype=np.float64)
+   empty = (np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0))
+   if len(coords_a) == 0 or len(coords_b) == 0:
+      return empty
+   # Keep only atoms near the other structure's bounding box
+   near_a = np.nonzero(np.all((coords_a >= coords_b.min(axis=0) - cutoff) & (coords_a <= coords_b.max(axis=0) + cutoff), axis=1))[0]
+   if len(near_a) == 0:
+      return empty
+   sub_a = coords_a[near_a]
+   near_b = np.nonzero(np.all((coords_b >= sub_a.min(axis=0) - cutoff) & (coords_b <= sub_a.max(axis=0) + cutoff), axis=1))[0]
+   if len(near_b) == 0:
+      return empty
+   sub_b = coords_b[near_b]
+   found_i = []
+   found_j = []
+   found_d = []
+   for start in range(0, len(sub_a), BLOCK_SIZE):
+      block = sub_a[start:start + BLOCK_SIZE]
+      # Summed one axis at a time, in place, to avoid a (block, atoms, 3) temporary array
+      squared = np.subtract.outer(block[:, 0], sub_b[:, 0])
+      squared *= squared
+      for axis in (1, 2):
+         difference = np.subtract.outer(block[:, axis], sub_b[:, axis])
+         difference *= difference
+         squared += difference
+      i, j = np.nonzero(squared <= cutoff * cutoff)
+      found_i += [near_a[start + i]]
+      found_j += [near_b[j]]
+      found_d += [np.sqrt(squared[i, j])]
+   return np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_d)
+
+#*************************************************************************
+
+def _first_unique(values):
+   """
+   Return the unique values of an integer array in order of first appearance, with the number of times each appears.
+
+   >>> [array.tolist() for array in _first_unique(np.array([5, 2, 5, 7, 2, 5]))]
+   [[5, 2, 7], [3, 2, 1]]
+
+   """
+   unique, first, counts = np.unique(values, return_index=True, return_counts=True)
+   order = np.argsort(first, kind='stable')
+   return unique[order], counts[order]
+
+#*************************************************************************
+
+class InterfacePairs:
+   """
+   The antibody-antigen atom pairs of a complex within a maximum cutoff, with their distances, from which the interface at any smaller cutoff is taken without a new search.
+
+   >>> pairs = find_interface_pairs(read_pdb('test/test8_OG.pdb'), 'Y', 10.0)
+   >>> [len(pairs.contacts(cutoff).res_pairs) for cutoff in (4.0, 5.0, 10.0)]
+   [37, 57, 431]
+   >>> ab_residues, ag_residues = pairs.residues(10.0)
+   >>> len(ab_residues), len(ag_residues), int(pairs.interface_atom_mask(10.0).sum())
+   (59, 45, 858)
+
+   """
+   def __init__(self, ab_atoms, ag_atoms, distances, residue_index, residue_labels, max_cutoff):
+      # Atom indices (in the structure) and distance of each pair, ordered by antibody then antigen atom
+      self.ab_atoms = ab_atoms
+      self.ag_atoms = ag_atoms
+      self.distances = distances
+      # Residue number (from 0) of each atom, and the label of each residue
+      self.residue_index = residue_index
+      self.residue_labels = residue_labels
+      self.max_cutoff = max_cutoff
+
+   def _within(self, cutoff):
+      if cutoff > self.max_cutoff:
+         raise ValueError(f"Cutoff {cutoff} is larger than the search cutoff {self.max_cutoff}")
+      keep = self.distances <= cutoff
+      return self.ab_atoms[keep], self.ag_atoms[keep]
+
+   def contacts(self, cutoff=4.0):
+      """
+      Return the InterfaceContacts at cutoff.
+
+      """
+      ab_atoms, ag_atoms = self._within(cutoff)
+      ab_res = self.residue_index[ab_atoms]
+      ag_res = self.residue_index[ag_atoms]
+      num_residues = len(self.residue_labels)
+      pair_keys, counts = _first_unique(ab_res.astype(np.int64) * num_residues + ag_res)
+      labels = self.residue_labels
+      res_pairs = {f"{labels[key // num_residues]}-{labels[key % num_residues]}": int(count) for key, count in zip(pair_keys.tolist(), counts.tolist())}
+      return InterfaceContacts(res_pairs, labels[_first_unique(ab_res)[0]].tolist(), labels[_first_unique(ag_res)[0]].tolist())
+
+   def residues(self, cutoff):
+      """
+      Return the antibody and antigen interface residue labels at cutoff.
+
+      """
+      ab_atoms, ag_atoms = self._within(cutoff)
+      return self.residue_labels[_first_unique(self.residue_index[ab_atoms])[0]].tolist(), self.residue_labels[_first_unique(self.residue_index[ag_atoms])[0]].tolist()
+
+   def interface_atom_mask(self, cutoff):
+      """
+      Return a mask of the atoms of every residue (on either side) with an atom within cutoff of the other side, e.g. the 10 Angstrom interface used for interface RMSD.
+
+      """
+      ab_atoms, ag_atoms = self._within(cutoff)
+      in_interface = np.zeros(len(self.residue_labels), dtype=bool)
+      in_interface[self.residue_index[ab_atoms]] = True
+      in_interface[self.residue_index[ag_atoms]] = True
+      return in_interface[self.residue_index]
+
+#*************************************************************************
+
+def residue_numbering(labels):
+   """
+   Return the residue number (from 0, in order of first appearance) of each atom and the label of each residue, from per-atom residue labels.
+
+   >>> index, residues = residue_numbering(np.array(['L1', 'L1', 'L2', 'H1', 'H1']))
+   >>> index.tolist(), residues.tolist()
+   ([0, 0, 1, 2, 2], ['L1', 'L2', 'H1'])
+
+   """
+   unique, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+   order = np.argsort(first, kind='stable')
+   rank = np.empty(len(order), dtype=np.int64)
+   rank[order] = np.arange(len(order))
+   return rank[inverse.reshape(-1)], unique[order]
+
+#*************************************************************************
+
+def find_interface_pairs(structure, agchainid, max_cutoff=10.0, abchains=AB_CHAINS, numbering=None):
+   """
+   Search once for the antibody-antigen atom pairs of a PDBStructure within max_cutoff. numbering is the result of residue_numbering for the structure, if already known (e.g. shared by many decoys).
+
+   """
+   return pairs_from_arrays(structure.coords, structure.chain_mask(abchains), structure.chain_mask(agchainid), numbering or residue_numbering(structure.residue_labels()), max_cutoff)
+
+def pairs_from_arrays(coords, ab_mask, ag_mask, numbering, max_cutoff=10.0):
+   """
+   Search once for the atom pairs within max_cutoff given coordinates, antibody and antigen atom masks and the residue numbering of the atoms. Used when the masks and numbering are shared by many structures (e.g. decoys with the same topology).
+
+   """
+   ab_index = np.nonzero(ab_mask)[0]
+   ag_index = np.nonzero(ag_mask)[0]
+   i, j, distances = atom_pairs_within(coords[ab_index], coords[ag_index], max_cutoff)
+   residue_index, residue_labels = numbering
+   return InterfacePairs(ab_index[i], ag_index[j], distances, residue_index, residue_labels, max_cutoff)
+
+#*************************************************************************
+
+def contacts_from_arrays(coords, ab_mask, ag_mask, labels, cutoff=4.0):
+   """
+   Find the interface contacts of a complex given its coordinates, masks of the antibody and antigen atoms and the residue label of each atom.
+
+   """
+   return pairs_from_arrays(coords, ab_mask, ag_mask, residue_numbering(labels), cutoff).contacts(cutoff)
+
+#*************************************************************************
+
+def interface_contacts(structure, agchainid, cutoff=4.0, abchains=AB_CHAINS):
+   """
+   Find the contacts between the antibody chains and the antigen chain of a PDBStructure.
+
+   >>> contacts = interface_contacts(read_pdb('test/test8_OG.pdb'), 'Y')
+   >>> len(contacts.res_pairs), len(contacts.ab_residues), len(contacts.ag_residues)
+   (37, 19, 14)
+
+   """
+   return find_interface_pairs(structure, agchainid, cutoff, abchains).contacts(cutoff)
+
+#*************************************************************************
+
+def load_cdr_reference(reference_file=CDR_REFERENCE_FILE):
+   """
+   Load the CDR residues of each complex from the reference JSON file.
+
+   """
+   with open(reference_file) as file:
+      return json.load(file)[0]
+
+_references = {}
+
+def cdr_reference(reference_file=CDR_REFERENCE_FILE):
+   """
+   Return the CDR reference, parsed once per process (and again only if the file changes).
+
+   >>> cdr_reference() is cdr_reference(CDR_REFERENCE_FILE)
+   True
+
+   """
+   reference_file = os.path.realpath(reference_file)
+   status = os.stat(reference_file)
+   stamp = (status.st_mtime_ns, status.st_size)
+   if reference_file not in _references or _references[reference_file][0] != stamp:
+      _references[reference_file] = (stamp, load_cdr_reference(reference_file))
+   return _references[reference_file][1]
+
+def cdr_residues(OG_file, reference_data):
+   """
+   Return the CDR residues of the complex in OG_file from the reference data, or None if it is not in the reference (the file name may start with 'pdb').
+
+   >>> cdr_residues('/data/pdb1vfb_0P.pdb', {'1vfb_0P': ['H26', 'H27']})
+   ['H26', 'H27']
+
+   """
+   OG_filename = os.path.basename(OG_file).split('.')[0]
+   reference_filename = OG_filename.split('pdb')[1] if 'pdb' in OG_filename else OG_filename
+   return reference_data.get(reference_filename)
+
+#*************************************************************************
+
+def compare_interfaces(native, docked, reference_cdrs=None):
+   """
+   Compare the InterfaceContacts of a docked complex with those of the native. reference_cdrs are the CDR residues of the complex (None if there is no reference).
+
+   >>> native = InterfaceContacts({'H1-Y1': 2, 'H2-Y1': 1, 'L1-Y2': 3}, ['H1', 'H2', 'L1'], ['Y1', 'Y2'])
+   >>> docked = InterfaceContacts({'H1-Y1': 2, 'H2-Y3': 1}, ['H1', 'H2'], ['Y1', 'Y3'])
+   >>> result = compare_interfaces(native, docked, ['H1', 'H2', 'H3'])
+   >>> result.res_pair_proportion, result.ab_res_proportion, result.ag_res_proportion, result.cdr_proportion, result.correct_num_contacts
+   (0.3333333333333333, 0.6666666666666666, 0.5, 1.0, 1)
+   >>> compare_interfaces(native, docked).cdr_proportion
+   'No reference'
+
+   """
+   native_ab = set(native.ab_residues)
+   native_ag = set(native.ag_residues)
+   correct_ab_res = sum(1 for res in docked.ab_residues if res in native_ab)
+   correct_ag_res = sum(1 for res in docked.ag_residues if res in native_ag)
+   correct_res_pairs = sum(1 for res_pair in docked.res_pairs if res_pair in native.res_pairs)
+   correct_num_contacts = sum(1 for res_pair, contacts in docked.res_pairs.items() if native.res_pairs.get(res_pair) == contacts)
+   try:
+      reference = set(reference_cdrs)
+      true_cdr = {res for res in native.ab_residues if res in reference}
+      predicted_true = sum(1 for res in docked.ab_residues if res in true_cdr)
+      predicted_false = sum(1 for res in docked.ab_residues if res not in true_cdr and res in reference)
+      cdr = (predicted_true / len(true_cdr), len(true_cdr), predicted_true, predicted_false)
+   except (TypeError, ZeroDivisionError):
+      cdr = ("No reference",) * 4
+   return InterfaceComparison(correct_res_pairs / len(native.res_pairs), correct_ab_res / len(native.ab_residues), correct_ag_res / len(native.ag_residues), cdr[0],
+                              correct_num_contacts, correct_res_pairs, correct_ab_res, correct_ag_res,
+                              len(native.ab_residues), len(native.ag_residues), len(native.res_pairs), cdr[1], cdr[2], cdr[3])
+
+#*************************************************************************
+
+def interface_report(result):
+   """
+   Return the lines printed by evaluate_interface.py for an InterfaceComparison.
+
+   """
+   return [f"Proportion of correctly predicted interface residues (0-1):",
+           f"============================================================",
+           f"Correctly predicted residue pairs:       {result.res_pair_proportion}",
+           f"Correctly predicted residues (antibody): {result.ab_res_proportion}",
+           f"Correctly predicted residues (antigen):  {result.ag_res_proportion}",
+           f"Correctly predicted interface CDR residues: {result.cdr_proportion}",
+           f"Number of correctly predicted contacts: {result.correct_num_contacts}",
+           f"Number of correctly predicted residue pairs: {result.correct_res_pairs}",
+           f"Number of correctly predicted ab residues: {result.correct_ab_res}",
+           f"Number of correctly predicted ag residues: {result.correct_ag_res}",
+           f"Number of original ab residues: {result.total_ab_res}",
+           f"Number of original ag residues: {result.total_ag_res}",
+           f"Number of original res pairs: {result.total_res_pairs}",
+           f"Number of original (true total) interface CDR residues: {result.true_cdr_res}",
+           f"Number of correctly predicted interface CDR residues: {result.predicted_true_cdr_res}",
+           f"Number of incorrectly predicted interface CDR residues: {result.predicted_false_cdr_res}"]
+
+#*************************************************************************
+
+def evaluate_interface_cutoffs(OG_file, docked_file, cutoffs=(4.0,), reference_data=None):
+   """
+   Compare the interface of docked_file with that of OG_file at each cutoff, with one neighbour search per structure (the antigen chain is taken from the OG_file header, the CDRs from reference_data, by default cdr_reference()). Returns {cutoff: InterfaceComparison}.
+
+   >>> results = evaluate_interface_cutoffs('test/test8_OG.pdb', 'test/test8_single.pdb', (4.0, 5.0), reference_data={})
+   >>> results[4.0].res_pair_proportion, results[4.0].ab_res_proportion, results[5.0].total_res_pairs
+   (0.24324324324324326, 0.5789473684210527, 57)
+
+   """
+   if reference_data is None:
+      reference_data = cdr_reference()
+   agchainid = getantigenchainid(OG_file)
+   native = find_interface_pairs(read_pdb(OG_file), agchainid, max(cutoffs))
+   docked = find_interface_pairs(read_pdb(docked_file), agchainid, max(cutoffs))
+   reference_cdrs = cdr_residues(OG_file, reference_data)
+   return {cutoff: compare_interfaces(native.contacts(cutoff), docked.contacts(cutoff), reference_cdrs) for cutoff in cutoffs}
+
+def evaluate_interface(OG_file, docked_file, cutoff=4.0, reference_data=None):
+   """
+   Compare the interface of docked_file with that of OG_file at one cutoff. Returns an InterfaceComparison.
+
+   """
+   return evaluate_interface_cutoffs(OG_file, docked_file, (cutoff,), reference_data)[cutoff]
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Program: datasetrunner
+File:    datasetrunner.py
+
+Version:  V1.4
+Date:     19.10.26
+Function: Dock a manifest of antibody-antigen complexes in balanced chunks, as batch-scheduler array tasks or on the local machine.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+The complexes listed in a manifest (one PDB file per line, optionally followed by its expected runtime in seconds) are split into chunks of nearly equal predicted runtime (see datasetrunner_lib.py). The chunking is worked out from the manifest each time, so each array task only needs its chunk number. Commands:
+  plan    write the chunks and their predicted runtimes to a table
+  emit    write an SGE or SLURM array job script with one task per chunk
+  run     dock one chunk (the command run by each array task)
+  local   run every chunk on this machine, a few at a time
+  queue   take complexes from a work queue on the shared filesystem until none are left (see workqueue_lib.py); any number of nodes can run this on the same manifest
+  status  count the complexes done, claimed, abandoned and pending in the work queue
+With emit --queue SLOTS, each array task runs a work queue runner rather than a fixed chunk.
+With --max-resolution, complexes with a worse or unknown resolution (from --resolution-index, by default the AbDb resolutions in chunan/data, or else the header of the PDB file) are left out of the manifest before planning, so no compute is spent on them; plan and emit report how many were left out.
+Results are written to OUTPath/<complex>/run<i>/, and the log and summary of each chunk to OUTPath/logs/.
+
+--------------------------------------------------------------------------
+
+Usage:
+======
+datasetrunner.py plan manifest --chunks N [-o plan_file]
+datasetrunner.py emit manifest OUTPath --chunks N --scheduler sge|slurm [--cpus N] [--memory 4G] [--walltime 48:00:00] [-o script]
+datasetrunner.py run manifest OUTPath --chunks N --chunk K [--cpus N] [--memory GB]
+datasetrunner.py local manifest OUTPath --chunks N [--workers N] [--cpus N] [--memory GB]
+datasetrunner.py queue manifest OUTPath [--slots N] [--cpus N] [--memory GB] [--queue-dir dir]
+datasetrunner.py status manifest OUTPath [--queue-dir dir]
+Each also takes --methods, --runs and --evaluate as for orchestrate.py, and --max-resolution Angstroms [--resolution-index file].
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   Work queue mode (queue, status, emit --queue)   By: OECH
+V1.2   19.10.26   --memory budget for run, local and queue   By: OECH
+V1.3   19.10.26   --max-resolution pre-filter of the manifest   By: OECH
+V1.4   19.10.26   emit --memory is the total of a task, split between the slots for SGE   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import sys
+import argparse
+from orchestrator_lib import METHODS
+from workqueue_lib import HEARTBEAT, STALE_AFTER
+from datasetrunner_lib import read_manifest, resolution_filter, plan_chunks, write_plan, array_script, run_chunk, run_local, run_queue, queue_status
+
+#*************************************************************************
+
+# Define inputs
+parser = argparse.ArgumentParser(description="Dock a manifest of complexes in balanced chunks.")
+commands = parser.add_subparsers(dest="command", required=True)
+for name in ("plan", "emit", "run", "local", "queue", "status"):
+   command = commands.add_parser(name)
+   command.add_argument("manifest", help="Manifest of PDB files")
+   if name != "plan":
+      command.add_argument("OUTPath", help="Output directory")
+   if name not in ("queue", "status"):
+      command.add_argument("--chunks", type=int, required=True, help="Number of chunks (array tasks for emit --queue)")
+   command.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS), help="Docking methods to run (default: all)")
+   command.add_argument("--runs", type=int, default=1, help="Number of docking runs of each complex (default: 1)")
+   command.add_argument("--evaluate", action="store_true", help="Evaluate the interface of each result")
+   command.add_argument("--max-resolution", type=float, help="Leave out complexes with a worse (or unknown) resolution, in Angstroms")
+   command.add_argument("--resolution-index", help="Resolution grep dump or saved index (default: chunan/data/abdb.pdb.resolution.text)")
+commands.choices["plan"].add_argument("-o", dest="plan_file", help="Plan table (default: print)")
+commands.choices["emit"].add_argument("--scheduler", choices=("sge", "slurm"), required=True)
+commands.choices["emit"].add_argument("--cpus", type=int, default=1, help="Cores per task (default: 1)")
+commands.choices["emit"].add_argument("--memory", default="4G", help="Total memory per task (default: 4G); SGE jobs request it per slot, as h_vmem = memory / cpus")
+commands.choices["emit"].add_argument("--walltime", default="48:00:00", help="Time limit per task (default: 48:00:00)")
+commands.choices["emit"].add_argument("--name", default="docking", help="Job name")
+commands.choices["emit"].add_argument("-o", dest="script", help="Job script (default: print)")
+commands.choices["emit"].add_argument("--queue", dest="slots", type=int, help="Run a work queue runner with this many slots in each task")
+commands.choices["run"].add_argument("--chunk", type=int, required=True, help="Chunk to run (from 0)")
+commands.choices["run"].add_argument("--cpus", type=int, help="Cores to use (default: all)")
+commands.choices["run"].add_argument("--memory", type=float, help="Memory (GB) to use (default: all)")
+commands.choices["local"].add_argument("--workers", type=int, default=1, help="Chunks run at once (default: 1)")
+commands.choices["local"].add_argument("--cpus", type=int, help="Cores per chunk (default: shared between the workers)")
+commands.choices["local"].add_argument("--memory", type=float, help="Memory (GB) per chunk (default: shared between the workers)")
+for name in ("queue", "status"):
+   commands.choices[name].add_argument("--queue-dir", help="Work queue directory (default: OUTPath/queue)")
+commands.choices["queue"].add_argument("--slots", type=int, default=1, help="Complexes worked on at once (default: 1)")
+commands.choices["queue"].add_argument("--cpus", type=int, help="Cores to use (default: all)")
+commands.choices["queue"].add_argument("--memory", type=float, help="Memory (GB) to use (default: all)")
+commands.choices["queue"].add_argument("--heartbeat", type=float, default=HEARTBEAT, help=f"Seconds between heartbeats (default: {HEARTBEAT})")
+commands.choices["queue"].add_argument("--stale-after", type=float, default=STALE_AFTER, help=f"Seconds without a heartbeat before a claim is taken over (default: {STALE_AFTER})")
+args = parser.parse_args()
+
+#*************************************************************************
+
+# Report the complexes left out by resolution
+if args.max_resolution is not None and args.command in ("plan", "emit"):
+   _, excluded = resolution_filter(read_manifest(args.manifest), args.max_resolution, args.resolution_index)
+   print(f"{len(excluded)} complexes left out with a resolution worse than {args.max_resolution:g} Angstroms or unknown", file=sys.stderr)
+   for PDBfile, _ in excluded:
+      print(f"   {PDBfile}", file=sys.stderr)
+
+if args.command == "plan":
+   chunks = plan_chunks(args.manifest, args.chunks, args.methods, args.runs, args.max_resolution, args.resolution_index)
+   write_plan(chunks, args.plan_file or "/dev/stdout")
+
+elif args.command == "emit":
+   script = array_script(args.scheduler, args.manifest, args.OUTPath, args.chunks, args.methods, args.runs, args.cpus, args.memory, args.walltime, args.name, args.evaluate, args.slots, args.max_resolution, args.resolution_index)
+   os.makedirs(os.path.join(args.OUTPath, "logs"), exist_ok=True)
+   if args.script:
+      with open(args.script, "w") as file:
+         file.write(script)
+      print(f"Submit with: {'qsub' if args.scheduler == 'sge' else 'sbatch'} {args.script}")
+   else:
+      print(script, end='')
+
+elif args.command == "run":
+   failures = run_chunk(args.manifest, args.OUTPath, args.chunk, args.chunks, args.methods, args.runs, args.cpus, args.evaluate, args.memory, args.max_resolution, args.resolution_index)
+   print(f"Chunk {args.chunk}: {failures} failed method runs")
+   sys.exit(1 if failures else 0)
+
+elif args.command == "local":
+   statuses = run_local(args.manifest, args.OUTPath, args.chunks, args.workers, args.methods, args.runs, args.cpus, args.evaluate, args.memory, args.max_resolution, args.resolution_index)
+   for chunk, status in enumerate(statuses):
+      print(f"Chunk {chunk}: {'ok' if status == 0 else f'failed (exit status {status})'}")
+   sys.exit(1 if any(statuses) else 0)
+
+elif args.command == "queue":
+   failures = run_queue(args.manifest, args.OUTPath, args.queue_dir, args.slots, args.methods, args.runs, args.cpus, args.evaluate, args.heartbeat, args.stale_after, args.memory, args.max_resolution, args.resolution_index)
+   print(f"Queue empty: {failures} failed method runs on this node")
+   sys.exit(1 if failures else 0)
+
+elif args.command == "status":
+   for state, count in queue_status(args.manifest, args.OUTPath, args.queue_dir, args.max_resolution, args.resolution_index).items():
+      print(f"{state}\t{count}")
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Program: datasetrunner_lib
+File:    datasetrunner_lib.py
+
+Version:  V1.6
+Date:     19.10.26
+Function:   Library: Split a manifest of complexes into balanced chunks and run each chunk as a batch-scheduler array task or locally.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+A manifest lists the PDB files of the complexes to dock, one per line (blank lines and lines starting with '#' are skipped). A second column may give the expected runtime of the complex; otherwise it is predicted from the number of atoms and the runtimes of the docking methods run (their resource profiles, see resources_lib.py). If a maximum resolution is given, complexes with a worse or unknown resolution (looked up in a resolution index, see resolution_lib.py) are left out as the manifest is read, so nothing is spent on them and every command sees the same complexes. The complexes are split into chunks of nearly equal total runtime by the longest processing time rule: complexes are taken longest first and each is added to the chunk with the least work so far. The split only depends on the manifest and the options, so every array task works out the same chunks and needs only its own chunk number.
+
+Each chunk is docked by run_chunk() with the asyncio orchestrator (see orchestrator_lib.py), results going to OUTPath/<complex>/run<i>/ and a log and summary of the chunk to OUTPath/logs/. array_script() writes an SGE or SLURM array job script with one task per chunk, and run_local() runs the same per-chunk command for every chunk on the local machine, a few at a time, for testing.
+
+In place of fixed chunks, run_queue() takes complexes one at a time from a work queue on the shared filesystem (see workqueue_lib.py), longest first, until none are left. Any number of nodes (or array tasks) can run it on the same manifest; each keeps a number of complexes in progress at once (slots) and the work balances itself, however long each complex takes.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   Work queue mode (run_queue)   By: OECH
+V1.2   19.10.26   Runtimes from the method resource profiles; memory budget of each task passed to the orchestrator   By: OECH
+V1.3   19.10.26   Complexes worse than a maximum resolution left out of the manifest (max_resolution)   By: OECH
+V1.4   19.10.26   Queue runners cancel the docking of a complex whose claim is lost and do not complete it   By: OECH
+V1.5   19.10.26   SGE h_vmem requested per slot (task memory / cores)   By: OECH
+V1.6   19.10.26   A complex that fails with an error is completed as failed and the queue runner carries on   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import sys
+import math
+import heapq
+import shlex
+import socket
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from toolrunner_lib import run_script, SCRIPT_DIR
+from orchestrator_lib import METHODS, Orchestrator, run_complexes, dock_complex
+from workqueue_lib import HEARTBEAT, STALE_AFTER, WorkQueue, item_names
+from resources_lib import load_profiles, run_runtime, node_memory, count_atoms
+from resolution_lib import load_index, complex_resolution
+
+#*************************************************************************
+
+# Batch-scheduler array job script headers
+SCHEDULER_HEADERS = {
+   "sge": ["#$ -N {name}",
+           "#$ -t 1-{num_chunks}",
+           "#$ -pe smp {cpus}",
+           "#$ -l h_vmem={slot_memory}",
+           "#$ -l h_rt={walltime}",
+           "#$ -cwd",
+           "#$ -o {logs}/$JOB_NAME.$TASK_ID.out",
+           "#$ -e {logs}/$JOB_NAME.$TASK_ID.err"],
+   "slurm": ["#SBATCH --job-name={name}",
+             "#SBATCH --array=0-{last_chunk}",
+             "#SBATCH --cpus-per-task={cpus}",
+             "#SBATCH --mem={memory}",
+             "#SBATCH --time={walltime}",
+             "#SBATCH --output={logs}/%x_%A_%a.out",
+             "#SBATCH --error={logs}/%x_%A_%a.err"],
+}
+
+# Chunk number of an array task in each scheduler (chunks are numbered from 0)
+SCHEDULER_TASK = {
+   "sge": "$((SGE_TASK_ID - 1))",
+   "slurm": "$SLURM_ARRAY_TASK_ID",
+}
+
+#*************************************************************************
+
+def read_manifest(manifest, max_resolution=None, resolution_index=None):
+   """
+   Read a manifest, returning a list of (PDB file, runtime or None). Relative paths are taken from the manifest's directory. If max_resolution is given, only complexes with a resolution of at most max_resolution Angstroms in the resolution index (a grep dump or saved index, default resolution_lib.RESOLUTION_FILE) or their own header are kept.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    with open(tmp + '/manifest.txt', 'w') as file:
+   ...       _ = file.write('# complexes\\n/data/1abc_0P.pdb\\n\\n/data/2xyz_0P.pdb 3600\\n')
+   ...    read_manifest(tmp + '/manifest.txt')
+   [('/data/1abc_0P.pdb', None), ('/data/2xyz_0P.pdb', 3600.0)]
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    with open(tmp + '/manifest.txt', 'w') as file:
+   ...       _ = file.write('/data/pdb1vfb_0P.pdb\\n/data/pdb6avq_0P.pdb\\n/data/pdb1qnz_0P.pdb\\n')
+   ...    read_manifest(tmp + '/manifest.txt', max_resolution=3.0)
+   [('/data/pdb1vfb_0P.pdb', None)]
+
+   """
+   directory = os.path.dirname(os.path.abspath(manifest))
+   entries = []
+   with open(manifest) as file:
+      for line in file:
+         fields = line.split()
+         if not fields or fields[0].startswith('#'):
+            continue
+         entries += [(os.path.join(directory, fields[0]), float(fields[1]) if len(fields) > 1 else None)]
+   if max_resolution is not None:
+      entries = resolution_filter(entries, max_resolution, resolution_index)[0]
+   return entries
+
+def resolution_filter(entries, max_resolution, resolution_index=None):
+   """
+   Split manifest entries into those with a resolution of at most max_resolution Angstroms and those left out (worse or unknown resolution).
+
+   >>> kept, excluded = resolution_filter([('pdb1vfb_0P.pdb', None), ('pdb6avq_0P.pdb', 10.0)], 2.0)
+   >>> kept, excluded
+   ([('pdb1vfb_0P.pdb', None)], [('pdb6avq_0P.pdb', 10.0)])
+
+   """
+   index = load_index(resolution_index)
+   kept, excluded = [], []
+   for entry in entries:
+      resolution = complex_resolution(entry[0], index)
+      if resolution is not None and resolution <= max_resolution:
+         kept += [entry]
+      else:
+         excluded += [entry]
+   return kept, excluded
+
+#*************************************************************************
+
+def predict_runtime(PDBfile, methods=METHODS, runs=1):
+   """
+   Predict the runtime (seconds) of docking a complex with the given methods from its number of atoms and the methods' resource profiles.
+
+   >>> round(predict_runtime('test/test8_OG.pdb', ['megadock']))
+   1626
+
+   """
+   atoms = count_atoms(PDBfile)
+   profiles = load_profiles()
+   return runs * sum(run_runtime(profiles[method], atoms) for method in methods)
+
+#*************************************************************************
+
+def partition(weights, num_chunks):
+   """
+   Split items with the given weights into num_chunks chunks of nearly equal total weight (longest processing time rule). Returns a list of the item indices in each chunk, heaviest first.
+
+   >>> partition([5, 1, 4, 3, 3, 2], 3)
+   [[0, 1], [2, 5], [3, 4]]
+
+   """
+   order = sorted(range(len(weights)), key=lambda i: (-weights[i], i))
+   chunks = [[] for _ in range(num_chunks)]
+   # (total weight, chunk number) of each chunk
+   loads = [(0, chunk) for chunk in range(num_chunks)]
+   for i in order:
+      load, chunk = heapq.heappop(loads)
+      chunks[chunk] += [i]
+      heapq.heappush(loads, (load + weights[i], chunk))
+   return chunks
+
+def plan_chunks(manifest, num_chunks, methods=METHODS, runs=1, max_resolution=None, resolution_index=None):
+   """
+   Split the complexes of a manifest (those of at most max_resolution, if given) into num_chunks balanced chunks. Returns a list of chunks, each a list of (PDB file, runtime).
+
+   """
+   entries = read_manifest(manifest, max_resolution, resolution_index)
+   weights = [runtime if runtime is not None else predict_runtime(PDBfile, methods, runs) for PDBfile, runtime in entries]
+   return [[(entries[i][0], weights[i]) for i in chunk] for chunk in partition(weights, num_chunks)]
+
+def write_plan(chunks, plan_file):
+   """
+   Write the chunks as a table of chunk number, PDB file and predicted runtime, ending with the total runtime of each chunk.
+
+   """
+   with open(plan_file, "w") as file:
+      file.write("chunk\tPDBfile\truntime\n")
+      for number, chunk in enumerate(chunks):
+         for PDBfile, runtime in chunk:
+            file.write(f"{number}\t{PDBfile}\t{runtime:.0f}\n")
+      for number, chunk in enumerate(chunks):
+         file.write(f"# chunk {number}: {len(chunk)} complexes, {sum(runtime for _, runtime in chunk):.0f} s\n")
+
+#*************************************************************************
+
+def chunk_command(manifest, OUTPath, num_chunks, chunk, methods=METHODS, runs=1, cpus=None, evaluate=False, memory=None, max_resolution=None, resolution_index=None):
+   """
+   Build the command line running one chunk (the same for array tasks and local runs).
+
+   >>> chunk_command('m.txt', 'out', 4, 2, ['megadock'], cpus=8)[2:]
+   ['run', 'm.txt', 'out', '--chunks', '4', '--chunk', '2', '--methods', 'megadock', '--runs', '1', '--cpus', '8']
+
+   """
+   command = [sys.executable, os.path.join(SCRIPT_DIR, "datasetrunner.py"), "run", manifest, OUTPath, "--chunks", str(num_chunks), "--chunk", str(chunk), "--methods", *methods, "--runs", str(runs)]
+   return _add_options(command, cpus, evaluate, memory, max_resolution, resolution_index)
+
+def queue_command(manifest, OUTPath, slots=1, methods=METHODS, runs=1, cpus=None, evaluate=False, memory=None, max_resolution=None, resolution_index=None):
+   """
+   Build the command line of a work queue runner.
+
+   >>> queue_command('m.txt', 'out', 2, ['piper'])[2:]
+   ['queue', 'm.txt', 'out', '--slots', '2', '--methods', 'piper', '--runs', '1']
+   >>> queue_command('m.txt', 'out', 2, ['piper'], max_resolution=3.0)[-2:]
+   ['--max-resolution', '3']
+
+   """
+   command = [sys.executable, os.path.join(SCRIPT_DIR, "datasetrunner.py"), "queue", manifest, OUTPath, "--slots", str(slots), "--methods", *methods, "--runs", str(runs)]
+   return _add_options(command, cpus, evaluate, memory, max_resolution, resolution_index)
+
+def _add_options(command, cpus, evaluate, memory=None, max_resolution=None, resolution_index=None):
+   if cpus:
+      command += ["--cpus", str(cpus)]
+   if memory:
+      command += ["--memory", f"{memory:g}"]
+   if evaluate:
+      command += ["--evaluate"]
+   if max_resolution is not None:
+      command += ["--max-resolution", f"{max_resolution:g}"]
+   if resolution_index:
+      command += ["--resolution-index", os.path.abspath(resolution_index)]
+   return command
+
+def gigabytes(memory):
+   """
+   Convert a scheduler memory request (e.g. 4G, 500M) to GB.
+
+   >>> gigabytes('4G'), gigabytes('512M'), gigabytes('1T')
+   (4.0, 0.5, 1024.0)
+
+   """
+   units = {"K": 1024 ** -2, "M": 1024 ** -1, "G": 1.0, "T": 1024.0}
+   memory = memory.upper().rstrip("B")
+   if memory[-1:] in units:
+      return float(memory[:-1]) * units[memory[-1]]
+   # Plain numbers are megabytes, as for SLURM
+   return float(memory) / 1024
+
+def slot_memory(memory, cpus):
+   """
+   Split the memory of a task (e.g. 8G) between its cpus slots, as SGE's h_vmem is requested per slot.
+
+   >>> slot_memory('8G', 4), slot_memory('4G', 3), slot_memory('4G', 1)
+   ('2G', '1366M', '4G')
+
+   """
+   share = gigabytes(memory) / max(1, cpus)
+   return f"{share:g}G" if share == int(share) else f"{math.ceil(share * 1024)}M"
+
+def array_script(scheduler, manifest, OUTPath, num_chunks, methods=METHODS, runs=1, cpus=1, memory="4G", walltime="48:00:00", name="docking", evaluate=False, slots=None, max_resolution=None, resolution_index=None):
+   """
+   Return the text of an SGE or SLURM array job script running one chunk per task. If slots is given, each of the num_chunks tasks instead runs a work queue runner with that many slots. Each task asks for cpus cores and the given memory, and its orchestrator packs the docking runs into those. memory is the total of the task: SLURM's --mem is per job and is given it unchanged, while SGE's h_vmem is per slot (of -pe smp cpus) and is given memory / cpus.
+
+   >>> script = array_script('slurm', '/data/manifest.txt', '/data/out', 10, ['megadock'], cpus=8)
+   >>> [line for line in script.splitlines() if 'array' in line or 'datasetrunner' in line][0]
+   '#SBATCH --array=0-9'
+   >>> script = array_script('sge', '/data/manifest.txt', '/data/out', 10, ['megadock'], cpus=8, memory='16G')
+   >>> [line for line in script.splitlines() if 'h_vmem' in line], script.split()[-1]
+   (['#$ -l h_vmem=2G'], '16')
+
+   """
+   manifest = os.path.abspath(manifest)
+   OUTPath = os.path.abspath(OUTPath)
+   fields = {"name": name, "num_chunks": num_chunks, "last_chunk": num_chunks - 1, "cpus": cpus, "memory": memory, "slot_memory": slot_memory(memory, cpus), "walltime": walltime, "logs": os.path.join(OUTPath, "logs")}
+   lines = ["#!/bin/bash"] + [line.format(**fields) for line in SCHEDULER_HEADERS[scheduler]] + [""]
+   if "DOCKINGTOOLS_CONFIG" in os.environ:
+      lines += [f"export DOCKINGTOOLS_CONFIG={shlex.quote(os.path.abspath(os.environ['DOCKINGTOOLS_CONFIG']))}"]
+   if slots:
+      command = queue_command(manifest, OUTPath, slots, methods, runs, cpus, evaluate, gigabytes(memory), max_resolution, resolution_index)
+   else:
+      command = chunk_command(manifest, OUTPath, num_chunks, "@CHUNK@", methods, runs, cpus, evaluate, gigabytes(memory), max_resolution, resolution_index)
+   lines += [" ".join(shlex.quote(arg) for arg in command).replace("@CHUNK@", SCHEDULER_TASK[scheduler])]
+   return "\n".join(lines) + "\n"
+
+#*************************************************************************
+
+def run_chunk(manifest, OUTPath, chunk, num_chunks, methods=METHODS, runs=1, cpus=None, evaluate=False, memory=None, max_resolution=None, resolution_index=None):
+   """
+   Dock the complexes of one chunk of a manifest with the orchestrator (within cpus cores and memory GB, by default those of the machine), writing the log to OUTPath/logs/chunk_<chunk>.jsonl and a summary line per complex, run and method to OUTPath/logs/chunk_<chunk>.tsv. Returns the number of failed method runs.
+
+   """
+   chunks = plan_chunks(manifest, num_chunks, methods, runs, max_resolution, resolution_index)
+   logs = os.path.join(OUTPath, "logs")
+   os.makedirs(logs, exist_ok=True)
+   PDBfiles = [PDBfile for PDBfile, _ in chunks[chunk]]
+   outcomes = run_complexes(PDBfiles, OUTPath, methods, runs, cpus, os.path.join(logs, f"chunk_{chunk}.jsonl"), evaluate, memory)
+   failures = 0
+   with open(os.path.join(logs, f"chunk_{chunk}.tsv"), "w") as file:
+      for name, complex_runs in outcomes.items():
+         if not complex_runs:
+            file.write(f"{name}\t-\t-\tskipped\n")
+         for run, complex_methods in complex_runs.items():
+            for method, (returncode, resultfiles) in complex_methods.items():
+               ok = returncode == 0 and bool(resultfiles)
+               failures += not ok
+               file.write(f"{name}\trun{run}\t{method}\t{'ok' if ok else f'failed ({returncode})'}\n")
+   return failures
+
+def run_local(manifest, OUTPath, num_chunks, workers=1, methods=METHODS, runs=1, cpus=None, evaluate=False, memory=None, max_resolution=None, resolution_index=None):
+   """
+   Run every chunk on this machine, workers chunks at a time, each with the same command as an array task. Unless cpus and memory are given, the cores and memory of the machine are shared between the workers. Returns the exit status of each chunk.
+
+   """
+   if not cpus:
+      cpus = max(1, (os.cpu_count() or 1) // workers)
+   if not memory:
+      memory = node_memory() / workers
+   def run(chunk):
+      command = chunk_command(manifest, OUTPath, num_chunks, chunk, methods, runs, cpus, evaluate, memory, max_resolution, resolution_index)
+      return run_script("datasetrunner.py", command[2:]).returncode
+   with ThreadPoolExecutor(max_workers=workers) as pool:
+      return list(pool.map(run, range(num_chunks)))
+
+def queue_items(manifest, methods=METHODS, runs=1, max_resolution=None, resolution_index=None):
+   """
+   Return the work queue items of a manifest (those of at most max_resolution, if given), longest first, and the PDB file of each.
+
+   """
+   entries = read_manifest(manifest, max_resolution, resolution_index)
+   items = item_names([os.path.basename(PDBfile).split('.')[0] for PDBfile, _ in entries])
+   weights = [runtime if runtime is not None else predict_runtime(PDBfile, methods, runs) for PDBfile, runtime in entries]
+   order = sorted(range(len(entries)), key=lambda i: (-weights[i], i))
+   return [items[i] for i in order], {items[i]: entries[i][0] for i in order}
+
+def queue_status(manifest, OUTPath, queue_dir=None, max_resolution=None, resolution_index=None):
+   """
+   Count the complexes of a manifest that are done, claimed, stale and pending in its work queue (given the same max_resolution as the runners).
+
+   """
+   items, _ = queue_items(manifest, [], 1, max_resolution, resolution_index)
+   return WorkQueue(queue_dir or os.path.join(OUTPath, "queue"), items).status()
+
+def run_queue(manifest, OUTPath, queue_dir=None, slots=1, methods=METHODS, runs=1, cpus=None, evaluate=False, heartbeat=HEARTBEAT, stale_after=STALE_AFTER, memory=None, max_resolution=None, resolution_index=None):
+   """
+   Dock complexes of a manifest taken from its work queue (OUTPath/queue by default) until none are left, working on up to slots complexes at once. The log of this runner is written to OUTPath/logs/queue_<host>_<pid>.jsonl and the outcome of each complex to the queue. If the claim on a complex is lost (taken over by another node after missed heartbeats), its docking is cancelled and the complex is left to the new owner. A complex whose docking raises an error is completed with the error as its outcome (and counted as a failure). Returns the number of failed method runs.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    with open(tmp + '/manifest.txt', 'w') as file:
+   ...       _ = file.write('/nonexistent/1abc_0P.pdb 10\\n')
+   ...    queue = WorkQueue(tmp + '/out/queue', ['00000_1abc_0P'])
+   ...    _ = queue.complete(queue.claim_next(), 'ok')
+   ...    run_queue(tmp + '/manifest.txt', tmp + '/out'), queue_status(tmp + '/manifest.txt', tmp + '/out')
+   (0, {'done': 1, 'claimed': 0, 'stale': 0, 'pending': 0})
+
+   """
+   items, PDBfiles = queue_items(manifest, methods, runs, max_resolution, resolution_index)
+   queue = WorkQueue(queue_dir or os.path.join(OUTPath, "queue"), items, stale_after)
+   logs = os.path.join(OUTPath, "logs")
+   os.makedirs(logs, exist_ok=True)
+   log_file = os.path.join(logs, f"queue_{socket.gethostname()}_{os.getpid()}.jsonl")
+   failures = []
+
+   async def keep_alive(item, docking):
+      while True:
+         await asyncio.sleep(heartbeat)
+         if not queue.heartbeat(item):
+            # Another node has taken the complex over: stop writing to its output directory
+            orchestrator.log(event="claim lost", job=item)
+            docking.cancel()
+            return
+
+   async def worker():
+      while True:
+         item = queue.claim_next()
+         if item is None:
+            return
+         orchestrator.log(event="claimed", job=item)
+         name = item.split('_', 1)[1]
+         docking = asyncio.create_task(dock_complex(orchestrator, PDBfiles[item], os.path.join(OUTPath, name), methods, runs, evaluate))
+         alive = asyncio.create_task(keep_alive(item, docking))
+         try:
+            outcome = await docking
+         except asyncio.CancelledError:
+            if alive.done() and not alive.cancelled():
+               # Cancelled by keep_alive: the claim was lost
+               continue
+            docking.cancel()
+            raise
+         except Exception as error:
+            # A bad complex must not stop the runner (or every node that takes it over)
+            message = f"error ({type(error).__name__}: {error})"
+            orchestrator.log(event="error", job=item, error=message)
+            if queue.complete(item, message):
+               failures.append(item)
+            continue
+         finally:
+            alive.cancel()
+         summary = {f"run{run}/{method}": "ok" if returncode == 0 and resultfiles else f"failed ({returncode})" for run, complex_methods in outcome.items() for method, (returncode, resultfiles) in complex_methods.items()}
+         if not queue.complete(item, summary or "skipped"):
+            orchestrator.log(event="claim lost", job=item)
+            continue
+         failures.extend(key for key, status in summary.items() if status != "ok")
+         orchestrator.log(event="completed", job=item, outcome=summary or "skipped")
+
+   async def main():
+      try:
+         await asyncio.gather(*[worker() for _ in range(slots)])
+      finally:
+         orchestrator.close()
+
+   orchestrator = Orchestrator(cpus, log_file, memory)
+   asyncio.run(main())
+   return len(failures)
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Program: decoyarchive
+File:    decoyarchive.py
+
+Version:  V1.0
+Date:     19.10.26
+Function: Pack a directory of decoy PDB files into a decoy archive, or write decoys from an archive out as PDB files.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+'pack' converts a directory of decoy.1.pdb ... decoy.N.pdb files into a decoy archive (the topology once plus a float32 coordinate array, see decoyarchive_lib.py). 'export' writes chosen decoys (by name or by index from 0), or all of them, from an archive or directory as PDB files. 'info' prints the number of decoys and atoms in an archive.
+
+--------------------------------------------------------------------------
+
+Usage:
+======
+decoyarchive.py pack DecoyDir ArchiveDir
+decoyarchive.py export ArchiveDir OUTPath [decoy ...]
+decoyarchive.py info ArchiveDir
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import argparse
+from decoyarchive_lib import open_decoys, pack_directory
+
+#*************************************************************************
+
+# Get inputs from command line
+parser = argparse.ArgumentParser(description="Pack decoy PDB files into a decoy archive, or export decoys from one.")
+subparsers = parser.add_subparsers(dest="command", required=True)
+pack_parser = subparsers.add_parser("pack", help="Pack a directory of decoy.N.pdb files into an archive")
+pack_parser.add_argument("DecoyDir", help="Directory of decoy.N.pdb files")
+pack_parser.add_argument("ArchiveDir", help="Archive directory to write")
+export_parser = subparsers.add_parser("export", help="Write decoys out as PDB files")
+export_parser.add_argument("ArchiveDir", help="Decoy archive (or directory of decoy PDB files)")
+export_parser.add_argument("OUTPath", help="Directory to write the PDB files to")
+export_parser.add_argument("decoys", nargs="*", help="Decoy names (e.g. decoy.12) or indices from 0 (default: all)")
+info_parser = subparsers.add_parser("info", help="Print the size of an archive")
+info_parser.add_argument("ArchiveDir", help="Decoy archive")
+args = parser.parse_args()
+
+#*************************************************************************
+
+if args.command == "pack":
+   num_decoys = pack_directory(args.DecoyDir, args.ArchiveDir)
+   print(f"Packed {num_decoys} decoys into {args.ArchiveDir}")
+
+elif args.command == "export":
+   decoys = open_decoys(args.ArchiveDir)
+   os.makedirs(args.OUTPath, exist_ok=True)
+   indices = [int(decoy) if decoy.isdigit() else decoys.index(decoy) for decoy in args.decoys] or range(len(decoys))
+   for i in indices:
+      print(decoys.to_pdb(i, os.path.join(args.OUTPath, f"{decoys.names[i]}.pdb")))
+
+else:
+   decoys = open_decoys(args.ArchiveDir)
+   print(f"{args.ArchiveDir}: {len(decoys)} decoys of {len(decoys.structure(0))} atoms")
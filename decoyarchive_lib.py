@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Program: decoyarchive_lib
+File:    decoyarchive_lib.py
+
+Version:  V1.0
+Date:     19.10.26
+Function:   Library: Read and write decoy sets as a single-topology, multi-frame archive with random access by decoy index.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+A decoy set of N structures of one complex is usually a directory of decoy.1.pdb ... decoy.N.pdb files, with the same atom records (and the same receptor coordinates) repeated in every file. A decoy archive instead is a directory holding:
+   topology.pdb   the atom records once (coordinates of the first decoy)
+   coords.npy     float32 (N, atoms, 3) coordinates of every decoy, in atom order of topology.pdb
+   names.txt      the name of each decoy, one per line (decoy.1 ... decoy.N)
+   rmsd.npy       target ligand RMSDs (optional, written by generate_decoys)
+coords.npy is memory mapped when read, so opening an archive costs the same whatever its size and any decoy can be read in O(1) without reading the others. Decoys can be written out as PDB files on demand.
+
+open_decoys() opens either layout (an archive or a directory of decoy.N.pdb files) and returns an object with the same interface, so that evaluation scripts can take both.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import re
+import numpy as np
+from pdbstructure_lib import PDBStructure, read_pdb, write_pdb
+
+#*************************************************************************
+
+# Files making up an archive
+TOPOLOGY_FILE = "topology.pdb"
+COORDS_FILE = "coords.npy"
+NAMES_FILE = "names.txt"
+RMSD_FILE = "rmsd.npy"
+
+#*************************************************************************
+
+def is_archive(path):
+   """
+   Check whether path is a decoy archive directory.
+
+   """
+   return os.path.isfile(os.path.join(path, TOPOLOGY_FILE)) and os.path.isfile(os.path.join(path, COORDS_FILE))
+
+#*************************************************************************
+
+def create_archive(archive_dir, structure, num_decoys, names=None, rmsds=None):
+   """
+   Create an archive for num_decoys decoys of structure (a PDBStructure, written as the topology) and return the float32 (num_decoys, atoms, 3) memory mapped coordinate array to be filled in. Decoys are named decoy.1 ... decoy.N unless names are given. The caller should flush() the array when it has been filled.
+
+   """
+   if names is None:
+      names = [f"decoy.{number}" for number in range(1, num_decoys + 1)]
+   if len(names) != num_decoys:
+      raise ValueError(f"{len(names)} names given for {num_decoys} decoys")
+   os.makedirs(archive_dir, exist_ok=True)
+   write_pdb(structure, os.path.join(archive_dir, TOPOLOGY_FILE))
+   with open(os.path.join(archive_dir, NAMES_FILE), "w") as file:
+      file.writelines(f"{name}\n" for name in names)
+   if rmsds is not None:
+      np.save(os.path.join(archive_dir, RMSD_FILE), np.asarray(rmsds, dtype=np.float32))
+   return np.lib.format.open_memmap(os.path.join(archive_dir, COORDS_FILE), mode='w+', dtype=np.float32, shape=(num_decoys, len(structure), 3))
+
+#*************************************************************************
+
+class DecoyArchive:
+   """
+   A decoy archive opened for reading. Coordinates are memory mapped, so decoys are only read from disk when used.
+
+   >>> import tempfile
+   >>> structure = read_pdb('test/test8_OG.pdb')
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    coords = create_archive(tmp + '/decoys', structure, 3)
+   ...    coords[:] = structure.coords + np.arange(3)[:, None, None]
+   ...    coords.flush()
+   ...    archive = DecoyArchive(tmp + '/decoys')
+   ...    len(archive), archive.names[-1], archive.coords(2)[0].tolist(), archive.index('decoy.2')
+   ...    archive.to_pdb(1, tmp + '/decoy.2.pdb') == tmp + '/decoy.2.pdb', read_pdb(tmp + '/decoy.2.pdb').coords[0].tolist()
+   (3, 'decoy.3', [19.203, -11.024, 36.883], 1)
+   (True, [18.203, -12.024, 35.883])
+
+   """
+   def __init__(self, archive_dir):
+      self.path = archive_dir
+      self.topology = read_pdb(os.path.join(archive_dir, TOPOLOGY_FILE))
+      self._coords = np.load(os.path.join(archive_dir, COORDS_FILE), mmap_mode='r')
+      if self._coords.shape[1] != len(self.topology):
+         raise ValueError(f"{archive_dir}: {COORDS_FILE} has {self._coords.shape[1]} atoms, {TOPOLOGY_FILE} has {len(self.topology)}")
+      names_file = os.path.join(archive_dir, NAMES_FILE)
+      if os.path.exists(names_file):
+         with open(names_file) as file:
+            self.names = [line.strip() for line in file if line.strip()]
+      else:
+         self.names = [f"decoy.{number}" for number in range(1, len(self._coords) + 1)]
+      self._index = {name: i for i, name in enumerate(self.names)}
+
+   def __len__(self):
+      return len(self._coords)
+
+   def index(self, name):
+      """
+      Return the index of the decoy called name.
+
+      """
+      return self._index[name]
+
+   def coords(self, i):
+      """
+      Return the (atoms, 3) coordinates of decoy i (read from disk only now), rounded to PDB precision so they match the coordinates read from a PDB file of the decoy.
+
+      """
+      return np.round(np.asarray(self._coords[i], dtype=np.float64), 3)
+
+   def structure(self, i):
+      """
+      Return decoy i as a PDBStructure.
+
+      """
+      return PDBStructure(self.topology.records, self.coords(i))
+
+   def rmsds(self):
+      """
+      Return the target RMSDs stored with the archive, or None.
+
+      """
+      rmsd_file = os.path.join(self.path, RMSD_FILE)
+      return np.load(rmsd_file) if os.path.exists(rmsd_file) else None
+
+   def to_pdb(self, i, PDBfile):
+      """
+      Write decoy i to a PDB file and return its name.
+
+      """
+      return write_pdb(self.topology, PDBfile, self._coords[i])
+
+   def pdb_file(self, i, tmp_dir):
+      """
+      Return a PDB file of decoy i, written to tmp_dir.
+
+      """
+      return self.to_pdb(i, os.path.join(tmp_dir, f"{self.names[i]}.pdb"))
+
+#*************************************************************************
+
+def _decoy_number(filename):
+   """
+   Get the number of a decoy.N.pdb file, or None for other files.
+
+   >>> _decoy_number('decoy.12.pdb'), _decoy_number('decoy_rmsds.txt')
+   (12, None)
+
+   """
+   match = re.fullmatch(r"decoy\.(\d+)\.pdb", filename)
+   return int(match.group(1)) if match else None
+
+#*************************************************************************
+
+class DecoyDirectory:
+   """
+   A directory of decoy.1.pdb ... decoy.N.pdb files, read with the same interface as DecoyArchive.
+
+   """
+   def __init__(self, directory):
+      self.path = directory
+      with os.scandir(directory) as entries:
+         numbers = sorted(number for number in (_decoy_number(entry.name) for entry in entries) if number is not None)
+      self.names = [f"decoy.{number}" for number in numbers]
+      self._index = {name: i for i, name in enumerate(self.names)}
+
+   def __len__(self):
+      return len(self.names)
+
+   def index(self, name):
+      return self._index[name]
+
+   def filename(self, i):
+      return os.path.join(self.path, f"{self.names[i]}.pdb")
+
+   def coords(self, i):
+      return read_pdb(self.filename(i)).coords
+
+   def structure(self, i):
+      return read_pdb(self.filename(i))
+
+   def rmsds(self):
+      return None
+
+   def to_pdb(self, i, PDBfile):
+      return write_pdb(self.structure(i), PDBfile)
+
+   def pdb_file(self, i, tmp_dir=None):
+      # The decoy is already a PDB file
+      return self.filename(i)
+
+#*************************************************************************
+
+def open_decoys(path):
+   """
+   Open a decoy archive or a directory of decoy.N.pdb files.
+
+   >>> import tempfile, shutil
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    for number in (1, 2, 10):
+   ...       _ = shutil.copy('test/test8_OG.pdb', f"{tmp}/decoy.{number}.pdb")
+   ...    decoys = open_decoys(tmp)
+   ...    type(decoys).__name__, decoys.names, decoys.coords(2).shape
+   ('DecoyDirectory', ['decoy.1', 'decoy.2', 'decoy.10'], (2710, 3))
+
+   """
+   if is_archive(path):
+      return DecoyArchive(path)
+   return DecoyDirectory(path)
+
+#*************************************************************************
+
+def pack_directory(directory, archive_dir):
+   """
+   Convert a directory of decoy.N.pdb files into an archive. Every decoy must have the same atoms, in the same order, as the first. Return the number of decoys packed.
+
+   >>> import tempfile, shutil
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _ = shutil.copy('test/test8_OG.pdb', f"{tmp}/decoy.1.pdb")
+   ...    _ = shutil.copy('test/test8_OG.pdb', f"{tmp}/decoy.2.pdb")
+   ...    pack_directory(tmp, tmp + '/archive'), DecoyArchive(tmp + '/archive').names
+   (2, ['decoy.1', 'decoy.2'])
+
+   """
+   decoys = DecoyDirectory(directory)
+   if len(decoys) == 0:
+      raise ValueError(f"No decoy.N.pdb files in {directory}")
+   first = decoys.structure(0)
+   keys = first.atom_keys()
+   coords = create_archive(archive_dir, first, len(decoys), decoys.names)
+   for i in range(len(decoys)):
+      structure = first if i == 0 else decoys.structure(i)
+      if structure.atom_keys() != keys:
+         raise ValueError(f"{decoys.filename(i)} does not have the same atoms as {decoys.filename(0)}")
+      coords[i] = structure.coords
+   coords.flush()
+   return len(decoys)
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
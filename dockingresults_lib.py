@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Program: dockingresults_lib
+File:    dockingresults_lib.py
+
+Version:  V1.0
+Date:     19.10.26
+Function:   Library: Parse the dockingresults files written by testdockingprogs_master into typed records in a single pass.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+A dockingresults file (<pdb>_dockingresults_<date>.results.txt) contains one block per docking method per run ('<method> | <options> | <time>' followed by 'Scores:' and the RMSD and interface lines), an '***** End of Run N *****' line after each run, and a 'Summary Evalutation Metrics' footer with one block per method. This library reads the file once, line by line, and returns a MethodResult for every method block and a MethodSummary for every footer block. Values that are missing ('N/A', 'Single PDB file needed as input') are given as NaN. A whole results tree can be parsed with parse_results_tree, reading each file exactly once.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import re
+from typing import NamedTuple
+
+#*************************************************************************
+
+# Method names used in extract_results.py, keyed by the start of the method lines in the results files
+METHOD_NAMES = [("Megadock", "Megadock"),
+                ("Piper", "Piper"),
+                ("Rosetta", "Rosetta"),
+                ("ZDOCK", "ZDOCK"),
+                ("Haddock2.4 | Protein-Protein Docking | Waters", "Haddock waters"),
+                ("Haddock2.4 | Protein-Protein Docking | No Waters", "Haddock no waters"),
+                ("Haddock2.4 | Protein-Protein | Waters", "Haddock waters"),
+                ("Haddock2.4 | Protein-Protein | No Waters", "Haddock no waters")]
+
+# Header line of the summary section (spelling as written by testdockingprogs_master.py)
+SUMMARY_HEADER = "Summary Evalutation Metrics"
+
+#*************************************************************************
+
+class MethodResult(NamedTuple):
+   """
+   Result of one docking method in one run.
+   """
+   method: str
+   run: int
+   title: str
+   all_atoms: float
+   ca_atoms: float
+   res_pairs: float
+   ab_res: float
+   ag_res: float
+   lines: tuple
+
+class MethodSummary(NamedTuple):
+   """
+   Summary of one docking method over all runs, from the results file footer.
+   """
+   method: str
+   title: str
+   avg_all_atoms: float
+   avg_ca_atoms: float
+   best_all_atoms: float
+   best_ca_atoms: float
+   num_hits: float
+   avg_res_pairs: float
+   avg_ab_res: float
+   avg_ag_res: float
+   lines: tuple
+
+class DockingResults(NamedTuple):
+   """
+   Contents of one dockingresults file.
+   """
+   pdb_id: str
+   date: str
+   results: list
+   summaries: list
+
+#*************************************************************************
+
+def method_name(title):
+   """
+   Return the short method name (as used by extract_results.py) for a method line of a results file.
+
+   >>> method_name('Megadock-4.1.1 | CPU Single Node | ZRANK Ranked Output | 19.10.2026 | 10:00:00')
+   'Megadock'
+   >>> method_name('Haddock2.4 | Protein-Protein Docking | No Waters | 19.10.2026 | 10:00:00')
+   'Haddock no waters'
+
+   """
+   for prefix, name in METHOD_NAMES:
+      if title.startswith(prefix):
+         return name
+   return title.split(' | ')[0]
+
+#*************************************************************************
+
+def _value(line):
+   """
+   Get the number from a result line ('CA atoms RMSD:   1.622'), or NaN if it has none.
+
+   >>> _value('CA atoms RMSD:   1.622'), _value('Single PDB file needed as input'), _value('All atoms:   N/A')
+   (1.622, nan, nan)
+
+   """
+   match = re.search(r"[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?\s*$", line.split(':', 1)[-1])
+   if ':' not in line or match is None:
+      return float('nan')
+   return float(match.group())
+
+#*************************************************************************
+
+# Line labels of a method block and a summary block, and the fields they fill
+_RESULT_FIELDS = [("All atoms RMSD", "all_atoms"), ("CA atoms RMSD", "ca_atoms"), ("Correctly predicted residue pairs", "res_pairs"), ("Correctly predicted residues (antibody)", "ab_res"), ("Correctly predicted residues (antigen)", "ag_res")]
+_SUMMARY_FIELDS = [("Number of good hits", "num_hits"), ("Residue pair predictions", "avg_res_pairs"), ("Antibody residue predictions", "avg_ab_res"), ("Antigen residue predictions", "avg_ag_res")]
+
+#*************************************************************************
+
+def _is_method_line(line):
+   """
+   Check whether a line is a method name line.
+
+   """
+   return any(line.startswith(prefix) for prefix, _ in METHOD_NAMES)
+
+#*************************************************************************
+
+def _fill(block, line):
+   """
+   Store the value of a result or summary line in the block being parsed.
+
+   """
+   if block["kind"] == "result":
+      for label, field in _RESULT_FIELDS:
+         if line.startswith(label):
+            block[field] = _value(line)
+      return
+   # Summary blocks give 'All atoms'/'CA atoms' twice, first averages then best scores
+   if line == "Best Score":
+      block["section"] = "best"
+   elif line.startswith("All atoms:"):
+      block[f"{block['section']}_all_atoms"] = _value(line)
+   elif line.startswith("CA atoms:"):
+      block[f"{block['section']}_ca_atoms"] = _value(line)
+   for label, field in _SUMMARY_FIELDS:
+      if line.startswith(label):
+         block[field] = _value(line)
+
+#*************************************************************************
+
+def _finish(block):
+   """
+   Turn a parsed block into a MethodResult or MethodSummary.
+
+   """
+   nan = float('nan')
+   if block["kind"] == "result":
+      return MethodResult(block["method"], block["run"], block["title"], *[block.get(field, nan) for _, field in _RESULT_FIELDS], tuple(block["lines"]))
+   fields = ["avg_all_atoms", "avg_ca_atoms", "best_all_atoms", "best_ca_atoms", "num_hits", "avg_res_pairs", "avg_ab_res", "avg_ag_res"]
+   return MethodSummary(block["method"], block["title"], *[block.get(field, nan) for field in fields], tuple(block["lines"]))
+
+#*************************************************************************
+
+def iter_records(lines):
+   """
+   Parse the lines of a dockingresults file in a single pass, yielding a MethodResult for each method block and a MethodSummary for each summary block, in file order.
+
+   >>> lines = ['Megadock-4.1.1 | CPU Single Node | ZRANK Ranked Output | 19.10.2026 | 10:00:00', 'Scores:', '=======',
+   ...          'All atoms RMSD:  10.751', 'CA atoms RMSD:   10.572', 'Proportion of correctly predicted interface residues (0-1):',
+   ...          'Correctly predicted residue pairs:       0.25', 'Correctly predicted residues (antibody): 0.5', 'Correctly predicted residues (antigen):  0.75', ' ',
+   ...          '***** End of Run 0 *****', ' ', 'Summary Evalutation Metrics', '===========================',
+   ...          'Megadock-4.1.1 | CPU Single Node | ZRANK Ranked Output', 'Average RMSD', 'All atoms:   10.751', 'CA atoms:   10.572',
+   ...          'Best Score', 'All atoms:   10.751', 'CA atoms:   10.572', 'Number of good hits (<3.0 RMSD):   0',
+   ...          'Average percentage of correctly predicted interface residues', 'Residue pair predictions:   0.25',
+   ...          'Antibody residue predictions:   0.5', 'Antigen residue predictions:   0.75', ' ']
+   >>> result, summary = iter_records(lines)
+   >>> result.method, result.run, result.ca_atoms, result.ag_res, len(result.lines)
+   ('Megadock', 0, 10.572, 0.75, 9)
+   >>> summary.method, summary.best_ca_atoms, summary.num_hits
+   ('Megadock', 10.572, 0.0)
+
+   """
+   run = 0
+   previous = None
+   block = None
+   in_summary = False
+   for line in lines:
+      line = line.rstrip('\n')
+      stripped = line.strip()
+      if not in_summary and stripped == "Scores:" and previous is not None:
+         # The line before 'Scores:' names the method
+         if block is not None:
+            yield _finish(block)
+         block = {"kind": "result", "method": method_name(previous.strip()), "title": previous.strip(), "run": run, "lines": [previous, line]}
+      elif stripped.startswith("***** End of Run") or stripped == SUMMARY_HEADER:
+         if block is not None:
+            yield _finish(block)
+            block = None
+         if stripped == SUMMARY_HEADER:
+            in_summary = True
+         else:
+            run += 1
+      elif in_summary and _is_method_line(stripped):
+         if block is not None:
+            yield _finish(block)
+         block = {"kind": "summary", "method": method_name(stripped), "title": stripped, "section": "avg", "lines": [line]}
+      elif not stripped:
+         # Blocks end at the spacer line
+         if block is not None:
+            yield _finish(block)
+            block = None
+      elif block is not None:
+         block["lines"] += [line]
+         _fill(block, stripped)
+      previous = line
+   if block is not None:
+      yield _finish(block)
+
+#*************************************************************************
+
+def parse_dockingresults(result_file):
+   """
+   Parse a dockingresults file (read once) into a DockingResults record. The PDB ID and date are taken from the file name (<pdb>_dockingresults_<date>...).
+
+   """
+   basename = os.path.basename(result_file)
+   pdb_id, _, date = basename.partition('_dockingresults_')
+   results = []
+   summaries = []
+   with open(result_file) as file:
+      for record in iter_records(file):
+         if isinstance(record, MethodResult):
+            results += [record]
+         else:
+            summaries += [record]
+   return DockingResults(pdb_id, date, results, summaries)
+
+#*************************************************************************
+
+def find_results_files(root):
+   """
+   Return the paths of all dockingresults files below root, sorted.
+
+   """
+   found = []
+   for dirpath, _, filenames in os.walk(root):
+      found += [os.path.join(dirpath, name) for name in filenames if '_dockingresults_' in name]
+   return sorted(found)
+
+#*************************************************************************
+
+def parse_results_tree(root):
+   """
+   Parse every dockingresults file below root (one read per file), returning a list of DockingResults.
+
+   """
+   return [parse_dockingresults(result_file) for result_file in find_results_files(root)]
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Program: dockingstats_lib
+File:    dockingstats_lib.py
+
+Version:  V1.0
+Date:     19.10.26
+Function:   Library: Summary statistics, hit rates, CAPRI classes, bootstrap confidence intervals and paired comparisons of docking results across a dataset.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+Docking results are handled as NumPy arrays with one row per method and one column per complex (or per run), with NaN marking missing results. Every function works on the whole array at once, so summaries of thousands of complexes for all methods, including bootstrap resampling, take well under a second.
+
+The metrics used are those written by the testdockingprogs_master scripts and collected by extract_results.py: 'All_atoms' and 'CA_atoms' RMSDs (Angstroms, after fitting on the antibody), 'Res_pairs' (proportion of native interface residue pairs reproduced, used as Fnat) and 'Ab_res'/'Ag_res' (proportion of native interface residues reproduced).
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import json
+import math
+import numpy as np
+
+#*************************************************************************
+
+# Default RMSD (Angstroms) and Fnat hit thresholds
+RMSD_THRESHOLDS = (1.0, 2.0, 3.0, 5.0, 10.0)
+FNAT_THRESHOLDS = (0.1, 0.3, 0.5)
+
+# CAPRI classes, in the order returned by capri_class()
+CAPRI_CLASSES = ("Incorrect", "Acceptable", "Medium", "High")
+
+#*************************************************************************
+
+def as_matrix(values):
+   """
+   Convert a list of result lists (one per method, possibly of different lengths or empty) to a 2D float array padded with NaN.
+
+   >>> as_matrix([[1.0, 2.0], [], [3.0]]).tolist()
+   [[1.0, 2.0], [nan, nan], [3.0, nan]]
+
+   """
+   if isinstance(values, np.ndarray):
+      return np.atleast_2d(values.astype(np.float64))
+   rows = [np.ravel(np.asarray(row, dtype=np.float64)) for row in values]
+   width = max([len(row) for row in rows] + [1])
+   matrix = np.full((len(rows), width), np.nan)
+   for i, row in enumerate(rows):
+      matrix[i, :len(row)] = row
+   return matrix
+
+#*************************************************************************
+
+def summarise(values):
+   """
+   Return per-row count, minimum, maximum, mean, median and standard deviation of a (methods, complexes) array, ignoring NaN. Rows with no results give NaN.
+
+   >>> summary = summarise([[12.5, 11.0, 20.0], [2.0, 4.0, np.nan], []])
+   >>> summary['min'].tolist(), summary['mean'].tolist(), summary['count'].tolist()
+   ([11.0, 2.0, nan], [14.5, 3.0, nan], [3, 2, 0])
+
+   """
+   matrix = as_matrix(values)
+   valid = ~np.isnan(matrix)
+   count = valid.sum(axis=1)
+   summary = {"count": count}
+   # Rows without any results are filled with NaN rather than raising warnings
+   safe = np.where(valid.any(axis=1)[:, None], matrix, 0.0)
+   for name, function in [("min", np.nanmin), ("max", np.nanmax), ("mean", np.nanmean), ("median", np.nanmedian), ("std", np.nanstd)]:
+      summary[name] = np.where(count > 0, function(safe, axis=1), np.nan)
+   return summary
+
+#*************************************************************************
+
+def hit_counts(values, thresholds=RMSD_THRESHOLDS, below=True):
+   """
+   Count the results in each row below (RMSDs) or at/above (Fnat, below=False) each threshold. Returns a (methods, thresholds) integer array.
+
+   >>> hit_counts([[0.8, 2.5, 4.0, np.nan], [12.0, 3.0, 1.5, 9.0]], (1.0, 3.0, 5.0)).tolist()
+   [[1, 2, 3], [0, 1, 2]]
+   >>> hit_counts([[0.05, 0.3, 0.6]], (0.1, 0.3, 0.5), below=False).tolist()
+   [[2, 2, 1]]
+
+   """
+   matrix = as_matrix(values)[:, :, None]
+   thresholds = np.asarray(thresholds, dtype=np.float64)[None, None, :]
+   # NaN compares False either way, so missing results never count as hits
+   hits = matrix < thresholds if below else matrix >= thresholds
+   return hits.sum(axis=1)
+
+#*************************************************************************
+
+def hit_rates(values, thresholds=RMSD_THRESHOLDS, below=True):
+   """
+   Return the proportion of available results in each row that are hits at each threshold.
+
+   >>> hit_rates([[0.8, 2.5, 4.0, np.nan]], (1.0, 3.0)).round(3).tolist()
+   [[0.333, 0.667]]
+
+   """
+   matrix = as_matrix(values)
+   count = (~np.isnan(matrix)).sum(axis=1)[:, None]
+   with np.errstate(invalid='ignore', divide='ignore'):
+      return hit_counts(matrix, thresholds, below) / count
+
+#*************************************************************************
+
+def capri_class(fnat, lrmsd, irmsd=None):
+   """
+   Return the CAPRI class of each result as an integer array (0 incorrect, 1 acceptable, 2 medium, 3 high; see CAPRI_CLASSES):
+      high:       Fnat >= 0.5 and (L-RMSD <= 1.0 or I-RMSD <= 1.0)
+      medium:     Fnat >= 0.3 and (L-RMSD <= 5.0 or I-RMSD <= 2.0)
+      acceptable: Fnat >= 0.1 and (L-RMSD <= 10.0 or I-RMSD <= 4.0)
+   If irmsd is not given the classes are assigned from Fnat and L-RMSD alone. Missing values (NaN) are incorrect.
+
+   >>> capri_class([0.6, 0.6, 0.35, 0.2, 0.05, np.nan], [0.8, 3.0, 4.0, 9.0, 1.0, 1.0]).tolist()
+   [3, 2, 2, 1, 0, 0]
+   >>> capri_class([0.6], [6.0], [0.9]).tolist()
+   [3]
+
+   """
+   fnat = np.asarray(fnat, dtype=np.float64)
+   lrmsd = np.asarray(lrmsd, dtype=np.float64)
+   irmsd = np.full(lrmsd.shape, np.nan) if irmsd is None else np.asarray(irmsd, dtype=np.float64)
+   acceptable = (fnat >= 0.1) & ((lrmsd <= 10.0) | (irmsd <= 4.0))
+   medium = (fnat >= 0.3) & ((lrmsd <= 5.0) | (irmsd <= 2.0))
+   high = (fnat >= 0.5) & ((lrmsd <= 1.0) | (irmsd <= 1.0))
+   return acceptable.astype(np.int8) + medium + high
+
+#*************************************************************************
+
+def capri_counts(fnat, lrmsd, irmsd=None):
+   """
+   Count the results of each row in each CAPRI class. Returns a (methods, 4) integer array ordered as CAPRI_CLASSES; missing results are not counted.
+
+   >>> capri_counts([[0.6, 0.2, np.nan], [0.05, 0.4, 0.4]], [[0.8, 9.0, np.nan], [1.0, 4.0, 12.0]]).tolist()
+   [[0, 1, 0, 1], [2, 0, 1, 0]]
+
+   """
+   fnat = as_matrix(fnat)
+   lrmsd = as_matrix(lrmsd)
+   classes = capri_class(fnat, lrmsd, None if irmsd is None else as_matrix(irmsd))
+   present = ~(np.isnan(fnat) & np.isnan(lrmsd))
+   return ((classes[:, :, None] == np.arange(len(CAPRI_CLASSES))) & present[:, :, None]).sum(axis=1)
+
+#*************************************************************************
+
+def top_k_success(ranked_classes, ks=(1, 5, 10), min_class="Acceptable"):
+   """
+   Return the proportion of complexes with at least one model of min_class or better among the top k models, for each k. ranked_classes has one list per complex of the CAPRI classes (names or integers as from capri_class) of its models in rank order; complexes may have different numbers of models.
+
+   >>> top_k_success([['Incorrect', 'Acceptable'], ['High'], ['Incorrect', 'Incorrect', 'Medium'], []], ks=(1, 2, 3)).tolist()
+   [0.25, 0.5, 0.75]
+   >>> top_k_success([[0, 1], [3], [0, 0, 2]], ks=(3,), min_class='Medium').tolist()
+   [0.6666666666666666]
+
+   """
+   minimum = CAPRI_CLASSES.index(min_class)
+   width = max([len(classes) for classes in ranked_classes] + [max(ks)])
+   # Pad with -1 (no model), then take the best class seen by each rank
+   matrix = np.full((len(ranked_classes), width), -1, dtype=np.int8)
+   for row, classes in enumerate(ranked_classes):
+      matrix[row, :len(classes)] = [CAPRI_CLASSES.index(value) if isinstance(value, str) else value for value in classes]
+   best = np.maximum.accumulate(matrix, axis=1)
+   return np.array([(best[:, k - 1] >= minimum).mean() for k in ks])
+
+#*************************************************************************
+
+def _statistic(name, missing=True):
+   """
+   Return a function computing a named statistic along an axis, NaN-aware if there are missing values (the plain NumPy functions are much faster).
+
+   """
+   if missing:
+      functions = {"mean": np.nanmean, "median": np.nanmedian, "min": np.nanmin, "max": np.nanmax}
+   else:
+      functions = {"mean": np.mean, "median": np.median, "min": np.min, "max": np.max}
+   if callable(name):
+      return name
+   if name not in functions:
+      raise ValueError(f"Unknown statistic: {name}")
+   return functions[name]
+
+#*************************************************************************
+
+def bootstrap_ci(values, statistic="mean", num_resamples=2000, confidence=0.95, rng=None, max_elements=20000000):
+   """
+   Bootstrap confidence interval for a statistic of each row of values (e.g. the mean RMSD of each method over complexes). Complexes (columns) are resampled together for all rows, so the intervals of different methods come from the same resampled datasets. Resamples are drawn as one index array per chunk (of at most max_elements values) rather than in a Python loop. statistic is 'mean', 'median', 'min', 'max' or a function taking (array, axis). Returns (estimate, lower, upper) arrays, one value per row.
+
+   >>> estimate, lower, upper = bootstrap_ci([np.arange(1.0, 101.0)], rng=np.random.default_rng(0))
+   >>> float(estimate[0]), bool(44 < lower[0] < 50.5 < upper[0] < 57)
+   (50.5, True)
+
+   """
+   if rng is None:
+      rng = np.random.default_rng()
+   matrix = as_matrix(values)
+   # Drop complexes without a result for any method
+   matrix = matrix[:, ~np.isnan(matrix).all(axis=0)]
+   function = _statistic(statistic, np.isnan(matrix).any())
+   rows, num = matrix.shape
+   if not num:
+      empty = np.full(rows, np.nan)
+      return empty, empty.copy(), empty.copy()
+   with np.errstate(invalid='ignore'):
+      estimate = function(matrix, axis=-1)
+      resampled = np.empty((rows, num_resamples))
+      chunk_size = max(1, max_elements // (rows * num))
+      for start in range(0, num_resamples, chunk_size):
+         size = min(chunk_size, num_resamples - start)
+         indices = rng.integers(0, num, (size, num), dtype=np.int32)
+         if statistic == "mean":
+            # How often each complex is drawn in each resample, so means become matrix products
+            counts = np.bincount((indices + num * np.arange(size, dtype=np.int32)[:, None]).ravel(), minlength=size * num).reshape(size, num)
+            valid = ~np.isnan(matrix)
+            resampled[:, start:start + size] = (np.where(valid, matrix, 0.0) @ counts.T) / (valid.astype(np.float64) @ counts.T)
+         else:
+            resampled[:, start:start + size] = function(matrix[:, indices], axis=-1)
+   tail = (1 - confidence) / 2
+   lower, upper = np.nanquantile(resampled, [tail, 1 - tail], axis=1)
+   return estimate, lower, upper
+
+#*************************************************************************
+
+def sign_test(wins, losses):
+   """
+   Two-sided exact sign test p-value for wins against losses (ties excluded).
+
+   >>> round(sign_test(9, 1), 4)
+   0.0215
+   >>> sign_test(0, 0)
+   1.0
+
+   """
+   n = wins + losses
+   if n == 0:
+      return 1.0
+   k = min(wins, losses)
+   # Sum the binomial tail in log space so large datasets do not overflow
+   log_terms = [math.lgamma(n + 1) - math.lgamma(i + 1) - math.lgamma(n - i + 1) - n * math.log(2) for i in range(k + 1)]
+   peak = max(log_terms)
+   tail = math.exp(peak) * sum(math.exp(term - peak) for term in log_terms)
+   return min(1.0, 2 * tail)
+
+#*************************************************************************
+
+def paired_comparison(values_a, values_b, num_resamples=2000, confidence=0.95, lower_is_better=True, rng=None):
+   """
+   Compare two methods on the complexes for which both have a result. Returns a dictionary with the number of paired complexes, the mean difference (a - b) and its bootstrap confidence interval, the number of complexes on which a is better, worse or tied, and the sign test p-value.
+
+   >>> a = [1.0, 2.0, 3.0, 4.0, np.nan, 2.0]
+   >>> b = [2.0, 3.5, 3.0, 6.0, 1.0, 5.0]
+   >>> result = paired_comparison(a, b, rng=np.random.default_rng(1))
+   >>> result['paired'], result['mean_difference'], (result['a_better'], result['b_better'], result['ties'])
+   (5, -1.5, (4, 0, 1))
+
+   """
+   a = np.ravel(np.asarray(values_a, dtype=np.float64))
+   b = np.ravel(np.asarray(values_b, dtype=np.float64))
+   paired = ~(np.isnan(a) | np.isnan(b))
+   differences = a[paired] - b[paired]
+   if not lower_is_better:
+      better = differences > 0
+   else:
+      better = differences < 0
+   ties = differences == 0
+   estimate, lower, upper = bootstrap_ci([differences], "mean", num_resamples, confidence, rng)
+   a_better = int(better.sum())
+   b_better = int(len(differences) - a_better - ties.sum())
+   return {"paired": int(paired.sum()),
+           "mean_difference": float(estimate[0]),
+           "ci_lower": float(lower[0]),
+           "ci_upper": float(upper[0]),
+           "a_better": a_better,
+           "b_better": b_better,
+           "ties": int(ties.sum()),
+           "p_value": sign_test(a_better, b_better)}
+
+#*************************************************************************
+
+def summary_lists(score_lists, cutoff=3.0):
+   """
+   Summarise a list of result lists (as built by testdockingprogs_master.py, one per method and metric) into average, lowest, highest and number of hits (< cutoff) lists, with 'N/A' for empty lists.
+
+   >>> summary_lists([[12.5, 11.0], [2.0, 4.0], []])
+   ([11.75, 3.0, 'N/A'], [11.0, 2.0, 'N/A'], [12.5, 4.0, 'N/A'], [0, 1, 'N/A'])
+
+   """
+   summary = summarise(score_lists)
+   hits = hit_counts(score_lists, (cutoff,))[:, 0]
+   def listed(array, cast):
+      return [cast(value) if count else 'N/A' for value, count in zip(array, summary["count"])]
+   return listed(summary["mean"], float), listed(summary["min"], float), listed(summary["max"], float), listed(hits, int)
+
+#*************************************************************************
+
+def load_results_json(results_file, reduce="min"):
+   """
+   Load a '_results.json' file written by extract_results.py into arrays. Returns (pdb_ids, methods, metrics), where metrics maps each metric name (e.g. 'CA_atoms', 'Res_pairs') to a (methods, complexes) array holding one value per complex: the best ('min'/'max'), 'mean' or 'first' of its runs. Missing results are NaN.
+
+   >>> import tempfile, os
+   >>> results = {"1abc_0P": [{"Megadock": {"CA_atoms": [8.0, 2.0], "Res_pairs": [0.1, 0.4]}}, {"Piper": {"CA_atoms": [5.0], "Res_pairs": [0.2]}}],
+   ...            "2xyz_1P": [{"Megadock": {"CA_atoms": [], "Res_pairs": []}}, {"Piper": {"CA_atoms": [1.0], "Res_pairs": [0.6]}}]}
+   >>> with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as file:
+   ...    json.dump(results, file)
+   >>> ids, methods, metrics = load_results_json(file.name)
+   >>> ids, methods, metrics['CA_atoms'].tolist()
+   (['1abc_0P', '2xyz_1P'], ['Megadock', 'Piper'], [[2.0, nan], [5.0, 1.0]])
+   >>> os.remove(file.name)
+
+   """
+   with open(results_file) as file:
+      results = json.load(file)
+   pdb_ids = list(results)
+   methods = []
+   names = []
+   for entries in results.values():
+      for entry in entries:
+         for method, values in entry.items():
+            if method not in methods:
+               methods += [method]
+            names += [name for name in values if name not in names]
+   reducers = {"min": np.min, "max": np.max, "mean": np.mean, "first": lambda runs: runs[0]}
+   metrics = {name: np.full((len(methods), len(pdb_ids)), np.nan) for name in names}
+   for column, pdb_id in enumerate(pdb_ids):
+      for entry in results[pdb_id]:
+         for method, values in entry.items():
+            for name, runs in values.items():
+               if len(runs):
+                  metrics[name][methods.index(method), column] = reducers[reduce](np.asarray(runs, dtype=np.float64))
+   return pdb_ids, methods, metrics
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Program: dockingtools
+File:    dockingtools.py
+
+Version:  V1.0
+Date:     19.10.26
+Function: Run any of the docking and evaluation scripts as a command of one program.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+Single entry point for the ab-docking-scripts: the first argument names the command (see commands_lib.py) and the remaining arguments are passed to its script unchanged, so 'dockingtools.py piper OG.pdb ab.pdb ag.pdb out' runs exactly as 'runpiper.py OG.pdb ab.pdb ag.pdb out'. The command is run in this interpreter, and its exit status is returned.
+
+--------------------------------------------------------------------------
+
+Usage:
+======
+dockingtools.py <command> [arguments]
+dockingtools.py --help
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import libraries
+import sys
+from commands_lib import COMMANDS, command_script, run_command
+
+#*************************************************************************
+
+# List the commands if none is given
+if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help"):
+   print("Usage: dockingtools.py <command> [arguments]\n\nCommands:")
+   for command, (module, description) in COMMANDS.items():
+      print(f"   {command:<20} {description} ({module}.py)")
+   sys.exit(0 if len(sys.argv) > 1 else 2)
+
+# Run the command
+command = sys.argv[1]
+if command not in COMMANDS:
+   print(f"dockingtools.py: unknown command '{command}' (one of {', '.join(COMMANDS)})", file=sys.stderr)
+   sys.exit(2)
+# Name the script in its usage and error messages
+sys.argv = [command_script(command)] + sys.argv[2:]
+sys.exit(run_command(command, sys.argv[1:]))
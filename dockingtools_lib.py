@@ -3,7 +3,7 @@
 Program: dockingtools_lib
 File:    dockingtools_lib.py
 
-Version:  V1.0
+Version:  V1.3
 Date:     03.12.2021
 Function:   Library: Library of frequently used functions in the 'Antibody-Antigen Docking' Project.
 
@@ -20,6 +20,9 @@ This library contains a number of functions that I frequently need in scripts fo
 Revision History:
 =================
 V1.0   03.12.2021   Original   By: OECH
+V1.1   19.10.26     CAPRI mode for evaluate_results (see capri_lib.py)   By: OECH
+V1.2   19.10.26     getantigenchainid reads only the header rather than the whole file   By: OECH
+V1.3   19.10.26     evaluate_results runs runprofit_single and evaluate_interface in-process   By: OECH
 
 """
 
@@ -27,8 +30,9 @@ V1.0   03.12.2021   Original   By: OECH
 
 # Import Libraries
 
-import subprocess
 import time
+from subprocess import PIPE
+from toolrunner_lib import run_script
 
 #*************************************************************************
 
@@ -51,10 +55,8 @@ def getantigenchainid(PDBfile):
    antigen_count = 0
    #Open PDB file
    with open(PDBfile) as file:
-      #Read rows in file
-      rows = file.readlines()
-      #Identify Antigen chains from PDB Header
-      for line in rows:
+      #Identify Antigen chains from PDB Header, reading only up to the first atom
+      for line in file:
          if 'CHAIN A' in line:
             #Increase antigen_count by 1
             antigen_count += 1
@@ -110,16 +112,23 @@ def get_date():
 
 #*************************************************************************
 
-def evaluate_results(OG_file, *args, single_file=True):
+def evaluate_results(OG_file, *args, single_file=True, mode='text', reference=None):
    """
    Take either a single docked antibody/antigen structure, or separate antibody and antigen structures as input, run the relevant runprofit script on the structures and output the results into a results file. (Will later add functionality to determine the proportion of correctly predicted contacts)
+   With mode='capri' the structures are instead evaluated in-process and a capri_lib.CapriResult (Fnat, Fnonnat, L-RMSD, I-RMSD and CAPRI class) is returned; reference can be a capri_lib.CapriReference of OG_file so the native is only prepared once for many results (see capri_lib.evaluate_decoy_set for whole decoy sets).
 
    >>> evaluate_results('test/test8_OG.pdb', 'test/test8_single.pdb')
    ('All atoms RMSD:  10.751', 'CA atoms RMSD:   10.572', 'Correctly predicted residue pairs:       0.24324324324324326', 'Correctly predicted residues (antibody): 0.5789473684210527', 'Correctly predicted residues (antigen):  0.6428571428571429')
    >>> evaluate_results('test/test8_OG.pdb', 'test/test8_ab.pdb', 'test/test8_Dag.pdb')
    ('All atoms RMSD:  1.652', 'CA atoms RMSD:   1.622', 'Single PDB file needed as input', 'Single PDB file needed as input', 'Single PDB file needed as input')
+   >>> evaluate_results('test/test8_OG.pdb', 'test/test8_single.pdb', mode='capri').capri_class
+   'Acceptable'
 
    """
+   if mode == 'capri':
+      # Imported here as capri_lib itself uses this library
+      from capri_lib import evaluate_capri
+      return evaluate_capri(OG_file, *args, reference=reference)
    # Check whether input is single file (antibody+antigen) or separate files (antibody, antigen)
    if len(args) > 1:
       single_file=False
@@ -127,18 +136,13 @@ def evaluate_results(OG_file, *args, single_file=True):
    if single_file:   
       # Define the docked_file
       docked_file = args[0]
-      # Run the relevant profit script, capture results in 'result'
-      result_profit = subprocess.check_output([f"~/ab-docking-scripts/runprofit_single.py {OG_file} {docked_file}"], shell=True)
-      result_profit = str(result_profit, 'utf-8')
-      # Extract the result lines from output
-      contents = result_profit.split('\n')
-      all_atoms = contents[0]
-      CA_atoms = contents[1]
-      # Get interface evaluation metrics using evaluate_interface.py
-      result_interface = subprocess.check_output([f"~/ab-docking-scripts/evaluate_interface.py {OG_file} {docked_file}"], shell=True)
-      result_interface = str(result_interface, 'utf-8')
-      # Extract the result lines from output
-      contents = result_interface.split('\n')
+      # Imported here as the scripts themselves use this library
+      from runprofit_single import profit_single
+      from evaluate_interface import interface_lines
+      # Run the relevant profit script in-process, capture result lines
+      all_atoms, CA_atoms = profit_single(OG_file, docked_file)
+      # Get interface evaluation metrics as given by evaluate_interface.py
+      contents = interface_lines(OG_file, docked_file)
       res_pairs = contents[2]
       ab_res = contents[3]
       ag_res = contents[4]
@@ -149,8 +153,7 @@ def evaluate_results(OG_file, *args, single_file=True):
       Ab_file = args[0]
       Dag_file = args[1]
       # Run the relevant profit script, capture results in 'result'
-      result_profit = subprocess.check_output([f"~/ab-docking-scripts/runprofit.py {OG_file} {Ab_file} {Dag_file}"], shell=True)
-      result_profit = str(result_profit, 'utf-8')
+      result_profit = run_script("runprofit.py", [OG_file, Ab_file, Dag_file], stdout=PIPE, check=True).stdout
       # Extract the result lines from output
       contents = result_profit.split('\n')
       all_atoms = contents[0]
@@ -166,8 +169,12 @@ def evaluate_results(OG_file, *args, single_file=True):
 def getlowestscore(list):
    """
    Take a list of scores as input and output the lowest score.
+
+   >>> getlowestscore([12.5, 11.0, 20.0])
+   11.0
+
    """
-   bestscore = 10
+   bestscore = float('inf')
    for item in list:
       if item < bestscore:
          bestscore = item
@@ -179,7 +186,7 @@ def gethighestscore(list):
    """
    Take a list of scores as input and output the highest score.
    """
-   bestscore = 0
+   bestscore = float('-inf')
    for item in list:
       if item > bestscore:
          bestscore = item
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Program: evalclient_lib
+File:    evalclient_lib.py
+
+Version:  V1.0
+Date:     19.10.26
+Function:   Library: Send evaluation requests to the evaluation daemon (evald.py), if one is running.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+The evaluation daemon (see evalserver_lib.py) listens on a Unix socket and keeps the natives it has evaluated, their interface contacts and the CDR reference in memory. This library is the client side: it imports nothing heavier than the standard library, so a script that is only passing a request on does not pay for importing NumPy or reading the reference data.
+
+Each request is one JSON object on one line ({"command": ..., ...}) and is answered by one JSON object on one line ({"ok": true, ...} or {"ok": false, "error": ...}). Relative file names are sent with the working directory of the client (cwd), as the daemon runs elsewhere.
+
+The socket is given by the DOCKINGTOOLS_EVAL_SOCKET environment variable or else by the 'eval_socket' entry of the 'paths' section of the toolrunner configuration (default ~/.cache/ab-docking-scripts/evald.sock); setting either to "" turns the daemon off. When no daemon is listening the requests return None and the caller evaluates in-process as before.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import json
+import socket
+from toolrunner_lib import load_config
+
+#*************************************************************************
+
+# Seconds to wait for the daemon to answer an evaluation request
+REQUEST_TIMEOUT = 600
+
+#*************************************************************************
+
+def socket_path():
+   """
+   Return the socket of the evaluation daemon, or None if the daemon is turned off.
+
+   >>> os.environ['DOCKINGTOOLS_EVAL_SOCKET'] = '/tmp/test_evald.sock'
+   >>> socket_path()
+   '/tmp/test_evald.sock'
+   >>> os.environ['DOCKINGTOOLS_EVAL_SOCKET'] = ''
+   >>> socket_path() is None
+   True
+   >>> del os.environ['DOCKINGTOOLS_EVAL_SOCKET']
+
+   """
+   path = os.environ.get("DOCKINGTOOLS_EVAL_SOCKET")
+   if path is None:
+      path = load_config()["paths"].get("eval_socket")
+   return os.path.expanduser(path) if path else None
+
+def request(message, path=None, timeout=REQUEST_TIMEOUT):
+   """
+   Send one request to the daemon and return its answer. Raises OSError if no daemon is listening on the socket.
+
+   >>> request({'command': 'ping'}, '/tmp/no-such-evald.sock')
+   Traceback (most recent call last):
+   ...
+   FileNotFoundError: [Errno 2] No such file or directory
+
+   """
+   path = path or socket_path()
+   if path is None:
+      raise FileNotFoundError("The evaluation daemon is turned off")
+   with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+      connection.settimeout(timeout)
+      connection.connect(path)
+      connection.sendall(json.dumps(message).encode() + b"\n")
+      with connection.makefile("rb") as stream:
+         answer = stream.readline()
+   if not answer:
+      raise ConnectionError("The evaluation daemon closed the connection without answering")
+   return json.loads(answer)
+
+#*************************************************************************
+
+def served_interface_lines(OG_file, docked_file, cutoffs=(4.0,), path=None):
+   """
+   Return the lines evaluate_interface.py prints for docked_file, as evaluated by the daemon, or None if no daemon is listening or it could not evaluate them (the caller then evaluates in-process, giving the usual error if the files are bad).
+
+   >>> served_interface_lines('test/test8_OG.pdb', 'test/test8_single.pdb', path='/tmp/no-such-evald.sock') is None
+   True
+
+   """
+   try:
+      answer = request({"command": "interface", "cwd": os.getcwd(), "OG_file": OG_file, "docked_file": docked_file, "cutoffs": list(cutoffs)}, path)
+   except (OSError, ValueError):
+      return None
+   return answer["lines"] if answer.get("ok") else None
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
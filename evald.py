@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Program: evald
+File:    evald.py
+
+Version:  V1.0
+Date:     19.10.26
+Function: Start, stop or query the evaluation daemon.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+The evaluation daemon keeps natives, their interface contacts and the CDR reference in memory and evaluates docked structures for evaluate_interface.py, which passes its runs to the daemon whenever one is listening (see evalserver_lib.py). Start it before a batch of evaluations, e.g.
+   evald.py serve --idle-timeout 600 &
+   ./evaluate_megadock_wrapper.sh
+   evald.py stop
+'serve' runs the daemon in the foreground until it is stopped or idle; 'status' prints its statistics (natives cached, cache hits and misses, requests answered).
+
+--------------------------------------------------------------------------
+
+Usage:
+======
+evald.py serve [--socket path] [--max-natives N] [--idle-timeout seconds]
+evald.py status [--socket path]
+evald.py stop [--socket path]
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import libraries
+import sys, argparse
+from evalclient_lib import socket_path, request
+
+#*************************************************************************
+
+# Get inputs from command line
+parser = argparse.ArgumentParser(description="Start, stop or query the evaluation daemon.")
+parser.add_argument("command", choices=["serve", "status", "stop"], help="serve: run the daemon; status: print its statistics; stop: shut it down")
+parser.add_argument("--socket", default=None, help="Socket of the daemon (default: DOCKINGTOOLS_EVAL_SOCKET or the eval_socket path of the toolrunner configuration)")
+parser.add_argument("--max-natives", type=int, default=64, help="Number of natives kept in memory (default: 64)")
+parser.add_argument("--idle-timeout", type=float, default=None, help="Exit after this many seconds without a request (default: never)")
+args = parser.parse_args()
+
+path = args.socket or socket_path()
+if path is None:
+   sys.exit("evald.py: the evaluation daemon is turned off (eval_socket is \"\")")
+
+#*************************************************************************
+
+# Run the daemon
+if args.command == "serve":
+   # Imported here as only the daemon needs the evaluation libraries
+   from evalserver_lib import serve
+   print(f"Evaluation daemon listening on {path}", flush=True)
+   try:
+      serve(path, args.max_natives, args.idle_timeout)
+   except FileExistsError as error:
+      sys.exit(f"evald.py: {error}")
+   except KeyboardInterrupt:
+      pass
+   sys.exit(0)
+
+# Query or stop the daemon
+try:
+   answer = request({"command": "stats" if args.command == "status" else "shutdown"}, path, timeout=10)
+except OSError:
+   sys.exit(f"evald.py: no evaluation daemon listening on {path}")
+if args.command == "status":
+   for key, value in answer.items():
+      if key != "ok":
+         print(f"{key + ':':<12} {value}")
+else:
+   print("Evaluation daemon stopped")
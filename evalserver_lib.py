@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Program: evalserver_lib
+File:    evalserver_lib.py
+
+Version:  V1.1
+Date:     19.10.26
+Function:   Library: Evaluation daemon keeping natives, their interface contacts and the CDR reference in memory between requests.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+Shell loops such as evaluate_megadock_wrapper.sh start a new interpreter for every structure they evaluate, and each one imports NumPy, loads the CDR reference (nr1797_cdr_identifiers.json) and reads and searches the same native complex again. The daemon started by 'evald.py serve' does this work once: it listens on a Unix socket (see evalclient_lib.py for the socket and the request format) and keeps
+   the CDR reference, loaded once and again only if the file changes
+   the most recently used natives (max_natives, least recently used dropped first), each with its antigen chain, CDR residues and the antibody-antigen atom pairs within 10 Angstroms (so any smaller contact cutoff needs no new search)
+so a request only reads and searches the docked structure. A native is read again if its file, or the CDR reference, has changed since it was cached.
+
+evaluate_interface.py sends its evaluation to the daemon when one is running and gives the same output either way, so existing scripts and shell wrappers are sped up without change. Requests are answered one at a time in the order they arrive. The daemon exits on a 'shutdown' request (evald.py stop) or when it has had no request for idle_timeout seconds.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   Natives cached against the CDR reference they were read with   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import json
+import time
+import socket
+import socketserver
+from collections import OrderedDict
+from typing import NamedTuple
+from pdbstructure_lib import read_pdb
+from dockingtools_lib import getantigenchainid
+from contacts_lib import CDR_REFERENCE_FILE, InterfacePairs, find_interface_pairs, load_cdr_reference, cdr_residues, compare_interfaces, interface_report
+
+#*************************************************************************
+
+# Number of natives kept in memory
+MAX_NATIVES = 64
+
+# Cutoff (Angstroms) at which the native atom pairs are kept
+NATIVE_CUTOFF = 10.0
+
+#*************************************************************************
+
+class NativeEntry(NamedTuple):
+   """
+   A native complex as kept by the daemon.
+   """
+   agchainid: str
+   pairs: InterfacePairs
+   reference_cdrs: object
+
+class EvaluationCache:
+   """
+   The CDR reference and an LRU cache of natives, used to evaluate docked structures as evaluate_interface.py does.
+
+   >>> cache = EvaluationCache(max_natives=1)
+   >>> lines = cache.interface_lines('test/test8_OG.pdb', 'test/test8_single.pdb', (4.0, 5.0))
+   >>> from evaluate_interface import interface_lines
+   >>> lines == interface_lines('test/test8_OG.pdb', 'test/test8_single.pdb', (4.0, 5.0))
+   True
+   >>> _ = cache.interface_lines('test/test8_OG.pdb', 'test/test8_single.pdb')
+   >>> import tempfile, shutil
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _ = cache.interface_lines(shutil.copy('test/test8_OG.pdb', tmp), 'test/test8_single.pdb')
+   >>> cache.stats()
+   {'natives': 1, 'hits': 1, 'misses': 2}
+
+   """
+   def __init__(self, max_natives=MAX_NATIVES, reference_file=CDR_REFERENCE_FILE):
+      self.max_natives = max_natives
+      self.reference_file = reference_file
+      self._reference = None
+      self._reference_stamp = None
+      self._natives = OrderedDict()
+      self.hits = 0
+      self.misses = 0
+
+   def reference(self):
+      """
+      Return the CDR reference, loading it again if the file has changed.
+
+      """
+      stamp = _file_stamp(self.reference_file)
+      if stamp != self._reference_stamp:
+         self._reference = load_cdr_reference(self.reference_file)
+         self._reference_stamp = stamp
+      return self._reference
+
+   def native(self, OG_file, max_cutoff=NATIVE_CUTOFF):
+      """
+      Return the NativeEntry of OG_file, from the cache if neither it nor the CDR reference has changed since it was cached.
+
+      >>> import tempfile, json
+      >>> with tempfile.TemporaryDirectory() as tmp:
+      ...    cache = EvaluationCache(reference_file=tmp + '/cdrs.json')
+      ...    with open(tmp + '/cdrs.json', 'w') as file:
+      ...       json.dump([{'test8_OG': ['H26', 'H27']}], file)
+      ...    before = cache.native('test/test8_OG.pdb').reference_cdrs
+      ...    with open(tmp + '/cdrs.json', 'w') as file:
+      ...       json.dump([{'test8_OG': ['H26', 'H27', 'H28']}], file)
+      ...    after = cache.native('test/test8_OG.pdb').reference_cdrs
+      >>> before, after, cache.stats()['misses']
+      (['H26', 'H27'], ['H26', 'H27', 'H28'], 2)
+
+      """
+      reference = self.reference()
+      key = (os.path.realpath(OG_file), _file_stamp(OG_file), self._reference_stamp)
+      entry = self._natives.get(key)
+      if entry is not None and entry.pairs.max_cutoff >= max_cutoff:
+         self._natives.move_to_end(key)
+         self.hits += 1
+         return entry
+      self.misses += 1
+      agchainid = getantigenchainid(OG_file)
+      pairs = find_interface_pairs(read_pdb(OG_file), agchainid, max(max_cutoff, NATIVE_CUTOFF))
+      entry = NativeEntry(agchainid, pairs, cdr_residues(OG_file, reference))
+      self._natives[key] = entry
+      self._natives.move_to_end(key)
+      while len(self._natives) > self.max_natives:
+         self._natives.popitem(last=False)
+      return entry
+
+   def interface_lines(self, OG_file, docked_file, cutoffs=(4.0,)):
+      """
+      Return the lines printed by evaluate_interface.py for docked_file at each cutoff.
+
+      """
+      native = self.native(OG_file, max(cutoffs))
+      docked = find_interface_pairs(read_pdb(docked_file), native.agchainid, max(cutoffs))
+      lines = []
+      for cutoff in cutoffs:
+         if len(cutoffs) > 1:
+            lines += [f"Contact cutoff: {cutoff} Angstroms"]
+         lines += interface_report(compare_interfaces(native.pairs.contacts(cutoff), docked.contacts(cutoff), native.reference_cdrs))
+      return lines
+
+   def stats(self):
+      return {"natives": len(self._natives), "hits": self.hits, "misses": self.misses}
+
+def _file_stamp(filename):
+   stat = os.stat(filename)
+   return stat.st_mtime_ns, stat.st_size
+
+#*************************************************************************
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+   """
+   Answer one JSON request (see evalclient_lib.py).
+
+   """
+   def handle(self):
+      line = self.rfile.readline()
+      if not line:
+         return
+      try:
+         answer = self.server.answer(json.loads(line))
+      except Exception as error:
+         answer = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+      self.wfile.write(json.dumps(answer).encode() + b"\n")
+
+class EvaluationServer(socketserver.UnixStreamServer):
+   """
+   Unix socket server answering evaluation requests from an EvaluationCache, one at a time.
+
+   """
+   def __init__(self, path, max_natives=MAX_NATIVES, idle_timeout=None):
+      self.cache = EvaluationCache(max_natives)
+      self.timeout = idle_timeout
+      self.started = time.time()
+      self.requests = 0
+      self.stopped = False
+      super().__init__(path, _RequestHandler)
+      os.chmod(path, 0o600)
+
+   def answer(self, message):
+      self.requests += 1
+      command = message.get("command")
+      if command == "ping":
+         return {"ok": True, "pid": os.getpid()}
+      if command == "stats":
+         return {"ok": True, "pid": os.getpid(), "uptime": round(time.time() - self.started, 1), "requests": self.requests, **self.cache.stats()}
+      if command == "shutdown":
+         self.stopped = True
+         return {"ok": True}
+      if command == "interface":
+         cwd = message.get("cwd", "")
+         OG_file = os.path.join(cwd, message["OG_file"])
+         docked_file = os.path.join(cwd, message["docked_file"])
+         cutoffs = tuple(float(cutoff) for cutoff in message.get("cutoffs", (4.0,)))
+         return {"ok": True, "lines": self.cache.interface_lines(OG_file, docked_file, cutoffs)}
+      return {"ok": False, "error": f"Unknown command: {command}"}
+
+   def handle_timeout(self):
+      # No request for idle_timeout seconds
+      self.stopped = True
+
+def _in_use(path):
+   """
+   Return True if a daemon is listening on the socket.
+
+   """
+   with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+      try:
+         connection.connect(path)
+      except OSError:
+         return False
+   return True
+
+def serve(path, max_natives=MAX_NATIVES, idle_timeout=None):
+   """
+   Run the evaluation daemon on the socket until it is shut down or idle for idle_timeout seconds. A socket left by a daemon that has exited is replaced; raises FileExistsError if a daemon is already listening.
+
+   >>> import tempfile, threading
+   >>> from evalclient_lib import request, served_interface_lines
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    daemon = threading.Thread(target=serve, args=(tmp + '/evald.sock',))
+   ...    daemon.start()
+   ...    while not os.path.exists(tmp + '/evald.sock'):
+   ...       time.sleep(0.01)
+   ...    lines = served_interface_lines('test/test8_OG.pdb', 'test/test8_single.pdb', path=tmp + '/evald.sock')
+   ...    again = served_interface_lines('test/test8_OG.pdb', 'test/test8_single.pdb', path=tmp + '/evald.sock')
+   ...    stats = request({'command': 'stats'}, tmp + '/evald.sock')
+   ...    _ = request({'command': 'shutdown'}, tmp + '/evald.sock')
+   ...    daemon.join()
+   >>> lines[2], lines == again, stats['hits'], stats['misses']
+   ('Correctly predicted residue pairs:       0.24324324324324326', True, 1, 1)
+
+   """
+   if os.path.exists(path):
+      if _in_use(path):
+         raise FileExistsError(f"An evaluation daemon is already listening on {path}")
+      os.remove(path)
+   os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+   server = EvaluationServer(path, max_natives, idle_timeout)
+   try:
+      while not server.stopped:
+         server.handle_request()
+   finally:
+      server.server_close()
+      if os.path.exists(path):
+         os.remove(path)
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
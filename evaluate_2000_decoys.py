@@ -3,7 +3,7 @@
 Program: evaluate_2000_decoys
 File:    evaluate_2000_decoys.py
 
-Version:  V1.0
+Version:  V1.3
 Date:     26.06.23
 Function:   Run evaluate_interface on full list of 2000 Megadock outputs
 Author: Oliver E. C. Hood
@@ -12,31 +12,44 @@ Author: Oliver E. C. Hood
 
 Description:
 ============
-Take a directory name as input, find the OG structure in one of 4 directories and run evaluate_interface using the OG and each output file
+Take a directory name as input, find the OG structure in one of 4 directories and run evaluate_interface using the OG and each output file.
+The directory can hold decoy.1.pdb ... decoy.N.pdb files or be a decoy archive (see decoyarchive_lib.py), in which case each
+decoy is written to a temporary PDB file when it is evaluated.
+If a number of workers is given, decoys are instead evaluated in-process by a pool of workers sharing one parsed copy of the
+OG structure (see nativecache_lib.py), giving the same output without running evaluate_interface.py for each decoy.
 
 --------------------------------------------------------------------------
 
 Usage:
 ======
-
+evaluate_2000_decoys.py decoy_complexes-<pdb> [workers]
 
 --------------------------------------------------------------------------
 
 Revision History:
 =================
 V1.0   29.07.23   Original   By: OECH
+V1.1   19.10.26   Read decoys through decoyarchive_lib (PDB directory or decoy archive)   By: OECH
+V1.2   19.10.26   In-process parallel evaluation with a shared native (optional workers argument)   By: OECH
+V1.3   19.10.26   evaluate_decoy runs evaluate_interface in-process   By: OECH
 
 """
 
 #*************************************************************************
 
 # Import libraries
-import sys, os, subprocess, json
+import sys, os, json, tempfile
+from evaluate_interface import interface_lines
+from decoyarchive_lib import open_decoys
+from nativecache_lib import evaluate_decoys
 
 #*************************************************************************
 
 filename = sys.argv[1]
 
+# Number of in-process workers (if given)
+workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
 #*************************************************************************
 
 # Get input name (not sure if sys arg takes full path or just dir name)
@@ -69,30 +82,24 @@ evaluation_outputs['PDB ID'] = filename_stripped
 
 # Evaluation function
 def evaluate_decoy(decoyfile, OG_file):
-    output = []
-    infile = decoyfile.split('.pdb')[0]
-    outfile = f"{infile}_eval.txt"
-    # Run evaluation script, write to results file
-    subprocess.run([f"~/ab-docking-scripts/evaluate_interface.py {OG_file} {decoyfile} >> {outfile}"], shell=True) 
-    # Save contents of results file to output
-    with open(outfile) as file:
-        contents = file.readlines()
-        for line in contents:
-            clean_line = line.split('\n')[0]
-            output += [clean_line]
-    # Delete results file (cleanliness)
-    subprocess.run([f"rm {outfile}"], shell=True)
-    return(output)
+    # Run evaluation in-process, returning the lines evaluate_interface.py prints
+    return(interface_lines(OG_file, decoyfile))
 
 #*************************************************************************
 
 # iterate through each decoy
 
-for decoy in range(1,2001):
-    decoy_number = f"decoy.{decoy}" # Get decoy.x identifier
-    decoyfilename = f"{target_dir}/decoy.{decoy}.pdb" # get actual decoy filename
-    evaluation = evaluate_decoy(decoyfilename, OG_file) # run evaluation
-    evaluation_outputs[decoy_number] = evaluation # add evaluation output to dictionary
+if workers:
+    evaluation_outputs.update(evaluate_decoys(OG_file, target_dir, workers=workers))
+else:
+    decoys = open_decoys(target_dir)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i, decoy_number in enumerate(decoys.names):
+            decoyfilename = decoys.pdb_file(i, tmp_dir) # get decoy file (written out if in an archive)
+            evaluation = evaluate_decoy(decoyfilename, OG_file) # run evaluation
+            evaluation_outputs[decoy_number] = evaluation # add evaluation output to dictionary
+            if decoyfilename.startswith(tmp_dir):
+                os.remove(decoyfilename)
 
 # Temp decoy list for test
 #decoys = [1110,1555,1690,28,573]
@@ -3,8 +3,8 @@
 Program: evaluate_interface
 File:    evaluate_interface.py
 
-Version:  V1.0
-Date:     14.12.2021 
+Version:  V1.3
+Date:     14.12.2021
 Function: Take an original PDB file containing an antibody-antigen complex and another PDB file containing a docked antibody-antigen complex as input then calculate the percentage of correctly predicted interface residues and contacts.
 
 Author: Oliver E. C. Hood
@@ -13,20 +13,28 @@ Author: Oliver E. C. Hood
 
 Description:
 ============
-This program takes two PDB files as input: one 'original' file containing an experimentally determined antibody-antigen complex structure, and one docked file containing the result of a docking algorithm. The contacts made between the antibody and antigen chains in each file are determined using chaincontacts and the percentage of correctly predicted contacts is given as output.
+This program takes two PDB files as input: one 'original' file containing an experimentally determined antibody-antigen complex structure, and one docked file containing the result of a docking algorithm. The contacts made between the antibody and antigen chains in each file are determined (as by chaincontacts, see contacts_lib.py) and the percentage of correctly predicted contacts is given as output.
+
+Contacts are found at 4.0 Angstroms by default. Several cutoffs can be given with -r (e.g. -r 4 5 10); each structure is then searched once at the largest cutoff and the results are printed for each cutoff in turn, each headed by the cutoff.
 
 --------------------------------------------------------------------------
 
 Usage:
 ======
-evaluate_interface.py OG_file docked_file OUTPath
+evaluate_interface.py OG_file docked_file [OUTPath] [-r cutoff [cutoff ...]]
+
+interface_lines() gives the same lines without starting a new interpreter (used by dockingtools_lib.evaluate_results and the orchestrator).
+
+If an evaluation daemon is running (evald.py serve, see evalserver_lib.py) the evaluation is done by the daemon, which keeps the native and CDR reference in memory between runs; the output is the same. Set DOCKINGTOOLS_EVAL_SOCKET="" to always evaluate in-process.
 
 --------------------------------------------------------------------------
 
 Revision History:
 =================
 V1.0   14.12.2021   Original   By: OECH
-
+V1.1   19.10.26     Find contacts in-process with contacts_lib, several cutoffs from one search (-r)   By: OECH
+V1.2   19.10.26     interface_lines() and main(argv) for in-process use, run by dockingtools.py   By: OECH
+V1.3   19.10.26     Evaluation passed to the evaluation daemon (evald.py) when one is running   By: OECH
 
 """
 
@@ -34,249 +42,57 @@ V1.0   14.12.2021   Original   By: OECH
 
 # Import libraries
 
-import sys, subprocess, os, json
-from dockingtools_lib import getantigenchainid
-
-#*************************************************************************
-
-# Define inputs
-
-# Original PDB file
-OG_file = sys.argv[1]
-# Docked PDB file
-docked_file = sys.argv[2]
-# Get output path from command line (if present)
-OUTPath = './'
-try:
-   OUTPath = sys.argv[3] + '/'
-except IndexError:
-   OUTPath = './'
-
-#*************************************************************************
-
-# Run chaincontacts program
-
-# Get input filename (OG_file)
-OG_filename = os.path.basename(OG_file).split('.')[0]
-# Get input filename (docked_file)
-docked_filename = os.path.basename(docked_file).split('.')[0]
-
-# Define OG chain contacts filename
-OG_contacts = OUTPath + OG_filename + "_interface_contacts"
-
-# Get antigen chain ID
-agchainid = getantigenchainid(OG_file)
-
-# Run chaincontacts on original PDB file
-subprocess.run([f"chaincontacts -r 4.0 -x LH -y {agchainid} {OG_file} > {OG_contacts}"], shell=True)
-
-# Define docked chain contacts file name
-docked_contacts = OUTPath + docked_filename + "_interface_contacts"
-
-# Run chaincontacts on docked PDB file
-subprocess.run([f"chaincontacts -r 4.0 -x LH -y {agchainid} {docked_file} > {docked_contacts}"], shell=True)
+import sys
+import argparse
+from evalclient_lib import served_interface_lines
 
 #*************************************************************************
-# Retrieving interface contacts
 
-# OG file
-# Initialise list of residue pairs
-OG_res_pairs = []
-OG_ab_residues = []
-OG_ag_residues = []
-# Initialise number of contacts, list of contacts (per pair)
-OG_total_contacts = 0
-OG_dict_contacts_res_pair = {}
-# Get interface residues/contacts from OG_file
-with open(OG_contacts) as file:
-   # extract contents
-   rows = file.readlines()[8:] # skip the header rows
-   # Loop through each line separately
-   for line in rows:
-      # Extract contents
-      contents = line.split()
-      # Get residues (chain ID + residue ID)
-      ab_res = str(f"{contents[1]}{contents[3]}")
-      ag_res = str(f"{contents[6]}{contents[8]}")
-      # Add residues to relevant list
-      if ab_res not in OG_ab_residues:
-         OG_ab_residues += [ab_res]
-      if ag_res not in OG_ag_residues:
-         OG_ag_residues += [ag_res]
-      # Define residue pair
-      res_pair = f"{ab_res}-{ag_res}"
-      # Add pair to relevant list
-      OG_res_pairs += [res_pair]
-      # Get number of contacts
-      contacts = int(contents[10])
-      # Increase sum of contacts
-      OG_total_contacts += contacts
-      # Add number of contacts to dictionary entry for residue pair
-      OG_dict_contacts_res_pair[res_pair] = contacts
+def interface_lines(OG_file, docked_file, cutoffs=(4.0,)):
+   """
+   Return the lines printed by this script comparing the interface of docked_file with that of OG_file at each cutoff.
 
-# Docked file
-# Initialise list of residue pairs
-docked_res_pairs = []
-docked_ab_residues = []
-docked_ag_residues = []
-# Initialise number of contacts, list of contacts (per pair)
-docked_total_contacts = 0
-docked_dict_contacts_res_pair = {}
-# Get interface residues/contacts from OG_file
-with open(docked_contacts) as file:
-   # extract contents
-   rows = file.readlines()[8:] # skip the header rows
-   # Loop through each line separately
-   for line in rows:
-      # Extract contents
-      contents = line.split()
-      # Get residues (chain ID + residue ID)
-      ab_res = str(f"{contents[1]}{contents[3]}")
-      ag_res = str(f"{contents[6]}{contents[8]}")
-      # Add residues to relevant list
-      if ab_res not in docked_ab_residues:
-         docked_ab_residues += [ab_res]
-      if ag_res not in docked_ag_residues:
-         docked_ag_residues += [ag_res]
-      # Define residue pair
-      res_pair = f"{ab_res}-{ag_res}"
-      # Add pair to relevant list
-      docked_res_pairs += [res_pair]
-      # Get number of contacts
-      contacts = int(contents[10])
-      # Increase sum of contacts
-      docked_total_contacts += contacts
-      # Add number of contacts to dictionary entry for residue pair
-      docked_dict_contacts_res_pair[res_pair] = contacts
+   >>> interface_lines('test/test8_OG.pdb', 'test/test8_single.pdb')[2]
+   'Correctly predicted residue pairs:       0.24324324324324326'
 
-#*************************************************************************
-
-# Compare original vs predicted contacts
-
-# Num. interface residues
-
-# Original file
-# Antibody interface residues
-OG_total_ab_res = len(OG_ab_residues)
-# Antigen interface residues
-OG_total_ag_res = len(OG_ag_residues)
-# Total number of interface residues
-OG_total_int_res = OG_total_ab_res + OG_total_ag_res
-# Residue pairs
-OG_total_res_pairs = len(OG_res_pairs)
-
-# Count of residues correctly predicted
-correct_ab_res = 0
-correct_ag_res = 0
-correct_res_pairs = 0
-# Antibody residues
-for res in docked_ab_residues:
-   if res in OG_ab_residues:
-      correct_ab_res += 1
-
-# Antigen residues
-for res in docked_ag_residues:
-   if res in OG_ag_residues:
-      correct_ag_res += 1
-
-# Residue pairs
-for res_pair in docked_res_pairs:
-   if res_pair in OG_res_pairs:
-      correct_res_pairs += 1
-
-# Calculate correctly predicted antibody residues
-ab_res_proportion = correct_ab_res/OG_total_ab_res
-# Calculate correctly predicted antigen residues
-ag_res_proportion = correct_ag_res/OG_total_ag_res
-# Calculate correctly predicted residue pairs
-res_pair_proportion = correct_res_pairs/OG_total_res_pairs
-
-# Calculate number of correctly predicted contacts within residue pair
-# Initialise value
-count_correct_num_contacts = 0
-# Loop through dictionary keys
-for res_pair in docked_dict_contacts_res_pair.keys():
-   # Check if key is also in OG_res_pairs
-   if res_pair in OG_dict_contacts_res_pair.keys():
-      # Check if the number of contacts is the same
-      if OG_dict_contacts_res_pair[res_pair] == docked_dict_contacts_res_pair[res_pair]:
-         # Add to count of correct contacts
-         count_correct_num_contacts += 1
+   """
+   # Imported here so runs passed to the evaluation daemon do not import NumPy
+   from contacts_lib import evaluate_interface_cutoffs, interface_report
+   results = evaluate_interface_cutoffs(OG_file, docked_file, cutoffs)
+   lines = []
+   for cutoff in cutoffs:
+      if len(cutoffs) > 1:
+         lines += [f"Contact cutoff: {cutoff} Angstroms"]
+      lines += interface_report(results[cutoff])
+   return lines
 
 #*************************************************************************
 
-# Calculating interface CDR metrics
+def main(argv=None):
+   """
+   Run evaluate_interface with the command line arguments argv (default: sys.argv[1:]).
 
-# Loading Reference JSON file
-with open('/home/oliverh/ab-docking-scripts/nr1797_cdr_identifiers.json') as reference_file:
-   reference_data_list = json.load(reference_file)
+   """
+   argv = sys.argv[1:] if argv is None else [str(arg) for arg in argv]
 
-# Extract dict from list
-reference_data = reference_data_list[0]
+   # Define inputs
+   parser = argparse.ArgumentParser(description="Compare the antibody-antigen interface of a docked complex with the original.")
+   parser.add_argument("OG_file", help="Original PDB file")
+   parser.add_argument("docked_file", help="Docked PDB file")
+   parser.add_argument("OUTPath", nargs="?", default="./", help="Not used (contacts files are no longer written), kept for existing callers")
+   parser.add_argument("-r", dest="cutoffs", type=float, nargs="+", default=[4.0], help="Contact cutoff(s) in Angstroms (default: 4.0)")
+   args = parser.parse_args(argv)
 
-# Getting base filename for dict search (incase pdb at front)
-if 'pdb' in OG_filename:
-   reference_filename = OG_filename.split('pdb')[1]
-else:
-   reference_filename = OG_filename
+   # Evaluate with the evaluation daemon if one is running, otherwise in-process
+   lines = served_interface_lines(args.OG_file, args.docked_file, args.cutoffs)
+   if lines is None:
+      lines = interface_lines(args.OG_file, args.docked_file, args.cutoffs)
 
-try:
-# Retrieve CDRs for OG file
-   reference_CDR_res = reference_data[reference_filename]
-
-   # Get ground truth interface CDR residues
-   true_CDR_int_res = []
-
-   for residue in OG_ab_residues:
-      if residue in reference_CDR_res:
-         true_CDR_int_res += [residue]
-
-   # Number of true CDRs int
-   count_true_CDR_res = len(true_CDR_int_res)
-
-   # Get all model CDR res, check if true or not
-   predicted_true_CDR_int_res = [] # Initialising true list
-   predicted_false_CDR_int_res = [] # Initialising false list
-
-   # Looping through model ab residues
-   for residue in docked_ab_residues:
-      if residue in true_CDR_int_res: # True CDR interface residues
-         predicted_true_CDR_int_res += [residue]
-      else:
-         if residue in reference_CDR_res: # False CDR interface residues
-               predicted_false_CDR_int_res += [residue]
-
-   # Get integers of true/false interface CDR predictions
-   # true
-   count_predicted_true_CDR_res = len(predicted_true_CDR_int_res)
-   # false
-   count_predicted_false_CDR_res = len(predicted_false_CDR_int_res)
-
-   # Calculate proportions for true
-   true_CDR_predicted_proportion = count_predicted_true_CDR_res/count_true_CDR_res
-except:
-   count_predicted_true_CDR_res = "No reference"
-   count_predicted_false_CDR_res = "No reference"
-   true_CDR_predicted_proportion = "No reference"
-   count_true_CDR_res = "No reference"
+   # Print evaluation results at each cutoff
+   for line in lines:
+      print(line)
 
 #*************************************************************************
 
-# Print evaluation results
-print(f"Proportion of correctly predicted interface residues (0-1):")
-print(f"============================================================")
-print(f"Correctly predicted residue pairs:       {res_pair_proportion}")
-print(f"Correctly predicted residues (antibody): {ab_res_proportion}")
-print(f"Correctly predicted residues (antigen):  {ag_res_proportion}")
-print(f"Correctly predicted interface CDR residues: {true_CDR_predicted_proportion}")
-print(f"Number of correctly predicted contacts: {count_correct_num_contacts}")
-print(f"Number of correctly predicted residue pairs: {correct_res_pairs}")
-print(f"Number of correctly predicted ab residues: {correct_ab_res}")
-print(f"Number of correctly predicted ag residues: {correct_ag_res}")
-print(f"Number of original ab residues: {OG_total_ab_res}")
-print(f"Number of original ag residues: {OG_total_ag_res}")
-print(f"Number of original res pairs: {OG_total_res_pairs}")
-print(f"Number of original (true total) interface CDR residues: {count_true_CDR_res}")
-print(f"Number of correctly predicted interface CDR residues: {count_predicted_true_CDR_res}")
-print(f"Number of incorrectly predicted interface CDR residues: {count_predicted_false_CDR_res}")
-
+if __name__ == "__main__":
+   main()
@@ -3,7 +3,7 @@
 Program: evaluate_megadock
 File:    evaluate_megadock.py
 
-Version:  V1.0
+Version:  V2.1
 Date:     26.06.23
 Function:   Run evaluate_interface on outputs of CL's megadock Docking
 Author: Oliver E. C. Hood
@@ -26,13 +26,15 @@ Revision History:
 =================
 V1.0   26.06.23   Original   By: OECH
 V2.0   17.03.24   Modified for new results directory structure   By: OECH
+V2.1   19.10.26   evaluate_interface run in-process (dockingtools interface command)   By: OECH
 
 """
 
 #*************************************************************************
 
 # Import libraries
-import sys, os, subprocess
+import sys, os, glob
+from commands_lib import run_command
 
 #*************************************************************************
 
@@ -70,7 +72,7 @@ print("Rank1:", flush=True)
 rank_1 = f"{target_dir}/{filename_stripped}_1.pdb"
 
 # Run evaluation
-output_1 = str(subprocess.run([f"~/ab-docking-scripts/evaluate_interface.py {OG_file} {rank_1}"], shell=True))
+output_1 = run_command("interface", [OG_file, rank_1])
 
 print("", flush=True)
 # save evaluation
@@ -82,7 +84,7 @@ print("Rank2:", flush=True)
 rank_2 = f"{target_dir}/{filename_stripped}_2.pdb"
 
 # Run evaluation
-output_2 = str(subprocess.run([f"~/ab-docking-scripts/evaluate_interface.py {OG_file} {rank_2}"], shell=True))
+output_2 = run_command("interface", [OG_file, rank_2])
 
 print("", flush=True)
 # save evaluation
@@ -94,7 +96,7 @@ print("Rank3:", flush=True)
 rank_3 = f"{target_dir}/{filename_stripped}_3.pdb"
 
 # Run evaluation
-output_3 = str(subprocess.run([f"~/ab-docking-scripts/evaluate_interface.py {OG_file} {rank_3}"], shell=True))
+output_3 = run_command("interface", [OG_file, rank_3])
 
 print("", flush=True)
 # save evaluation
@@ -106,7 +108,7 @@ print("Rank4:", flush=True)
 rank_4 = f"{target_dir}/{filename_stripped}_4.pdb"
 
 # Run evaluation
-output_4 = str(subprocess.run([f"~/ab-docking-scripts/evaluate_interface.py {OG_file} {rank_4}"], shell=True))
+output_4 = run_command("interface", [OG_file, rank_4])
 
 print("", flush=True)
 # save evaluation
@@ -118,7 +120,7 @@ print("Rank5:", flush=True)
 rank_5 = f"{target_dir}/{filename_stripped}_5.pdb"
 
 # Run evaluation
-output_5 = str(subprocess.run([f"~/ab-docking-scripts/evaluate_interface.py {OG_file} {rank_5}"], shell=True))
+output_5 = run_command("interface", [OG_file, rank_5])
 
 print("", flush=True)
 # save evaluation
@@ -137,5 +139,6 @@ print("*************************************************************************
 #*************************************************************************
 
 # Remove interim files
-subprocess.run(["rm ./*_contacts"], shell=True)
+for contacts_file in glob.glob("./*_contacts"):
+   os.remove(contacts_file)
 
@@ -3,7 +3,7 @@
 Program: evaluate_results_4x_methods
 File:    evaluate_results_4x_methods.py
 
-Version:  V1.0
+Version:  V1.1
 Date:     31.08.23
 Function:   Run evaluate_interface on outputs from full suite of docking methods
 Author: Oliver E. C. Hood
@@ -25,13 +25,15 @@ Usage:
 Revision History:
 =================
 V1.0   31.08.23   Original   By: OECH
+V1.1   19.10.26   evaluate_decoy runs evaluate_interface in-process   By: OECH
 
 """
 
 #*************************************************************************
 
 # Import libraries
-import sys, os, subprocess, json
+import sys, os, json
+from evaluate_interface import interface_lines
 
 #*************************************************************************
 
@@ -42,36 +44,20 @@ evaluation_outputs = {}
 
 # Function to evaluate file
 def evaluate_decoy(decoyfile, OG_file):
-    output = []
-    infile = decoyfile.split('.pdb')[0]
-    outfile = f"{infile}_eval.txt"
-    # Run evaluation script, write to results file
-    subprocess.run([f"~/ab-docking-scripts/evaluate_interface.py {OG_file} {decoyfile} >> {outfile}"], shell=True) 
-    # Save contents of results file to output
-    with open(outfile) as file:
-        contents = file.readlines()
-        for line in contents:
-            clean_line = line.split('\n')[0]
-            output += [clean_line]
-    # Delete results file (cleanliness)
-    subprocess.run([f"rm {outfile}"], shell=True)
-    return(output)
+    # Run evaluation in-process, returning the lines evaluate_interface.py prints
+    return(interface_lines(OG_file, decoyfile))
 
 #*************************************************************************
 
 # Filter through files in run3 to get complexes with completed results
 list_ids = []
 
-# Run ls > list_pdbs.txt
-subprocess.run([f"cd run2; ls >> list_pdbs.txt; cd .."], shell=True)
-
-# Open txt file
-with open('run2/list_pdbs.txt') as file:
-    contents = file.readlines()
-    for item in contents:
-        if '_Megadock' in item:
-            pdb_id = item.split('_Mega')[0]
-            list_ids += [pdb_id]
+# List files in run2
+contents = sorted(os.listdir('run2'))
+for item in contents:
+    if '_Megadock' in item:
+        pdb_id = item.split('_Mega')[0]
+        list_ids += [pdb_id]
 
 #*************************************************************************
 
@@ -3,7 +3,7 @@
 Program: extract_pdbs
 File:    extract_pdbs.py
 
-Version:  V1.0
+Version:  V1.2
 Date:     11.05.23
 Function: Filter through the output directories of tesdockingprogs_master to extract docking result PDBs.
 
@@ -14,19 +14,24 @@ Author: Oliver E. C. Hood
 Description:
 ============
 This program takes the log file for a docking run as input and filters through it to find the ids of files that were
-entered into the docking protocol. Output PDB files are identified and copied to a new directory.
+entered into the docking protocol. Output PDB files of each run are identified and collected in OUTPath/run<N>/ (as
+reflinks or copies, or hard links with --mode hardlink, see collate_lib.py), with a manifest.tsv listing every file collected or missing. Optionally
+the collected files are also packed into a single zip archive for transfer.
 
 --------------------------------------------------------------------------
 
 Usage:
 ======
-extract_pdbs.py logfile OUTPath
+extract_pdbs.py logfile [OUTPath] [--runs 0 1 2] [--mode auto|hardlink|reflink|copy_file_range|copy] [--workers N]
+                [--archive FILE.zip] [--compress]
 
 --------------------------------------------------------------------------
 
 Revision History:
 =================
 V1.0   11.05.23   Original   By: OECH
+V1.1   19.10.26   Collect all runs with collate_lib (links where possible, in parallel), write a manifest and optional archive   By: OECH
+V1.2   19.10.26   Independent copies by default, hard links only with --mode hardlink   By: OECH
 
 """
 
@@ -34,132 +39,54 @@ V1.0   11.05.23   Original   By: OECH
 
 # Import libraries
 
-import sys, os, subprocess
+import os
+import argparse
+from collate_lib import collate, pack_archive, PLACE_METHODS
+from extract_results_lib import read_log_ids, find_docking_results
 
 #*************************************************************************
 
-# Specify input file
-
-LOGfile = sys.argv[1]
-
-# Get current working directory
-directory = os.getcwd()
-# Get output path from command line (if present)
-OUTPath = directory + "/"
-try:
-   OUTPath = sys.argv[2] + '/'
-except IndexError:
-   print('No output directory specified, writing files to current directory')
-   OUTPath = directory + "/"
+# Get inputs from command line
+parser = argparse.ArgumentParser(description="Collect the result PDB files of a docking run.")
+parser.add_argument("LOGfile", help="Log file of the docking run")
+parser.add_argument("OUTPath", nargs="?", default=os.getcwd(), help="Directory to collect the files in (default: current directory)")
+parser.add_argument("--runs", type=int, nargs="+", default=[0, 1, 2], help="Runs to collect (default: 0 1 2)")
+parser.add_argument("--mode", choices=("auto",) + PLACE_METHODS, default="auto", help="How to place files (default: auto, the fastest independent copy the file system allows; hardlink is faster but the collated files then change with the results)")
+parser.add_argument("--workers", type=int, default=16, help="Number of complexes collected at once (default: 16)")
+parser.add_argument("--archive", default=None, help="Also pack the collected files into this zip file")
+parser.add_argument("--compress", action="store_true", help="Compress files in the archive")
+args = parser.parse_args()
 
 #*************************************************************************
 
-# Get pdb ids from input file
-
-# Initialise list
-list_ids = []
-
-# Open log file
-with open(LOGfile) as file:
-   # Read lines
-   rows = file.readlines()
-   # Filter for files that were run
-   for line in rows:
-      if 'Starting docking program on' in line:
-         # Get filename
-         file_id = line.split(' on ')[1].split('...')[0]
-         # Add to list
-         list_ids += [file_id]
+# Get pdb ids from input file and the docking results directory next to it
+list_ids = list(dict.fromkeys(read_log_ids(args.LOGfile)))
+path = os.path.dirname(os.path.realpath(args.LOGfile))
+docking_results = find_docking_results(path)
+if docking_results is None:
+    raise SystemExit(f"No docking_results directory found in {path}")
 
 #*************************************************************************
 
 # Get PDB files
+rows = collate(docking_results, list_ids, args.OUTPath, runs=args.runs, mode=args.mode, workers=args.workers)
+
+# Report anything that was not collected
+for run, item, src, dst, size, method in rows:
+    if method == "missing" and os.path.basename(src) == f"run{run}":
+        print(f"No results directory found for {item} (run{run}).")
+    elif method == "missing":
+        print(f"Missing file for {item} (run{run}): {src}")
+    elif method.startswith("error"):
+        print(f"Could not collect {src}: {method}")
+
+placed = sum(1 for row in rows if row[3] and not row[5].startswith("error"))
+print(f"Collected {placed} files for {len(list_ids)} complexes, manifest written to {os.path.join(args.OUTPath, 'manifest.tsv')}")
 
-# Get current directory
-pwd = os.getcwd()
-
-# Move to results directory if there
-for item in list_ids:
-    # Get path to location of logfile
-    path = os.path.dirname(os.path.realpath(LOGfile))
-    # Search through contents of path for docking results directory
-    for file in os.listdir(path):
-        if file.startswith('docking_results'):
-            # Define docking results directory
-            docking_results = file
-    # Run0
-    # Check if output directory 1 (run0) exists
-    output_dir_0 = f"{path}/{docking_results}/{item}/run0/"
-    if os.path.isdir(output_dir_0):
-        # Print statement that file produced full results
-        print(f"{item} has results, copying output PDBs")
-        # Define result file locations and names
-        og = f"{path}/{docking_results}/{item}/{item}.pdb"
-        megadock_0 = f"{output_dir_0}{item}_MegadockRanked_result.pdb"
-        piper_0 = f"{output_dir_0}{item}_nohydrogens_Piper_result.pdb"
-        rosetta_0 = f"{output_dir_0}{item}_Rosetta_result.pdb"
-        haddock_waters_0 = f"{output_dir_0}/haddock_out/{item}_nohydrogens_Haddock_waters_result.pdb_split_labelled.pdb"
-        haddock_nowaters_0 = f"{output_dir_0}/haddock_out/{item}_nohydrogens_Haddock_nowaters_result.pdb_split_labelled.pdb"
-        # Define output directory
-        out_dir_combined_0 = "/home/oliverh/data/pdb_files/output_PDBs/run0"
-        # Make output directory
-        subprocess.run([f"mkdir {out_dir_combined_0}"], shell=True)
-        # Copy the files to new directory
-        subprocess.run([f"cp {megadock_0} {piper_0} {rosetta_0} {haddock_waters_0} {haddock_nowaters_0} {og} {out_dir_combined_0}"], shell=True)
-    # Fail line
-    else:
-        print(f"No results directory found for {item}.")
-
-    # Run1
-    # Check if output directory 2 (run1) exists
-    output_dir_1 = f"{path}/{docking_results}/{item}/run1/"
-    if os.path.isdir(output_dir_1):
-        # Print statement that file produced full results
-        print(f"{item} has results, copying output PDBs")
-        # Define result file locations and names
-        og = f"{path}/{docking_results}/{item}/{item}.pdb"
-        megadock_1 = f"{output_dir_1}{item}_MegadockRanked_result.pdb"
-        piper_1 = f"{output_dir_1}{item}_nohydrogens_Piper_result.pdb"
-        rosetta_1 = f"{output_dir_1}{item}_Rosetta_result.pdb"
-        haddock_waters_1 = f"{output_dir_1}/haddock_out/{item}_nohydrogens_Haddock_waters_result.pdb_split_labelled.pdb"
-        haddock_nowaters_1 = f"{output_dir_1}/haddock_out/{item}_nohydrogens_Haddock_nowaters_result.pdb_split_labelled.pdb"
-        # Define output directory
-        out_dir_combined_1 = "/home/oliverh/data/pdb_files/output_PDBs/run1"
-        # Make output directory
-        subprocess.run([f"mkdir {out_dir_combined_1}"], shell=True)
-        # Copy the files to new directory
-        subprocess.run([f"cp {megadock_1} {piper_1} {rosetta_1} {haddock_waters_1} {haddock_nowaters_1} {og} {out_dir_combined_1}"], shell=True)
-    # Fail line
-    else:
-        print(f"No results directory found for {item}.")
-
-    # Run2
-    # Check if output directory 3 (run2) exists
-    output_dir_2 = f"{path}/{docking_results}/{item}/run2/"
-    if os.path.isdir(output_dir_2):
-        # Print statement that file produced full results
-        print(f"{item} has results, copying output PDBs")
-        # Define result file locations and names
-        og = f"{path}/{docking_results}/{item}/{item}.pdb"
-        megadock_2 = f"{output_dir_2}{item}_MegadockRanked_result.pdb"
-        piper_2 = f"{output_dir_2}{item}_nohydrogens_Piper_result.pdb"
-        rosetta_2 = f"{output_dir_2}{item}_Rosetta_result.pdb"
-        haddock_waters_2 = f"{output_dir_2}/haddock_out/{item}_nohydrogens_Haddock_waters_result.pdb_split_labelled.pdb"
-        haddock_nowaters_2 = f"{output_dir_2}/haddock_out/{item}_nohydrogens_Haddock_nowaters_result.pdb_split_labelled.pdb"
-        # Define output directory
-        out_dir_combined_2 = "/home/oliverh/data/pdb_files/output_PDBs/run2"
-        # Make output directory
-        subprocess.run([f"mkdir {out_dir_combined_2}"], shell=True)
-        # Copy the files to new directory
-        subprocess.run(
-            [f"cp {megadock_2} {piper_2} {rosetta_2} {haddock_waters_2} {haddock_nowaters_2} {og} {out_dir_combined_2}"],
-            shell=True)
-    # Fail line
-    else:
-        print(f"No results directory found for {item}.")
-
-# Print that file extraction is complete for item in list
-    print(f"File extraction complete for {item}.")
+# Pack into a single archive if wanted
+if args.archive:
+    packed = pack_archive(rows, args.archive, compress=args.compress)
+    print(f"Packed {packed} files into {args.archive}")
 
 # Print run complete
-print("File extraction for chunkx is complete.")
\ No newline at end of file
+print("File extraction is complete.")
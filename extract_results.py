@@ -3,7 +3,7 @@
 Program: extract_results
 File:    extract_results.py
 
-Version:  V1.0
+Version:  V1.2
 Date:     21.04.22
 Function: Filter through the output directories of tesdockingprogs_master to extract docking results.
 
@@ -13,19 +13,21 @@ Author: Oliver E. C. Hood
 
 Description:
 ============
-This program takes the log file for a docking run as input and filters through it to find the ids of files that were entered into the docking protocol. Result files for these files are opened to extract the evaluation metrics.
+This program takes the log file for a docking run as input and filters through it to find the ids of files that were entered into the docking protocol. Result files for these files are opened to extract the evaluation metrics. Complexes are read in parallel (see extract_results_lib.py) and appended to <log>_results.jsonl as they finish, so an interrupted run can be restarted without repeating finished complexes. A complex is read again on restarting if any of its result files has changed since it was harvested; --no-resume reads every complex again. The results of the whole dataset are then written to <log>_results.json, with missing or unreadable result files listed in <log>_results_errors.json.
 
 --------------------------------------------------------------------------
 
 Usage:
 ======
-extract_results.py logfile OUTPath
+extract_results.py logfile [OUTPath] [--workers N] [--no-resume]
 
 --------------------------------------------------------------------------
 
 Revision History:
 =================
 V1.0   21.04.22   Original   By: OECH
+V1.1   19.10.26   Parallel harvesting, single consolidated output and error report   By: OECH
+V1.2   19.10.26   Complexes with changed result files harvested again on resuming   By: OECH
 
 """
 
@@ -33,179 +35,34 @@ V1.0   21.04.22   Original   By: OECH
 
 # Import libraries
 
-import sys, os, subprocess, json
+import os, argparse, time
+from extract_results_lib import harvest
 
 #*************************************************************************
 
-# Specify input file
+# Get inputs from command line
+parser = argparse.ArgumentParser(description="Extract the docking results of every complex in a docking run.")
+parser.add_argument("LOGfile", help="Log file written by testdockingprogs_master.py")
+parser.add_argument("OUTPath", nargs='?', default=None, help="Output directory (default: current directory)")
+parser.add_argument("--workers", type=int, default=16, help="Number of complexes read at the same time (default: 16)")
+parser.add_argument("--no-resume", action="store_true", help="Harvest every complex again, ignoring an existing .jsonl file (by default only complexes that are new, had errors or whose result files have changed are read)")
+args = parser.parse_args()
 
-LOGfile = sys.argv[1]
-
-# Get current working directory
-directory = os.getcwd()
 # Get output path from command line (if present)
-OUTPath = directory + "/"
-try:
-   OUTPath = sys.argv[2] + '/'
-except IndexError:
+if args.OUTPath is None:
    print('No output directory specified, writing files to current directory')
-   OUTPath = directory + "/"
-
-#*************************************************************************
-
-# Get pdb ids from input file
-
-# Initialise list
-list_ids = []
-
-# Open log file
-with open(LOGfile) as file:
-   # Read lines
-   rows = file.readlines()
-   # Filter for files that were run
-   for line in rows:
-      if 'Starting docking program on' in line:
-         # Get filename
-         file_id = line.split(' on ')[1].split('...')[0]
-         # Add to list
-         list_ids += [file_id]
+   OUTPath = os.getcwd() + "/"
+else:
+   OUTPath = args.OUTPath + '/'
 
 #*************************************************************************
 
-# Create dictionary for results to go into
-dict_results = {}
-
-# Get results
-
-#Get current directory
-pwd = os.getcwd()
-
-# Move to results directory if there
-for item in list_ids:
-   # Get path to location of logfile
-   path = os.path.dirname(os.path.realpath(LOGfile))
-   # Search through contents of path for docking_results directory
-   for file in os.listdir(path):
-      if file.startswith('docking_results'):
-         # Define docking_results directory
-         docking_results = file
-   # Check if results directory exists
-   results_dir = f"{path}/{docking_results}/{item}/results/"
-   if os.path.isdir(results_dir):
-      # Print statement that file produced full results
-      print(f"{item} has results, writing json file...")
-      # Define results file names
-      # Megadock
-      MD_all_out = f"{results_dir}{item}_MD_all.txt"
-      MD_ca_out = f"{results_dir}{item}_MD_ca.txt"
-      MD_res_pairs_out = f"{results_dir}{item}_MD_res_pairs.txt"
-      MD_ab_res_out = f"{results_dir}{item}_MD_ab_res.txt"
-      MD_ag_res_out = f"{results_dir}{item}_MD_ag_res.txt"
-      # Piper
-      Piper_all_out = f"{results_dir}{item}_Piper_all.txt"
-      Piper_ca_out = f"{results_dir}{item}_Piper_ca.txt"
-      Piper_res_pairs_out = f"{results_dir}{item}_Piper_res_pairs.txt"
-      Piper_ab_res_out = f"{results_dir}{item}_Piper_ab_res.txt"
-      Piper_ag_res_out = f"{results_dir}{item}_Piper_ag_res.txt"
-      # Rosetta
-      Rosetta_all_out = f"{results_dir}{item}_Rosetta_all.txt"
-      Rosetta_ca_out = f"{results_dir}{item}_Rosetta_ca.txt"
-      Rosetta_res_pairs_out = f"{results_dir}{item}_Rosetta_res_pairs.txt"
-      Rosetta_ab_res_out = f"{results_dir}{item}_Rosetta_ab_res.txt"
-      Rosetta_ag_res_out = f"{results_dir}{item}_Rosetta_ag_res.txt"
-      # Haddock waters
-      Hw_all_out = f"{results_dir}{item}_Hw_all.txt"
-      Hw_ca_out = f"{results_dir}{item}_Hw_ca.txt"
-      Hw_res_pairs_out = f"{results_dir}{item}_Hw_res_pairs.txt"
-      Hw_ab_res_out = f"{results_dir}{item}_Hw_ab_res.txt"
-      Hw_ag_res_out = f"{results_dir}{item}_Hw_ag_res.txt"
-      # Haddock No waters
-      Ha_all_out = f"{results_dir}{item}_Ha_all.txt"
-      Ha_ca_out = f"{results_dir}{item}_Ha_ca.txt"
-      Ha_res_pairs_out = f"{results_dir}{item}_Ha_res_pairs.txt"
-      Ha_ab_res_out = f"{results_dir}{item}_Ha_ab_res.txt"
-      Ha_ag_res_out = f"{results_dir}{item}_Ha_ag_res.txt"
-      # Extract results from files
-      def func(l):
-          while '' in l:
-              l.remove('')
-          return [float(i) for i in l]
-
-      func2 = lambda a,b,c,d,e: {"All_atoms":func(a), 
-                                 "CA_atoms":func(b), 
-                                 "Res_pairs":func(c), 
-                                 "Ab_res":func(d), 
-                                 "Ag_res":func(e)}
-      # Megadock
-      with open(MD_all_out) as file:
-         MD_all = file.readlines()[0].split(' /n')
-      with open(MD_ca_out) as file:
-         MD_ca = file.readlines()[0].split(' /n')
-      with open(MD_res_pairs_out) as file:
-         MD_res_pairs = file.readlines()[0].split(' /n')
-      with open(MD_ab_res_out) as file:
-         MD_ab_res = file.readlines()[0].split(' /n')
-      with open(MD_ag_res_out) as file:
-         MD_ag_res = file.readlines()[0].split(' /n')
-      megadock_dict = {"Megadock":func2(MD_all, MD_ca, MD_res_pairs, MD_ab_res, MD_ag_res)}
-      # Piper
-      with open(Piper_all_out) as file:
-         Piper_all = file.readlines()[0].split(' /n')
-      with open(Piper_ca_out) as file:
-         Piper_ca = file.readlines()[0].split(' /n')
-      with open(Piper_res_pairs_out) as file:
-         Piper_res_pairs = file.readlines()[0].split(' /n')
-      with open(Piper_ab_res_out) as file:
-         Piper_ab_res = file.readlines()[0].split(' /n')
-      with open(Piper_ag_res_out) as file:
-         Piper_ag_res = file.readlines()[0].split(' /n')
-      piper_dict = {"Piper":func2(Piper_all, Piper_ca, Piper_res_pairs, Piper_ab_res, Piper_ag_res)}
-      # Rosetta
-      with open(Rosetta_all_out) as file:
-         Rosetta_all = file.readlines()[0].split(' /n')
-      with open(Rosetta_ca_out) as file:
-         Rosetta_ca = file.readlines()[0].split(' /n')
-      with open(Rosetta_res_pairs_out) as file:
-         Rosetta_res_pairs = file.readlines()[0].split(' /n')
-      with open(Rosetta_ab_res_out) as file:
-         Rosetta_ab_res = file.readlines()[0].split(' /n')
-      with open(Rosetta_ag_res_out) as file:
-         Rosetta_ag_res = file.readlines()[0].split(' /n')
-      Rosetta_dict = {"Rosetta":func2(Rosetta_all, Rosetta_ca, Rosetta_res_pairs, Rosetta_ab_res, Rosetta_ag_res)}
-      # Haddock waters
-      with open(Hw_all_out) as file:
-         Hw_all = file.readlines()[0].split(' /n')
-      with open(Hw_ca_out) as file:
-         Hw_ca = file.readlines()[0].split(' /n')
-      with open(Hw_res_pairs_out) as file:
-         Hw_res_pairs = file.readlines()[0].split(' /n')
-      with open(Hw_ab_res_out) as file:
-         Hw_ab_res = file.readlines()[0].split(' /n')
-      with open(Hw_ag_res_out) as file:
-         Hw_ag_res = file.readlines()[0].split(' /n')
-      haddock_water_dict = {"Haddock waters":func2(Hw_all, Hw_ca, Hw_res_pairs, Hw_ab_res, Hw_ag_res)}
-      # Haddock no waters
-      with open(Ha_all_out) as file:
-         Ha_all = file.readlines()[0].split(' /n')
-      with open(Ha_ca_out) as file:
-         Ha_ca = file.readlines()[0].split(' /n')
-      with open(Ha_res_pairs_out) as file:
-         Ha_res_pairs = file.readlines()[0].split(' /n')
-      with open(Ha_ab_res_out) as file:
-         Ha_ab_res = file.readlines()[0].split(' /n')
-      with open(Ha_ag_res_out) as file:
-         Ha_ag_res = file.readlines()[0].split(' /n')
-      haddock_nowater_dict = {"Haddock no waters":func2(Ha_all, Ha_ca, Ha_res_pairs, Ha_ab_res, Ha_ag_res)}
-      # Add results dictionaries to main dictionary
-      dict_results[item] = [megadock_dict, piper_dict, Rosetta_dict, haddock_water_dict, haddock_nowater_dict]
-   else:
-      print(f"No results directory found for {item}.")
-
-# Write dict_results to json file
-outputfilename = f"/home/oliverh/data/pdb_files/results_json/{item}_results.json"
-# write output json file
-with open(outputfilename, "w") as file:
-   json.dump(dict_results, file)
+# Harvest results of all complexes in the log
+logname = os.path.basename(args.LOGfile).split('.')[0]
+start_time = time.time()
+num_results, num_errors = harvest(args.LOGfile, f"{OUTPath}{logname}_results", workers=args.workers, resume=not args.no_resume)
 
 # Print that extraction is complete
-print("Results extraction complete.")
\ No newline at end of file
+print(f"Results for {num_results} complexes written to {OUTPath}{logname}_results.json ({num_errors} with errors, see {logname}_results_errors.json)")
+print(f"Time taken: {time.time() - start_time:.1f}s")
+print("Results extraction complete.")
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Program: extract_results_lib
+File:    extract_results_lib.py
+
+Version:  V1.1
+Date:     19.10.26
+Function:   Library: Functions for extract_results, collects the docking results of every complex in a dataset into a single JSON file.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+The results of each complex are in <log directory>/docking_results*/<pdb>/results/, as one file per method and metric (e.g. 1abc_0P_MD_ca.txt, holding 'value /n' entries, one per run). The docking_results directory is found once, each results directory is listed once with os.scandir, and complexes are read in a thread pool so that many files can be waiting on a network file system at the same time. Each finished complex is appended to a JSON lines file straight away, with the time its result files were last changed, so an interrupted harvest keeps what it has done and can be resumed. On resuming, a partly written last line is cut off, and a complex is only reused if its result files have not changed since it was harvested (found by listing its results directory, without reading the files); resume=False harvests everything again. At the end the JSON lines are consolidated into one JSON file for the whole dataset (in the format read by dockingstats_lib.load_results_json), and any missing or unreadable files are written to an error report.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   Partly written last line removed before resuming; complexes whose result files have changed harvested again   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+#*************************************************************************
+
+# Methods (name in the JSON file, file name label) and metrics (name in the JSON file, file name label)
+METHODS = [("Megadock", "MD"), ("Piper", "Piper"), ("Rosetta", "Rosetta"), ("Haddock waters", "Hw"), ("Haddock no waters", "Ha")]
+METRICS = [("All_atoms", "all"), ("CA_atoms", "ca"), ("Res_pairs", "res_pairs"), ("Ab_res", "ab_res"), ("Ag_res", "ag_res")]
+
+#*************************************************************************
+
+def read_log_ids(LOGfile):
+   """
+   Get the ids of the files that were entered into the docking protocol from a testdockingprogs_master log file.
+
+   >>> import tempfile
+   >>> with tempfile.NamedTemporaryFile('w', delete=False) as file:
+   ...    _ = file.write('Starting docking program on 1abc_0P...\\nRun 0 complete.\\nStarting docking program on 2xyz_1P...\\n')
+   >>> read_log_ids(file.name)
+   ['1abc_0P', '2xyz_1P']
+   >>> os.remove(file.name)
+
+   """
+   list_ids = []
+   with open(LOGfile) as file:
+      for line in file:
+         if 'Starting docking program on' in line:
+            list_ids += [line.split(' on ')[1].split('...')[0]]
+   return list_ids
+
+#*************************************************************************
+
+def find_docking_results(path):
+   """
+   Return the docking_results directory in path (the last by name if there are several), or None.
+
+   """
+   with os.scandir(path) as entries:
+      found = sorted(entry.name for entry in entries if entry.name.startswith('docking_results') and entry.is_dir())
+   return os.path.join(path, found[-1]) if found else None
+
+#*************************************************************************
+
+def read_metric_file(filename):
+   """
+   Read the values in a results metric file ('value /n' entries on a single line).
+
+   >>> import tempfile
+   >>> with tempfile.NamedTemporaryFile('w', delete=False) as file:
+   ...    _ = file.write('10.751 /n12.3 /n')
+   >>> read_metric_file(file.name)
+   [10.751, 12.3]
+   >>> os.remove(file.name)
+
+   """
+   with open(filename) as file:
+      line = file.readline()
+   return [float(value) for value in line.split(' /n') if value.strip()]
+
+#*************************************************************************
+
+def harvest_complex(results_dir, pdb_id):
+   """
+   Read all method/metric files of one complex. Returns (entries, errors), where entries is the list of {method: {metric: values}} dictionaries written to the JSON file and errors lists missing or unreadable files (metrics that could not be read are left empty).
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    with open(f"{tmp}/1abc_0P_MD_ca.txt", "w") as file:
+   ...       _ = file.write('2.5 /n3.5 /n')
+   ...    entries, errors = harvest_complex(tmp, '1abc_0P')
+   >>> entries[0]['Megadock']['CA_atoms'], entries[1]['Piper']['CA_atoms'], len(errors)
+   ([2.5, 3.5], [], 24)
+
+   """
+   # List the directory once rather than trying to open every expected file
+   with os.scandir(results_dir) as listing:
+      present = {entry.name for entry in listing}
+   entries = []
+   errors = []
+   for method, label in METHODS:
+      values = {}
+      for metric, suffix in METRICS:
+         filename = f"{pdb_id}_{label}_{suffix}.txt"
+         values[metric] = []
+         if filename not in present:
+            errors += [f"{filename}: missing"]
+            continue
+         try:
+            values[metric] = read_metric_file(os.path.join(results_dir, filename))
+         except (OSError, ValueError) as error:
+            errors += [f"{filename}: {error}"]
+      entries += [{method: values}]
+   return entries, errors
+
+#*************************************************************************
+
+def _read_done(jsonl_file):
+   """
+   Read the complexes already harvested into a JSON lines file. Returns ({pdb_id: record}, length in bytes of the complete lines), a partly written last line being left out of both.
+
+   >>> import tempfile
+   >>> with tempfile.NamedTemporaryFile('w', delete=False) as file:
+   ...    _ = file.write('{"pdb_id": "1abc_0P", "results": [], "errors": []}\\n{"pdb_id": "2xy')
+   >>> done, complete = _read_done(file.name)
+   >>> list(done), complete
+   (['1abc_0P'], 51)
+   >>> os.remove(file.name)
+
+   """
+   done = {}
+   complete = 0
+   if os.path.exists(jsonl_file):
+      with open(jsonl_file, "rb") as file:
+         for line in file:
+            if not line.endswith(b"\n"):
+               break
+            complete += len(line)
+            try:
+               record = json.loads(line)
+            except ValueError:
+               continue
+            done[record["pdb_id"]] = record
+   return done, complete
+
+def _results_mtime(results_dir):
+   """
+   Return the time the newest file in a results directory (or the directory itself) was last changed.
+
+   """
+   with os.scandir(results_dir) as listing:
+      return max([entry.stat().st_mtime for entry in listing] + [os.stat(results_dir).st_mtime])
+
+#*************************************************************************
+
+def harvest(LOGfile, output_base, workers=16, resume=True):
+   """
+   Harvest the results of every complex listed in LOGfile. Complexes are appended to <output_base>.jsonl as they finish (if resume is True, complexes already there without errors and whose result files have not changed since are not read again), then written together to <output_base>.json ({pdb_id: entries}, in log order) with the errors of each complex in <output_base>_errors.json. Returns (number of complexes with results, number with errors).
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    os.makedirs(f"{tmp}/docking_results_1/1abc_0P/results")
+   ...    with open(f"{tmp}/docking_results_1/1abc_0P/results/1abc_0P_Piper_all.txt", "w") as file:
+   ...       _ = file.write('5.0 /n')
+   ...    with open(f"{tmp}/run.log", "w") as file:
+   ...       _ = file.write('Starting docking program on 1abc_0P...\\nStarting docking program on 9zzz_0P...\\n')
+   ...    harvest(f"{tmp}/run.log", f"{tmp}/out/run", workers=1)
+   ...    results = json.load(open(f"{tmp}/out/run.json"))
+   ...    errors = json.load(open(f"{tmp}/out/run_errors.json"))
+   1abc_0P has results
+   No results directory found for 9zzz_0P.
+   (1, 2)
+   >>> results['1abc_0P'][1]['Piper']['All_atoms'], errors['9zzz_0P']
+   ([5.0], ['No results directory found'])
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    os.makedirs(f"{tmp}/docking_results_1/1abc_0P/results")
+   ...    for name in [f"{method}_{metric}" for _, method in METHODS for _, metric in METRICS]:
+   ...       _ = open(f"{tmp}/docking_results_1/1abc_0P/results/1abc_0P_{name}.txt", "w").write('5.0 /n')
+   ...    _ = open(f"{tmp}/run.log", "w").write('Starting docking program on 1abc_0P...\\n')
+   ...    first = harvest(f"{tmp}/run.log", f"{tmp}/run", workers=1)
+   ...    second = harvest(f"{tmp}/run.log", f"{tmp}/run", workers=1)
+   ...    _ = open(f"{tmp}/run.jsonl", "a").write('{"pdb_id": "1ab')
+   ...    _ = open(f"{tmp}/docking_results_1/1abc_0P/results/1abc_0P_MD_ca.txt", "w").write('2.5 /n')
+   ...    os.utime(f"{tmp}/docking_results_1/1abc_0P/results/1abc_0P_MD_ca.txt", (2e9, 2e9))
+   ...    third = harvest(f"{tmp}/run.log", f"{tmp}/run", workers=1)
+   ...    results = json.load(open(f"{tmp}/run.json"))
+   ...    lines = [json.loads(line) for line in open(f"{tmp}/run.jsonl")]
+   1abc_0P has results
+   1abc_0P has results
+   >>> first, second, third, results['1abc_0P'][0]['Megadock']['CA_atoms'], len(lines)
+   ((1, 0), (1, 0), (1, 0), [2.5], 2)
+
+   """
+   list_ids = read_log_ids(LOGfile)
+   path = os.path.dirname(os.path.realpath(LOGfile))
+   docking_results = find_docking_results(path)
+   output_dir = os.path.dirname(output_base)
+   if output_dir:
+      os.makedirs(output_dir, exist_ok=True)
+   jsonl_file = f"{output_base}.jsonl"
+   done, complete = _read_done(jsonl_file) if resume else ({}, 0)
+   if resume and os.path.exists(jsonl_file):
+      # Cut off a line left partly written by an interrupted harvest, so the next record starts on a line of its own
+      os.truncate(jsonl_file, complete)
+
+   def harvest_one(pdb_id):
+      results_dir = None if docking_results is None else os.path.join(docking_results, pdb_id, "results")
+      if results_dir is None or not os.path.isdir(results_dir):
+         return {"pdb_id": pdb_id, "results": None, "errors": ["No results directory found"]}
+      mtime = _results_mtime(results_dir)
+      # Complexes that were incomplete last time, or whose results have changed since, are read again
+      previous = done.get(pdb_id)
+      if previous is not None and not previous["errors"] and previous.get("mtime") == mtime:
+         return None
+      entries, errors = harvest_complex(results_dir, pdb_id)
+      return {"pdb_id": pdb_id, "results": entries, "errors": errors, "mtime": mtime}
+
+   with open(jsonl_file, "a" if resume else "w") as jsonl:
+      with ThreadPoolExecutor(max_workers=workers) as executor:
+         futures = [executor.submit(harvest_one, pdb_id) for pdb_id in dict.fromkeys(list_ids)]
+         for future in as_completed(futures):
+            record = future.result()
+            if record is None:
+               continue
+            # Records are written from this thread only, as each complex finishes
+            jsonl.write(json.dumps(record) + "\n")
+            jsonl.flush()
+            done[record["pdb_id"]] = record
+            if record["results"] is None:
+               print(f"No results directory found for {record['pdb_id']}.", flush=True)
+            else:
+               print(f"{record['pdb_id']} has results", flush=True)
+
+   # Consolidate in log order
+   dict_results = {pdb_id: done[pdb_id]["results"] for pdb_id in dict.fromkeys(list_ids) if pdb_id in done and done[pdb_id]["results"] is not None}
+   dict_errors = {pdb_id: done[pdb_id]["errors"] for pdb_id in dict.fromkeys(list_ids) if pdb_id in done and done[pdb_id]["errors"]}
+   for filename, contents in [(f"{output_base}.json", dict_results), (f"{output_base}_errors.json", dict_errors)]:
+      # Write to a temporary file first so a reader never sees a partial file
+      with open(f"{filename}.tmp", "w") as file:
+         json.dump(contents, file)
+      os.replace(f"{filename}.tmp", filename)
+   return len(dict_results), len(dict_errors)
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -3,7 +3,7 @@
 Program: fix_chain_labelling
 File:    fix_chain_labelling.py
 
-Version:  V1.0
+Version:  V1.3
 Date:     05.12.2023
 Function: Fix chain labelling in Haddock output files
 
@@ -13,66 +13,57 @@ Author: Oliver E. C. Hood
 
 Description:
 ============
-
+Splits the chains of each HADDOCK result in a directory (<pdb>_nohydrogens_Haddock_waters_result.pdb and <pdb>_nohydrogens_Haddock_nowaters_result.pdb) at chain breaks and relabels them L, H and the antigen chain of the native complex (<pdb>.pdb), writing <result>_split_labelled.pdb. Results are relabelled in parallel, and those whose _split_labelled.pdb file is newer than the result and native are skipped unless --force is given. What was done with each result is written to fix_chain_labelling.tsv (see relabel_lib.py).
 
 --------------------------------------------------------------------------
 
 Usage:
 ======
-Run with bioptools in path
+fix_chain_labelling.py [directory] [--workers N] [--force]
 
 --------------------------------------------------------------------------
 
 Revision History:
 =================
 V1.0   05.12.23   Original   By: OECH
+V1.1   19.10.26   Chains split and relabelled in-process (pdbtransform_lib) rather than with pdbchain | pdbrenum   By: OECH
+V1.2   19.10.26   Parallel batch mode skipping results already relabelled, with a record of what was rewritten   By: OECH
+V1.3   19.10.26   Importable as main(argv), run by dockingtools.py   By: OECH
 
 """
 
 #*************************************************************************
 
 # Import libraries
-import subprocess, os
-from dockingtools_lib import getantigenchainid
+import sys, os, argparse, time
+from relabel_lib import relabel_directory, RECORD_FILE
 
 #*************************************************************************
 
-# Collect PDB IDs from dir
-list_ids = []
+def main(argv=None):
+   """
+   Run fix_chain_labelling with the command line arguments argv (default: sys.argv[1:]).
 
-# Get filenames in current directory
-files = os.listdir()
+   """
+   argv = sys.argv[1:] if argv is None else [str(arg) for arg in argv]
 
-# Extract PDB IDs
-for item in files:
-   if '_Rosetta' in item:
-      pdb_id = item.split('_Rosetta')[0]
-      list_ids += [pdb_id]
+   # Get inputs from command line
+   parser = argparse.ArgumentParser(description="Split and relabel the chains of the HADDOCK results in a directory.")
+   parser.add_argument("directory", nargs='?', default=".", help="Directory of native complexes and HADDOCK results (default: current directory)")
+   parser.add_argument("--workers", type=int, default=None, help="Number of results relabelled at the same time (default: one per CPU)")
+   parser.add_argument("--force", action="store_true", help="Relabel every result, even those already relabelled")
+   args = parser.parse_args(argv)
 
-#*************************************************************************
+   # Run relabelling on haddock files
+   start_time = time.time()
+   counts = relabel_directory(args.directory, workers=args.workers, force=args.force)
 
-# Function to fix chain labelling for input
-def fix_chain_labelling(PDBfile, resultfile):
-   # Define output filename
-   outfilename = f"{resultfile}_split_labelled.pdb"
-   # Get ag chain id
-   agchainid = getantigenchainid(PDBfile)
-   # Define executable
-   exe=f"pdbchain {resultfile} | pdbrenum -c L,H,{agchainid} > {outfilename}"
-   # Run executable
-   subprocess.run([exe], shell=True)
+   # Print summary
+   summary = ", ".join(f"{number} {status}" for status, number in sorted(counts.items())) or "no HADDOCK results found"
+   print(f"{summary} (see {os.path.join(args.directory, RECORD_FILE)})")
+   print(f"Time taken: {time.time() - start_time:.1f}s")
 
 #*************************************************************************
 
-# Run relabelling on haddock files
-for pdb in list_ids:
-   # Define filenames
-   PDBfile = f"{pdb}.pdb"
-   haddock_water = f"{pdb}_nohydrogens_Haddock_waters_result.pdb"
-   haddock_nowater = f"{pdb}_nohydrogens_Haddock_nowaters_result.pdb"
-   # Run on waters
-   fix_chain_labelling(PDBfile, haddock_water)
-   # Run on no waters
-   fix_chain_labelling(PDBfile, haddock_nowater)
-
-   
\ No newline at end of file
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Program: generate_decoys
+File:    generate_decoys.py
+
+Version:  V1.0
+Date:     19.10.26
+Function: Generate synthetic docking decoys from a native antibody-antigen complex for load-testing the evaluation scripts.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+This program takes a native antibody-antigen complex (single antigen chain) and writes N decoys in which the antigen has been rigidly rotated and translated to a target ligand RMSD drawn from a configurable distribution. Decoys are written either as individual PDB files (decoy.1.pdb ... decoy.N.pdb, as read by evaluate_2000_decoys.py) or as a compact archive, so that the evaluation and aggregation scripts can be benchmarked at any scale without running the docking programs.
+
+--------------------------------------------------------------------------
+
+Usage:
+======
+generate_decoys.py PDBfile num_decoys OUTPath [--format pdb|archive] [--min-rmsd X] [--max-rmsd Y] [--distribution uniform|loguniform|normal] [--seed S]
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import argparse
+import time
+import numpy as np
+from generate_decoys_lib import sample_target_rmsds, write_decoy_pdbs, write_decoy_archive
+
+#*************************************************************************
+
+# Get inputs from command line
+parser = argparse.ArgumentParser(description="Generate rigidly perturbed antigen decoys of a native complex.")
+parser.add_argument("PDBfile", help="Native antibody-antigen complex")
+parser.add_argument("num_decoys", type=int, help="Number of decoys to generate")
+parser.add_argument("OUTPath", nargs='?', default='./', help="Output directory (default: current directory)")
+parser.add_argument("--format", choices=['pdb', 'archive'], default='pdb', help="Write individual PDB files or a compact archive")
+parser.add_argument("--min-rmsd", type=float, default=0.0, help="Lowest target ligand RMSD (default: 0.0)")
+parser.add_argument("--max-rmsd", type=float, default=20.0, help="Highest target ligand RMSD (default: 20.0)")
+parser.add_argument("--distribution", choices=['uniform', 'loguniform', 'normal'], default='uniform', help="Distribution of target RMSDs")
+parser.add_argument("--seed", type=int, default=None, help="Random seed, for reproducible ensembles")
+args = parser.parse_args()
+
+#*************************************************************************
+
+# Draw target RMSDs
+rng = np.random.default_rng(args.seed)
+target_rmsds = sample_target_rmsds(args.num_decoys, args.min_rmsd, args.max_rmsd, args.distribution, rng)
+
+# Make output directory
+os.makedirs(args.OUTPath, exist_ok=True)
+
+# Write decoys
+start_time = time.time()
+if args.format == 'pdb':
+   write_decoy_pdbs(args.PDBfile, target_rmsds, args.OUTPath, seed=args.seed)
+   print(f"Wrote {args.num_decoys} decoys to {args.OUTPath}")
+else:
+   filename = os.path.basename(args.PDBfile).split('.')[0]
+   archive_dir = write_decoy_archive(args.PDBfile, target_rmsds, os.path.join(args.OUTPath, f"{filename}_decoys"), seed=args.seed)
+   print(f"Wrote {args.num_decoys} decoys to archive {archive_dir}")
+print(f"Time taken: {time.time() - start_time:.1f}s")
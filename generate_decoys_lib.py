@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Program: generate_decoys_lib
+File:    generate_decoys_lib.py
+
+Version:  V1.0
+Date:     19.10.26
+Function:   Library: Functions for generate_decoys, generates synthetic docking decoys by rigidly perturbing the antigen of a native antibody-antigen complex.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+The antigen chain of a native complex is rotated about its centroid and translated so that each decoy has an exact, pre-chosen ligand RMSD from the native (no fitting, antibody held fixed). Target RMSDs are drawn from a configurable distribution. Decoys are produced in batches as NumPy coordinate arrays so that they can be used in memory, written as individual PDB files (decoy.1.pdb ... decoy.N.pdb, the layout read by evaluate_2000_decoys.py) or written to a decoy archive (see decoyarchive_lib.py) containing the native topology once plus a float32 array of decoy coordinates.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import numpy as np
+from dockingtools_lib import getantigenchainid, writefile
+from pdbstructure_lib import read_pdb, write_pdb
+from decoyarchive_lib import create_archive, DecoyArchive
+
+#*************************************************************************
+
+def sample_target_rmsds(num_decoys, min_rmsd=0.0, max_rmsd=20.0, distribution='uniform', rng=None):
+   """
+   Draw num_decoys target ligand RMSDs between min_rmsd and max_rmsd. distribution can be 'uniform', 'loguniform' (more decoys close to the native) or 'normal' (centred between the limits, clipped to them).
+
+   >>> rmsds = sample_target_rmsds(1000, 1.0, 10.0, rng=np.random.default_rng(1))
+   >>> bool(rmsds.min() >= 1.0 and rmsds.max() <= 10.0)
+   True
+   >>> sample_target_rmsds(2, distribution='gamma')
+   Traceback (most recent call last):
+   ...
+   ValueError: Unknown RMSD distribution: gamma
+
+   """
+   if rng is None:
+      rng = np.random.default_rng()
+   if distribution == 'uniform':
+      rmsds = rng.uniform(min_rmsd, max_rmsd, num_decoys)
+   elif distribution == 'loguniform':
+      # Avoid log(0) for a lower limit of zero
+      low = max(min_rmsd, 0.01)
+      rmsds = np.exp(rng.uniform(np.log(low), np.log(max_rmsd), num_decoys))
+   elif distribution == 'normal':
+      centre = (min_rmsd + max_rmsd) / 2
+      spread = (max_rmsd - min_rmsd) / 6
+      rmsds = np.clip(rng.normal(centre, spread, num_decoys), min_rmsd, max_rmsd)
+   else:
+      raise ValueError(f"Unknown RMSD distribution: {distribution}")
+   return rmsds
+
+#*************************************************************************
+
+def _random_unit_vectors(num, rng):
+   """
+   Return num random unit vectors uniformly distributed on the sphere.
+
+   """
+   vectors = rng.normal(size=(num, 3))
+   return vectors / np.linalg.norm(vectors, axis=1)[:, None]
+
+#*************************************************************************
+
+def rotation_matrices(axes, angles):
+   """
+   Return the (N, 3, 3) rotation matrices for rotations of angles (radians) about unit axes (Rodrigues' formula).
+
+   >>> rotation_matrices(np.array([[0.0, 0.0, 1.0]]), np.array([np.pi / 2])).round(6).tolist()
+   [[[0.0, -1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]]
+
+   """
+   axes = np.asarray(axes, dtype=np.float64)
+   angles = np.asarray(angles, dtype=np.float64)
+   # Cross product matrix of each axis
+   K = np.zeros((len(axes), 3, 3))
+   K[:, 0, 1] = -axes[:, 2]
+   K[:, 0, 2] = axes[:, 1]
+   K[:, 1, 0] = axes[:, 2]
+   K[:, 1, 2] = -axes[:, 0]
+   K[:, 2, 0] = -axes[:, 1]
+   K[:, 2, 1] = axes[:, 0]
+   sin = np.sin(angles)[:, None, None]
+   cos = np.cos(angles)[:, None, None]
+   return np.eye(3)[None] + sin * K + (1 - cos) * (K @ K)
+
+#*************************************************************************
+
+def random_rigid_perturbations(ligand_coords, target_rmsds, rng=None):
+   """
+   Return rotations (N, 3, 3) about the ligand centroid and translations (N, 3) giving each moved ligand exactly the target RMSD from its starting position.
+   The squared RMSD of a rigid move about the centroid is the mean squared displacement from the rotation plus the squared translation, so a random share of each target is given to a rotation about a random axis and the remainder to a translation in a random direction.
+
+   >>> ligand = read_pdb('test/test8_OG.pdb').coords[-1001:]
+   >>> targets = np.array([0.5, 2.0, 8.0, 25.0])
+   >>> R, t = random_rigid_perturbations(ligand, targets, np.random.default_rng(7))
+   >>> centroid = ligand.mean(axis=0)
+   >>> moved = np.einsum('nij,aj->nai', R, ligand - centroid) + centroid + t[:, None, :]
+   >>> np.sqrt(((moved - ligand) ** 2).sum(axis=2).mean(axis=1)).round(3).tolist()
+   [0.5, 2.0, 8.0, 25.0]
+
+   """
+   if rng is None:
+      rng = np.random.default_rng()
+   target_rmsds = np.asarray(target_rmsds, dtype=np.float64)
+   num = len(target_rmsds)
+   centred = ligand_coords - ligand_coords.mean(axis=0)
+   # Second moment of the centred coordinates
+   moment = centred.T @ centred / len(centred)
+   axes = _random_unit_vectors(num, rng)
+   # Mean squared distance of the atoms from each rotation axis
+   perpendicular = np.trace(moment) - np.einsum('ni,ij,nj->n', axes, moment, axes)
+   # Share of the squared RMSD to be produced by the rotation
+   target_msd = target_rmsds ** 2
+   rotation_msd = rng.uniform(0, 1, num) * target_msd
+   # Rotation by angle a about an axis gives a mean squared displacement of 2(1 - cos a) * perpendicular
+   one_minus_cos = np.clip(rotation_msd / (2 * perpendicular), 0, 2)
+   angles = np.arccos(1 - one_minus_cos)
+   # Whatever the rotation cannot provide is made up by the translation
+   translation_msd = np.clip(target_msd - 2 * one_minus_cos * perpendicular, 0, None)
+   translations = _random_unit_vectors(num, rng) * np.sqrt(translation_msd)[:, None]
+   return rotation_matrices(axes, angles), translations
+
+#*************************************************************************
+
+def iter_decoy_batches(PDBfile, target_rmsds, batch_size=500, seed=None):
+   """
+   Generate decoys of the complex in PDBfile with the given target ligand RMSDs, yielding (first decoy index, rmsds, coordinates) per batch, where coordinates is a float32 (batch, atoms, 3) array of the whole complex. Only one batch is held in memory at a time.
+
+   >>> batches = list(iter_decoy_batches('test/test8_OG.pdb', [1.0, 2.0, 3.0], batch_size=2, seed=3))
+   >>> [(start, coords.shape) for start, rmsds, coords in batches]
+   [(0, (2, 2710, 3)), (2, (1, 2710, 3))]
+
+   """
+   structure = read_pdb(PDBfile)
+   agchainid = getantigenchainid(PDBfile)
+   if agchainid in ('Multiple chains', 'No chains'):
+      raise ValueError(f"{PDBfile} must contain a single antigen chain ({agchainid})")
+   ag_mask = structure.chain_mask(agchainid)
+   ligand = structure.coords[ag_mask]
+   centroid = ligand.mean(axis=0)
+   rng = np.random.default_rng(seed)
+   target_rmsds = np.asarray(target_rmsds, dtype=np.float64)
+   for start in range(0, len(target_rmsds), batch_size):
+      rmsds = target_rmsds[start:start + batch_size]
+      rotations, translations = random_rigid_perturbations(ligand, rmsds, rng)
+      # Antibody coordinates are shared by every decoy in the batch
+      coords = np.broadcast_to(structure.coords, (len(rmsds),) + structure.coords.shape).astype(np.float32)
+      moved = np.einsum('nij,aj->nai', rotations, ligand - centroid) + centroid + translations[:, None, :]
+      coords[:, ag_mask] = moved
+      yield start, rmsds, coords
+
+#*************************************************************************
+
+def write_decoy_pdbs(PDBfile, target_rmsds, OUTPath='./', batch_size=500, seed=None):
+   """
+   Write each decoy to OUTPath as decoy.<n>.pdb (numbered from 1) and the target RMSDs to decoy_rmsds.txt. Return the number of decoys written.
+
+   """
+   structure = read_pdb(PDBfile)
+   rmsd_lines = []
+   for start, rmsds, coords in iter_decoy_batches(PDBfile, target_rmsds, batch_size, seed):
+      for offset, (rmsd, decoy_coords) in enumerate(zip(rmsds, coords)):
+         number = start + offset + 1
+         write_pdb(structure, os.path.join(OUTPath, f"decoy.{number}.pdb"), decoy_coords)
+         rmsd_lines += [f"decoy.{number} {rmsd:.3f}"]
+   writefile(os.path.join(OUTPath, "decoy_rmsds.txt"), rmsd_lines)
+   return len(rmsd_lines)
+
+#*************************************************************************
+
+def write_decoy_archive(PDBfile, target_rmsds, archive_dir, batch_size=500, seed=None):
+   """
+   Write the decoys to a decoy archive directory (see decoyarchive_lib.py): topology.pdb (the native, written once), coords.npy (float32 (N, atoms, 3), written batch by batch so the full set never has to fit in memory), names.txt (decoy.1 ... decoy.N) and rmsd.npy (target RMSDs). Return the archive directory.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    archive = DecoyArchive(write_decoy_archive('test/test8_OG.pdb', [1.0, 4.0], tmp + '/decoys', seed=5))
+   ...    len(archive), archive.coords(1).shape, archive.rmsds().tolist()
+   (2, (2710, 3), [1.0, 4.0])
+
+   """
+   structure = read_pdb(PDBfile)
+   target_rmsds = np.asarray(target_rmsds, dtype=np.float64)
+   archive_coords = create_archive(archive_dir, structure, len(target_rmsds), rmsds=target_rmsds)
+   for start, rmsds, coords in iter_decoy_batches(PDBfile, target_rmsds, batch_size, seed):
+      archive_coords[start:start + len(rmsds)] = coords
+   archive_coords.flush()
+   del archive_coords
+   return archive_dir
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -13,110 +13,74 @@ Author: Oliver E. C. Hood
 
 Description:
 ============
-This program takes the results file from testdockingprogs_master as input and extracts the summary results from the file footer, returning them as individual results to the command line so they can be collated into a final results file.
+This program takes the results file from testdockingprogs_master as input and extracts the summary results from the file footer, returning them as individual results to the command line so they can be collated into a final results file. If a directory is given instead, every results file below it is summarised in turn. Each file is read once and parsed by dockingresults_lib.
 
 --------------------------------------------------------------------------
 
 Usage:
 ======
-getsummaryresults.py results_file
+getsummaryresults.py results_file|results_directory
 
 --------------------------------------------------------------------------
 
 Revision History:
 =================
 V1.0   12.11.21   Original   By: OECH
+V1.1   19.10.26   Single-pass parsing with dockingresults_lib, directory mode   By: OECH
 
 """
 
 #*************************************************************************
 
 # Import libraries
-import sys, itertools, os
+import sys, os
+from dockingresults_lib import parse_dockingresults, find_results_files
 
 #*************************************************************************
 
-# Define input file
-result_file = sys.argv[1]
+# Define input file (or directory of results files)
+result_input = sys.argv[1]
+
+# Methods printed, in order
+methods = ["Megadock", "Piper", "Rosetta"]
 
 #*************************************************************************
 
-# Get input filename
-inputfilename = os.path.basename(result_file).split('_dockingresults_')[0]
-result_date = os.path.basename(result_file).split('_dockingresults_')[1]
+def print_summary(result_file):
+   """
+   Print the method results and the summary results of a single results file.
+   """
+   # Parse results file
+   parsed = parse_dockingresults(result_file)
+   # Print input file name and date of test
+   print(f"Docking test on {parsed.pdb_id} | {parsed.date}")
+   print(f"===================================")
+   print("")
+   # Print Method results
+   for method in methods:
+      i = 1
+      for result in parsed.results:
+         if result.method == method:
+            print(f"run{i}")
+            i = i+1
+            for line in result.lines:
+               print(line)
+            print("")
+   # Print Summary result
+   if parsed.summaries:
+      print("Summary Evalutation Metrics")
+      print("===========================")
+   for summary in parsed.summaries:
+      for line in summary.lines:
+         print(line)
+      print(" ")
 
 #*************************************************************************
 
-# Define lists of method indices
-megadock_index = []
-piper_index = []
-rosetta_index = []
-
-# Define lists of method results
-megadock_results = []
-piper_results = []
-rosetta_results = []
-all_methods = [megadock_results, piper_results, rosetta_results]
-
-# Define list of summary results
-summary_results = []
-
-# Open input file
-with open(result_file) as file:
-   # Split into lines
-   rows = file.readlines()
-   # Get the index of method names, summary results header
-   # Start cycler
-   rows_cycle = itertools.cycle(rows)
-   next(rows_cycle)
-   for line in rows:
-      # Define next line
-      next_line = next(rows_cycle)
-      # Megadock
-      if 'Megadock-4.1.1' in line and 'Scores:' in next_line:
-         megadock_index += [rows.index(line)]
-      # Piper
-      if 'Piper 2.0.0' in line and 'Scores:' in next_line:
-         piper_index += [rows.index(line)]
-      # Rosetta
-      if 'Rosetta 3.13' in line and 'Scores:' in next_line:
-         rosetta_index += [rows.index(line)]
-      # Summary scores
-      if 'Summary Evalutation Metrics' in line:
-         summary_index = rows.index(line)
-# Extract Method results
-# Megadock
-for index in megadock_index:
-   with open(result_file) as file:
-      megadock_results += [file.readlines()[index:(index+9)]]
-# Piper
-for index in piper_index:
-   with open(result_file) as file:
-      piper_results += [file.readlines()[index:(index+10)]]
-# Rosetta
-for index in rosetta_index:
-   with open(result_file) as file:
-      rosetta_results += [file.readlines()[index:(index+9)]]
-# Extract summary results
-with open(result_file) as file:
-   summary_results += [file.readlines()[summary_index:]]
-
-# Print input file name and date of test
-print(f"Docking test on {inputfilename} | {result_date}")
-print(f"===================================")
-print("")
-
-# Print Method results
-for method in all_methods:
-   i = 1
-   for result in method:
-      print(f"run{i}")
-      i = i+1
-      for line in result:
-         print(line.strip('\n'))
+# Summarise single file or every results file in a directory
+if os.path.isdir(result_input):
+   for result_file in find_results_files(result_input):
+      print_summary(result_file)
       print("")
-
-# Print Summary result
-for result in summary_results:
-   for line in result:
-      print(line.strip('\n'))
\ No newline at end of file
+else:
+   print_summary(result_input)
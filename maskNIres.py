@@ -36,8 +36,8 @@ V1.0   28.11.21   Original   By: OECH
 
 import os
 import sys
-import subprocess
 import re
+from toolrunner_lib import run_tool
 
 #*************************************************************************
 
@@ -62,7 +62,7 @@ except IndexError:
 int_res = OUTPath + "int_res"
 
 # Run findif.pl to identify interface residues, writing result to int_res
-subprocess.run(["~/ab-docking-scripts/findif.pl -x " + OG_file + " " + Ab_file + " " + Ag_file + " > " + int_res], shell=True)
+run_tool("findif", ["-x", OG_file, Ab_file, Ag_file], stdout=int_res)
 
 #*************************************************************************
 Hres = []
@@ -162,4 +162,4 @@ with open(outfile, "w") as file:
 # Clean up
 
 # Remove 'int_res' file
-subprocess.run([f"rm {int_res}"], shell=True)
\ No newline at end of file
+os.remove(int_res)
\ No newline at end of file
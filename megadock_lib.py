@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Program: megadock_lib
+File:    megadock_lib.py
+
+Version:  V1.1
+Date:     19.10.26
+Function:   Library: Read Megadock (ZDOCK-format) output and ZRANK scores, place the ligand at every pose at once and screen poses for contact with the antibody CDRs.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+Megadock writes its poses in the ZDOCK format: a header of four lines (grid size and spacing, the initial rotation of the ligand, the receptor file and centre, the ligand file and centre) followed by one 'phi theta psi x y z score' line per pose. decoygen places the ligand at a pose by moving it to the origin (ligand centre), applying the initial rotation then the pose rotation (ZXZ Euler angles), and moving it to the receptor centre less the translation (grid units, with positions past the grid midpoint being negative). Here the same transforms are built for all poses at once as arrays, so the ligand coordinates of every pose can be found without running decoygen 2000 times.
+
+cdr_contact_poses() uses this to find the poses in which the antigen touches the antibody CDRs (nr1797_cdr_identifiers.json). The CDR atoms are mapped onto a grid of voxels, each marked if any point in it could be within the contact cutoff of a CDR atom, and the ligand atoms of each pose are looked up in the grid. The screen is conservative: a pose with a CDR contact is never rejected, though a pose whose closest approach to the CDRs is up to one voxel diagonal beyond the cutoff may be kept. Poses without a CDR contact (e.g. antigen bound to the constant region or back face of the Fv) can then be dropped before ZRANK, which only has to rescore the remaining poses.
+
+site_distances() gives, for every pose, the distance from the antibody combining site (the centroid of the CDR atoms) to the closest antigen atom, used by runmegadockranked_filtered.py to take the best ZRANK pose with the antigen bound at the combining site.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   Distance of each pose from the antibody combining site   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import numpy as np
+from typing import NamedTuple
+from superpose_lib import apply_transform, rmsd
+
+#*************************************************************************
+
+# Distance (Angstroms) within which a ligand atom counts as a CDR contact
+CONTACT_CUTOFF = 5.0
+
+# Voxel size (Angstroms) of the contact grid
+VOXEL_SIZE = 1.0
+
+# Number of poses transformed at a time
+POSE_BATCH = 100
+
+#*************************************************************************
+
+class MegadockOutput(NamedTuple):
+   """
+   Contents of a Megadock (ZDOCK-format) output file. header holds the four header lines and pose_lines the line of each pose (numbered from 1 in the file order), so a subset of poses can be written back out unchanged.
+   """
+   header: list
+   pose_lines: list
+   grid: int
+   spacing: float
+   initial_angles: np.ndarray
+   receptor_centre: np.ndarray
+   ligand_centre: np.ndarray
+   angles: np.ndarray
+   shifts: np.ndarray
+   scores: np.ndarray
+
+#*************************************************************************
+
+def read_megadock_out(outfile):
+   """
+   Read a Megadock output file into a MegadockOutput.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _write_example(tmp + '/megadock.out')
+   ...    output = read_megadock_out(tmp + '/megadock.out')
+   >>> output.grid, output.spacing, output.angles.shape, output.shifts[1].tolist(), output.scores.tolist()
+   (128, 1.2, (3, 3), [100, 0, 0], [3000.0, 2000.0, 1000.0])
+
+   """
+   with open(outfile) as file:
+      lines = [line.rstrip('\n') for line in file if line.strip()]
+   header, pose_lines = lines[:4], lines[4:]
+   grid, spacing = header[0].split()[:2]
+   values = np.array([line.split()[:7] for line in pose_lines], dtype=np.float64).reshape(-1, 7)
+   return MegadockOutput(header, pose_lines, int(grid), float(spacing),
+                         np.array(header[1].split()[:3], dtype=np.float64),
+                         np.array(header[2].split()[1:4], dtype=np.float64),
+                         np.array(header[3].split()[1:4], dtype=np.float64),
+                         values[:, :3], values[:, 3:6].astype(np.int64), values[:, 6])
+
+def write_megadock_out(output, poses, outfile):
+   """
+   Write the given poses (numbered from 1) of a MegadockOutput to a new output file, in the order given, so that ZRANK or decoygen can be run on that subset. Pose n of the new file is poses[n - 1] of the original.
+
+   """
+   with open(outfile, "w") as file:
+      file.write("\n".join(output.header + [output.pose_lines[pose - 1] for pose in poses]) + "\n")
+
+#*************************************************************************
+
+def euler_matrices(angles):
+   """
+   Return the (N, 3, 3) rotation matrices for (N, 3) ZXZ Euler angles (radians) as used in ZDOCK/Megadock output files, R = Rz(phi) Rx(theta) Rz(psi).
+
+   >>> (euler_matrices(np.array([[np.pi / 2, 0, 0]])).round(6) + 0.0).tolist()
+   [[[0.0, -1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]]
+
+   """
+   angles = np.asarray(angles, dtype=np.float64).reshape(-1, 3)
+   c, s = np.cos(angles), np.sin(angles)
+   c1, c2, c3 = c.T
+   s1, s2, s3 = s.T
+   R = np.empty((len(angles), 3, 3))
+   R[:, 0, 0] = c1 * c3 - s1 * c2 * s3
+   R[:, 0, 1] = -c1 * s3 - s1 * c2 * c3
+   R[:, 0, 2] = s1 * s2
+   R[:, 1, 0] = s1 * c3 + c1 * c2 * s3
+   R[:, 1, 1] = -s1 * s3 + c1 * c2 * c3
+   R[:, 1, 2] = -c1 * s2
+   R[:, 2, 0] = s2 * s3
+   R[:, 2, 1] = s2 * c3
+   R[:, 2, 2] = c2
+   return R
+
+def pose_transforms(output, poses=None):
+   """
+   Return the rotations R (N, 3, 3) and translations t (N, 3) placing the ligand at each of the given poses (numbered from 1; all poses by default), such that coords @ R.T + t are the ligand coordinates written by decoygen.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _write_example(tmp + '/megadock.out')
+   ...    output = read_megadock_out(tmp + '/megadock.out')
+   >>> R, t = pose_transforms(output)
+   >>> np.allclose(R[0], np.eye(3)), t[0].tolist(), t[1].round(6).tolist()
+   (True, [0.0, 0.0, 0.0], [33.6, 0.0, 0.0])
+
+   """
+   if poses is None:
+      index = np.arange(len(output.pose_lines))
+   else:
+      index = np.asarray(poses, dtype=np.intp) - 1
+   shifts = output.shifts[index]
+   # Grid positions past the midpoint are negative shifts
+   shifts = np.where(shifts >= output.grid // 2, shifts - output.grid, shifts)
+   R = euler_matrices(output.angles[index]) @ euler_matrices(output.initial_angles)[0]
+   t = output.receptor_centre - shifts * output.spacing - R @ output.ligand_centre
+   return R, t
+
+def place_ligand(output, coords, poses=None):
+   """
+   Return the (N, atoms, 3) coordinates of the ligand atoms coords at each of the given poses (numbered from 1; all poses by default).
+
+   """
+   R, t = pose_transforms(output, poses)
+   return apply_transform(coords, R, t)
+
+#*************************************************************************
+
+def read_zrank(zrank_file):
+   """
+   Read a ZRANK output file ('pose score' lines) and return the pose numbers ranked from best (lowest score) to worst, with their scores.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    with open(tmp + '/megadock.out.zr.out', 'w') as file:
+   ...       _ = file.write('1\\t-20.5\\n2\\t-75.1\\n3\\t3.2\\n')
+   ...    poses, scores = read_zrank(tmp + '/megadock.out.zr.out')
+   >>> poses.tolist(), scores.tolist()
+   ([2, 1, 3], [-75.1, -20.5, 3.2])
+
+   """
+   values = np.loadtxt(zrank_file, ndmin=2)
+   order = np.argsort(values[:, 1], kind='stable')
+   return values[order, 0].astype(np.int64), values[order, 1]
+
+#*************************************************************************
+
+class ContactGrid:
+   """
+   A grid of voxels marking the space within cutoff of a set of points. A voxel is marked if any point inside it could be within cutoff of one of the points, so contains() never misses a true contact.
+
+   >>> grid = ContactGrid(np.array([[0.0, 0.0, 0.0]]), 4.0)
+   >>> grid.contains(np.array([[3.9, 0.0, 0.0], [0.0, 4.5, 0.0], [7.0, 0.0, 0.0], [-50.0, 0.0, 0.0]])).tolist()
+   [True, True, False, False]
+
+   """
+   def __init__(self, points, cutoff, voxel_size=VOXEL_SIZE):
+      points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+      self.voxel_size = voxel_size
+      # Distance from a voxel centre to its corners
+      reach = cutoff + voxel_size * np.sqrt(3) / 2
+      margin = int(np.ceil(reach / voxel_size)) + 1
+      low = points.min(axis=0) if len(points) else np.zeros(3)
+      high = points.max(axis=0) if len(points) else np.zeros(3)
+      self.origin = low - margin * voxel_size
+      self.shape = tuple(np.floor((high - self.origin) / voxel_size).astype(int) + margin + 1)
+      self.grid = np.zeros(self.shape, dtype=bool)
+      steps = np.arange(-margin, margin + 1)
+      offsets = np.stack(np.meshgrid(steps, steps, steps, indexing='ij'), axis=-1).reshape(-1, 3)
+      for start in range(0, len(points), 256):
+         block = points[start:start + 256]
+         voxels = np.floor((block - self.origin) / voxel_size).astype(int)[:, None, :] + offsets
+         centres = self.origin + (voxels + 0.5) * voxel_size
+         near = ((centres - block[:, None, :]) ** 2).sum(axis=2) <= reach ** 2
+         marked = voxels[near]
+         self.grid[marked[:, 0], marked[:, 1], marked[:, 2]] = True
+
+   def contains(self, coords):
+      """
+      Return whether each point of coords (any shape ending in 3) lies in a marked voxel.
+
+      """
+      coords = np.asarray(coords, dtype=np.float64)
+      voxels = np.floor((coords - self.origin) / self.voxel_size).astype(int)
+      inside = np.all((voxels >= 0) & (voxels < self.shape), axis=-1)
+      result = np.zeros(coords.shape[:-1], dtype=bool)
+      found = voxels[inside]
+      result[inside] = self.grid[found[..., 0], found[..., 1], found[..., 2]]
+      return result
+
+#*************************************************************************
+
+def cdr_contact_poses(output, receptor, ligand, cdrs, cutoff=CONTACT_CUTOFF, batch=POSE_BATCH):
+   """
+   Screen every pose of a MegadockOutput for contact between the ligand (antigen) and the CDRs of the receptor (antibody). receptor and ligand are the PDBStructures given to Megadock and cdrs the CDR residue labels (e.g. 'H95'). Returns a boolean array, True for the poses in which a ligand heavy atom is within about cutoff of a CDR heavy atom.
+
+   >>> import tempfile
+   >>> from pdbstructure_lib import read_pdb
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _write_example(tmp + '/megadock.out')
+   ...    output = read_megadock_out(tmp + '/megadock.out')
+   >>> receptor, ligand = read_pdb('test/test8_ab.pdb'), read_pdb('test/test8_Dag.pdb')
+   >>> cdr_contact_poses(output, receptor, ligand, ['H31', 'H33', 'H50', 'H52', 'H95', 'H96', 'H97', 'H98', 'L91', 'L92']).tolist()
+   [True, False, False]
+
+   """
+   cdr_mask = np.isin(receptor.residue_labels(), list(cdrs)) & receptor.heavy_mask()
+   keep = np.zeros(len(output.pose_lines), dtype=bool)
+   if not cdr_mask.any():
+      return keep
+   grid = ContactGrid(receptor.coords[cdr_mask], cutoff)
+   ligand_coords = ligand.coords[ligand.heavy_mask()]
+   for start in range(0, len(keep), batch):
+      poses = np.arange(start + 1, min(start + batch, len(keep)) + 1)
+      keep[start:start + len(poses)] = grid.contains(place_ligand(output, ligand_coords, poses)).any(axis=1)
+   return keep
+
+def combining_site(receptor, cdrs):
+   """
+   Return the centroid of the CDR heavy atoms of receptor (the antibody combining site), or None if none of the CDR residues are present.
+
+   >>> from pdbstructure_lib import read_pdb
+   >>> combining_site(read_pdb('test/test8_ab.pdb'), ['H95', 'H96']).round(3).tolist()
+   [7.029, 8.504, 32.476]
+
+   """
+   mask = np.isin(receptor.residue_labels(), list(cdrs)) & receptor.heavy_mask()
+   return receptor.coords[mask].mean(axis=0) if mask.any() else None
+
+def site_distances(output, ligand, site, poses=None, batch=POSE_BATCH):
+   """
+   Return the distance from site (e.g. the combining site) to the closest ligand heavy atom at each of the given poses (numbered from 1; all poses by default) of a MegadockOutput.
+
+   >>> import tempfile
+   >>> from pdbstructure_lib import read_pdb
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _write_example(tmp + '/megadock.out')
+   ...    output = read_megadock_out(tmp + '/megadock.out')
+   >>> site = combining_site(read_pdb('test/test8_ab.pdb'), ['H95', 'H96'])
+   >>> site_distances(output, read_pdb('test/test8_Dag.pdb'), site, [2, 1]).round(2).tolist()
+   [31.13, 4.5]
+
+   """
+   if poses is None:
+      poses = np.arange(1, len(output.pose_lines) + 1)
+   poses = np.asarray(poses, dtype=np.intp)
+   ligand_coords = ligand.coords[ligand.heavy_mask()]
+   distances = np.empty(len(poses))
+   for start in range(0, len(poses), batch):
+      placed = place_ligand(output, ligand_coords, poses[start:start + batch])
+      distances[start:start + batch] = np.sqrt(((placed - site) ** 2).sum(axis=2).min(axis=1))
+   return distances
+
+#*************************************************************************
+
+def pose_rmsds(output, ligand, native_ligand, batch=POSE_BATCH):
+   """
+   Return the RMSD of the ligand CA atoms at each pose from their position in native_ligand (the ligand in its bound position relative to the receptor, as a PDBStructure), matching atoms by chain, residue number and atom name. No fitting is done, as the receptor is not moved by docking.
+
+   """
+   native_index = {key: i for i, key in enumerate(native_ligand.atom_keys())}
+   pairs = [(i, native_index[key]) for i, key in enumerate(ligand.atom_keys()) if key in native_index and ligand.atomnames[i] == "CA"]
+   ligand_coords = ligand.coords[[i for i, _ in pairs]]
+   native_coords = native_ligand.coords[[j for _, j in pairs]]
+   values = []
+   for start in range(0, len(output.pose_lines), batch):
+      poses = np.arange(start + 1, min(start + batch, len(output.pose_lines)) + 1)
+      values += [rmsd(place_ligand(output, ligand_coords, poses), native_coords)]
+   return np.concatenate(values) if values else np.zeros(0)
+
+def filter_report(keep, rmsds=None, thresholds=(5.0, 10.0)):
+   """
+   Report lines on the poses kept by a pose screen (keep, a boolean array) and, given the ligand RMSD of each pose from the native, on the near-native poses (ligand RMSD within each threshold) kept.
+
+   >>> for line in filter_report(np.array([True, False, True, False]), np.array([3.0, 4.0, 12.0, 20.0])):
+   ...    print(line)
+   Poses kept by filter:                    2 of 4 (50.0%)
+   Poses within 5.0 Angstroms kept:         1 of 2
+   Poses within 10.0 Angstroms kept:        1 of 2
+   Best pose RMSD, all/kept:                3.000 / 3.000
+
+   """
+   keep = np.asarray(keep, dtype=bool)
+   lines = [f"{'Poses kept by filter:':<40} {int(keep.sum())} of {len(keep)} ({100 * keep.mean() if len(keep) else 0:.1f}%)"]
+   if rmsds is not None and len(rmsds):
+      for threshold in thresholds:
+         near = rmsds <= threshold
+         lines += [f"{f'Poses within {threshold} Angstroms kept:':<40} {int((near & keep).sum())} of {int(near.sum())}"]
+      best_kept = f"{rmsds[keep].min():.3f}" if keep.any() else "none"
+      lines += [f"{'Best pose RMSD, all/kept:':<40} {rmsds.min():.3f} / {best_kept}"]
+   return lines
+
+#*************************************************************************
+
+def _write_example(outfile):
+   """
+   Write a small Megadock output file used in the examples: the ligand left in place (pose 1), moved 33.6 Angstroms along x (pose 2) and turned about z then moved (pose 3).
+
+   """
+   with open(outfile, "w") as file:
+      file.write("128\t1.2\n0.0\t0.0\t0.0\nrec.pdb\t0.0\t0.0\t0.0\nlig.pdb\t0.0\t0.0\t0.0\n"
+                 "0.0\t0.0\t0.0\t0\t0\t0\t3000.0\n"
+                 "0.0\t0.0\t0.0\t100\t0\t0\t2000.0\n"
+                 "3.141593\t0.0\t0.0\t0\t0\t40\t1000.0\n")
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
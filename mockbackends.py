@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Program: mockbackends
+File:    mockbackends.py
+
+Version:  V1.0
+Date:     19.10.26
+Function: Install fake versions of the docking programs so the docking scripts can be run and timed without Megadock, ZRANK, Piper, Rosetta or Haddock.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+This program writes an executable stub for each docking program (and helper tool) used by the scripts to a directory, together with a dockingtools_config.json file pointing toolrunner_lib at them. Setting DOCKINGTOOLS_CONFIG to that file makes runmegadockranked.py, runpiper.py, runrosetta.py, runhaddock.py and the testdockingprogs_master scripts use the mocks in place of the real software. The runtime and failure rate given here are defaults; they can be changed per run (and per tool) with the MOCK_ environment variables described in mockbackends_lib.py.
+
+--------------------------------------------------------------------------
+
+Usage:
+======
+mockbackends.py BINDir [--runtime S] [--failure-rate F] [--busy]
+export DOCKINGTOOLS_CONFIG=BINDir/dockingtools_config.json
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import argparse
+from mockbackends_lib import install_mocks, MOCKS
+
+#*************************************************************************
+
+# Get inputs from command line
+parser = argparse.ArgumentParser(description="Install mock docking programs for testing and benchmarking the docking scripts.")
+parser.add_argument("BINDir", help="Directory to write the mock executables and config file to")
+parser.add_argument("--runtime", type=float, default=None, help="Seconds each mock runs for (default: 0)")
+parser.add_argument("--failure-rate", type=float, default=None, help="Probability that a mock run fails (default: 0)")
+parser.add_argument("--busy", action="store_true", help="Use a CPU core for the runtime instead of sleeping")
+args = parser.parse_args()
+
+#*************************************************************************
+
+# Write mocks and config file
+config_file = install_mocks(args.BINDir, args.runtime, args.failure_rate, args.busy)
+print(f"Installed mocks for: {', '.join(MOCKS)}")
+print(f"export DOCKINGTOOLS_CONFIG={config_file}")
@@ -0,0 +1,633 @@
+#!/usr/bin/env python3
+"""
+Program: mockbackends_lib
+File:    mockbackends_lib.py
+
+Version:  V1.1
+Date:     19.10.26
+Function:   Library: Fake docking programs implementing the command lines and output files used by the 'Antibody-Antigen Docking' scripts.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+Megadock, ZRANK, Piper, Rosetta and Haddock cannot be installed on every machine, so the scripts that drive them (runmegadockranked.py, runpiper.py, runrosetta.py, runhaddock.py and the testdockingprogs_master scripts) can otherwise only be run on the cluster. This library provides stand-ins for each of the docking programs and their helper tools. Each mock accepts the same arguments as the real program, as called by these scripts, and writes files in the same format and location that the scripts read back (megadock.out, megadock.out.zr.out, ft.000.00, lig.000.00.pdb, score_local_dock.sc plus gzipped decoys, run1/structures/it1/file.list, ...). Docked structures are made by rigidly moving the antigen of the input, so the outputs can be evaluated as normal.
+
+How long each mock runs and how often it fails are set with environment variables, so scheduler throughput and concurrency can be measured without the real software:
+  MOCK_RUNTIME      seconds each tool runs for (default 0)
+  MOCK_JITTER       fractional spread of the runtime, e.g. 0.2 for +/-20% (default 0)
+  MOCK_FAILURE_RATE probability that a run fails (exit status 1, no output) (default 0)
+  MOCK_BUSY         if 1, use a CPU core for the runtime rather than sleeping (default 0)
+  MOCK_SEED         random seed for reproducible runs
+Each setting can be given per tool by adding the tool name, e.g. MOCK_RUNTIME_MEGADOCK=30 or MOCK_FAILURE_RATE_ROSETTA_DOCKING=0.1.
+
+BiopTools and ProFit are not mocked; they are freely available and are still needed for the input preparation and evaluation steps.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   Megadock poses placed as by decoygen (megadock_lib)   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import argparse
+import numpy as np
+from pdbstructure_lib import PDBStructure, read_pdb, format_pdb
+from generate_decoys_lib import random_rigid_perturbations
+from megadock_lib import euler_matrices, read_megadock_out, place_ligand
+
+#*************************************************************************
+
+# Directory containing the ab-docking-scripts
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+#*************************************************************************
+
+def _setting(name, tool, default):
+   """
+   Get a MOCK_<name> setting from the environment, preferring the per-tool value MOCK_<name>_<TOOL>.
+
+   >>> os.environ['MOCK_RUNTIME_ZRANK'] = '2.5'
+   >>> _setting('RUNTIME', 'zrank', 0), _setting('RUNTIME', 'megadock', 0)
+   (2.5, 0.0)
+   >>> del os.environ['MOCK_RUNTIME_ZRANK']
+
+   """
+   value = os.environ.get(f"MOCK_{name}_{tool.upper()}", os.environ.get(f"MOCK_{name}", default))
+   return float(value)
+
+#*************************************************************************
+
+def _rng():
+   """
+   Return the random number generator used by the mocks (seeded from MOCK_SEED if set).
+
+   """
+   seed = os.environ.get("MOCK_SEED")
+   return np.random.default_rng(None if seed is None else int(seed))
+
+#*************************************************************************
+
+def simulate_run(tool, rng=None):
+   """
+   Spend the configured runtime for a tool (sleeping, or spinning if MOCK_BUSY=1), then decide whether the run fails. Returns the exit status (0 or 1).
+
+   >>> os.environ['MOCK_FAILURE_RATE'] = '1'
+   >>> simulate_run('piper')
+   1
+   >>> del os.environ['MOCK_FAILURE_RATE']
+   >>> simulate_run('piper')
+   0
+
+   """
+   if rng is None:
+      rng = _rng()
+   runtime = _setting("RUNTIME", tool, 0) * (1 + _setting("JITTER", tool, 0) * rng.uniform(-1, 1))
+   if runtime > 0:
+      if _setting("BUSY", tool, 0):
+         end = time.perf_counter() + runtime
+         while time.perf_counter() < end:
+            pass
+      else:
+         time.sleep(runtime)
+   if rng.random() < _setting("FAILURE_RATE", tool, 0):
+      print(f"{tool}: simulated failure", file=sys.stderr)
+      return 1
+   return 0
+
+#*************************************************************************
+
+def euler_matrix(phi, theta, psi):
+   """
+   Return the rotation matrix for ZXZ Euler angles (radians), the convention used for the rotations in ZDOCK/Megadock output files.
+
+   >>> (euler_matrix(np.pi / 2, 0, 0).round(6) + 0.0).tolist()
+   [[0.0, -1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]
+
+   """
+   return euler_matrices([phi, theta, psi])[0]
+
+#*************************************************************************
+
+def _write_moved(structure, rotation, translation, PDBfile, mask=None):
+   """
+   Write structure to PDBfile with the atoms in mask (all atoms by default) rotated about their centroid and translated.
+
+   """
+   if mask is None:
+      mask = np.ones(len(structure), dtype=bool)
+   coords = structure.coords.copy()
+   centroid = coords[mask].mean(axis=0)
+   coords[mask] = (coords[mask] - centroid) @ rotation.T + centroid + translation
+   text = format_pdb(structure, coords)
+   opener = gzip.open if PDBfile.endswith('.gz') else open
+   with opener(PDBfile, "wt") as file:
+      file.write(text)
+
+#*************************************************************************
+
+# Megadock / ZRANK
+
+def mock_megadock(argv, rng):
+   """
+   megadock -R receptor -L ligand -o outfile [-N num_poses]: write a ZDOCK-format output file (grid size and spacing, initial ligand rotation, receptor and ligand centres, then one 'phi theta psi x y z score' line per pose).
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    mock_megadock(['-R', 'test/test8_ab.pdb', '-L', 'test/test8_Dag.pdb', '-o', tmp + '/megadock.out', '-N', '5'], np.random.default_rng(0))
+   ...    lines = open(tmp + '/megadock.out').readlines()
+   >>> len(lines), lines[0].split()
+   (9, ['128', '1.2'])
+
+   """
+   parser = argparse.ArgumentParser(prog="megadock")
+   parser.add_argument("-R", dest="receptor", required=True)
+   parser.add_argument("-L", dest="ligand", required=True)
+   parser.add_argument("-o", dest="outfile", default="megadock.out")
+   parser.add_argument("-N", dest="num_poses", type=int, default=2000)
+   args, _ = parser.parse_known_args(argv)
+   grid, spacing = 128, 1.2
+   receptor_centre = read_pdb(args.receptor).coords.mean(axis=0)
+   ligand_centre = read_pdb(args.ligand).coords.mean(axis=0)
+   angles = rng.uniform(0, 2 * np.pi, (args.num_poses, 3))
+   # Translations in grid units, wrapped onto the grid as in the real output. decoygen moves the ligand centre to the receptor centre less the translation, so poses are spread around the input ligand position.
+   offset = np.round((receptor_centre - ligand_centre) / spacing).astype(int)
+   shifts = (offset + rng.integers(-12, 13, (args.num_poses, 3))) % grid
+   scores = np.sort(rng.uniform(1000, 6000, args.num_poses))[::-1]
+   lines = [f"{grid}\t{spacing}", "0.000000\t0.000000\t0.000000",
+            f"{args.receptor}\t{receptor_centre[0]:.3f}\t{receptor_centre[1]:.3f}\t{receptor_centre[2]:.3f}",
+            f"{args.ligand}\t{ligand_centre[0]:.3f}\t{ligand_centre[1]:.3f}\t{ligand_centre[2]:.3f}"]
+   lines += [f"{a[0]:.6f}\t{a[1]:.6f}\t{a[2]:.6f}\t{s[0]}\t{s[1]}\t{s[2]}\t{score:.2f}" for a, s, score in zip(angles, shifts, scores)]
+   with open(args.outfile, "w") as file:
+      file.write("\n".join(lines) + "\n")
+
+def mock_decoygen(argv, rng):
+   """
+   decoygen outfile ligand megadock.out pose: write the ligand moved to the given pose (placed as by the real decoygen, see megadock_lib.py).
+
+   """
+   outfile, ligand, megadock_out, pose = argv[:4]
+   structure = read_pdb(ligand)
+   coords = place_ligand(read_megadock_out(megadock_out), structure.coords, [int(pose)])[0]
+   with open(outfile, "w") as file:
+      file.write(format_pdb(structure, coords))
+
+def mock_zrank(argv, rng):
+   """
+   zrank megadock.out first last: rerank poses first to last, writing '<pose> <score>' lines to megadock.out.zr.out (lower scores are better).
+
+   """
+   megadock_out = argv[0]
+   first, last = int(argv[1]), int(argv[2])
+   with open(megadock_out) as file:
+      num_poses = len(file.readlines()) - 4
+   poses = np.arange(first, min(last, num_poses) + 1)
+   scores = rng.normal(-60, 25, len(poses))
+   with open(f"{megadock_out}.zr.out", "w") as file:
+      file.writelines(f"{pose}\t{score:.3f}\n" for pose, score in zip(poses, scores))
+
+#*************************************************************************
+# Piper / sblu
+
+def mock_piper_prepare(argv, rng):
+   """
+   prepare.py file.pdb: write the prepared structure file_pnon.pdb to the current directory.
+
+   """
+   PDBfile = argv[0]
+   name = os.path.basename(PDBfile).split('.')[0]
+   with open(PDBfile) as infile, open(f"{name}_pnon.pdb", "w") as outfile:
+      outfile.writelines(line for line in infile if line.startswith(('ATOM  ', 'HETATM', 'TER', 'END')))
+
+def _rotation_for_index(index):
+   """
+   Return the rotation used for an entry of the Piper rotation set (the mocks use a fixed random rotation per index in place of rots.prm).
+
+   """
+   return euler_matrix(*np.random.default_rng(int(index)).uniform(0, 2 * np.pi, 3))
+
+def mock_piper(argv, rng):
+   """
+   piper [options] receptor ligand: write ft.000.00 ('<rotation> <x> <y> <z> <energy>' per pose, best first).
+
+   >>> import tempfile
+   >>> cwd = os.getcwd()
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    os.chdir(tmp)
+   ...    mock_piper(['--maskrec=mask.pdb', '-p', 'atoms.prm', 'rec.pdb', 'lig.pdb'], np.random.default_rng(0))
+   ...    rows = open('ft.000.00').readlines()
+   ...    os.chdir(cwd)
+   >>> len(rows), len(rows[0].split())
+   (1000, 5)
+
+   """
+   parser = argparse.ArgumentParser(prog="piper")
+   parser.add_argument("--maskrec")
+   parser.add_argument("-p")
+   parser.add_argument("-f")
+   parser.add_argument("-r")
+   parser.add_argument("--num", type=int, default=1000)
+   parser.add_argument("receptor")
+   parser.add_argument("ligand")
+   args, _ = parser.parse_known_args(argv)
+   rotations = rng.integers(0, 70000, args.num)
+   translations = rng.uniform(-15, 15, (args.num, 3))
+   energies = np.sort(rng.uniform(-1200, -300, args.num))
+   with open("ft.000.00", "w") as file:
+      file.writelines(f"{r}\t{t[0]:.6f}\t{t[1]:.6f}\t{t[2]:.6f}\t{e:.6f}\n" for r, t, e in zip(rotations, translations, energies))
+
+def _read_ft(ftfile):
+   """
+   Read a Piper ft file, returning the rotation indices and translations.
+
+   """
+   ft = np.loadtxt(ftfile, ndmin=2)
+   return ft[:, 0].astype(int), ft[:, 1:4]
+
+def mock_sblu(argv, rng):
+   """
+   sblu measure pwrmsd | docking cluster | docking gen_cluster_pdb, with the arguments used by runpiper.py.
+
+   """
+   command = " ".join(argv[:2])
+   parser = argparse.ArgumentParser(prog=f"sblu {command}")
+   parser.add_argument("-o", dest="outfile", required=True)
+   if command == "measure pwrmsd":
+      parser.add_argument("-n", dest="num", type=int, default=1000)
+      parser.add_argument("--rec")
+      parser.add_argument("ligand")
+      parser.add_argument("ftfile")
+      parser.add_argument("rotations")
+      args, _ = parser.parse_known_args(argv[2:])
+      # Pairwise distances between the pose translations stand in for the interface RMSDs
+      _, translations = _read_ft(args.ftfile)
+      translations = translations[:args.num]
+      i, j = np.triu_indices(len(translations), 1)
+      np.savetxt(args.outfile, np.linalg.norm(translations[i] - translations[j], axis=1), fmt="%.2f")
+   elif command == "docking cluster":
+      parser.add_argument("-r", dest="radius", type=float, default=9.0)
+      parser.add_argument("matrix")
+      args, _ = parser.parse_known_args(argv[2:])
+      distances = np.loadtxt(args.matrix, ndmin=1)
+      num = int(round((1 + np.sqrt(1 + 8 * len(distances))) / 2))
+      square = np.zeros((num, num))
+      square[np.triu_indices(num, 1)] = distances
+      neighbours = (square + square.T) < args.radius
+      # Greedy clustering: the pose with most unassigned neighbours becomes the next centre
+      unassigned = np.ones(num, dtype=bool)
+      clusters = []
+      while unassigned.any():
+         counts = (neighbours & unassigned[None, :]).sum(axis=1) * unassigned
+         centre = int(np.argmax(counts))
+         members = np.flatnonzero(neighbours[centre] & unassigned)
+         members = np.union1d(members, [centre])
+         unassigned[members] = False
+         clusters += [{"center": centre, "members": members.tolist()}]
+      with open(args.outfile, "w") as file:
+         json.dump({"clusters": clusters}, file)
+   elif command == "docking gen_cluster_pdb":
+      parser.add_argument("-l", dest="num_clusters", type=int, default=1)
+      parser.add_argument("clusters")
+      parser.add_argument("ftfile")
+      parser.add_argument("rotations")
+      parser.add_argument("ligand")
+      args, _ = parser.parse_known_args(argv[2:])
+      with open(args.clusters) as file:
+         clusters = json.load(file)["clusters"]
+      rotation_ids, translations = _read_ft(args.ftfile)
+      ligand = read_pdb(args.ligand)
+      for number, cluster in enumerate(clusters[:args.num_clusters]):
+         centre = cluster["center"]
+         _write_moved(ligand, _rotation_for_index(rotation_ids[centre]), translations[centre], f"{args.outfile}.{number:02d}.pdb")
+   else:
+      raise ValueError(f"unknown sblu command: {command}")
+
+#*************************************************************************
+# Rosetta
+
+def read_flags(argv):
+   """
+   Read Rosetta options from the command line and any @flags files into a dictionary of option: list of values.
+
+   >>> import tempfile
+   >>> with tempfile.NamedTemporaryFile('w', suffix='_flags', delete=False) as file:
+   ...    _ = file.write('-in:file:s a.pdb\\n-docking:partners HL_Y\\n\\n-ex1\\n-nstruct 5\\n')
+   >>> flags = read_flags(['@' + file.name])
+   >>> flags['-in:file:s'], flags['-ex1'], flags['-nstruct']
+   (['a.pdb'], [], ['5'])
+   >>> os.remove(file.name)
+
+   """
+   tokens = []
+   for arg in argv:
+      if arg.startswith('@'):
+         with open(arg[1:]) as file:
+            tokens += file.read().split()
+      else:
+         tokens += [arg]
+   flags = {}
+   option = None
+   for token in tokens:
+      if token.startswith('-') and not re.match(r'^-[0-9.]', token):
+         option = token
+         flags[option] = []
+      elif option is not None:
+         flags[option] += [token]
+   return flags
+
+def _rosetta_name(infile, suffix, number):
+   """
+   Return the name Rosetta gives to output structure number for input infile.
+
+   >>> _rosetta_name('dir/1abc_Rosetta_input.pdb', '_prepack', 1)
+   '1abc_Rosetta_input_prepack_0001.pdb'
+
+   """
+   return f"{os.path.basename(infile).split('.')[0]}{suffix}_{number:04d}.pdb"
+
+def mock_rosetta_prepack(argv, rng):
+   """
+   docking_prepack_protocol @prepack_flags: write <input><suffix>_0001.pdb to the current directory.
+
+   """
+   flags = read_flags(argv)
+   infile = flags["-in:file:s"][0]
+   suffix = flags.get("-out:suffix", [""])[0]
+   with open(infile) as file:
+      lines = [line for line in file if line.startswith(('ATOM  ', 'HETATM', 'TER', 'END'))]
+   with open(_rosetta_name(infile, suffix, 1), "w") as file:
+      file.writelines(lines)
+
+def mock_rosetta_docking(argv, rng):
+   """
+   docking_protocol @docking_flags: write -nstruct decoys (gzipped if -out:pdb_gz) to -out:path:pdb and append their scores to score<suffix>.sc in the current directory.
+
+   >>> import tempfile
+   >>> cwd = os.getcwd()
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    os.chdir(tmp)
+   ...    mock_rosetta_docking(['-in:file:s', f'{cwd}/test/test8_OG.pdb', '-docking:partners', 'HL_Y', '-out:path:pdb', 'docking_out/', '-out:pdb_gz', '-nstruct', '3', '-out:suffix', '_local_dock'], np.random.default_rng(0))
+   ...    sorted(os.listdir('docking_out'))
+   ...    rows = open('score_local_dock.sc').readlines()
+   ...    os.chdir(cwd)
+   ['test8_OG_local_dock_0001.pdb.gz', 'test8_OG_local_dock_0002.pdb.gz', 'test8_OG_local_dock_0003.pdb.gz']
+   >>> rows[1].split()[:3], len(rows)
+   (['SCORE:', 'total_score', 'rms'], 5)
+
+   """
+   flags = read_flags(argv)
+   infile = flags["-in:file:s"][0]
+   suffix = flags.get("-out:suffix", [""])[0]
+   nstruct = int(flags.get("-nstruct", ["1"])[0])
+   outdir = flags.get("-out:path:pdb", ["./"])[0]
+   moving_chains = flags.get("-docking:partners", ["_"])[0].split('_')[-1]
+   os.makedirs(outdir, exist_ok=True)
+   structure = read_pdb(infile)
+   mask = structure.chain_mask(moving_chains)
+   # Local docking: decoys stay within a few Angstroms of the start
+   rmsds = rng.uniform(0.5, 12.0, nstruct)
+   rotations, translations = random_rigid_perturbations(structure.coords[mask], rmsds, rng)
+   rows = []
+   for number in range(1, nstruct + 1):
+      name = _rosetta_name(infile, suffix, number)
+      PDBfile = os.path.join(outdir, name + (".gz" if "-out:pdb_gz" in flags else ""))
+      _write_moved(structure, rotations[number - 1], translations[number - 1], PDBfile, mask)
+      rms = rmsds[number - 1]
+      interface_score = -25 + 1.5 * rms + rng.normal(0, 2)
+      rows += [f"SCORE: {-500 + 3 * rms + rng.normal(0, 10):11.3f} {rms:11.3f} {interface_score:11.3f} {name.split('.pdb')[0]}"]
+   scores_file = f"score{suffix}.sc"
+   header = []
+   if not os.path.exists(scores_file):
+      header = ["SEQUENCE: ", f"SCORE: {'total_score':>11} {'rms':>11} {'I_sc':>11} description"]
+   with open(scores_file, "a") as file:
+      file.write("\n".join(header + rows) + "\n")
+
+#*************************************************************************
+# Haddock (and the pdb-tools/haddock-tools it uses)
+
+def _read_input_lines(argv):
+   """
+   Read PDB lines from the last file argument, or standard input if no file is given (as the pdb-tools do).
+
+   """
+   files = [arg for arg in argv if not arg.startswith('-')]
+   if files:
+      with open(files[-1]) as file:
+         return file.readlines()
+   return sys.stdin.readlines()
+
+def mock_pdb_chain(argv, rng):
+   """
+   pdb_chain.py [-X] [file]: set the chain identifier of every record (blank by default).
+
+   """
+   chain = next((arg[1:2] for arg in argv if arg.startswith('-')), ' ')
+   for line in _read_input_lines(argv):
+      if line.startswith(('ATOM  ', 'HETATM', 'ANISOU', 'TER')) and len(line) > 21:
+         line = line[:21] + chain + line[22:]
+      sys.stdout.write(line)
+
+def mock_pdb_seg(argv, rng):
+   """
+   pdb_seg.py [-XXXX] [file]: set the segment identifier of every record (blank by default).
+
+   """
+   segid = next((arg[1:5] for arg in argv if arg.startswith('-')), '')
+   for line in _read_input_lines(argv):
+      if line.startswith(('ATOM  ', 'HETATM', 'ANISOU')):
+         line = line.rstrip('\n').ljust(80)
+         line = f"{line[:72]}{segid:<4}{line[76:]}".rstrip() + "\n"
+      sys.stdout.write(line)
+
+def mock_restrain_bodies(argv, rng):
+   """
+   restrain_bodies.py file.pdb: print distance restraints between CA atoms of the structure, one 'assign (...) (...) d 0.0 0.0' line each.
+
+   """
+   structure = read_pdb(argv[-1])
+   ca = np.flatnonzero(structure.atomnames == 'CA')
+   picks = np.sort(rng.choice(ca, size=min(len(ca), 20), replace=False))
+   for first, second in zip(picks[:-1:2], picks[1::2]):
+      distance = np.linalg.norm(structure.coords[first] - structure.coords[second])
+      segids = [structure.records[atom][72:76].strip() for atom in (first, second)]
+      print(f"assign (segid {segids[0]} and resi {structure.resids[first]} and name CA) (segid {segids[1]} and resi {structure.resids[second]} and name CA) {distance:.3f} 0.0 0.0")
+
+def mock_molprobity(argv, rng):
+   """
+   molprobity.py file.pdb: print the protonation state of each histidine.
+
+   """
+   structure = read_pdb(argv[-1])
+   print("## Executing Reduce to assign histidine protonation states")
+   print("## Optimized histidine protonation states:")
+   his = (structure.resnames == 'HIS') & (structure.atomnames == 'CA')
+   for chain, resid in zip(structure.chains[his], structure.resids[his]):
+      print(f"{chain} {resid} - {rng.choice(['HISD', 'HISE'])}")
+
+def _read_param(param_file):
+   """
+   Read a Haddock run.param file into a dictionary.
+
+   """
+   with open(param_file) as file:
+      return dict(line.strip().split('=', 1) for line in file if '=' in line)
+
+def mock_haddock(argv, rng):
+   """
+   RunHaddock.py: if run from a directory with a run.param file, set up run1/ (with run.cns); if run from the run directory, 'dock' the two molecules in run.param and write structures/it1/file.list and structures/it1/water/file.list with their structures (best first).
+
+   >>> import tempfile, shutil
+   >>> cwd = os.getcwd()
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _ = shutil.copy('test/test8_ab.pdb', tmp)
+   ...    _ = shutil.copy('test/test8_Dag.pdb', tmp)
+   ...    os.chdir(tmp)
+   ...    with open('run.param', 'w') as file:
+   ...       _ = file.write('N_COMP=2\\nPDB_FILE1=./test8_ab.pdb\\nPDB_FILE2=./test8_Dag.pdb\\nRUN_NUMBER=1\\n')
+   ...    mock_haddock([], np.random.default_rng(0))
+   ...    os.chdir('run1')
+   ...    mock_haddock([], np.random.default_rng(0))
+   ...    os.chdir(tmp)
+   ...    best = open('run1/structures/it1/water/file.list').readline()
+   ...    exists = os.path.exists('run1/structures/it1/water/' + best.split()[0].split(':')[1].split('"')[0])
+   ...    os.chdir(cwd)
+   >>> best.split()[0], exists
+   ('"PREVIT:complex_1w.pdb"', True)
+
+   """
+   if os.path.exists("run.cns"):
+      params = _read_param("run.param")
+      with open("run.cns") as file:
+         structures = [int(value) for value in re.findall(r'structures_1=(\d+)', file.read())]
+      num_structures = structures[-1] if structures else 200
+      # Molecule paths in run.param are relative to the directory the run was set up from
+      molecules = []
+      for key in ("PDB_FILE1", "PDB_FILE2"):
+         path = params[key]
+         if not os.path.isabs(path) and not os.path.exists(path):
+            path = os.path.join("..", path)
+         molecules += [read_pdb(path)]
+      structure = PDBStructure(molecules[0].records + molecules[1].records, np.vstack([molecules[0].coords, molecules[1].coords]))
+      mask = np.arange(len(structure)) >= len(molecules[0])
+      for outdir, suffix in [("structures/it1", ""), ("structures/it1/water", "w")]:
+         os.makedirs(outdir, exist_ok=True)
+         rmsds = np.sort(rng.uniform(0.5, 15.0, num_structures))
+         rotations, translations = random_rigid_perturbations(structure.coords[mask], rmsds, rng)
+         scores = -150 + 8 * rmsds + rng.normal(0, 5, num_structures)
+         order = np.argsort(scores)
+         lines = []
+         for rank, index in enumerate(order, start=1):
+            name = f"complex_{rank}{suffix}.pdb"
+            _write_moved(structure, rotations[index], translations[index], os.path.join(outdir, name), mask)
+            lines += [f'"PREVIT:{name}"  {scores[index]:.5f}']
+         with open(os.path.join(outdir, "file.list"), "w") as file:
+            file.write("\n".join(lines) + "\n")
+   else:
+      params = _read_param("run.param")
+      rundir = f"run{params.get('RUN_NUMBER', '1')}"
+      os.makedirs(rundir, exist_ok=True)
+      with open(os.path.join(rundir, "run.param"), "w") as file:
+         file.writelines(f"{key}={value}\n" for key, value in params.items())
+      with open(os.path.join(rundir, "run.cns"), "w") as file:
+         file.write("{===>} structures_0=1000;\n{===>} structures_1=200;\n{===>} anastruc_1=200;\n")
+
+#*************************************************************************
+
+# Mock implementations, keyed by the tool names used in toolrunner_lib
+MOCKS = {
+   "megadock": mock_megadock,
+   "decoygen": mock_decoygen,
+   "zrank": mock_zrank,
+   "piper_prepare": mock_piper_prepare,
+   "piper": mock_piper,
+   "sblu": mock_sblu,
+   "rosetta_prepack": mock_rosetta_prepack,
+   "rosetta_docking": mock_rosetta_docking,
+   "haddock": mock_haddock,
+   "pdb_chain": mock_pdb_chain,
+   "pdb_seg": mock_pdb_seg,
+   "restrain_bodies": mock_restrain_bodies,
+   "molprobity": mock_molprobity,
+}
+
+#*************************************************************************
+
+def run_mock(tool, argv):
+   """
+   Run the mock of a tool with the given arguments, returning its exit status.
+
+   >>> run_mock('sblu', ['docking', 'minimize'])
+   1
+
+   """
+   rng = _rng()
+   status = simulate_run(tool, rng)
+   if status:
+      return status
+   try:
+      MOCKS[tool](argv, rng)
+   except (IndexError, KeyError, ValueError, OSError) as error:
+      print(f"{tool}: {error}", file=sys.stderr)
+      return 1
+   return 0
+
+#*************************************************************************
+
+def install_mocks(bin_dir, runtime=None, failure_rate=None, busy=False):
+   """
+   Write an executable stub for each mocked tool to bin_dir, plus a dockingtools_config.json pointing toolrunner_lib at them (use it by setting DOCKINGTOOLS_CONFIG). runtime, failure_rate and busy become the defaults for the MOCK_ settings, which can still be overridden from the environment. Returns the config file path.
+
+   >>> import tempfile, subprocess
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    config_file = install_mocks(tmp, failure_rate=1)
+   ...    config = json.load(open(config_file))
+   ...    result = subprocess.run([config['executable']['zrank'], 'megadock.out', '1', '10'], capture_output=True, text=True)
+   >>> result.returncode, result.stderr
+   (1, 'zrank: simulated failure\\n')
+
+   """
+   bin_dir = os.path.abspath(bin_dir)
+   os.makedirs(bin_dir, exist_ok=True)
+   defaults = {"MOCK_RUNTIME": runtime, "MOCK_FAILURE_RATE": failure_rate, "MOCK_BUSY": 1 if busy else None}
+   settings = "".join(f"os.environ.setdefault({key!r}, {str(value)!r})\n" for key, value in defaults.items() if value is not None)
+   executables = {}
+   for tool in MOCKS:
+      stub = os.path.join(bin_dir, tool)
+      with open(stub, "w") as file:
+         file.write(f"#!{sys.executable}\n"
+                    f"# Mock {tool} written by mockbackends.py\n"
+                    "import os, sys\n"
+                    f"sys.path.insert(0, {SCRIPT_DIR!r})\n"
+                    f"{settings}"
+                    "from mockbackends_lib import run_mock\n"
+                    f"sys.exit(run_mock({tool!r}, sys.argv[1:]))\n")
+      os.chmod(stub, 0o755)
+      executables[tool] = stub
+   # Data directories only need to exist for the mocks
+   data_dir = os.path.join(bin_dir, "data")
+   os.makedirs(data_dir, exist_ok=True)
+   config = {"executable": executables, "paths": {"piper_prms": data_dir, "rosetta_database": data_dir, "haddock_dir": data_dir}}
+   config_file = os.path.join(bin_dir, "dockingtools_config.json")
+   with open(config_file, "w") as file:
+      json.dump(config, file, indent=1)
+   return config_file
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Program: nativecache_lib
+File:    nativecache_lib.py
+
+Version:  V1.2
+Date:     19.10.26
+Function:   Library: Share a parsed native complex between evaluation worker processes through shared memory.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+When decoys are evaluated in a process pool, each worker would otherwise parse the native complex and find its interface contacts again. Here the parent parses the native once, finds its interface contacts and CDR residues and places them in one multiprocessing.shared_memory block as NumPy arrays. Only what the workers compare a decoy with is shared: the atoms of the native are not needed once its contacts are known. Workers are given only the small layout of the block, attach to it and use the arrays in place (no copy), so memory use does not grow with the number of workers and the work per task is only that of the decoy itself.
+
+evaluate_decoys() uses this to evaluate a decoy set (a decoy archive or a directory of decoy.N.pdb files, see decoyarchive_lib.py) against a native in parallel, giving the same report lines as evaluate_interface.py.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   Only the contacts and CDRs shared, the atom arrays being unused by the workers   By: OECH
+V1.2   19.10.26   CDR reference taken from the per-process cache (contacts_lib.cdr_reference)   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import numpy as np
+from multiprocessing import Pool, shared_memory
+from pdbstructure_lib import read_pdb
+from dockingtools_lib import getantigenchainid
+from contacts_lib import AB_CHAINS, InterfaceContacts, interface_contacts, pairs_from_arrays, residue_numbering, compare_interfaces, interface_report, cdr_reference, cdr_residues
+from decoyarchive_lib import open_decoys, DecoyArchive
+
+#*************************************************************************
+
+# Byte alignment of each array in a shared block
+ALIGNMENT = 64
+
+#*************************************************************************
+
+def share_arrays(arrays):
+   """
+   Copy a dictionary of NumPy arrays into a new shared memory block. Returns the block and its layout (block name plus the name, dtype, shape and offset of each array), which is all a process needs to attach with attach_arrays.
+
+   >>> shm, layout = share_arrays({'coords': np.arange(6.0).reshape(2, 3), 'labels': np.array(['H1', 'L22A'])})
+   >>> shm2, arrays = attach_arrays(layout)
+   >>> arrays['coords'].tolist(), arrays['labels'].tolist()
+   ([[0.0, 1.0, 2.0], [3.0, 4.0, 5.0]], ['H1', 'L22A'])
+   >>> del arrays; shm2.close(); shm.close(); shm.unlink()
+
+   """
+   fields = []
+   offset = 0
+   for name, array in arrays.items():
+      array = np.ascontiguousarray(array)
+      fields += [(name, array.dtype.str, array.shape, offset)]
+      offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+   shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+   for (name, dtype, shape, start), array in zip(fields, arrays.values()):
+      np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)[...] = array
+   return shm, {"name": shm.name, "fields": fields}
+
+def attach_arrays(layout):
+   """
+   Attach to a shared memory block made by share_arrays, returning the block and a dictionary of read-only array views onto it. The block must be kept open while the arrays are used.
+
+   """
+   shm = shared_memory.SharedMemory(name=layout["name"])
+   arrays = {}
+   for name, dtype, shape, offset in layout["fields"]:
+      array = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+      array.flags.writeable = False
+      arrays[name] = array
+   return shm, arrays
+
+#*************************************************************************
+
+class NativeData:
+   """
+   The interface contacts and CDR residues of a native complex, attached from shared memory.
+
+   """
+   def __init__(self, shm, arrays, info):
+      self._shm = shm
+      self.arrays = arrays
+      self.name = info["name"]
+      self.agchainid = info["agchainid"]
+      self.cutoff = info["cutoff"]
+      # The contacts are rebuilt as a dictionary once per process
+      self.contacts = InterfaceContacts(dict(zip(arrays["res_pairs"].tolist(), arrays["res_pair_contacts"].tolist())), arrays["ab_residues"].tolist(), arrays["ag_residues"].tolist())
+      self.cdr_residues = arrays["cdr_residues"].tolist() if info["has_cdrs"] else None
+
+   def close(self):
+      self.arrays = None
+      self._shm.close()
+
+#*************************************************************************
+
+class SharedNative:
+   """
+   The shared memory copy of a native complex, made by the parent process. Use as a context manager so the block is removed when finished; pass .descriptor to the workers, which call attach_native with it.
+
+   >>> with SharedNative('test/test8_OG.pdb', reference_data={}) as shared:
+   ...    native = attach_native(shared.descriptor)
+   ...    native.agchainid, len(native.contacts.res_pairs), len(native.contacts.ab_residues), native.cdr_residues
+   ...    native.close()
+   ('Y', 37, 19, None)
+
+   """
+   def __init__(self, OG_file, cutoff=4.0, reference_data=None):
+      if reference_data is None:
+         reference_data = cdr_reference()
+      structure = read_pdb(OG_file)
+      agchainid = getantigenchainid(OG_file)
+      contacts = interface_contacts(structure, agchainid, cutoff)
+      cdrs = cdr_residues(OG_file, reference_data)
+      arrays = {"res_pairs": np.array(list(contacts.res_pairs), dtype=str),
+                "res_pair_contacts": np.array(list(contacts.res_pairs.values()), dtype=np.int32),
+                "ab_residues": np.array(contacts.ab_residues, dtype=str),
+                "ag_residues": np.array(contacts.ag_residues, dtype=str),
+                "cdr_residues": np.array(cdrs or [], dtype=str)}
+      self.shm, layout = share_arrays(arrays)
+      self.descriptor = {"layout": layout, "info": {"name": OG_file, "agchainid": agchainid, "cutoff": cutoff, "has_cdrs": cdrs is not None}}
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, *exc):
+      self.close()
+
+   def close(self):
+      if self.shm is not None:
+         self.shm.close()
+         self.shm.unlink()
+         self.shm = None
+
+def attach_native(descriptor):
+   """
+   Attach to a native complex shared by SharedNative, returning a NativeData.
+
+   """
+   shm, arrays = attach_arrays(descriptor["layout"])
+   return NativeData(shm, arrays, descriptor["info"])
+
+#*************************************************************************
+
+# Per worker state, set up once by _init_worker
+_worker = {}
+
+def _init_worker(descriptor, decoy_path):
+   """
+   Attach a worker to the shared native and open the decoy set. For an archive the decoy topology (masks and residue numbering) is also worked out once here.
+
+   """
+   native = attach_native(descriptor)
+   decoys = open_decoys(decoy_path)
+   _worker["native"] = native
+   _worker["decoys"] = decoys
+   if isinstance(decoys, DecoyArchive):
+      topology = decoys.topology
+      _worker["topology"] = (topology.chain_mask(AB_CHAINS), topology.chain_mask(native.agchainid), residue_numbering(topology.residue_labels()))
+
+def _evaluate_decoy(i):
+   """
+   Evaluate decoy i against the shared native, returning (decoy name, report lines).
+
+   """
+   native = _worker["native"]
+   decoys = _worker["decoys"]
+   if "topology" in _worker:
+      ab_mask, ag_mask, numbering = _worker["topology"]
+      docked = pairs_from_arrays(decoys.coords(i), ab_mask, ag_mask, numbering, native.cutoff).contacts(native.cutoff)
+   else:
+      docked = interface_contacts(decoys.structure(i), native.agchainid, native.cutoff)
+   return decoys.names[i], interface_report(compare_interfaces(native.contacts, docked, native.cdr_residues))
+
+#*************************************************************************
+
+def evaluate_decoys(OG_file, decoy_path, workers=4, cutoff=4.0, chunksize=16):
+   """
+   Evaluate every decoy in decoy_path (archive or directory) against OG_file in a pool of worker processes sharing one parsed copy of the native. Returns {decoy name: evaluate_interface.py report lines}, in decoy order.
+
+   >>> import tempfile
+   >>> from generate_decoys_lib import write_decoy_archive
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    archive = write_decoy_archive('test/test8_OG.pdb', [0.0, 1.0, 30.0], tmp + '/decoys', seed=2)
+   ...    results = evaluate_decoys('test/test8_OG.pdb', archive, workers=2)
+   >>> list(results), results['decoy.1'][2], results['decoy.3'][2]
+   (['decoy.1', 'decoy.2', 'decoy.3'], 'Correctly predicted residue pairs:       1.0', 'Correctly predicted residue pairs:       0.0')
+
+   """
+   num_decoys = len(open_decoys(decoy_path))
+   with SharedNative(OG_file, cutoff) as shared:
+      with Pool(workers, initializer=_init_worker, initargs=(shared.descriptor, decoy_path)) as pool:
+         results = dict(pool.imap(_evaluate_decoy, range(num_decoys), chunksize=chunksize))
+   return results
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Program: orchestrate
+File:    orchestrate.py
+
+Version:  V1.2
+Date:     19.10.26
+Function: Dock many antibody-antigen complexes with each docking method from one process, keeping the node's cores busy without oversubscribing them.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+This program runs the testdockingprogs_master_v2.py pipeline (strip hydrogens, split into antibody and antigen, dock with each method) for every input complex at once. Each complex is stripped and split once, and only the antigen is moved for each of its runs (--runs), from a random seed that is recorded in OUTPath/<complex>/replicates.tsv and can be given with --seed to repeat a run exactly. All tools are run as asyncio subprocesses from this one process (see orchestrator_lib.py); the number running at once is limited by the cores and memory given (--cpus and --memory, default those of the machine) and the cores and memory reserved by each method (its resource profile, see resources_lib.py), and by any per-tool concurrency limits in the toolrunner configuration. Each method is told to use only its reserved cores through OMP_NUM_THREADS and the like. The output of every tool is logged as JSON records (one per line) to OUTPath/orchestrator_log.jsonl, or the file given with --log. A summary of the result of each method for each complex is printed at the end.
+
+--------------------------------------------------------------------------
+
+Usage:
+======
+orchestrate.py OUTPath PDBfile [PDBfile ...] [--methods method ...] [--runs N] [--seed N] [--cpus N] [--memory GB] [--log file] [--evaluate]
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   --memory budget; reservations from the method resource profiles   By: OECH
+V1.2   19.10.26   Each complex split once for all runs; --seed   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import argparse
+from orchestrator_lib import METHODS, run_complexes
+
+#*************************************************************************
+
+# Define inputs
+parser = argparse.ArgumentParser(description="Dock antibody-antigen complexes with each docking method from one asyncio process.")
+parser.add_argument("OUTPath", help="Output directory (results in OUTPath/<complex>/run<i>/)")
+parser.add_argument("PDBfiles", nargs="+", help="PDB files of the complexes")
+parser.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS), help="Docking methods to run (default: all)")
+parser.add_argument("--runs", type=int, default=1, help="Number of docking runs of each complex (default: 1)")
+parser.add_argument("--seed", type=int, help="Random seed of the antigen orientations of the runs (default: random)")
+parser.add_argument("--cpus", type=int, help="Number of cores to use (default: all)")
+parser.add_argument("--memory", type=float, help="Memory (GB) to use (default: all)")
+parser.add_argument("--log", help="JSON log file (default: OUTPath/orchestrator_log.jsonl)")
+parser.add_argument("--evaluate", action="store_true", help="Evaluate the interface of each result with evaluate_interface.py")
+args = parser.parse_args()
+
+#*************************************************************************
+
+# Dock every complex
+os.makedirs(args.OUTPath, exist_ok=True)
+log_file = args.log or os.path.join(args.OUTPath, "orchestrator_log.jsonl")
+outcomes = run_complexes(args.PDBfiles, args.OUTPath, args.methods, args.runs, args.cpus, log_file, args.evaluate, args.memory, args.seed)
+
+#*************************************************************************
+
+# Print summary
+for name, runs in outcomes.items():
+   if not runs:
+      print(f"{name}: skipped (not a single antigen chain)")
+      continue
+   for run, methods in runs.items():
+      for method, (returncode, resultfiles) in methods.items():
+         status = "ok" if returncode == 0 and resultfiles else f"failed (exit status {returncode})"
+         print(f"{name}\trun{run}\t{method}\t{status}")
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Program: orchestrator_lib
+File:    orchestrator_lib.py
+
+Version:  V1.5
+Date:     19.10.26
+Function:   Library: Run the docking and evaluation tools for many complexes at once from a single asyncio process.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+The testdockingprogs_master scripts run one tool at a time and wait for each to finish. Here every tool is started with asyncio.create_subprocess_exec (no shell, arguments built by toolrunner_lib) from one event loop, so hundreds of jobs can be waiting or running at once at the cost of a coroutine each rather than a thread or process.
+
+The number of jobs actually running is bounded in two ways:
+  - each tool or script may have a concurrency limit ('concurrency' section of the toolrunner configuration), enforced with one asyncio semaphore per tool;
+  - each run reserves a number of CPU cores and an amount of memory from those given to the Orchestrator, and only starts once they are free. The docking methods reserve the threads and memory of their resource profiles (see resources_lib.py), the memory scaled by the size of the complex; other tools reserve one core (or as set in the 'cpus' section of the toolrunner configuration). Waiting runs are started as soon as they fit, so small jobs fill the cores left by large ones and the node is kept busy without being oversubscribed. This is not first come first served: a large run waiting for cores can be overtaken by smaller runs queued after it for as long as they keep coming, so it may only start once most of the smaller runs have finished.
+Every run is told how many threads it may use through OMP_NUM_THREADS and the other thread count variables, set to its core reservation. Python functions (such as the interface evaluation of a result) can be run the same way in a worker thread with call(), within the same limits, rather than in a new interpreter.
+The standard output and error of every job are read line by line as they are written and recorded, together with start and exit events, in a log of JSON records (one per line) naming the job, tool and stream.
+
+dock_complex() runs the testdockingprogs_master_v2.py pipeline for one complex (hydrogen stripping, splitting into antibody and antigen, then each docking method, and optionally interface evaluation of each result). The complex is stripped and split once and only the antigen is moved for each run (see replicates_lib.py); the runs, and the methods of each run, are then docked concurrently. Each method runs in its own working directory, as the docking programs write fixed file names (megadock.out, ft.000.00, ...) to the current directory. run_complexes() docks a whole list of complexes this way. An error in the docking of one complex or method (a failed preparation, a missing file, ...) is logged and reported as a failed outcome (exit status 1 unless the failing tool gave one) and the others carry on.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   Cores, memory and thread counts from the method resource profiles (resources_lib)   By: OECH
+V1.2   19.10.26   Complex split once for all runs, only the antigen moved for each (replicates_lib)   By: OECH
+V1.3   19.10.26   Interface evaluation run in-process (Orchestrator.call) rather than as a script   By: OECH
+V1.4   19.10.26   Output read in blocks (no line length limit); runs killed on any error; replicate preparation reserves a core   By: OECH
+V1.5   19.10.26   Any failure of a complex or method reported as a failed outcome; public reserved() context manager; queueing order documented   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import json
+import time
+import shutil
+import codecs
+import asyncio
+import subprocess
+from contextlib import asynccontextmanager
+from toolrunner_lib import load_config, tool_argv, script_argv
+from dockingtools_lib import getantigenchainid
+from resources_lib import profile_for, run_memory, thread_env, node_memory, count_atoms
+from replicates_lib import prepare_replicates
+from evaluate_interface import interface_lines
+
+# Docking methods run by dock_complex
+METHODS = ("megadock", "piper", "rosetta", "haddock")
+
+# Bytes read from a job's output at a time
+READ_SIZE = 65536
+
+#*************************************************************************
+
+class Orchestrator:
+   """
+   Runs external tools as asyncio subprocesses within per-tool concurrency limits and a budget of CPU cores and memory (GB, by default that of the machine), logging their output as JSON records.
+
+   >>> import sys, tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    orchestrator = Orchestrator(cpus=2, log_file=tmp + '/log.jsonl')
+   ...    result = asyncio.run(orchestrator.run(sys.executable, [sys.executable, '-c', 'print("docked")'], job='test'))
+   ...    orchestrator.close()
+   ...    records = [json.loads(line) for line in open(tmp + '/log.jsonl')]
+   >>> result.returncode, result.stdout
+   (0, 'docked\\n')
+   >>> [(record['event'], record.get('line')) for record in records]
+   [('start', None), ('output', 'docked'), ('exit', None)]
+
+   """
+   def __init__(self, cpus=None, log_file=None, memory=None):
+      self.config = load_config()
+      self.cpus = cpus or os.cpu_count() or 1
+      self.free_cpus = self.cpus
+      self.memory = memory or node_memory()
+      self.free_memory = self.memory
+      self._log = open(log_file, "a") if log_file else None
+      self._semaphores = {}
+      self._cpu_condition = None
+
+   def close(self):
+      if self._log is not None:
+         self._log.close()
+         self._log = None
+
+   def log(self, **record):
+      """
+      Write one JSON record to the log.
+
+      """
+      if self._log is not None:
+         self._log.write(json.dumps({"time": round(time.time(), 3), **record}) + "\n")
+         self._log.flush()
+
+   def reservation(self, name):
+      """
+      Return the number of cores reserved for a run of a tool or script (never more than the cores available).
+
+      >>> Orchestrator(cpus=2).reservation('runpiper.py'), Orchestrator(cpus=8).reservation('runpiper.py'), Orchestrator(cpus=8).reservation('pdbhstrip')
+      (2, 4, 1)
+
+      """
+      profile = profile_for(name)
+      cpus = self.config["cpus"].get(name, profile.threads if profile else 1)
+      return max(1, min(int(cpus), self.cpus))
+
+   def _semaphore(self, name):
+      limit = self.config["concurrency"].get(name)
+      if not limit:
+         return None
+      if name not in self._semaphores:
+         self._semaphores[name] = asyncio.Semaphore(int(limit))
+      return self._semaphores[name]
+
+   @asynccontextmanager
+   async def reserved(self, cpus, memory=0.0):
+      """
+      Reserve cpus cores and memory GB for the body of an async with block, waiting until they are free (a run that fits is started even if larger runs are waiting).
+
+      >>> orchestrator = Orchestrator(cpus=2)
+      >>> async def reserve():
+      ...    async with orchestrator.reserved(1):
+      ...       return orchestrator.free_cpus
+      >>> asyncio.run(reserve()), orchestrator.free_cpus
+      (1, 2)
+
+      """
+      if self._cpu_condition is None:
+         self._cpu_condition = asyncio.Condition()
+      async with self._cpu_condition:
+         await self._cpu_condition.wait_for(lambda: self.free_cpus >= cpus and self.free_memory >= memory)
+         self.free_cpus -= cpus
+         self.free_memory -= memory
+      try:
+         yield
+      finally:
+         async with self._cpu_condition:
+            self.free_cpus += cpus
+            self.free_memory += memory
+            self._cpu_condition.notify_all()
+
+   async def _read(self, stream, label, job, name, chunks, handle=None):
+      """
+      Read a job's output stream in blocks, logging each line (or writing the output to handle, for redirected output) and keeping it in chunks. Lines may be of any length.
+
+      >>> async def read(data):
+      ...    stream = asyncio.StreamReader()
+      ...    stream.feed_data(data)
+      ...    stream.feed_eof()
+      ...    chunks = []
+      ...    await Orchestrator()._read(stream, 'stdout', 'test', 'tool', chunks)
+      ...    return chunks
+      >>> [len(line) for line in asyncio.run(read(b'x' * 200000 + b'\\nlast'))]
+      [200001, 4]
+
+      """
+      decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+      partial = ""
+      while True:
+         block = await stream.read(READ_SIZE)
+         text = decoder.decode(block, final=not block)
+         if handle is not None:
+            handle.write(text)
+         else:
+            lines = (partial + text).split("\n")
+            partial = lines.pop()
+            chunks += [line + "\n" for line in lines]
+            if not block and partial:
+               # Last line, without a newline
+               chunks += [partial]
+               lines += [partial]
+            for line in lines:
+               self.log(event="output", job=job, tool=name, stream=label, line=line)
+         if not block:
+            return
+
+   async def run(self, name, argv, job="", cwd=None, env=None, stdout=None, cpus=None, memory=0.0):
+      """
+      Run argv once the concurrency limit of name (the tool or script) allows and its reservation of cores (by default as given by self.reservation) and memory (GB) is free. The run's thread count variables are set to its cores, on top of env (by default this process's environment). stdout may be a filename to write the output to rather than log it. Returns a subprocess.CompletedProcess with the captured output (exit status 127 if the program is not found).
+
+      """
+      cpus = min(cpus or self.reservation(name), self.cpus)
+      # A run needing more memory than the node has is run alone rather than never
+      memory = min(memory, self.memory)
+      env = thread_env(cpus, profile_for(name), env)
+      semaphore = self._semaphore(name)
+      timeout = self.config["timeout"].get(name)
+      if semaphore is not None:
+         await semaphore.acquire()
+      try:
+         async with self.reserved(cpus, memory):
+            start = time.perf_counter()
+            self.log(event="start", job=job, tool=name, cpus=cpus, memory=round(memory, 2), argv=[str(arg) for arg in argv])
+            try:
+               process = await asyncio.create_subprocess_exec(*[str(arg) for arg in argv], stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd, env=env)
+            except FileNotFoundError:
+               message = f"{argv[0]}: command not found"
+               self.log(event="exit", job=job, tool=name, returncode=127, elapsed=0.0, error=message)
+               return subprocess.CompletedProcess(argv, 127, "", message + "\n")
+            out_chunks, err_chunks = [], []
+            handle = open(stdout, "w") if stdout else None
+            try:
+               communicate = asyncio.gather(self._read(process.stdout, "stdout", job, name, out_chunks, handle), self._read(process.stderr, "stderr", job, name, err_chunks), process.wait())
+               try:
+                  await asyncio.wait_for(communicate, timeout)
+               except BaseException as error:
+                  # Timed out, cancelled or failed: leave nothing running
+                  if process.returncode is None:
+                     try:
+                        process.kill()
+                     except ProcessLookupError:
+                        pass
+                  await process.wait()
+                  if not isinstance(error, asyncio.TimeoutError):
+                     raise
+                  self.log(event="timeout", job=job, tool=name, timeout=timeout)
+            finally:
+               if handle is not None:
+                  handle.close()
+            self.log(event="exit", job=job, tool=name, returncode=process.returncode, elapsed=round(time.perf_counter() - start, 3))
+            return subprocess.CompletedProcess(argv, process.returncode, "".join(out_chunks), "".join(err_chunks))
+      finally:
+         if semaphore is not None:
+            semaphore.release()
+
+   async def call(self, name, function, *args, job="", cpus=1):
+      """
+      Call function(*args) in a worker thread once the concurrency limit of name and a reservation of cpus cores are free, logging its start and exit as for run. Returns the function's result, or None if it raised an exception (logged with exit status 1).
+
+      >>> orchestrator = Orchestrator(cpus=1)
+      >>> asyncio.run(orchestrator.call('sum', sum, [1, 2])), asyncio.run(orchestrator.call('int', int, 'x'))
+      (3, None)
+
+      """
+      cpus = min(cpus, self.cpus)
+      semaphore = self._semaphore(name)
+      if semaphore is not None:
+         await semaphore.acquire()
+      try:
+         async with self.reserved(cpus, 0.0):
+            start = time.perf_counter()
+            self.log(event="start", job=job, tool=name, cpus=cpus, memory=0.0, argv=[str(arg) for arg in args])
+            try:
+               result = await asyncio.to_thread(function, *args)
+            except Exception as error:
+               self.log(event="exit", job=job, tool=name, returncode=1, elapsed=round(time.perf_counter() - start, 3), error=f"{type(error).__name__}: {error}")
+               return None
+            self.log(event="exit", job=job, tool=name, returncode=0, elapsed=round(time.perf_counter() - start, 3))
+            return result
+      finally:
+         if semaphore is not None:
+            semaphore.release()
+
+   async def run_tool(self, tool, args=(), **options):
+      """
+      Run an external tool (as toolrunner_lib.run_tool) through the orchestrator.
+
+      """
+      return await self.run(tool, tool_argv(tool, args), **options)
+
+   async def run_script(self, script, args=(), **options):
+      """
+      Run one of the ab-docking-scripts (as toolrunner_lib.run_script) through the orchestrator.
+
+      """
+      return await self.run(script, script_argv(script, args), **options)
+
+#*************************************************************************
+
+def method_job(method, PDBfile, input_nohydrogens, inputfilename, ab_filename, ag_filename, OUTPath_i):
+   """
+   Return the script, arguments, working directory and result files of a docking method for one run, as in testdockingprogs_master_lib_v2.py.
+
+   >>> method_job('piper', 'in.pdb', 'out/run0/in_nohydrogens.pdb', 'in', 'out/run0/ab.pdb', 'out/run0/ag.pdb', 'out/run0/')
+   ('runpiper.py', ['out/run0/in_nohydrogens.pdb', 'out/run0/ab.pdb', 'out/run0/ag.pdb', 'out/run0/'], 'out/run0/piper/', ['out/run0/in_nohydrogens_Piper_result.pdb'])
+
+   """
+   if method == "megadock":
+      return "runmegadockranked.py", [ab_filename, ag_filename, OUTPath_i], f"{OUTPath_i}megadock/", [f"{OUTPath_i}{inputfilename}_MegadockRanked_result.pdb"]
+   if method == "piper":
+      return "runpiper.py", [input_nohydrogens, ab_filename, ag_filename, OUTPath_i], f"{OUTPath_i}piper/", [f"{OUTPath_i}{inputfilename}_nohydrogens_Piper_result.pdb"]
+   if method == "rosetta":
+      return "runrosetta.py", [PDBfile, ab_filename, ag_filename, 50, OUTPath_i], f"{OUTPath_i}rosetta/", [f"{OUTPath_i}{inputfilename}_Rosetta_result.pdb"]
+   if method == "haddock":
+      haddock_out = f"{OUTPath_i}haddock_out/"
+      return "runhaddock.py", [ab_filename, ag_filename, "short", haddock_out], haddock_out, [f"{haddock_out}{inputfilename}_nohydrogens_Haddock_waters_result.pdb_split_labelled.pdb", f"{haddock_out}{inputfilename}_nohydrogens_Haddock_nowaters_result.pdb_split_labelled.pdb"]
+   raise ValueError(f"Unknown docking method: {method}")
+
+def write_interface(PDBfile, resultfile):
+   """
+   Write the interface evaluation of a result (as printed by evaluate_interface.py) to <result>_interface.txt. Returns the filename.
+
+   """
+   outfile = resultfile.rsplit('.pdb', 1)[0] + "_interface.txt"
+   with open(outfile, "w") as file:
+      file.write("".join(line + "\n" for line in interface_lines(PDBfile, resultfile)))
+   return outfile
+
+#*************************************************************************
+
+async def _dock_method(orchestrator, method, PDBfile, input_nohydrogens, inputfilename, ab_filename, ag_filename, OUTPath_i, job, evaluate):
+   """
+   Run one docking method for one run of a complex (then evaluate its results if asked). Returns (return code, result files found).
+
+   """
+   script, args, workdir, resultfiles = method_job(method, PDBfile, input_nohydrogens, inputfilename, ab_filename, ag_filename, OUTPath_i)
+   os.makedirs(workdir, exist_ok=True)
+   if method == "haddock":
+      # Haddock reads its inputs from its run directory
+      for inputfile in [PDBfile, ab_filename, ag_filename]:
+         shutil.copy(inputfile, workdir)
+   profile = profile_for(method)
+   atoms = count_atoms(PDBfile)
+   result = await orchestrator.run_script(script, args, job=f"{job}/{method}", cwd=workdir, cpus=orchestrator.reservation(method), memory=run_memory(profile, atoms))
+   found = [resultfile for resultfile in resultfiles if os.path.isfile(resultfile)]
+   if evaluate:
+      await asyncio.gather(*[orchestrator.call("evaluate_interface.py", write_interface, PDBfile, resultfile, job=f"{job}/{method}/evaluate") for resultfile in found])
+   return result.returncode, found
+
+def _outcome(orchestrator, job, outcome):
+   """
+   Return the outcome of a method run, or a failed outcome (exit status 1) if it raised an exception, which is logged.
+
+   >>> _outcome(Orchestrator(), 'test/run0/piper', (0, ['result.pdb'])), _outcome(Orchestrator(), 'test/run0/piper', OSError('disk full'))
+   ((0, ['result.pdb']), (1, []))
+
+   """
+   if not isinstance(outcome, Exception):
+      return outcome
+   orchestrator.log(event="error", job=job, error=f"{type(outcome).__name__}: {outcome}")
+   return 1, []
+
+async def _dock_run(orchestrator, PDBfile, run, run_inputs, methods, evaluate):
+   """
+   Dock one run of a complex, given its prepared input, with each method concurrently. Returns {method: (return code, result files)}.
+
+   """
+   inputfilename = os.path.basename(PDBfile).split('.')[0]
+   input_nohydrogens, ab_filename, ag_filename, OUTPath_i = run_inputs
+   job = f"{inputfilename}/run{run}"
+   outcomes = await asyncio.gather(*[_dock_method(orchestrator, method, PDBfile, input_nohydrogens, inputfilename, ab_filename, ag_filename, OUTPath_i, job, evaluate) for method in methods], return_exceptions=True)
+   for method, outcome in zip(methods, outcomes):
+      if isinstance(outcome, BaseException) and not isinstance(outcome, Exception):
+         raise outcome
+   return {method: _outcome(orchestrator, f"{job}/{method}", outcome) for method, outcome in zip(methods, outcomes)}
+
+async def dock_complex(orchestrator, PDBfile, OUTPath, methods=METHODS, runs=1, evaluate=False, seed=None):
+   """
+   Dock one complex with each method (runs times, in OUTPath/run0, run1, ...), all runs and methods concurrently within the orchestrator's limits. The antigen orientations of the runs are drawn from seed (random if None). Returns {run number: {method: (return code, result files)}}, empty if the complex does not have exactly one antigen chain.
+
+   """
+   PDBfile = os.path.abspath(PDBfile)
+   agchainid = getantigenchainid(PDBfile)
+   if agchainid in ("Multiple chains", "No chains"):
+      orchestrator.log(event="skip", job=os.path.basename(PDBfile).split('.')[0], reason=agchainid)
+      return {}
+   job = os.path.basename(PDBfile).split('.')[0]
+   # Strip and split the complex once and move the antigen for each run
+   orchestrator.log(event="prepare", job=job, runs=runs, seed=seed)
+   # The preparation runs BiopTools, so it takes a core from the orchestrator like any other run
+   try:
+      async with orchestrator.reserved(1):
+         replicate_inputs = await asyncio.to_thread(prepare_replicates, PDBfile, os.path.abspath(OUTPath), runs, seed)
+   except Exception as error:
+      returncode = error.returncode if isinstance(error, subprocess.CalledProcessError) else 1
+      orchestrator.log(event="prepare failed", job=job, returncode=returncode, error=f"{type(error).__name__}: {error}", stderr=getattr(error, "stderr", None))
+      return {run: {method: (returncode, []) for method in methods} for run in range(runs)}
+   outcomes = await asyncio.gather(*[_dock_run(orchestrator, PDBfile, run, run_inputs, methods, evaluate) for run, run_inputs in enumerate(replicate_inputs)])
+   return dict(enumerate(outcomes))
+
+#*************************************************************************
+
+def run_complexes(PDBfiles, OUTPath, methods=METHODS, runs=1, cpus=None, log_file=None, evaluate=False, memory=None, seed=None):
+   """
+   Dock every complex in PDBfiles (results in OUTPath/<complex>/run<i>/) from one event loop, sharing the cores and memory between all of them. Returns {complex name: dock_complex result}; a complex that could not be docked at all (e.g. a missing file) has every method of every run failed with exit status 1.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    run_complexes(['/nonexistent/1abc.pdb'], tmp, methods=['piper'], runs=2, cpus=1)
+   {'1abc': {0: {'piper': (1, [])}, 1: {'piper': (1, [])}}}
+
+   """
+   async def main():
+      orchestrator = Orchestrator(cpus, log_file, memory)
+      try:
+         names = [os.path.basename(PDBfile).split('.')[0] for PDBfile in PDBfiles]
+         outcomes = await asyncio.gather(*[dock_complex(orchestrator, PDBfile, os.path.join(OUTPath, name), methods, runs, evaluate, seed) for PDBfile, name in zip(PDBfiles, names)], return_exceptions=True)
+         results = {}
+         for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, BaseException) and not isinstance(outcome, Exception):
+               raise outcome
+            if isinstance(outcome, Exception):
+               returncode, resultfiles = _outcome(orchestrator, name, outcome)
+               outcome = {run: {method: (returncode, resultfiles) for method in methods} for run in range(runs)}
+            results[name] = outcome
+         return results
+      finally:
+         orchestrator.close()
+   return asyncio.run(main())
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Program: pdbstructure_lib
+File:    pdbstructure_lib.py
+
+Version:  V1.0
+Date:     19.10.26
+Function:   Library: Read, manipulate and write the coordinate records of PDB files in-process.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+This library parses the ATOM/HETATM records of a PDB file once and holds the coordinates as a NumPy array alongside per-atom chain, residue and atom name arrays. Structures can be subset by chain and written back out with new coordinates, so rigid body moves and atom selections can be done without calling out to BiopTools for every step.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import numpy as np
+
+#*************************************************************************
+
+class PDBStructure:
+   """
+   Atom records of a PDB file. The original record lines are kept so that output files are written with every column other than the coordinates unchanged.
+
+   """
+   def __init__(self, records, coords):
+      # Original ATOM/HETATM lines (without newline)
+      self.records = list(records)
+      # (atoms, 3) coordinate array
+      self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+      # Per-atom identifiers taken from the fixed PDB columns
+      self.atomnames = np.array([line[12:16].strip() for line in self.records])
+      self.resnames = np.array([line[17:20].strip() for line in self.records])
+      self.chains = np.array([line[21:22] for line in self.records])
+      self.resids = np.array([f"{line[22:26].strip()}{line[26:27].strip()}" for line in self.records])
+      self.elements = np.array([_element(line) for line in self.records])
+
+   def __len__(self):
+      return len(self.records)
+
+   def residue_labels(self):
+      """
+      Return the chain + residue number label of each atom (e.g. 'H52A'), in the same form as used by evaluate_interface.py and nr1797_cdr_identifiers.json.
+
+      """
+      return np.char.add(self.chains.astype(str), self.resids.astype(str))
+
+   def atom_keys(self):
+      """
+      Return a key for each atom (chain, residue number, atom name) used to match atoms between two structures of the same complex.
+
+      """
+      return [f"{c}:{r}:{a}" for c, r, a in zip(self.chains, self.resids, self.atomnames)]
+
+   def select(self, mask):
+      """
+      Return a new PDBStructure containing only the atoms where mask is True.
+
+      """
+      mask = np.asarray(mask, dtype=bool)
+      records = [line for line, keep in zip(self.records, mask) if keep]
+      return PDBStructure(records, self.coords[mask])
+
+   def chain_mask(self, chainids):
+      """
+      Return a boolean mask of the atoms belonging to any of the chains in chainids.
+
+      """
+      return np.isin(self.chains, list(chainids))
+
+   def heavy_mask(self):
+      """
+      Return a boolean mask of the non-hydrogen atoms.
+
+      """
+      return self.elements != 'H'
+
+#*************************************************************************
+
+def _element(line):
+   """
+   Get the element of an atom record, falling back to the first letter of the atom name when the element columns are empty.
+
+   """
+   element = line[76:78].strip()
+   if not element:
+      element = line[12:16].strip().lstrip('0123456789')[:1]
+   return element.upper()
+
+#*************************************************************************
+
+def read_pdb(PDBfile):
+   """
+   Read the ATOM/HETATM records of a PDB file into a PDBStructure.
+
+   >>> structure = read_pdb('test/test8_OG.pdb')
+   >>> len(structure)
+   2710
+   >>> sorted(set(structure.chains.tolist()))
+   ['H', 'L', 'Y']
+   >>> str(structure.residue_labels()[0]), structure.coords[0].tolist()
+   ('L1', [17.203, -13.024, 34.883])
+
+   """
+   records = []
+   coords = []
+   with open(PDBfile) as file:
+      for line in file:
+         if line.startswith(('ATOM  ', 'HETATM')):
+            line = line.rstrip('\n')
+            records += [line]
+            coords += [(float(line[30:38]), float(line[38:46]), float(line[46:54]))]
+   return PDBStructure(records, np.array(coords, dtype=np.float64).reshape(-1, 3))
+
+#*************************************************************************
+
+def format_pdb(structure, coords=None):
+   """
+   Return the atom records of a structure as PDB text, optionally replacing the coordinates with coords. Chains are separated by TER records and the text ends with END.
+
+   >>> structure = read_pdb('test/test8_OG.pdb')
+   >>> text = format_pdb(structure, structure.coords + 1.0)
+   >>> text.splitlines()[0]
+   'ATOM      9  N   ASP L   1      18.203 -12.024  35.883  1.00 38.78           N  '
+   >>> text.splitlines()[-1]
+   'END'
+
+   """
+   if coords is None:
+      coords = structure.coords
+   lines = []
+   previous_chain = None
+   for line, chain, xyz in zip(structure.records, structure.chains, coords):
+      if previous_chain is not None and chain != previous_chain:
+         lines += ["TER   "]
+      previous_chain = chain
+      lines += [f"{line[:30]}{xyz[0]:8.3f}{xyz[1]:8.3f}{xyz[2]:8.3f}{line[54:]}"]
+   lines += ["TER   ", "END"]
+   return "\n".join(lines) + "\n"
+
+#*************************************************************************
+
+def write_pdb(structure, PDBfile, coords=None):
+   """
+   Write the atom records of a structure to a PDB file, optionally with new coordinates.
+
+   """
+   with open(PDBfile, "w") as file:
+      file.write(format_pdb(structure, coords))
+   return PDBfile
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Program: pdbtransform_lib
+File:    pdbtransform_lib.py
+
+Version:  V1.1
+Date:     19.10.26
+Function:   Library: Edit PDB files in-process with a pipeline of transform stages (in place of pdbhstrip, pdbgetchain, pdbchain, pdbrenum, pdb_chain.py and pdb_seg.py).
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+Cleaning a docking input or result used to mean piping it through several programs (e.g. pdb_chain.py | pdb_seg.py | pdbrenum), each starting a process and parsing the whole file again. Here the file is read once into a PDBRecords object (the header lines and the ATOM/HETATM records), passed through a list of stages, and written once. Each stage is a function taking and returning PDBRecords, made by one of:
+   strip_hydrogens()       remove hydrogen atoms                              (pdbhstrip)
+   select_chains(chains)   keep only the given chains                         (pdbgetchain)
+   set_chain(chain)        set the chain label of every atom (default blank)  (pdb_chain.py)
+   set_segid(segid)        set the segment ID of every atom (default blank)   (pdb_seg.py)
+   split_chains()          split chains at chain breaks, labelling A, B, ...  (pdbchain)
+   renumber(chains)        number residues from 1 in each chain and the atoms from 1, optionally relabelling the chains in order (pdbrenum [-c])
+Files are written as BiopTools writes them: header, atoms with a TER record after each chain, MASTER (if there is a header) and END. They are written to a temporary file in the same directory and renamed into place, so a file is either complete or absent (relabel_lib takes any existing labelled file newer than its result as done).
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   Files written to a temporary file and renamed, so an interrupted write leaves no truncated file   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import math
+import threading
+
+#*************************************************************************
+
+# Peptide bond C-N distance (Angstroms) above which a chain is taken to be broken
+CHAIN_BREAK = 2.5
+
+# CA-CA distance used instead where a residue has no backbone C or N
+CA_BREAK = 4.5
+
+# Chain labels given by split_chains
+CHAIN_LABELS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789abcdefghijklmnopqrstuvwxyz"
+
+#*************************************************************************
+
+class PDBRecords:
+   """
+   The header lines (before the first atom) and the ATOM/HETATM records of a PDB file, each padded to 80 columns. renumbered is set once the atoms have been numbered from 1, counting the TER records, as pdbrenum does.
+
+   """
+   def __init__(self, header, atoms, renumbered=False):
+      self.header = list(header)
+      self.atoms = list(atoms)
+      self.renumbered = renumbered
+
+   def __len__(self):
+      return len(self.atoms)
+
+   def replace(self, atoms, renumbered=None):
+      return PDBRecords(self.header, atoms, self.renumbered if renumbered is None else renumbered)
+
+def _chain_runs(atoms):
+   """
+   Split a list of atom records into runs of consecutive atoms with the same chain label.
+
+   """
+   runs = []
+   for line in atoms:
+      if runs and runs[-1][-1][21] == line[21]:
+         runs[-1] += [line]
+      else:
+         runs += [[line]]
+   return runs
+
+def _residue_key(line):
+   return line[22:27]
+
+def _is_hydrogen(line):
+   element = line[76:78].strip()
+   if not element:
+      element = line[12:16].strip().lstrip('0123456789')[:1]
+   return element.upper() in ('H', 'D')
+
+#*************************************************************************
+
+def read_records(PDBfile):
+   """
+   Read the header lines and ATOM/HETATM records of a PDB file. TER, MASTER, END and CONECT records are dropped, being rewritten on output.
+
+   >>> records = read_records('test/test9.pdb')
+   >>> len(records.header), len(records)
+   (40, 3362)
+
+   """
+   header = []
+   atoms = []
+   with open(PDBfile) as file:
+      for line in file:
+         line = line.rstrip('\n')
+         if line.startswith(('ATOM  ', 'HETATM')):
+            atoms += [line.ljust(80)]
+         elif not atoms and not line.startswith(('TER', 'END', 'MASTER', 'CONECT')):
+            header += [line]
+   return PDBRecords(header, atoms)
+
+def format_records(records):
+   """
+   Return PDB text for records, with a TER record after each chain and MASTER and END records.
+
+   """
+   lines = list(records.header)
+   serial_offset = 0
+   for run in _chain_runs(records.atoms):
+      for line in run:
+         if records.renumbered and serial_offset:
+            line = f"{line[:6]}{int(line[6:11]) + serial_offset:5d}{line[11:]}"
+         lines += [line]
+      last = lines[-1]
+      serial = int(last[6:11]) + 1
+      if records.renumbered:
+         serial_offset += 1
+      lines += [f"TER   {serial:5d}      {last[17:20]} {last[21]}{last[22:27]}".ljust(80)]
+   if records.header:
+      num_remark = sum(1 for line in records.header if line.startswith('REMARK'))
+      num_ter = len(_chain_runs(records.atoms))
+      lines += [f"MASTER    {num_remark:5d}{0:5d}{0:5d}{0:5d}{0:5d}{0:5d}{0:5d}{0:5d}{len(records.atoms):5d}{num_ter:5d}{0:5d}{0:5d}".ljust(80)]
+   lines += ["END".ljust(80)]
+   return "\n".join(lines) + "\n"
+
+def write_records(records, PDBfile):
+   """
+   Write records to a PDB file, through a temporary file renamed into place once complete.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _ = write_records(read_records('test/test8_OG.pdb'), tmp + '/out.pdb')
+   ...    os.listdir(tmp), len(read_records(tmp + '/out.pdb')) == len(read_records('test/test8_OG.pdb'))
+   (['out.pdb'], True)
+
+   """
+   directory, name = os.path.split(PDBfile)
+   temporary = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+   try:
+      with open(temporary, "w") as file:
+         file.write(format_records(records))
+      os.replace(temporary, PDBfile)
+   except BaseException:
+      if os.path.exists(temporary):
+         os.remove(temporary)
+      raise
+   return PDBfile
+
+def apply_stages(records, stages):
+   """
+   Pass records through each stage in turn.
+
+   """
+   for stage in stages:
+      records = stage(records)
+   return records
+
+def transform_pdb(PDBfile, outfile, stages):
+   """
+   Read a PDB file, pass it through the stages and write the result to outfile. Returns outfile.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _ = transform_pdb('test/test9.pdb', tmp + '/labelled.pdb', [split_chains(), renumber('L,H,Y')])
+   ...    open(tmp + '/labelled.pdb').read() == open('test/test9.pdb_split_labelled.pdb').read()
+   True
+
+   """
+   return write_records(apply_stages(read_records(PDBfile), stages), outfile)
+
+#*************************************************************************
+
+def strip_hydrogens():
+   """
+   Stage removing hydrogen atoms.
+
+   >>> len(strip_hydrogens()(read_records('test/test9.pdb')))
+   2709
+
+   """
+   def stage(records):
+      return records.replace([line for line in records.atoms if not _is_hydrogen(line)])
+   return stage
+
+def select_chains(chains):
+   """
+   Stage keeping only the atoms of the given chains (a string of labels, with or without commas).
+
+   >>> len(select_chains('H,L')(read_records('test/test8_OG.pdb')))
+   1709
+
+   """
+   keep = set(chains.replace(',', ''))
+   def stage(records):
+      return records.replace([line for line in records.atoms if line[21] in keep])
+   return stage
+
+def set_chain(chain=" "):
+   """
+   Stage setting the chain label of every atom.
+
+   """
+   def stage(records):
+      return records.replace([f"{line[:21]}{chain}{line[22:]}" for line in records.atoms])
+   return stage
+
+def set_segid(segid=""):
+   """
+   Stage setting the segment ID (columns 73-76) of every atom.
+
+   >>> records = set_segid('A')(read_records('test/test8_OG.pdb'))
+   >>> records.atoms[0][72:76]
+   'A   '
+
+   """
+   segid = segid.ljust(4)[:4]
+   def stage(records):
+      return records.replace([f"{line[:72]}{segid}{line[76:]}" for line in records.atoms])
+   return stage
+
+def split_chains(cutoff=CHAIN_BREAK):
+   """
+   Stage splitting chains wherever the peptide bond between consecutive residues is broken (C-N distance above cutoff, or CA-CA distance above CA_BREAK for residues without backbone C or N) and labelling the chains A, B, C, ... in order.
+
+   >>> records = split_chains()(read_records('test/test9.pdb'))
+   >>> sorted(set(line[21] for line in records.atoms))
+   ['A', 'B', 'C']
+
+   """
+   def stage(records):
+      atoms = []
+      label = -1
+      for run in _chain_runs(records.atoms):
+         previous = None
+         for residue in _residues(run):
+            if previous is None or _broken(previous, residue, cutoff):
+               label += 1
+            new_chain = CHAIN_LABELS[label % len(CHAIN_LABELS)]
+            atoms += [f"{line[:21]}{new_chain}{line[22:]}" for line in residue]
+            previous = residue
+      return records.replace(atoms)
+   return stage
+
+def _residues(atoms):
+   residues = []
+   for line in atoms:
+      if residues and _residue_key(residues[-1][-1]) == _residue_key(line):
+         residues[-1] += [line]
+      else:
+         residues += [[line]]
+   return residues
+
+def _atom_coords(residue, name):
+   for line in residue:
+      if line[12:16].strip() == name:
+         return float(line[30:38]), float(line[38:46]), float(line[46:54])
+   return None
+
+def _broken(previous, residue, cutoff):
+   c, n = _atom_coords(previous, "C"), _atom_coords(residue, "N")
+   if c is not None and n is not None:
+      return math.dist(c, n) > cutoff
+   ca1, ca2 = _atom_coords(previous, "CA"), _atom_coords(residue, "CA")
+   if ca1 is not None and ca2 is not None:
+      return math.dist(ca1, ca2) > CA_BREAK
+   return False
+
+def renumber(chains=None):
+   """
+   Stage numbering the residues of each chain from 1 (clearing insertion codes) and the atoms from 1 (on output, the TER records are counted as pdbrenum does). If chains is given (a comma separated list of labels) the chains are relabelled with them in order.
+
+   >>> records = renumber('L,H')(read_records('test/test8_OG.pdb'))
+   >>> records.atoms[0][6:27], records.atoms[-1][21:26]
+   ('    1  N   ASP L   1 ', 'Y 129')
+
+   """
+   labels = chains.split(',') if chains else []
+   def stage(records):
+      atoms = []
+      serial = 0
+      for index, run in enumerate(_chain_runs(records.atoms)):
+         chain = labels[index] if index < len(labels) else run[0][21]
+         for number, residue in enumerate(_residues(run), start=1):
+            for line in residue:
+               serial += 1
+               atoms += [f"{line[:6]}{serial:5d}{line[11:21]}{chain}{number:4d} {line[27:]}"]
+      # The serial numbers of the TER records are added on output
+      return records.replace(atoms, renumbered=True)
+   return stage
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Program: prepcache_lib
+File:    prepcache_lib.py
+
+Version:  V1.2
+Date:     19.10.26
+Function:   Library: Cache of prepared docking inputs, keyed by the content of the inputs and the tool that prepared them.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+Before docking, each method prepares its inputs: hydrogens are added with pdbhadd for Megadock, Piper's prepare.py is run on both partners and Rosetta prepacks the complex. The inputs are the same for every replicate and every rerun, so the prepared files are kept in a cache and copied from it when the same preparation is asked for again.
+
+A cache entry is keyed by the SHA-256 of
+   the content of each input file (not its name or location)
+   the tools used and their versions (size and modification time of each tool's executable, so reinstalling a tool starts afresh)
+   the flags given to the tools
+and holds a copy of each output file. Entries are written to a temporary directory and renamed into place, so runs sharing the cache on a common filesystem never see a partial entry; if two runs prepare the same inputs at once, the first to finish is kept.
+
+The cache is kept in the directory given by the 'prep_cache' entry of the 'paths' section of the toolrunner configuration (default ~/.cache/ab-docking-scripts/prepared); setting it to "" turns caching off.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   HADDOCK input cleaning no longer cached, being done in-process (pdbtransform_lib)   By: OECH
+V1.2   19.10.26   Old outputs removed before preparing; only successful preparations cached; prune skips stray files   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from toolrunner_lib import load_config, tool_path
+
+#*************************************************************************
+
+# Bytes read at a time when hashing a file
+BLOCK_SIZE = 1 << 20
+
+#*************************************************************************
+
+def file_hash(filename):
+   """
+   Return the SHA-256 of the content of a file.
+
+   >>> file_hash('test/test8_OG.pdb') == file_hash('test/test8_OG.pdb')
+   True
+   >>> len(file_hash('test/test8_OG.pdb'))
+   64
+
+   """
+   digest = hashlib.sha256()
+   with open(filename, "rb") as file:
+      for block in iter(lambda: file.read(BLOCK_SIZE), b""):
+         digest.update(block)
+   return digest.hexdigest()
+
+def tool_version(tool):
+   """
+   Return a version string for a tool: the size and modification time of its executable, or 'missing' if it cannot be found.
+
+   >>> tool_version('no-such-tool-xyz')
+   'missing'
+
+   """
+   try:
+      stat = os.stat(tool_path(tool))
+   except OSError:
+      return "missing"
+   return f"{stat.st_size}-{int(stat.st_mtime)}"
+
+def cache_key(tools, inputs, flags=()):
+   """
+   Return the cache key of preparing the input files with the given tools (a tool name or a sequence of them) and flags.
+
+   >>> cache_key('pdbhadd', ['test/test8_OG.pdb'], ['-a']) == cache_key('pdbhadd', ['test/test8_OG.pdb'], ['-a'])
+   True
+   >>> cache_key('pdbhadd', ['test/test8_OG.pdb'], ['-a']) == cache_key('pdbhadd', ['test/test8_OG.pdb'], [])
+   False
+
+   """
+   if isinstance(tools, str):
+      tools = [tools]
+   description = {"tools": [[tool, tool_version(tool)] for tool in tools],
+                  "inputs": [file_hash(filename) for filename in inputs],
+                  "flags": [str(flag) for flag in flags]}
+   return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+#*************************************************************************
+
+def cache_dir():
+   """
+   Return the cache directory, or None if caching is turned off.
+
+   """
+   directory = load_config()["paths"].get("prep_cache")
+   return os.path.expanduser(directory) if directory else None
+
+def _copy(source, destination):
+   """
+   Copy a file so that the destination is replaced in one step.
+
+   """
+   directory = os.path.dirname(os.path.abspath(destination))
+   fd, temporary = tempfile.mkstemp(dir=directory, prefix=".prepcache.")
+   os.close(fd)
+   try:
+      shutil.copyfile(source, temporary)
+      os.replace(temporary, destination)
+   except BaseException:
+      os.unlink(temporary)
+      raise
+
+def prepared(tools, inputs, outputs, prepare, flags=(), directory=None):
+   """
+   Make the output files prepared from the input files by tools (a tool name or a sequence of them) with the given flags. If the same preparation has been cached, the outputs are copied from the cache; otherwise prepare() is called to make them and they are added to the cache. Returns True if the outputs came from the cache.
+
+   directory is the cache directory (default: cache_dir()). Any old output files are removed before prepare() is called, so only files it makes can be cached. prepare() should raise if it fails (run_tool with check=True); if it returns a result with a non-zero returncode, that counts as a failure too. Outputs are only cached if prepare() succeeded and made all of them.
+
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    calls = []
+   ...    def prepare():
+   ...       calls.append(1)
+   ...       shutil.copy('test/test8_OG.pdb', tmp + '/prepared.pdb')
+   ...    first = prepared('pdbhadd', ['test/test8_OG.pdb'], [tmp + '/prepared.pdb'], prepare, ['-a'], tmp + '/cache')
+   ...    os.remove(tmp + '/prepared.pdb')
+   ...    second = prepared('pdbhadd', ['test/test8_OG.pdb'], [tmp + '/prepared.pdb'], prepare, ['-a'], tmp + '/cache')
+   ...    first, second, len(calls), file_hash(tmp + '/prepared.pdb') == file_hash('test/test8_OG.pdb')
+   (False, True, 1, True)
+   >>> import subprocess
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _ = shutil.copy('test/test8_OG.pdb', tmp + '/prepared.pdb')
+   ...    failed = prepared('pdbhadd', ['test/test8_single.pdb'], [tmp + '/prepared.pdb'], lambda: subprocess.CompletedProcess([], 1), [], tmp + '/cache')
+   ...    failed, os.path.exists(tmp + '/prepared.pdb'), os.listdir(tmp + '/cache') if os.path.isdir(tmp + '/cache') else []
+   (False, False, [])
+
+   """
+   # Old outputs must not be taken for the work of a failed preparation
+   for output in outputs:
+      if os.path.isfile(output):
+         os.remove(output)
+   root = directory or cache_dir()
+   if root is None:
+      prepare()
+      return False
+   key = cache_key(tools, inputs, flags)
+   entry = os.path.join(root, key[:2], key)
+   cached = [os.path.join(entry, str(number)) for number in range(len(outputs))]
+
+   # Copy the outputs from the cache
+   if all(os.path.isfile(filename) for filename in cached):
+      for source, output in zip(cached, outputs):
+         _copy(source, output)
+      # Mark the entry as used, for pruning old entries
+      os.utime(entry)
+      return True
+
+   # Prepare the inputs and add the outputs to the cache
+   result = prepare()
+   if getattr(result, "returncode", 0) != 0 or not all(os.path.isfile(output) for output in outputs):
+      return False
+   os.makedirs(os.path.dirname(entry), exist_ok=True)
+   staging = tempfile.mkdtemp(dir=os.path.dirname(entry), prefix=".staging.")
+   for source, target in zip(outputs, [os.path.join(staging, str(number)) for number in range(len(outputs))]):
+      shutil.copyfile(source, target)
+   with open(os.path.join(staging, "entry.json"), "w") as file:
+      json.dump({"tools": [tools] if isinstance(tools, str) else list(tools), "inputs": [os.path.abspath(filename) for filename in inputs], "outputs": [os.path.basename(output) for output in outputs], "flags": [str(flag) for flag in flags], "created": time.time()}, file)
+   try:
+      os.rename(staging, entry)
+   except OSError:
+      # Another run added the same entry first
+      shutil.rmtree(staging, ignore_errors=True)
+   return False
+
+#*************************************************************************
+
+def prune_cache(max_age_days, directory=None):
+   """
+   Remove cache entries not used for max_age_days days. Returns the number of entries removed.
+
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _ = prepared('pdbhadd', ['test/test8_OG.pdb'], [tmp + '/prepared.pdb'], lambda: shutil.copy('test/test8_OG.pdb', tmp + '/prepared.pdb'), directory=tmp + '/cache')
+   ...    _ = open(tmp + '/cache/README', 'w').write('stray file')
+   ...    prune_cache(1, tmp + '/cache'), prune_cache(0, tmp + '/cache')
+   (0, 1)
+
+   """
+   root = directory or cache_dir()
+   if root is None or not os.path.isdir(root):
+      return 0
+   oldest = time.time() - max_age_days * 86400
+   removed = 0
+   for prefix in os.listdir(root):
+      # Skip anything other than the entry directories (e.g. stray files)
+      if not os.path.isdir(os.path.join(root, prefix)):
+         continue
+      for key in os.listdir(os.path.join(root, prefix)):
+         entry = os.path.join(root, prefix, key)
+         if not key.startswith(".") and os.stat(entry).st_mtime <= oldest:
+            shutil.rmtree(entry, ignore_errors=True)
+            removed += 1
+   return removed
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
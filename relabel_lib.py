@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Program: relabel_lib
+File:    relabel_lib.py
+
+Version:  V1.0
+Date:     19.10.26
+Function:   Library: Split and relabel the chains of a directory of HADDOCK results in parallel, skipping results already relabelled.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+HADDOCK writes its results with the antibody chains joined and unlabelled, so each result (<pdb>_nohydrogens_Haddock_waters_result.pdb and <pdb>_nohydrogens_Haddock_nowaters_result.pdb) is split at its chain breaks and relabelled L, H, <antigen chain> into <result>_split_labelled.pdb, the antigen chain being read from the header of the native complex (<pdb>.pdb).
+
+relabel_directory() does this for every HADDOCK result in a directory over a pool of worker processes. A result is skipped if its _split_labelled.pdb file is newer than both the result and the native, so after a rerun only the results that changed are rewritten. What was done with each result (relabelled, current or failed, with the reason) is written to fix_chain_labelling.tsv in the directory.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+from multiprocessing import Pool
+from dockingtools_lib import getantigenchainid
+from pdbtransform_lib import transform_pdb, split_chains, renumber
+
+#*************************************************************************
+
+# Suffixes of the HADDOCK result files of a complex
+HADDOCK_SUFFIXES = ("_nohydrogens_Haddock_waters_result.pdb", "_nohydrogens_Haddock_nowaters_result.pdb")
+
+# Suffix added to a result file once relabelled
+LABELLED_SUFFIX = "_split_labelled.pdb"
+
+# Record of what was done with each result, written to the directory
+RECORD_FILE = "fix_chain_labelling.tsv"
+
+#*************************************************************************
+
+def find_haddock_results(directory="."):
+   """
+   Return (native file, result file) of each HADDOCK result in a directory, sorted by result file.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    for name in ('1abc.pdb', '1abc_nohydrogens_Haddock_waters_result.pdb', '1abc_nohydrogens_Haddock_waters_result.pdb_split_labelled.pdb'):
+   ...       open(os.path.join(tmp, name), 'w').close()
+   ...    [(os.path.basename(native), os.path.basename(result)) for native, result in find_haddock_results(tmp)]
+   [('1abc.pdb', '1abc_nohydrogens_Haddock_waters_result.pdb')]
+
+   """
+   results = []
+   for name in sorted(os.listdir(directory)):
+      for suffix in HADDOCK_SUFFIXES:
+         if name.endswith(suffix):
+            results += [(os.path.join(directory, name[:-len(suffix)] + ".pdb"), os.path.join(directory, name))]
+   return results
+
+def is_current(outfile, *inputs):
+   """
+   Return True if outfile exists and is at least as new as each of the input files.
+
+   >>> is_current('no-such-file.pdb', 'test/test8_OG.pdb')
+   False
+
+   """
+   try:
+      made = os.stat(outfile).st_mtime
+   except OSError:
+      return False
+   return all(os.stat(filename).st_mtime <= made for filename in inputs)
+
+#*************************************************************************
+
+def relabel_result(resultfile, agchainid):
+   """
+   Split the chains of a HADDOCK result at chain breaks and relabel them L, H and agchainid. Returns the relabelled file.
+
+   """
+   return transform_pdb(resultfile, resultfile + LABELLED_SUFFIX, [split_chains(), renumber(f"L,H,{agchainid}")])
+
+def _relabel_job(job):
+   """
+   Relabel one result in a worker process, returning (result file, status, detail).
+
+   """
+   resultfile, agchainid = job
+   try:
+      relabel_result(resultfile, agchainid)
+   except (OSError, ValueError) as error:
+      return resultfile, "failed", str(error)
+   return resultfile, "relabelled", agchainid
+
+def relabel_directory(directory=".", workers=None, force=False):
+   """
+   Relabel every HADDOCK result in a directory whose _split_labelled.pdb file is missing or older than the result or native (every result if force is True), over a pool of workers (default: one per CPU). The outcome for each result is written to fix_chain_labelling.tsv in the directory. Returns the number of results with each status.
+
+   >>> import tempfile, shutil
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _ = shutil.copy('test/test8_OG.pdb', tmp + '/1abc.pdb')
+   ...    _ = shutil.copy('test/test9.pdb', tmp + '/1abc_nohydrogens_Haddock_waters_result.pdb')
+   ...    first = relabel_directory(tmp, workers=1)
+   ...    second = relabel_directory(tmp, workers=1)
+   ...    open(tmp + '/1abc_nohydrogens_Haddock_waters_result.pdb_split_labelled.pdb').read() == open('test/test9.pdb_split_labelled.pdb').read()
+   ...    first, second
+   True
+   ({'relabelled': 1}, {'current': 1})
+
+   """
+   records = []
+   jobs = []
+   agchainids = {}
+   for PDBfile, resultfile in find_haddock_results(directory):
+      if not os.path.exists(PDBfile):
+         records += [(resultfile, "failed", f"no native {os.path.basename(PDBfile)}")]
+      elif not force and is_current(resultfile + LABELLED_SUFFIX, resultfile, PDBfile):
+         records += [(resultfile, "current", "")]
+      else:
+         # Read the antigen chain once for both results of a complex
+         if PDBfile not in agchainids:
+            agchainids[PDBfile] = getantigenchainid(PDBfile)
+         agchainid = agchainids[PDBfile]
+         if agchainid in ("No chains", "Multiple chains"):
+            records += [(resultfile, "failed", f"{agchainid} in {os.path.basename(PDBfile)}")]
+         else:
+            jobs += [(resultfile, agchainid)]
+
+   # Relabel in parallel
+   if len(jobs) > 1 and workers != 1:
+      with Pool(min(workers or os.cpu_count() or 1, len(jobs))) as pool:
+         records += pool.imap_unordered(_relabel_job, jobs, chunksize=8)
+   else:
+      records += [_relabel_job(job) for job in jobs]
+
+   # Record what was done with each result
+   records.sort()
+   with open(os.path.join(directory, RECORD_FILE), "w") as file:
+      file.write("result\tstatus\tdetail\n")
+      for resultfile, status, detail in records:
+         file.write(f"{os.path.basename(resultfile)}\t{status}\t{detail}\n")
+   counts = {}
+   for resultfile, status, detail in records:
+      counts[status] = counts.get(status, 0) + 1
+   return counts
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Program: replicates_lib
+File:    replicates_lib.py
+
+Version:  V1.1
+Date:     19.10.26
+Function:   Library: Prepare the inputs of several docking replicates of a complex, splitting it only once.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+The replicates of a docking test differ only in the random rotation and translation given to the antigen before docking. prepare_replicates() therefore strips the hydrogens from the complex and extracts its antibody and antigen chains once (into OUTPath/inputs/, in-process from a single read of the complex, see pdbtransform_lib.py), and then writes, for each replicate, the antigen moved by its own perturbation. Each replicate directory (OUTPath/run<i>/) gets the same files as from pdbhstrip and splitantibodyantigenchains.py (<name>_nohydrogens.pdb, <name>_nohydrogens_ab.pdb and <name>_nohydrogens_ag.pdb), so the docking scripts are run exactly as before.
+
+The perturbation of each replicate is drawn from the same ranges as in splitantibodyantigenchains.py (rotation of -8 to 8 degrees and translation of 5 to 10 Angstroms about each axis) by a random number generator seeded with the run seed and the replicate number, so a run can be repeated exactly. The seed and the perturbation of each replicate are written to OUTPath/replicates.tsv.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   Hydrogen stripping and chain extraction done in-process from one read of the complex (pdbtransform_lib)   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import shutil
+import random
+from toolrunner_lib import run_pipeline
+from dockingtools_lib import getantigenchainid
+from pdbtransform_lib import read_records, write_records, apply_stages, strip_hydrogens, select_chains
+
+#*************************************************************************
+
+def antigen_perturbation(seed, replicate):
+   """
+   Return the rotation (degrees) and translation (Angstroms) about x, y and z of the antigen of a replicate.
+
+   >>> antigen_perturbation(7, 0) == antigen_perturbation(7, 0), antigen_perturbation(7, 0) == antigen_perturbation(7, 1)
+   (True, False)
+   >>> rotation, translation = antigen_perturbation(7, 0)
+   >>> all(-8 <= angle <= 8 for angle in rotation), all(5 <= shift <= 10 for shift in translation)
+   (True, True)
+
+   """
+   generator = random.Random(f"{seed}/{replicate}")
+   rotation = tuple(generator.randint(-8, 8) for axis in "xyz")
+   translation = tuple(generator.randint(5, 10) for axis in "xyz")
+   return rotation, translation
+
+#*************************************************************************
+
+def prepare_replicates(PDBfile, OUTPath, replicates, seed=None):
+   """
+   Prepare the inputs of replicates docking runs of a complex in OUTPath/run0/, run1/, ..., stripping and splitting the complex only once. If seed is None a random seed is used (and recorded). Returns a list of (input_nohydrogens, ab_filename, ag_filename, OUTPath_i) for the replicates.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    runs = prepare_replicates('test/test8_OG.pdb', tmp, 2, seed=7)
+   ...    [os.path.relpath(filename, tmp) for filename in runs[1]], open(tmp + '/replicates.tsv').read().split('\\n')[0]
+   (['run1/test8_OG_nohydrogens.pdb', 'run1/test8_OG_nohydrogens_ab.pdb', 'run1/test8_OG_nohydrogens_ag.pdb', 'run1'], '# seed 7')
+
+   """
+   if seed is None:
+      seed = random.SystemRandom().randrange(2 ** 32)
+   OUTPath = os.path.join(OUTPath, "")
+   inputfilename = os.path.basename(PDBfile).split('.')[0]
+   nohydrogens_filename = f"{inputfilename}_nohydrogens"
+   inputs = OUTPath + "inputs/"
+   os.makedirs(inputs, exist_ok=True)
+
+   # Strip hydrogens and split the complex into antibody and antigen, once
+   input_nohydrogens = inputs + nohydrogens_filename + ".pdb"
+   nohydrogens = apply_stages(read_records(PDBfile), [strip_hydrogens()])
+   write_records(nohydrogens, input_nohydrogens)
+   agchainid = getantigenchainid(input_nohydrogens)
+   antibody = write_records(select_chains("H,L")(nohydrogens), inputs + nohydrogens_filename + "_ab.pdb")
+   antigen = write_records(select_chains(agchainid)(nohydrogens), inputs + nohydrogens_filename + "_ag_native.pdb")
+
+   # Write the inputs of each replicate, only the antigen being moved
+   runs = []
+   table = [f"# seed {seed}", "replicate\trotation_x\trotation_y\trotation_z\ttranslation_x\ttranslation_y\ttranslation_z"]
+   for replicate in range(replicates):
+      OUTPath_i = OUTPath + f"run{replicate}/"
+      os.makedirs(OUTPath_i, exist_ok=True)
+      rotation, translation = antigen_perturbation(seed, replicate)
+      run_files = [OUTPath_i + nohydrogens_filename + suffix for suffix in (".pdb", "_ab.pdb", "_ag.pdb")]
+      shutil.copyfile(input_nohydrogens, run_files[0])
+      shutil.copyfile(antibody, run_files[1])
+      run_pipeline([("pdbrotate", ["-x", rotation[0], "-y", rotation[1], "-z", rotation[2], antigen]),
+                    ("pdbtranslate", ["-x", translation[0], "-y", translation[1], "-z", translation[2]])], stdout=run_files[2], check=True)
+      runs += [(*run_files, OUTPath_i)]
+      table += ["\t".join(str(value) for value in (replicate, *rotation, *translation))]
+   with open(OUTPath + "replicates.tsv", "w") as file:
+      file.write("\n".join(table) + "\n")
+   return runs
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Program: resolution_lib
+File:    resolution_lib.py
+
+Version:  V1.1
+Date:     19.10.26
+Function:   Library: Index of the resolution and experimental method of AbDb entries, with lookup by name and resolution range queries.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+AbDb files give the experimental method and resolution of their PDB entry in their header (REMARK 950 METHOD, REMARK 950 RESOLUTION). chunan/data/abdb.pdb.resolution.text holds these lines for all of AbDb, as written by grep (path:REMARK 950 RESOLUTION 1.900). A ResolutionIndex is built once from such a grep dump (from_text), from the headers of a set of PDB files (from_pdb_files) or from an index saved earlier as JSON (save, load), and then answers
+   get()       the resolution and method of an entry, by AbDb ID or any file name containing it (1VFB_1, pdb1vfb_0P.pdb); an entry not in the index is looked up by its PDB code, as all entries of a PDB file share its resolution
+   between()   the entries with a resolution in a range, best first (a binary search of the entries sorted by resolution)
+Structures with no resolution (NMR, given as RESOLUTION 0.000 by AbDb) are kept with a resolution of None and are never in a range.
+
+datasetrunner.py uses this to leave complexes worse than --max-resolution out of a manifest before anything is docked (see datasetrunner_lib.read_manifest).
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   An empty index given to complex_resolution is used rather than replaced by the default   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import re
+import json
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple
+
+#*************************************************************************
+
+# Resolutions of all AbDb entries (grep dump of the REMARK 950 RESOLUTION lines)
+RESOLUTION_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "chunan", "data", "abdb.pdb.resolution.text")
+
+# AbDb ID in a file name: PDB code, then the AbDb suffix (pdb1vfb_0P.pdb, 12E8_1.pdb)
+ABDB_ID = re.compile(r"(?:pdb)?([0-9][0-9a-z]{3})(_\w+)?$", re.IGNORECASE)
+
+# REMARK 950 lines of an AbDb header (with the file name if from grep)
+REMARK_950 = re.compile(r"(?:(.*):)?REMARK 950 (RESOLUTION|METHOD)\s+(.*?)\s*$")
+
+#*************************************************************************
+
+class Resolution(NamedTuple):
+   """
+   Resolution (Angstroms, None if not applicable or not known) and experimental method (None if not known) of an entry.
+   """
+   resolution: object
+   method: object
+
+def abdb_id(name):
+   """
+   Return the AbDb ID (upper case PDB code and AbDb suffix) in a file name or ID, or None if it has none.
+
+   >>> abdb_id('/data/pdb1vfb_0P.pdb'), abdb_id('12E8_1'), abdb_id('1abc'), abdb_id('test8_OG.pdb')
+   ('1VFB_0P', '12E8_1', '1ABC', None)
+
+   """
+   match = ABDB_ID.match(os.path.basename(name).split('.')[0])
+   if match is None:
+      return None
+   return match.group(1).upper() + (match.group(2) or "")
+
+def _resolution(value):
+   """
+   Convert a RESOLUTION field to Angstroms, or None if there is none (0.000, NOT APPLICABLE).
+
+   """
+   try:
+      resolution = float(value.split()[0])
+   except (ValueError, IndexError):
+      return None
+   return resolution if resolution > 0 else None
+
+#*************************************************************************
+
+class ResolutionIndex:
+   """
+   Resolution and experimental method of AbDb entries, by AbDb ID.
+
+   >>> index = ResolutionIndex.from_text(RESOLUTION_FILE)
+   >>> len(index), index.get('12E8_1'), index.get('/data/pdb12e8_0P.pdb').resolution
+   (5025, Resolution(resolution=1.9, method=None), 1.9)
+   >>> index.get('1QNZ_1'), index.get('9ZZZ_1'), '12e8_2' in index
+   (Resolution(resolution=None, method=None), None, True)
+   >>> index.between(0, 1.21)
+   ['5XCT_1', '3D9A_1', '4NZU_1', '4QYO_1']
+   >>> len(index.between(high=2.5)) + len(index.between(2.5)) - len(index.between(2.5, 2.5)) + 34
+   5025
+
+   """
+   def __init__(self, entries):
+      self._entries = {abdb_id(name) or name: entry for name, entry in entries.items()}
+      # Best resolution of each PDB code
+      self._codes = {}
+      for name, entry in self._entries.items():
+         known = self._codes.get(name[:4])
+         if known is None or (entry.resolution is not None and (known.resolution is None or entry.resolution < known.resolution)):
+            self._codes[name[:4]] = entry
+      # Entries with a resolution, sorted by resolution
+      resolved = sorted((entry.resolution, name) for name, entry in self._entries.items() if entry.resolution is not None)
+      self._resolutions = [resolution for resolution, _ in resolved]
+      self._names = [name for _, name in resolved]
+
+   def __len__(self):
+      return len(self._entries)
+
+   def __contains__(self, name):
+      return (abdb_id(name) or name) in self._entries
+
+   def get(self, name, default=None):
+      """
+      Return the Resolution of an entry by AbDb ID or file name, from its PDB code if the entry itself is not indexed, or default if neither is.
+
+      """
+      key = abdb_id(name)
+      entry = self._entries.get(key or name)
+      if entry is None and key is not None:
+         entry = self._codes.get(key[:4])
+      return entry if entry is not None else default
+
+   def between(self, low=0.0, high=float("inf")):
+      """
+      Return the AbDb IDs of the entries with low <= resolution <= high, best resolution first.
+
+      """
+      return self._names[bisect_left(self._resolutions, low):bisect_right(self._resolutions, high)]
+
+   def save(self, index_file):
+      """
+      Save the index as JSON, to be read again with load().
+
+      >>> import tempfile
+      >>> with tempfile.TemporaryDirectory() as tmp:
+      ...    ResolutionIndex({'3V6F_3': Resolution(2.52, 'X-ray crystal structure')}).save(tmp + '/index.json')
+      ...    ResolutionIndex.load(tmp + '/index.json').get('3v6f_3')
+      Resolution(resolution=2.52, method='X-ray crystal structure')
+
+      """
+      with open(index_file, "w") as file:
+         json.dump({name: list(entry) for name, entry in self._entries.items()}, file)
+
+   @classmethod
+   def load(cls, index_file):
+      with open(index_file) as file:
+         return cls({name: Resolution(*entry) for name, entry in json.load(file).items()})
+
+   @classmethod
+   def from_text(cls, text_file):
+      """
+      Build an index from grep output of REMARK 950 RESOLUTION (and optionally METHOD) lines, each starting with its file name.
+
+      """
+      fields = {}
+      with open(text_file) as file:
+         for line in file:
+            match = REMARK_950.match(line)
+            if match and match.group(1):
+               fields.setdefault(match.group(1), {})[match.group(2)] = match.group(3)
+      return cls({name: Resolution(_resolution(entry.get("RESOLUTION", "")), entry.get("METHOD")) for name, entry in fields.items()})
+
+   @classmethod
+   def from_pdb_files(cls, PDBfiles):
+      """
+      Build an index from the headers of PDB files (files without a resolution in their header are left out).
+
+      >>> ResolutionIndex.from_pdb_files(['chunan/example/3V6F_3.pdb', 'test/test8_OG.pdb']).between()
+      ['3V6F_3']
+
+      """
+      entries = {}
+      for PDBfile in PDBfiles:
+         entry = header_resolution(PDBfile)
+         if entry is not None:
+            entries[PDBfile] = entry
+      return cls(entries)
+
+#*************************************************************************
+
+def header_resolution(PDBfile):
+   """
+   Return the Resolution given in the header of an AbDb file (REMARK 950) or PDB file (REMARK 2, EXPDTA), or None if it gives none.
+
+   >>> header_resolution('chunan/example/3V6Z_2.pdb')
+   Resolution(resolution=3.34, method='X-ray crystal structure')
+   >>> header_resolution('test/test8_OG.pdb') is None
+   True
+
+   """
+   resolution = method = None
+   found = False
+   with open(PDBfile) as file:
+      for line in file:
+         if line.startswith(("ATOM", "HETATM", "MODEL")):
+            break
+         if line.startswith("REMARK 950 RESOLUTION") or line.startswith("REMARK   2 RESOLUTION."):
+            resolution = _resolution(line[22:].strip())
+            found = True
+         elif line.startswith("REMARK 950 METHOD"):
+            method = line[17:].strip()
+         elif line.startswith("EXPDTA"):
+            method = line[10:].strip()
+   return Resolution(resolution, method) if found else None
+
+_indexes = {}
+
+def load_index(index_file=None):
+   """
+   Return the ResolutionIndex of a grep dump or saved JSON index (default: RESOLUTION_FILE), built once per process.
+
+   >>> load_index() is load_index(RESOLUTION_FILE)
+   True
+
+   """
+   index_file = os.path.realpath(index_file or RESOLUTION_FILE)
+   if index_file not in _indexes:
+      if index_file.endswith(".json"):
+         _indexes[index_file] = ResolutionIndex.load(index_file)
+      else:
+         _indexes[index_file] = ResolutionIndex.from_text(index_file)
+   return _indexes[index_file]
+
+def complex_resolution(PDBfile, index=None):
+   """
+   Return the resolution of a complex from the index (default: load_index()), or from its own header if it is not indexed (None if neither gives one).
+
+   >>> complex_resolution('chunan/example/3V6Z_2.pdb', ResolutionIndex({})), complex_resolution('/data/pdb1vfb_0P.pdb', load_index())
+   (3.34, 1.8)
+   >>> complex_resolution('/data/pdb1vfb_0P.pdb', ResolutionIndex({})) is None
+   True
+
+   """
+   entry = (index if index is not None else load_index()).get(PDBfile)
+   if entry is None and os.path.isfile(PDBfile):
+      entry = header_resolution(PDBfile)
+   return entry.resolution if entry is not None else None
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
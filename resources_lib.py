@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Program: resources_lib
+File:    resources_lib.py
+
+Version:  V1.0
+Date:     19.10.26
+Function:   Library: Resource profiles (threads, memory and expected runtime) of the docking methods.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+The docking programs use the cores of a node very differently: Megadock is parallelised with OpenMP and by default takes every core, Piper is multi-threaded, Rosetta docking runs on one core and Haddock runs several CNS jobs at once. Each method is given a profile of
+   threads             cores used by one run (the thread count it is told to use)
+   memory              memory (GB) of one run for a complex of 1000 atoms ...
+   memory_per_katom    ... plus this much for each further 1000 atoms
+   runtime             expected runtime (seconds) of one run for a complex of 1000 atoms ...
+   runtime_exponent    ... scaling as this power of the number of atoms
+   env                 environment variables, besides the usual thread count variables (THREAD_VARIABLES), set to the thread count
+The defaults (DEFAULT_PROFILES) can be changed for each method in the 'profiles' section of the toolrunner configuration, e.g. {"profiles": {"megadock": {"threads": 8}}}.
+
+The orchestrator (orchestrator_lib.py) uses the profiles to reserve cores and memory for each run and to set the thread count variables of the program, so the node is filled without being oversubscribed; the dataset runner (datasetrunner_lib.py) uses the runtimes to balance its chunks.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+from typing import NamedTuple
+from toolrunner_lib import load_config
+
+#*************************************************************************
+
+# Environment variables limiting the threads of OpenMP and numerical libraries
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+#*************************************************************************
+
+class ResourceProfile(NamedTuple):
+   """
+   Resources used by one run of a docking method (see the description above).
+   """
+   script: str
+   threads: int
+   memory: float
+   memory_per_katom: float
+   runtime: float
+   runtime_exponent: float
+   env: tuple = ()
+
+# Default profile of each docking method
+DEFAULT_PROFILES = {
+   "megadock": ResourceProfile("runmegadockranked.py", 4, 1.0, 0.5, 600.0, 1.0),
+   "piper": ResourceProfile("runpiper.py", 4, 2.0, 0.5, 1800.0, 1.0),
+   "rosetta": ResourceProfile("runrosetta.py", 1, 1.0, 0.2, 3600.0, 1.0),
+   "haddock": ResourceProfile("runhaddock.py", 2, 1.0, 0.3, 7200.0, 1.2, ("HADDOCK_CPUS",)),
+}
+
+#*************************************************************************
+
+def load_profiles():
+   """
+   Return the profile of each method: the defaults with any changes from the toolrunner configuration.
+
+   >>> load_profiles()['rosetta'].threads
+   1
+
+   """
+   profiles = dict(DEFAULT_PROFILES)
+   for method, changes in load_config().get("profiles", {}).items():
+      base = profiles.get(method, ResourceProfile(method, 1, 1.0, 0.0, 600.0, 1.0))
+      if "env" in changes:
+         changes = {**changes, "env": tuple(changes["env"])}
+      profiles[method] = base._replace(**changes)
+   return profiles
+
+def profile_for(name):
+   """
+   Return the profile of a method, given its name or the script that runs it, or None if it has no profile.
+
+   >>> profile_for('runmegadockranked.py').threads, profile_for('pdbhstrip')
+   (4, None)
+
+   """
+   profiles = load_profiles()
+   if name in profiles:
+      return profiles[name]
+   return next((profile for profile in profiles.values() if profile.script == name), None)
+
+#*************************************************************************
+
+def count_atoms(PDBfile):
+   """
+   Count the ATOM/HETATM records of a PDB file.
+
+   >>> count_atoms('test/test8_OG.pdb')
+   2710
+
+   """
+   with open(PDBfile) as file:
+      return sum(1 for line in file if line.startswith(('ATOM  ', 'HETATM')))
+
+def run_memory(profile, atoms):
+   """
+   Expected memory (GB) of one run for a complex of the given number of atoms.
+
+   >>> run_memory(DEFAULT_PROFILES['megadock'], 5000)
+   3.0
+
+   """
+   return profile.memory + profile.memory_per_katom * max(atoms / 1000 - 1, 0)
+
+def run_runtime(profile, atoms):
+   """
+   Expected runtime (seconds) of one run for a complex of the given number of atoms.
+
+   >>> run_runtime(DEFAULT_PROFILES['megadock'], 2710)
+   1626.0
+
+   """
+   return profile.runtime * (atoms / 1000) ** profile.runtime_exponent
+
+#*************************************************************************
+
+def thread_env(threads, profile=None, base=None):
+   """
+   Return a copy of the environment (base, by default os.environ) with the thread count variables (and those of the profile) set to threads.
+
+   >>> env = thread_env(2, DEFAULT_PROFILES['haddock'], {})
+   >>> env['OMP_NUM_THREADS'], env['HADDOCK_CPUS']
+   ('2', '2')
+
+   """
+   env = dict(os.environ if base is None else base)
+   for variable in THREAD_VARIABLES + (profile.env if profile else ()):
+      env[variable] = str(threads)
+   return env
+
+def node_memory():
+   """
+   Return the physical memory of this machine in GB.
+
+   """
+   return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 3
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
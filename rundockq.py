@@ -31,8 +31,9 @@ V1.0   29.11.23   Original   By: OECH
 #*************************************************************************
 
 # Import Libraries
-import subprocess, json, os
+import json, os
 from dockingtools_lib import getantigenchainid
+from toolrunner_lib import run_tool
 
 #*************************************************************************
 
@@ -62,7 +63,7 @@ def run_dockq(model, native):
    agchainid = getantigenchainid(native)
    # Run DockQ, write to outfile
    try:
-      subprocess.run([f"dockq.sh {model} {native} -model_chain1 H L -model_chain2 {agchainid} -native_chain1 H L -native_chain2 {agchainid} -no_needle >> {outfile}"], shell=True)
+      run_tool("dockq", [model, native, "-model_chain1", "H", "L", "-model_chain2", agchainid, "-native_chain1", "H", "L", "-native_chain2", agchainid, "-no_needle"], stdout=(outfile, "a"))
       # Collect DockQ metrics
       with open(outfile) as file:
          contents = file.readlines()
@@ -84,7 +85,7 @@ def run_dockq(model, native):
          #output += [contents[22].split('\n')[0].split(' ')[1]] # Fnonnat
          #output += [contents[21].split('\n')[0].split(' ')[1]] # Fnat
       # Delete results file (cleanliness)
-      subprocess.run([f"rm {outfile}"], shell=True)
+      os.remove(outfile)
       print(f"Done", flush=True)
    # Key error exception
    except:
@@ -3,7 +3,7 @@
 Program: runhaddock
 File:    runhaddock.py
 
-Version:  V1.0
+Version:  V1.2
 Date:     15.02.2022
 Function: Run input antibody and antigen files through the haddock protein docking algorithm, output a single result file.
 
@@ -26,130 +26,127 @@ runhaddock.py antibody antigen length OUTPath
 Revision History:
 =================
 V1.0   15.02.22   Original   By: OECH
+V1.1   19.10.26   Number of CNS jobs from HADDOCK_CPUS (set by the orchestrator)   By: OECH
+V1.2   19.10.26   Importable as main(argv), run by dockingtools.py   By: OECH
 
 """
 
 #*************************************************************************
 
 # Import libraries
-import sys, os, subprocess
+import sys, os
+from toolrunner_lib import run_tool
 from runhaddock_lib import clean_inputs, fix_chain_labelling, generate_unambig_tbl, rewrite_unambig_tbl, generate_run_param, edit_run_cns, extract_best_results
 
 #*************************************************************************
 
-# Get input files
+def main(argv=None):
+   """
+   Run runhaddock with the command line arguments argv (default: sys.argv[1:]).
 
-# antibody
-antibody = sys.argv[1]
+   """
+   argv = sys.argv[1:] if argv is None else [str(arg) for arg in argv]
 
-# antigen
-antigen = sys.argv[2]
+   # Get input files
 
-# length
-length = sys.argv[3]
+   # antibody
+   antibody = argv[0]
 
-# Get output path from command line (if present)
-OUTPath = './'
-try:
-   OUTPath = sys.argv[4] + '/'
-except IndexError:
-   print('No output directory specified, writing files to current directory')
-   OUTPath = './'
-
-#*************************************************************************
-
-# Get input filenames
+   # antigen
+   antigen = argv[1]
 
-# Antibody
-ab_filename = os.path.basename(antibody).split('.')[0]
-# Antigen
-ag_filename = os.path.basename(antigen).split('.')[0]
+   # length
+   length = argv[2]
 
-# Clean input files
-clean_inputs(antibody, antigen, ab_filename, ag_filename)
-
-#*************************************************************************
-
-# Generate unambig_tbl file
-generate_unambig_tbl(ab_filename)
+   # Get output path from command line (if present)
+   OUTPath = './'
+   try:
+      OUTPath = argv[3] + '/'
+   except IndexError:
+      print('No output directory specified, writing files to current directory')
+      OUTPath = './'
 
-# Define unambig_tbl filename
-unambig_tbl = './antibody-antigen-unambig.tbl'
+   # Get input filenames
 
-# Rewrite unambig_tbl file to include segIDs
-rewrite_unambig_tbl(unambig_tbl)
+   # Antibody
+   ab_filename = os.path.basename(antibody).split('.')[0]
+   # Antigen
+   ag_filename = os.path.basename(antigen).split('.')[0]
 
-#*************************************************************************
+   # Clean input files
+   clean_inputs(antibody, antigen, ab_filename, ag_filename)
 
-# Generate run.param file
-generate_run_param(ab_filename, ag_filename, OUTPath)
+   # Generate unambig_tbl file
+   generate_unambig_tbl(ab_filename)
 
-#*************************************************************************
+   # Define unambig_tbl filename
+   unambig_tbl = './antibody-antigen-unambig.tbl'
 
-# Run haddock2.4 for first time
-subprocess.run([f"/home/oliverh/DockingSoftware/haddock2.4/Haddock/RunHaddock.py"], shell=True)
+   # Rewrite unambig_tbl file to include segIDs
+   rewrite_unambig_tbl(unambig_tbl)
 
-#*************************************************************************
+   # Generate run.param file
+   generate_run_param(ab_filename, ag_filename, OUTPath)
 
-# Edit CNS file
-# Determine whether the run should be long or short
-long=False
-if length.lower() == 'long':
-   long=True
-# Edit file
-edit_run_cns(long)
+   # Run haddock2.4 for first time
+   run_tool("haddock")
 
-#*************************************************************************
+   # Edit CNS file
+   # Determine whether the run should be long or short
+   long=False
+   if length.lower() == 'long':
+      long=True
+   # Edit file, running as many CNS jobs at once as the cores reserved for this run (if set)
+   edit_run_cns(long, os.environ.get("HADDOCK_CPUS"))
 
-# Move to run1 directory, run haddock2.4 again
-subprocess.run(["cd run1; /home/oliverh/DockingSoftware/haddock2.4/Haddock/RunHaddock.py"], shell=True)
+   # Move to run1 directory, run haddock2.4 again
+   run_tool("haddock", cwd="run1")
 
-#*************************************************************************
-# def cli():
-#    config_path = sys.argv[1] # "/path/to/config" path to the config file
-#    with open(config_path, 'r') as f:
-#       config = yaml.safe_load(f)  # install pyyaml on macos
-#
-#    return config
-# """
-# config = {"executable": {"megadock": ...,
-#                          "piper": ...}
-#          }
-# """
-#
-#
-# megadock_path = config["executable"]["megadock"]
-# abag = config["dataset"]["abag"]
-# abymod = config["dataset"]["abymod"]
-#
-# python script.py config.yml
-#*************************************************************************
+   # def cli():
+   #    config_path = sys.argv[1] # "/path/to/config" path to the config file
+   #    with open(config_path, 'r') as f:
+   #       config = yaml.safe_load(f)  # install pyyaml on macos
+   #
+   #    return config
+   # """
+   # config = {"executable": {"megadock": ...,
+   #                          "piper": ...}
+   #          }
+   # """
+   #
+   #
+   # megadock_path = config["executable"]["megadock"]
+   # abag = config["dataset"]["abag"]
+   # abymod = config["dataset"]["abymod"]
+   #
+   # python script.py config.yml
 
-# Move back to start directory
-subprocess.run(["pwd"], shell=True)
+   # Move back to start directory
+   print(os.getcwd())
 
-# Extract result files
+   # Extract result files
 
-# Get base input filename
-inputfilename = ab_filename.split('_ab')[0]
+   # Get base input filename
+   inputfilename = ab_filename.split('_ab')[0]
 
-# Extract files
-extract_best_results(inputfilename)
+   # Extract files
+   extract_best_results(inputfilename)
 
-#*************************************************************************
+   # Split antibody chains and relabel chains for final result file
 
-# Split antibody chains and relabel chains for final result file
+   # Define nowaters resultfile
+   resultfile_nowaters = f"{inputfilename}_Haddock_nowaters_result.pdb"
 
-# Define nowaters resultfile
-resultfile_nowaters = f"{inputfilename}_Haddock_nowaters_result.pdb"
+   # Define waters resultfile
+   resultfile_waters = f"{inputfilename}_Haddock_waters_result.pdb"
 
-# Define waters resultfile
-resultfile_waters = f"{inputfilename}_Haddock_waters_result.pdb"
+   # Run fix_chain_labelling on nowaters file
+   fix_chain_labelling(antigen, resultfile_nowaters)
 
-# Run fix_chain_labelling on nowaters file
-fix_chain_labelling(antigen, resultfile_nowaters)
+   # Run fix_chain_labelling on waters file
+   fix_chain_labelling(antigen, resultfile_waters)
 
-# Run fix_chain_labelling on waters file
-fix_chain_labelling(antigen, resultfile_waters)
+#*************************************************************************
 
-#*************************************************************************
\ No newline at end of file
+if __name__ == "__main__":
+   main()
@@ -3,7 +3,7 @@
 Program: runhaddock_lib
 File:    runhaddock_lib.py
 
-Version:  V1.0
+Version:  V1.3
 Date:     15.02.2022
 Function:   Library: Run input antibody and antigen files through the haddock protein docking algorithm, output a single result file.
 
@@ -26,26 +26,32 @@ runhaddock.py antibody antigen OUTPath
 Revision History:
 =================
 V1.0   15.02.22   Original   By: OECH
+V1.1   19.10.26   edit_run_cns sets the number of CNS jobs run at once; short runs no longer keep the original structures_0/structures_1 lines after the new ones, nor add a blank line after every other line   By: OECH
+V1.2   19.10.26   Cleaned inputs taken from the prepared input cache (prepcache_lib)   By: OECH
+V1.3   19.10.26   Input cleaning and chain relabelling done in-process (pdbtransform_lib)   By: OECH
 
 """
 
 #*************************************************************************
 
 # Import libraries
-import subprocess
+import shutil
+from subprocess import PIPE
 from dockingtools_lib import writefile, getantigenchainid
+from toolrunner_lib import run_tool, data_path
+from pdbtransform_lib import transform_pdb, set_chain, set_segid, split_chains, renumber
 
 #*************************************************************************
 
 def clean_inputs(antibody, antigen, ab_filename, ag_filename):
    """
-   Clean input files for entry into haddock.
+   Clean input files for entry into haddock: blank chain labels and segment IDs (as pdb_chain.py | pdb_seg.py), and the antibody residues renumbered (as pdbrenum), in one pass over each file.
    """
    print("Cleaning input files...", end='')
-   # clean antibody file using pdb_chain and pdb_seg
-   subprocess.run([f"/home/oliverh/DockingSoftware/pdb-tools/pdbtools/pdb_chain.py {antibody} | /home/oliverh/DockingSoftware/pdb-tools/pdbtools/pdb_seg.py | pdbrenum > {ab_filename}_clean.pdb"], shell=True)
-   # Clean antigen file using pdb_chain and pdb_seg
-   subprocess.run([f"/home/oliverh/DockingSoftware/pdb-tools/pdbtools/pdb_chain.py {antigen} | /home/oliverh/DockingSoftware/pdb-tools/pdbtools/pdb_seg.py > {ag_filename}_clean.pdb"], shell=True)
+   # clean antibody file (blank chain and segment, renumbered)
+   transform_pdb(antibody, f"{ab_filename}_clean.pdb", [set_chain(), set_segid(), renumber()])
+   # Clean antigen file (blank chain and segment)
+   transform_pdb(antigen, f"{ag_filename}_clean.pdb", [set_chain(), set_segid()])
    print("Done")
 
 #*************************************************************************
@@ -54,7 +60,7 @@ def generate_unambig_tbl(ab_filename):
    # Define clean antibody filename
    ab_clean = ab_filename + "_clean.pdb"
    # Run restrain_bodies script on antibody file to generate unambig restraints table
-   subprocess.run([f"~/DockingSoftware/haddock-tools/restrain_bodies.py {ab_clean} > antibody-antigen-unambig.tbl"], shell=True)
+   run_tool("restrain_bodies", [ab_clean], stdout="antibody-antigen-unambig.tbl")
 
 #*************************************************************************
 
@@ -93,7 +99,7 @@ def generate_run_param(ab_filename, ag_filename, OUTPath):
    Write run.param file for haddock.
    """
    # Define list of lines for run.param
-   lines = ["HADDOCK_DIR=/home/oliverh/DockingSoftware/haddock2.4", "N_COMP=2", f"PDB_FILE1={OUTPath}{ab_filename}_clean.pdb", f"PDB_FILE2={OUTPath}{ag_filename}_clean.pdb", "PROJECT_DIR=./", "PROT_SEGID_1=A", "PROT_SEGID_2=B", "RUN_NUMBER=1", "UNAMBIG_TBL=antibody-antigen-unambig.tbl"]
+   lines = [f"HADDOCK_DIR={data_path('haddock_dir')}", "N_COMP=2", f"PDB_FILE1={OUTPath}{ab_filename}_clean.pdb", f"PDB_FILE2={OUTPath}{ag_filename}_clean.pdb", "PROJECT_DIR=./", "PROT_SEGID_1=A", "PROT_SEGID_2=B", "RUN_NUMBER=1", "UNAMBIG_TBL=antibody-antigen-unambig.tbl"]
    # Write run.param file
    writefile("run.param", lines)
 
@@ -110,9 +116,7 @@ def get_his_protonation(PDBfile):
    # Initialise full list
    full_list = []
    # Run molprobity on file, save output
-   protonation = subprocess.check_output([f"~/DockingSoftware/haddock-tools/molprobity.py {PDBfile}"], shell=True)
-   # Decode output
-   protonation = str(protonation, 'utf-8')
+   protonation = run_tool("molprobity", [PDBfile], stdout=PIPE, check=True).stdout
    # Split output into list
    protonation = protonation.split('\n')
    # Search output for hisD or hisE
@@ -141,30 +145,41 @@ def get_his_protonation(PDBfile):
 
 #*************************************************************************
 
-def edit_run_cns(long=True):
+def edit_run_cns(long=True, cpus=None, run_cns="./run1/run.cns"):
    """
-   Edit the run.cns file to change length of run. HADDOCK2.4 automatically determines protonation states as default >:( )
+   Edit the run.cns file to change length of run and, if cpus is given, the number of CNS jobs run at once (cpunumber_1). HADDOCK2.4 automatically determines protonation states as default >:( )
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    with open(tmp + '/run.cns', 'w') as file:
+   ...       _ = file.write('{===>} structures_0=1000;\\n{===>} cpunumber_1=10;\\n{===>} anastruc_1=200;\\n')
+   ...    edit_run_cns(False, 4, tmp + '/run.cns')
+   ...    open(tmp + '/run.cns').read().split()
+   ['{===>}', 'structures_0=200;', '{===>}', 'cpunumber_1=4;', '{===>}', 'anastruc_1=10;']
+
    """
+   if long and not cpus:
+      return
    # Initiate new list of file contents
    run_cns_out = []
    # Open run.cns file
-   run_cns = "./run1/run.cns"
-   # If long = false]
-   if not long:
-      with open(run_cns) as file:
-         lines = file.readlines()
+   with open(run_cns) as file:
+      lines = file.read().splitlines()
+   for row in lines:
       # Change length of run (if long = False)
-         for row in lines:
-            if 'structures_0=' in row:
-               run_cns_out += ['{===>} structures_0=200;']
-            if 'structures_1=' in row:
-               run_cns_out += ['{===>} structures_1=10;']
-            if 'anastruc_1=' in row:
-               run_cns_out += ['{===>} anastruc_1=10;']
-            else:
-               run_cns_out += [row]
-      # write new run.cns file
-      writefile(run_cns, run_cns_out)
+      if not long and 'structures_0=' in row:
+         run_cns_out += ['{===>} structures_0=200;']
+      elif not long and 'structures_1=' in row:
+         run_cns_out += ['{===>} structures_1=10;']
+      elif not long and 'anastruc_1=' in row:
+         run_cns_out += ['{===>} anastruc_1=10;']
+      # Number of CNS jobs run at once
+      elif cpus and 'cpunumber_1=' in row:
+         run_cns_out += [f'{{===>}} cpunumber_1={cpus};']
+      else:
+         run_cns_out += [row]
+   # write new run.cns file
+   writefile(run_cns, run_cns_out)
 
 #*************************************************************************
 
@@ -180,7 +195,7 @@ def extract_best_results(inputfilename):
       best_result_nw = best_result_nw.split()[0].split(':')[1].split('"')[0]
 
    # Copy best no waters result to starting directory, give it new name
-   subprocess.run([f"cp ./run1/structures/it1/{best_result_nw} ./{inputfilename}_Haddock_nowaters_result.pdb"], shell=True)
+   shutil.copy(f"./run1/structures/it1/{best_result_nw}", f"./{inputfilename}_Haddock_nowaters_result.pdb")
 
    # Find the best waters result
    file_list_waters = "./run1/structures/it1/water/file.list"
@@ -190,52 +205,28 @@ def extract_best_results(inputfilename):
       best_result_w = best_result_w.split()[0].split(':')[1].split('"')[0]
 
    # Copy best waters result to starting directory, giving it new name
-   subprocess.run([f"cp ./run1/structures/it1/water/{best_result_w} ./{inputfilename}_Haddock_waters_result.pdb"], shell=True)
+   shutil.copy(f"./run1/structures/it1/water/{best_result_w}", f"./{inputfilename}_Haddock_waters_result.pdb")
 
 #*************************************************************************
 
 def fix_chain_labelling(PDBfile, resultfile):
    """
-   Function to split the antibody chains into H,L chains and to relabel the chains to L,H and <agchainid>.
-
-   >>> fix_chain_labelling('test6.pdb', 'test9.pdb')
-pdbchain test9.pdb | pdbrenum -c L,H,Y > test9.pdb_split_labelled.pdb
-REMARK FILENAME="haddock_out_27.pdb0"
-
-REMARK ===============================================================
-
-REMARK HADDOCK run for haddock_out
-
-REMARK initial structure: haddock_out_887.pdb
+   Function to split the antibody chains into H,L chains and to relabel the chains to L,H and <agchainid> (as pdbchain | pdbrenum -c L,H,<agchainid>, in-process). Returns the output filename.
 
-REMARK ===============================================================
-
-REMARK            total,bonds,angles,improper,dihe,vdw,elec,air,cdih,coup,rdcs,vean,dani,xpcs,rg
-
-REMARK energies: 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
-
-REMARK ===============================================================
-
-REMARK            bonds,angles,impropers,dihe,air,cdih,coup,rdcs,vean,dani,xpcs
-
-REMARK rms-dev.: 0,0,0,0,0,0,0, 0, 0, 0, 0
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    _ = shutil.copy('test/test9.pdb', tmp)
+   ...    outfilename = fix_chain_labelling('test/test6.pdb', tmp + '/test9.pdb')
+   ...    open(outfilename).read() == open('test/test9.pdb_split_labelled.pdb').read()
+   True
 
    """
    # Define output filename
    outfilename = f"{resultfile}_split_labelled.pdb"
    # Get agchainid
    agchainid = getantigenchainid(PDBfile)
-   # Define executable
-   exe=f"pdbchain {resultfile} | pdbrenum -c L,H,{agchainid} > {outfilename}"
-   # Print executable to make sure it's working
-   print(exe)
    # Split ab chains and relabel all chains
-   subprocess.run([exe], shell=True)
-   # Test thingy
-   with open(outfilename) as file:
-      rows = file.readlines()
-      for line in rows[0:10]:
-         print(line)
+   return transform_pdb(resultfile, outfilename, [split_chains(), renumber(f"L,H,{agchainid}")])
 
 #*************************************************************************
 
@@ -33,7 +33,7 @@ Revision History:
 
 import sys
 import os
-import subprocess
+from toolrunner_lib import run_tool
 
 #*************************************************************************
 
@@ -48,13 +48,13 @@ try:
 except IndexError:
    OUTPath = './'
 # Run Megadock
-subprocess.run(["~/DockingSoftware/megadock-4.1.1/megadock -R " + receptor + " -L " + ligand + " -o megadock.out"], shell=True)
+run_tool("megadock", ["-R", receptor, "-L", ligand, "-o", "megadock.out"])
 # Get input file basename
 filenamecontents = os.path.basename(receptor).split('.')[0].split('_')
 inputfilename = filenamecontents[0] + "_" + filenamecontents[1]
 # Define output filename
 outfile = OUTPath+inputfilename + "_Dag.pdb"
 # Extract top docking result from megadock using decoygen
-subprocess.run(["~/DockingSoftware/megadock-4.1.1/decoygen " + outfile + " " + ligand + " megadock.out 1"], shell=True)
+run_tool("decoygen", [outfile, ligand, "megadock.out", 1])
 # Remove megadock.out file
-subprocess.run(["rm megadock.out"], shell=True)
\ No newline at end of file
+os.remove("megadock.out")
\ No newline at end of file
@@ -3,8 +3,8 @@
 Program: runmegadockranked
 File:    runmegadockranked.py
 
-Version: V1.0
-Date:    18.11.21 
+Version: V1.4
+Date:    18.11.21
 Function: Run input antibody and antigen files through the Megadock docking algorithm and extract the top-ranked docked ligand into a new PDB file.
 
 Author: Oliver E. C. Hood
@@ -15,17 +15,23 @@ Description:
 ============
 This program takes a receptor (antibody), ligand (antigen), and their bound complex as input. The residues at the binding interface between the proteins is determined and non-interface residues are 'blocked' using the blockNIres program
 
+With --cdr-filter, the Megadock poses are screened before ZRANK is run: the antigen is placed at every pose (see megadock_lib.py) and poses in which it makes no contact with the antibody CDRs (from nr1797_cdr_identifiers.json) are dropped. ZRANK then only rescores the remaining poses. The number of poses kept and the ZRANK run time are printed, and if the antigen in its native position is given (--native) so are the number of near-native poses kept, to show what the filter costs in accuracy. If the complex has no CDR reference, or no pose passes, all poses are kept.
+
 --------------------------------------------------------------------------
 
 Usage:
 ======
-runmegadockranked.py receptorfile ligandfile OUTPath
+runmegadockranked.py receptorfile ligandfile [OUTPath] [--cdr-filter] [--cutoff distance] [--cdr-reference file] [--native native_antigen_file]
 
 --------------------------------------------------------------------------
 
 Revision History:
 =================
 V1.0   19.11.2021   Original   By: OECH
+V1.1   19.10.26     CDR contact filter of the Megadock poses before ZRANK (--cdr-filter)   By: OECH
+V1.2   19.10.26     Hydrogenated inputs taken from the prepared input cache (prepcache_lib)   By: OECH
+V1.3   19.10.26     Importable as main(argv), run by dockingtools.py   By: OECH
+V1.4   19.10.26     Stops if pdbhadd fails, rather than docking (or caching) incomplete inputs   By: OECH
 
 
 """
@@ -36,88 +42,120 @@ V1.0   19.11.2021   Original   By: OECH
 
 import sys
 import os
-import subprocess
+import time
+import argparse
+from toolrunner_lib import run_tool
+from prepcache_lib import prepared
 from runprofit_lib import combineabdagfiles
+from pdbstructure_lib import read_pdb
+from contacts_lib import CDR_REFERENCE_FILE, load_cdr_reference, cdr_residues
+from megadock_lib import CONTACT_CUTOFF, read_megadock_out, write_megadock_out, cdr_contact_poses, pose_rmsds, filter_report, read_zrank
 
 #*************************************************************************
-# Get input files
-
-# Define receptor (antibody) file
-receptor = sys.argv[1]
-# Define ligand (antigen) file
-ligand = sys.argv[2]
-# Get output path from command line (if present)
-OUTPath = ''
-try:
-   OUTPath = sys.argv[3] + '/'
-except IndexError:
-   OUTPath = './'
-
-#*************************************************************************
-# Add hydrogens to input files
-
-# Get input file basename
-filenamecontents = os.path.basename(receptor).split('.')[0].split('_')
-inputfilename = filenamecontents[0] + "_" + filenamecontents[1]
-# Define output antibody file name
-antibody_hydrogens = OUTPath + inputfilename + "_ab_hydrogens.pdb"
-# Define output antigen file name
-antigen_hydrogens = OUTPath + inputfilename + "_ag_hydrogens.pdb"
-# Antibody file
-subprocess.run([f"pdbhadd -a {receptor} {antibody_hydrogens}"], shell=True)
-# Antigen file
-subprocess.run([f"pdbhadd -a {ligand} {antigen_hydrogens}"], shell=True)
 
-#*************************************************************************
-# Run Megadock
-subprocess.run([f"~/DockingSoftware/megadock-4.1.1/megadock -R {antibody_hydrogens} -L {antigen_hydrogens} -o megadock.out"], shell=True)
-# Define output filename
-outfile = OUTPath+inputfilename + "_megadockranked_Dag.pdb"
-
-#*************************************************************************
-# Run ZRank on megadock outfileq
-subprocess.run(["~/DockingSoftware/zdock3.0.2/zrank megadock.out 1 2000"], shell=True)
-
-# Extracting top ranked output
-# Initiate min out variable
-min_out = 0
-
-# Read Zrank out file
-with open('megadock.out.zr.out') as file:
-   # Read lines
-   rows = file.readlines()
-   # Identify highest scoring output
-   for line in rows:
-      contents = line.split()
-      if float(contents[1]) < min_out:
-         min_out = float(contents[1])
-         # Get number of the top hit
-         top_hit = contents[0]
-
-# Extract top docking result from megadock using decoygen
-subprocess.run(["~/DockingSoftware/megadock-4.1.1/decoygen " + outfile + " " + antigen_hydrogens + " megadock.out " + top_hit], shell=True)
+def main(argv=None):
+   """
+   Run runmegadockranked with the command line arguments argv (default: sys.argv[1:]).
+
+   """
+   argv = sys.argv[1:] if argv is None else [str(arg) for arg in argv]
+
+   # Get input files
+
+   parser = argparse.ArgumentParser(description="Dock an antibody and antigen with Megadock and keep the top ZRANK pose.")
+   # Define receptor (antibody) file
+   parser.add_argument("receptor", help="Receptor (antibody) PDB file")
+   # Define ligand (antigen) file
+   parser.add_argument("ligand", help="Ligand (antigen) PDB file")
+   # Get output path from command line (if present)
+   parser.add_argument("OUTPath", nargs="?", default=".", help="Output directory (default: current directory)")
+   parser.add_argument("--cdr-filter", action="store_true", help="Drop poses with no antigen contact to the antibody CDRs before running ZRANK")
+   parser.add_argument("--cutoff", type=float, default=CONTACT_CUTOFF, help=f"CDR contact distance in Angstroms (default: {CONTACT_CUTOFF})")
+   parser.add_argument("--cdr-reference", default=CDR_REFERENCE_FILE, help="CDR residues of each complex (default: nr1797_cdr_identifiers.json)")
+   parser.add_argument("--native", help="Antigen in its native position, to report the near-native poses kept by the filter")
+   args = parser.parse_args(argv)
+   receptor = args.receptor
+   ligand = args.ligand
+   OUTPath = args.OUTPath + '/'
+
+   # Add hydrogens to input files
+
+   # Get input file basename
+   filenamecontents = os.path.basename(receptor).split('.')[0].split('_')
+   inputfilename = filenamecontents[0] + "_" + filenamecontents[1]
+   # Define output antibody file name
+   antibody_hydrogens = OUTPath + inputfilename + "_ab_hydrogens.pdb"
+   # Define output antigen file name
+   antigen_hydrogens = OUTPath + inputfilename + "_ag_hydrogens.pdb"
+   # Antibody file (taken from the prepared input cache if this antibody has been done before)
+   prepared("pdbhadd", [receptor], [antibody_hydrogens], lambda: run_tool("pdbhadd", ["-a", receptor, antibody_hydrogens], check=True), ["-a"])
+   # Antigen file
+   prepared("pdbhadd", [ligand], [antigen_hydrogens], lambda: run_tool("pdbhadd", ["-a", ligand, antigen_hydrogens], check=True), ["-a"])
+
+   # Run Megadock
+   run_tool("megadock", ["-R", antibody_hydrogens, "-L", antigen_hydrogens, "-o", "megadock.out"])
+   # Define output filename
+   outfile = OUTPath+inputfilename + "_megadockranked_Dag.pdb"
+
+   # Filter poses for CDR contacts
+
+   # Megadock file given to ZRANK, and the original number of each of its poses
+   zrank_input = "megadock.out"
+   output = read_megadock_out("megadock.out")
+   pose_numbers = list(range(1, len(output.pose_lines) + 1))
+
+   if args.cdr_filter:
+      cdrs = cdr_residues(inputfilename, load_cdr_reference(args.cdr_reference))
+      if cdrs is None:
+         print(f"No CDR reference for {inputfilename}, keeping all poses")
+      else:
+         ligand_structure = read_pdb(antigen_hydrogens)
+         keep = cdr_contact_poses(output, read_pdb(antibody_hydrogens), ligand_structure, cdrs, args.cutoff)
+         rmsds = pose_rmsds(output, ligand_structure, read_pdb(args.native)) if args.native else None
+         for line in filter_report(keep, rmsds):
+            print(line)
+         if keep.any():
+            pose_numbers = [pose for pose, kept in zip(pose_numbers, keep) if kept]
+            zrank_input = "megadock_filtered.out"
+            write_megadock_out(output, pose_numbers, zrank_input)
+         else:
+            print("No pose contacts the CDRs, keeping all poses")
+
+   # Run ZRank on megadock outfileq
+   start = time.perf_counter()
+   run_tool("zrank", [zrank_input, 1, len(pose_numbers)])
+   if args.cdr_filter:
+      print(f"{'ZRANK time (s):':<40} {time.perf_counter() - start:.1f}")
+
+   # Extracting top ranked output (lowest ZRANK score), as its number in megadock.out
+   ranked, _ = read_zrank(zrank_input + ".zr.out")
+   top_hit = pose_numbers[ranked[0] - 1]
+
+   # Extract top docking result from megadock using decoygen
+   run_tool("decoygen", [outfile, antigen_hydrogens, "megadock.out", top_hit])
+
+   # Combine ab and dag files to give single docked output file
+
+   # Output filename
+   resultfile = OUTPath + inputfilename + "_MegadockRanked_result.pdb"
+   # Open antibody file
+   with open(receptor) as file:
+      # Extract contents
+      ab = file.readlines()
+      # Open docked antigen file
+   with open(outfile) as file:
+      # Extract contents
+      dag = file.readlines()
+      # Combine antibody and docked antigen files
+   AbDag = ab + dag
+   # Write new PDB file
+   with open(resultfile, "w") as file:
+      for line in AbDag:
+      # Skip lines containing 'END'
+         if 'END' not in line.strip('\n'):
+            file.write(line)
 
 #*************************************************************************
 
-# Combine ab and dag files to give single docked output file
-
-# Output filename
-resultfile = OUTPath + inputfilename + "_MegadockRanked_result.pdb"
-# Open antibody file
-with open(receptor) as file:
-   # Extract contents
-   ab = file.readlines()
-   # Open docked antigen file
-with open(outfile) as file:
-   # Extract contents
-   dag = file.readlines()
-   # Combine antibody and docked antigen files
-AbDag = ab + dag
-# Write new PDB file
-with open(resultfile, "w") as file:
-   for line in AbDag:
-   # Skip lines containing 'END'
-      if 'END' not in line.strip('\n'):
-         file.write(line)
-
-#*************************************************************************
\ No newline at end of file
+if __name__ == "__main__":
+   main()
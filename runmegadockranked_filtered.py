@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 """
-Program: runmegadockranked
-File:    runmegadockranked.py
+Program: runmegadockranked_filtered
+File:    runmegadockranked_filtered.py
 
-Version: V1.0
+Version: V1.4
 Date:    18.11.21
-Function: Run input antibody and antigen files through the Megadock docking algorithm and extract the top-ranked docked ligand into a new PDB file.
+Function: Run input antibody and antigen files through the Megadock docking algorithm and extract the top-ranked docked ligand bound at the antibody combining site into a new PDB file.
 
 Author: Oliver E. C. Hood
 
@@ -13,19 +13,23 @@ Author: Oliver E. C. Hood
 
 Description:
 ============
-This program takes a receptor (antibody), ligand (antigen), and their bound complex as input. The residues at the binding interface between the proteins is determined and non-interface residues are 'blocked' using the blockNIres program
+As runmegadockranked.py, but rather than taking the top ZRANK pose, the ZRANK ranking is walked down until a pose passes an antibody-antigen distance test: the closest antigen atom must be within the maximum distance (10 Angstroms by default) of the antibody combining site (the centroid of the CDR atoms, from nr1797_cdr_identifiers.json). The distance is found for every ranked pose in one pass over the transformed antigen coordinates (see megadock_lib.py), so decoygen is only run for the chosen pose. If the complex has no CDR reference, or no pose passes, the top ZRANK pose is taken as by runmegadockranked.py.
 
 --------------------------------------------------------------------------
 
 Usage:
 ======
-runmegadockranked.py receptorfile ligandfile OUTPath
+runmegadockranked_filtered.py receptorfile ligandfile [OUTPath] [--max-distance distance] [--cdr-reference file]
 
 --------------------------------------------------------------------------
 
 Revision History:
 =================
 V1.0   19.11.2021   Original   By: OECH
+V1.1   19.10.26     Distance filter completed: in-process screen of all ranked poses, decoygen for the chosen pose only   By: OECH
+V1.2   19.10.26     Hydrogenated inputs taken from the prepared input cache (prepcache_lib)   By: OECH
+V1.3   19.10.26     Importable as main(argv), run by dockingtools.py   By: OECH
+V1.4   19.10.26     Stops if pdbhadd fails, rather than docking (or caching) incomplete inputs   By: OECH
 
 
 """
@@ -36,137 +40,112 @@ V1.0   19.11.2021   Original   By: OECH
 
 import sys
 import os
-import subprocess
-from runprofit_lib import combineabdagfiles
+import argparse
+import numpy as np
+from toolrunner_lib import run_tool
+from prepcache_lib import prepared
+from pdbstructure_lib import read_pdb
+from contacts_lib import CDR_REFERENCE_FILE, load_cdr_reference, cdr_residues
+from megadock_lib import read_megadock_out, read_zrank, combining_site, site_distances
 
 #*************************************************************************
-# Get input files
-
-# Define receptor (antibody) file
-receptor = sys.argv[1]
-# Define ligand (antigen) file
-ligand = sys.argv[2]
-# Get output path from command line (if present)
-OUTPath = ''
-try:
-   OUTPath = sys.argv[3] + '/'
-except IndexError:
-   OUTPath = './'
 
-#*************************************************************************
-# Add hydrogens to input files
-
-# Get input file basename
-filenamecontents = os.path.basename(receptor).split('.')[0].split('_')
-inputfilename = filenamecontents[0] + "_" + filenamecontents[1]
-# Define output antibody file name
-antibody_hydrogens = OUTPath + inputfilename + "_ab_hydrogens.pdb"
-# Define output antigen file name
-antigen_hydrogens = OUTPath + inputfilename + "_ag_hydrogens.pdb"
-# Antibody file
-subprocess.run([f"pdbhadd -a {receptor} {antibody_hydrogens}"], shell=True)
-# Antigen file
-subprocess.run([f"pdbhadd -a {ligand} {antigen_hydrogens}"], shell=True)
-
-#*************************************************************************
-# Run Megadock
-subprocess.run([f"~/DockingSoftware/megadock-4.1.1/megadock -R {antibody_hydrogens} -L {antigen_hydrogens} -o megadock.out"], shell=True)
-# Define output filename
-outfile = OUTPath+inputfilename + "_megadockranked_Dag.pdb"
-
-#*************************************************************************
-# Run ZRank on megadock outfileq
-subprocess.run(["~/DockingSoftware/zdock3.0.2/zrank megadock.out 1 2000"], shell=True)
-
-# Extracting top ranked output
-
-# Initiate min out variable
-min_out = 0
-
-# Read Zrank out file
-with open('megadock.out.zr.out') as file:
-   # Read lines
-   rows = file.readlines()
-   # Identify highest scoring output
-   for line in rows:
-      contents = line.split()
-      if float(contents[1]) < min_out:
-         min_out = float(contents[1])
-         # Get number of the top hit
-         top_hit = contents[0]
-
-# define gen_decoy function
-def gen_decoy(outfile, antigen_hydrogens, top_hit):
-    # Extract top docking result from megadock using decoygen
-    subprocess.run(["~/DockingSoftware/megadock-4.1.1/decoygen " + outfile + " " + antigen_hydrogens + " megadock.out " + top_hit], shell=True)
-
-gen_decoy(outfile, antigen_hydrogens, top_hit)
+# Default maximum distance (Angstroms) from the combining site to the antigen
+MAX_DISTANCE = 10.0
 
 #*************************************************************************
 
-# Combine ab and dag files to give single docked output file
-
-# Output filename
-resultfile = OUTPath + inputfilename + "_MegadockRanked_result.pdb"
-# Open antibody file
-with open(receptor) as file:
-   # Extract contents
-   ab = file.readlines()
-   # Open docked antigen file
-with open(outfile) as file:
-   # Extract contents
-   dag = file.readlines()
-   # Combine antibody and docked antigen files
-AbDag = ab + dag
-# Write new PDB file
-with open(resultfile, "w") as file:
-   for line in AbDag:
-   # Skip lines containing 'END'
-      if 'END' not in line.strip('\n'):
-         file.write(line)
+def main(argv=None):
+   """
+   Run runmegadockranked_filtered with the command line arguments argv (default: sys.argv[1:]).
+
+   """
+   argv = sys.argv[1:] if argv is None else [str(arg) for arg in argv]
+
+   # Get input files
+
+   parser = argparse.ArgumentParser(description="Dock an antibody and antigen with Megadock and keep the best ZRANK pose bound at the combining site.")
+   # Define receptor (antibody) file
+   parser.add_argument("receptor", help="Receptor (antibody) PDB file")
+   # Define ligand (antigen) file
+   parser.add_argument("ligand", help="Ligand (antigen) PDB file")
+   # Get output path from command line (if present)
+   parser.add_argument("OUTPath", nargs="?", default=".", help="Output directory (default: current directory)")
+   parser.add_argument("--max-distance", type=float, default=MAX_DISTANCE, help=f"Maximum distance from the combining site to the antigen in Angstroms (default: {MAX_DISTANCE})")
+   parser.add_argument("--cdr-reference", default=CDR_REFERENCE_FILE, help="CDR residues of each complex (default: nr1797_cdr_identifiers.json)")
+   args = parser.parse_args(argv)
+   receptor = args.receptor
+   ligand = args.ligand
+   OUTPath = args.OUTPath + '/'
+
+   # Add hydrogens to input files
+
+   # Get input file basename
+   filenamecontents = os.path.basename(receptor).split('.')[0].split('_')
+   inputfilename = filenamecontents[0] + "_" + filenamecontents[1]
+   # Define output antibody file name
+   antibody_hydrogens = OUTPath + inputfilename + "_ab_hydrogens.pdb"
+   # Define output antigen file name
+   antigen_hydrogens = OUTPath + inputfilename + "_ag_hydrogens.pdb"
+   # Antibody file (taken from the prepared input cache if this antibody has been done before)
+   prepared("pdbhadd", [receptor], [antibody_hydrogens], lambda: run_tool("pdbhadd", ["-a", receptor, antibody_hydrogens], check=True), ["-a"])
+   # Antigen file
+   prepared("pdbhadd", [ligand], [antigen_hydrogens], lambda: run_tool("pdbhadd", ["-a", ligand, antigen_hydrogens], check=True), ["-a"])
+
+   # Run Megadock
+   run_tool("megadock", ["-R", antibody_hydrogens, "-L", antigen_hydrogens, "-o", "megadock.out"])
+   # Define output filename
+   outfile = OUTPath+inputfilename + "_megadockranked_Dag.pdb"
+
+   # Run ZRank on megadock outfile
+   output = read_megadock_out("megadock.out")
+   run_tool("zrank", ["megadock.out", 1, len(output.pose_lines)])
+
+   # Poses ranked from best (lowest ZRANK score) to worst
+   ranked, _ = read_zrank("megadock.out.zr.out")
+   top_hit = ranked[0]
+
+   # Filter for ab-ag distance
+
+   cdrs = cdr_residues(inputfilename, load_cdr_reference(args.cdr_reference))
+   site = combining_site(read_pdb(antibody_hydrogens), cdrs) if cdrs else None
+   if site is None:
+      print(f"No CDR reference for {inputfilename}, taking the top ZRANK pose")
+   else:
+      # Distance from the combining site to the antigen for every ranked pose
+      distances = site_distances(output, read_pdb(antigen_hydrogens), site, ranked)
+      passed = np.nonzero(distances < args.max_distance)[0]
+      if len(passed):
+         top_hit = ranked[passed[0]]
+         print(f"Taking ZRANK rank {passed[0] + 1} (pose {top_hit}), {distances[passed[0]]:.1f} Angstroms from the combining site")
+      else:
+         print(f"No pose within {args.max_distance} Angstroms of the combining site, taking the top ZRANK pose")
+
+   # Extract chosen docking result from megadock using decoygen
+   run_tool("decoygen", [outfile, antigen_hydrogens, "megadock.out", top_hit])
+
+   # Combine ab and dag files to give single docked output file
+
+   # Output filename
+   resultfile = OUTPath + inputfilename + "_MegadockRanked_result.pdb"
+   # Open antibody file
+   with open(receptor) as file:
+      # Extract contents
+      ab = file.readlines()
+      # Open docked antigen file
+   with open(outfile) as file:
+      # Extract contents
+      dag = file.readlines()
+      # Combine antibody and docked antigen files
+   AbDag = ab + dag
+   # Write new PDB file
+   with open(resultfile, "w") as file:
+      for line in AbDag:
+      # Skip lines containing 'END'
+         if 'END' not in line.strip('\n'):
+            file.write(line)
 
 #*************************************************************************
 
-# Function to get second, third megadock output
-def filter_output(index: int):
-    # Define indices score lists
-    scores = []
-    # Define dictionary indices:scores
-    score_dict = {} #format == index:score
-    # Set initial min_out
-    min_out = 0
-    # Open file
-    with open('megadock.out.zr.out') as file:
-       # Read lines
-       rows = file.readlines()
-       # Identify highest scoring output
-       for line in rows:
-          contents = line.split()
-          index = contents[0]
-          score = contents [1]
-          scores += [score]
-          score_dict[index] = score
-    # Sort list of scores
-    scores_sorted = scores.sort()
-    # Get required score (second/third best etc)
-    score_out = scores_sorted[index]
-    # return index of second/third/etc best score
-    for number, score in score_dict:
-        if score == score_out:
-            return number
-
-#*************************************************************************
-
-# Filter for ab-ag distance
-
-# Get distance between ab and ag
-abagdist = subprocess.check_output(f"abagdist {resultfile}")
-
-# Add filtering
-if float(abagdist) >= 10.0:
-    next_hit =
-
-
-
-
-result = subprocess.check_output("profit -f" + " " + script + " " + OG_nohydrogens + " " + docked_nohydrogens + " | grep 'RMS' | tail -2", shell=True)
+if __name__ == "__main__":
+   main()
@@ -3,7 +3,7 @@
 Program: runpiper
 File:    runpiper.py
 
-Version:  V1.0
+Version:  V1.3
 Date:     25.11.2021
 Function: Take an antibody and an antigen file as input and run the piper docking algorithm on them.
 
@@ -30,6 +30,9 @@ nohup nice -10 runpiper.py <receptor> <ligand> <OUTPath> &> sysouts.txt &
 Revision History:
 =================
 V1.0   25.11.2021   Original   By: OECH
+V1.1   19.10.26     Prepared inputs taken from the prepared input cache (prepcache_lib)   By: OECH
+V1.2   19.10.26     Importable as main(argv), run by dockingtools.py   By: OECH
+V1.3   19.10.26     Stops if prepare.py fails, rather than docking (or caching) incomplete inputs   By: OECH
 
 
 """
@@ -40,113 +43,116 @@ V1.0   25.11.2021   Original   By: OECH
 
 import os
 import sys
-import subprocess
+import shutil
+from toolrunner_lib import run_tool, run_script, data_path
+from prepcache_lib import prepared
 
 #*************************************************************************
 
-# Define input files
+def main(argv=None):
+   """
+   Run runpiper with the command line arguments argv (default: sys.argv[1:]).
 
-# Define original (unsplit) PDB file
-OG_file = sys.argv[1]
+   """
+   argv = sys.argv[1:] if argv is None else [str(arg) for arg in argv]
 
-# Define receptor (antibody) file
-receptor = sys.argv[2]
+   # Define input files
 
-# Define ligand (antigen) file
-ligand = sys.argv[3]
+   # Define original (unsplit) PDB file
+   OG_file = argv[0]
 
-# Get outpath from command line (if present)
-OUTPath = './'
-try:
-   OUTPath = sys.argv[4] + '/'
-except IndexError:
-   OUTPath = './'
-
-#*************************************************************************
-
-# Process input files
-
-# Process receptor
-subprocess.run([f"~/DockingSoftware/piper/protein_prep/prepare.py {receptor}"], shell=True)
-# Get original receptor file name
-receptor_name = os.path.basename(receptor).split('.')[0]
-# Define processed receptor filename
-receptor_processed = receptor_name + "_pnon.pdb"
-# Move processed receptor to OUTPath directory
-subprocess.run([f"mv {receptor_processed} {OUTPath}"], shell=True)
-# Define new processed receptor filename
-receptor_processed = OUTPath + receptor_name + "_pnon.pdb"
-
-# Process ligand
-subprocess.run([f"~/DockingSoftware/piper/protein_prep/prepare.py {ligand}"], shell=True)
-# Get original ligand file name
-ligand_name = os.path.basename(ligand).split('.')[0]
-# Define processed ligand filename
-ligand_processed = ligand_name + "_pnon.pdb"
-# Move processed receptor to OUTPath directory
-subprocess.run([f"mv {ligand_processed} {OUTPath}"], shell=True)
-# Define new processed receptor file
-ligand_processed = OUTPath + ligand_name + "_pnon.pdb"
-
-#*************************************************************************
-# Mask non-interface residues
-
-# Write maskfile using maskNIres.py
-subprocess.run([f"~/ab-docking-scripts/maskNIres.py {OG_file} {receptor} {ligand} {OUTPath}"], shell=True)
-
-# Define maskfile name (+location)
-OG_filename = os.path.basename(OG_file).split('.')[0]
-maskfile = OUTPath + OG_filename + "_maskfile.pdb"
-
-
-#*************************************************************************
+   # Define receptor (antibody) file
+   receptor = argv[1]
 
-# Run piper on processed files
-subprocess.run([f"~/DockingSoftware/piper/piper --maskrec={maskfile} -p ~/DockingSoftware/piper/prms/atoms.prm -f ~/DockingSoftware/piper/prms/coeffs.0.0.6.antibody.prm -r ~/DockingSoftware/piper/prms/rots.prm {receptor_processed} {ligand_processed}"], shell=True)
-
-#*************************************************************************
-
-# Process piper output files
-
-# Create pairwise RMSD matrices
-subprocess.run([f"sblu measure pwrmsd -n 1000 --only-CA --only-interface --rec {receptor_processed} -o clustermat.000.00 {ligand_processed} ft.000.00 ~/DockingSoftware/piper/prms/rots.prm"], shell=True)
-
-# Run clustering on the matrix
-subprocess.run([f"sblu docking cluster -o clustermat.000.00.clusters clustermat.000.00"], shell=True)
-
-# Generate cluster centers without minimising models
-subprocess.run([f"sblu docking gen_cluster_pdb -l 1 clustermat.000.00.clusters ft.000.00 ~/DockingSoftware/piper/prms/rots.prm {ligand_processed} -o lig.000"], shell=True)
-
-# Output Dag PDB file will always be called 'lig.000.00.pdb'
-
-#*************************************************************************
-# Combine antibody and docked antigen files to give a single output file
-
-# Get input filename
-inputfilename = os.path.basename(OG_file).split('.')[0]
-# Define output file name
-resultfile = OUTPath + inputfilename + "_Piper_result.pdb"
-# Define Dag filename
-dag_filename = "lig.000.00.pdb"
-# Combine antibody and Dag files
-with open(receptor) as file:
-   # Extract contents
-   ab = file.readlines()
-   # Open docked antigen file
-with open(dag_filename) as file:
-   # Extract contents
-   dag = file.readlines()
-   # Combine antibody and docked antigen files
-AbDag = ab + dag
-# Write new PDB file
-with open(resultfile, "w") as file:
-   for line in AbDag:
-   # Skip lines containing 'END'
-      if 'END' not in line.strip('\n'):
-         file.write(line)
+   # Define ligand (antigen) file
+   ligand = argv[2]
 
+   # Get outpath from command line (if present)
+   OUTPath = './'
+   try:
+      OUTPath = argv[3] + '/'
+   except IndexError:
+      OUTPath = './'
+
+   # Process input files (taken from the prepared input cache if these inputs have been processed before)
+
+   def process(PDBfile):
+      """
+      Run prepare.py on a PDB file, moving the processed file (<name>_pnon.pdb) to OUTPath. Returns the processed filename.
+      """
+      # Get original file name
+      name = os.path.basename(PDBfile).split('.')[0]
+      # Define processed filename (in OUTPath)
+      processed = OUTPath + name + "_pnon.pdb"
+      def prepare():
+         run_tool("piper_prepare", [PDBfile], check=True)
+         # Move processed file to OUTPath directory
+         shutil.move(name + "_pnon.pdb", processed)
+      prepared("piper_prepare", [PDBfile], [processed], prepare)
+      return processed
+
+   # Process receptor
+   receptor_processed = process(receptor)
+
+   # Process ligand
+   ligand_processed = process(ligand)
+
+   # Mask non-interface residues
+
+   # Write maskfile using maskNIres.py
+   run_script("maskNIres.py", [OG_file, receptor, ligand, OUTPath])
+
+   # Define maskfile name (+location)
+   OG_filename = os.path.basename(OG_file).split('.')[0]
+   maskfile = OUTPath + OG_filename + "_maskfile.pdb"
+
+   # Run piper on processed files
+   run_tool("piper", [f"--maskrec={maskfile}", "-p", data_path("piper_prms", "atoms.prm"), "-f", data_path("piper_prms", "coeffs.0.0.6.antibody.prm"), "-r", data_path("piper_prms", "rots.prm"), receptor_processed, ligand_processed])
+
+   # Process piper output files
+
+   # Create pairwise RMSD matrices
+   run_tool("sblu", ["measure", "pwrmsd", "-n", 1000, "--only-CA", "--only-interface", "--rec", receptor_processed, "-o", "clustermat.000.00", ligand_processed, "ft.000.00", data_path("piper_prms", "rots.prm")])
+
+   # Run clustering on the matrix
+   run_tool("sblu", ["docking", "cluster", "-o", "clustermat.000.00.clusters", "clustermat.000.00"])
+
+   # Generate cluster centers without minimising models
+   run_tool("sblu", ["docking", "gen_cluster_pdb", "-l", 1, "clustermat.000.00.clusters", "ft.000.00", data_path("piper_prms", "rots.prm"), ligand_processed, "-o", "lig.000"])
+
+   # Output Dag PDB file will always be called 'lig.000.00.pdb'
+
+   # Combine antibody and docked antigen files to give a single output file
+
+   # Get input filename
+   inputfilename = os.path.basename(OG_file).split('.')[0]
+   # Define output file name
+   resultfile = OUTPath + inputfilename + "_Piper_result.pdb"
+   # Define Dag filename
+   dag_filename = "lig.000.00.pdb"
+   # Combine antibody and Dag files
+   with open(receptor) as file:
+      # Extract contents
+      ab = file.readlines()
+      # Open docked antigen file
+   with open(dag_filename) as file:
+      # Extract contents
+      dag = file.readlines()
+      # Combine antibody and docked antigen files
+   AbDag = ab + dag
+   # Write new PDB file
+   with open(resultfile, "w") as file:
+      for line in AbDag:
+      # Skip lines containing 'END'
+         if 'END' not in line.strip('\n'):
+            file.write(line)
+
+   # Remove unneeded files (keeping ft.000.00 bc it takes so long to generate, better safe than sorry!)
+   for clusterfile in ["clustermat.000.00", "clustermat.000.00.clusters"]:
+      if os.path.exists(clusterfile):
+         os.remove(clusterfile)
 
 #*************************************************************************
 
-# Remove unneeded files (keeping ft.000.00 bc it takes so long to generate, better safe than sorry!)
-subprocess.run([f"rm clustermat.000.00 clustermat.000.00.clusters"], shell=True)
\ No newline at end of file
+if __name__ == "__main__":
+   main()
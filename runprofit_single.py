@@ -3,7 +3,7 @@
 Program: runprofit_single
 File:    runprofit_single.py
 
-Version: V1.0
+Version: V1.1
 Date:    
 Function: Process the output files of docking algorithms run on split antibody/antigen structures to compare them to the original antibody/antigen structures using ProFit. Input is in the form of a single PDB file containing both the antibody and docked antigen chains.
 
@@ -21,11 +21,14 @@ Usage:
 ======
 runprofit_single OG_file Docked_file OUTPath
 
+profit_single() gives the same two lines without starting a new interpreter (used by dockingtools_lib.evaluate_results).
+
 --------------------------------------------------------------------------
 
 Revision History:
 =================
 V1.0   06.12.2021   Original   By: OECH
+V1.1   19.10.26     profit_single() and main(argv) for in-process use, run by dockingtools.py   By: OECH
 
 """
 
@@ -34,50 +37,72 @@ V1.0   06.12.2021   Original   By: OECH
 # Import Libraries
 
 import sys, os
-import subprocess
+from subprocess import PIPE
+from toolrunner_lib import run_tool
 from runprofit_lib import (writecontrolscript)
 
 #*************************************************************************
 
-# Get input files from command line
-# Original PDB file
-OG_file = sys.argv[1]
-# Docked structure file
-Docked_file = sys.argv[2]
-# Get output path from command line (if present)
-OUTPath = ''
-try:
-   OUTPath = sys.argv[3] + '/'
-except IndexError:
-   OUTPath = './'
-
-# Get input filenames
-inputfilename = os.path.basename(OG_file).split('.')[0]
-docked_filename = os.path.basename(Docked_file).split('.')[0]
-
-# Define new filenames
-OG_nohydrogens = OUTPath + inputfilename + "_nohydrogens.pdb"
-docked_nohydrogens = OUTPath + docked_filename + "_nohydrogens.pdb"
-
-# Strip hydrogens from input files
-subprocess.run([f"pdbhstrip {OG_file} {OG_nohydrogens}"], shell=True)
-subprocess.run([f"pdbhstrip {Docked_file} {docked_nohydrogens}"], shell=True)
-
-# Write the profit control script
-script = str(writecontrolscript(OG_file))
-
-# Run profit, returning the RMS values across all atoms and across CA atoms
-result = subprocess.check_output("profit -f" + " " + script + " " + OG_nohydrogens + " " + docked_nohydrogens + " | grep 'RMS' | tail -2", shell=True)
-# Decode results
-result = str(result, 'utf-8')
-# Split result text into list
-result = result.split()
-# Set all_atoms RMSD
-all_atoms = result[1]
-# Set CA atoms RMSD
-CA_atoms = result[3]
-# Print RMSD values
-print('All atoms RMSD:  '+all_atoms)
-print('CA atoms RMSD:   '+CA_atoms)
-# Remove .prf file
-subprocess.run(['rm ' + script], shell=True)
\ No newline at end of file
+def profit_single(OG_file, Docked_file, OUTPath='./'):
+   """
+   Fit Docked_file to OG_file on the antibody with ProFit and return the RMSD lines over the antigen (all atoms and CA atoms), as printed by this script.
+
+   """
+   # Get input filenames
+   inputfilename = os.path.basename(OG_file).split('.')[0]
+   docked_filename = os.path.basename(Docked_file).split('.')[0]
+
+   # Define new filenames
+   OG_nohydrogens = OUTPath + inputfilename + "_nohydrogens.pdb"
+   docked_nohydrogens = OUTPath + docked_filename + "_nohydrogens.pdb"
+
+   # Strip hydrogens from input files
+   run_tool("pdbhstrip", [OG_file, OG_nohydrogens])
+   run_tool("pdbhstrip", [Docked_file, docked_nohydrogens])
+
+   # Write the profit control script
+   script = str(writecontrolscript(OG_file))
+
+   # Run profit, returning the RMS values across all atoms and across CA atoms
+   result = run_tool("profit", ["-f", script, OG_nohydrogens, docked_nohydrogens], stdout=PIPE).stdout
+   # Remove .prf file
+   os.remove(script)
+   # Keep the last two 'RMS' lines (final all atoms and CA atoms values)
+   result = [line for line in result.splitlines() if 'RMS' in line][-2:]
+   # Split result text into list
+   result = " ".join(result).split()
+   # Set all_atoms RMSD
+   all_atoms = result[1]
+   # Set CA atoms RMSD
+   CA_atoms = result[3]
+   return ['All atoms RMSD:  '+all_atoms, 'CA atoms RMSD:   '+CA_atoms]
+
+#*************************************************************************
+
+def main(argv=None):
+   """
+   Run runprofit_single with the command line arguments argv (default: sys.argv[1:]).
+
+   """
+   argv = sys.argv[1:] if argv is None else [str(arg) for arg in argv]
+
+   # Get input files from command line
+   # Original PDB file
+   OG_file = argv[0]
+   # Docked structure file
+   Docked_file = argv[1]
+   # Get output path from command line (if present)
+   OUTPath = ''
+   try:
+      OUTPath = argv[2] + '/'
+   except IndexError:
+      OUTPath = './'
+
+   # Print RMSD values
+   for line in profit_single(OG_file, Docked_file, OUTPath):
+      print(line)
+
+#*************************************************************************
+
+if __name__ == "__main__":
+   main()
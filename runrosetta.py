@@ -3,7 +3,7 @@
 Program: runrosetta
 File:    runrosetta.py
 
-Version:  V1.0
+Version:  V1.4
 Date:     03.12.21
 Function: Takes a PDB file containing an antibody and an antigen as input and runs the Rosetta docking algorithm on them, extracting the top scoring structure as the output.
 
@@ -26,6 +26,10 @@ runrosetta.py PDBfile antibody antigen num_outputs OUTPath
 Revision History:
 =================
 V1.0   03.12.2021   Original   By: OECH
+V1.1   19.10.26     Prepacked input taken from the prepared input cache (prepcache_lib)   By: OECH
+V1.2   19.10.26     Hydrogens stripped in-process (pdbtransform_lib)   By: OECH
+V1.3   19.10.26     Importable as main(argv), run by dockingtools.py   By: OECH
+V1.4   19.10.26     Stops if the prepack fails, rather than docking (or caching) incomplete inputs   By: OECH
 
 """
 
@@ -33,96 +37,102 @@ V1.0   03.12.2021   Original   By: OECH
 
 # Import Libraries
 
-import subprocess
 import sys
 import os
+import gzip
+import shutil
+from toolrunner_lib import run_tool
+from prepcache_lib import prepared
+from pdbtransform_lib import transform_pdb, strip_hydrogens
 from runrosetta_lib import (writeprepack_flags, writedocking_flags, getbestresult, combine_input_files)
 
 #*************************************************************************
 
-# Define Input Files
-# PDB file
-PDBfile = sys.argv[1]
-# Antibody file
-antibody = sys.argv[2]
+def main(argv=None):
+   """
+   Run runrosetta with the command line arguments argv (default: sys.argv[1:]).
 
-# Antigen file
-antigen = sys.argv[3]
+   """
+   argv = sys.argv[1:] if argv is None else [str(arg) for arg in argv]
 
-# Get number of docking runs to carry out (num_outputs)
-runs = 10
-try:
-   runs = sys.argv[4]
-except IndexError:
-   runs = 10
-
-# Define OUTPath
-OUTPath = './'
-try:
-   OUTPath = sys.argv[5] + '/'
-except IndexError:
-   OUTPath = './'
+   # Define Input Files
+   # PDB file
+   PDBfile = argv[0]
+   # Antibody file
+   antibody = argv[1]
 
-#*************************************************************************
+   # Antigen file
+   antigen = argv[2]
 
-# Create directory to output docked PDBs
-outdir = OUTPath + "docking_out"
-subprocess.run([f"mkdir {outdir}"], shell=True)
+   # Get number of docking runs to carry out (num_outputs)
+   runs = 10
+   try:
+      runs = argv[3]
+   except IndexError:
+      runs = 10
 
-#*************************************************************************
+   # Define OUTPath
+   OUTPath = './'
+   try:
+      OUTPath = argv[4] + '/'
+   except IndexError:
+      OUTPath = './'
 
-# Combine input files into signle PDB
-combine_input_files(antibody, antigen)
+   # Create directory to output docked PDBs
+   outdir = OUTPath + "docking_out"
+   os.makedirs(outdir, exist_ok=True)
 
-# Define combined filename
-# Get input filename
-filename = os.path.basename(PDBfile).split('.')[0]
-# Combined filename
-combined_filename = OUTPath + filename + "_Rosetta_input.pdb"
+   # Combine input files into signle PDB
+   combine_input_files(antibody, antigen)
 
-#*************************************************************************
+   # Define combined filename
+   # Get input filename
+   filename = os.path.basename(PDBfile).split('.')[0]
+   # Combined filename
+   combined_filename = OUTPath + filename + "_Rosetta_input.pdb"
 
-# Prepack the input structure
+   # Prepack the input structure
 
-# Write prepack_flags
-writeprepack_flags(PDBfile)
+   # Write prepack_flags
+   writeprepack_flags(PDBfile)
 
-# Run the prepack protocol
-subprocess.run(["/home/oliverh/DockingSoftware/rosetta/rosetta/main/source/bin/docking_prepack_protocol.default.linuxgccrelease @prepack_flags"], shell=True)
+   # Run the prepack protocol (or take the prepacked structure from the prepared input cache if this complex has been prepacked before)
+   with open("prepack_flags") as file:
+      prepack_flags = file.read().split()
+   prepared("rosetta_prepack", [filename + "_Rosetta_input.pdb"], [filename + "_Rosetta_input_prepack_0001.pdb"], lambda: run_tool("rosetta_prepack", ["@prepack_flags"], check=True), prepack_flags)
 
-#*************************************************************************
+   # Perform docking run
 
-# Perform docking run
+   # Write docking_flags
+   writedocking_flags(PDBfile, nstructures=runs, OUTPath=OUTPath)
 
-# Write docking_flags
-writedocking_flags(PDBfile, nstructures=runs, OUTPath=OUTPath)
+   # Run the docking protocol
+   run_tool("rosetta_docking", ["@docking_flags"])
 
-# Run the docking protocol
-subprocess.run(["/home/oliverh/DockingSoftware/rosetta/rosetta/main/source/bin/docking_protocol.default.linuxgccrelease @docking_flags"], shell=True)
+   # Get the best docked structure from the scores file
+   scores_file = "score_local_dock.sc"
+   best_structure = getbestresult(scores_file)
+   best_structure_file = best_structure
+   best_structure_file_compressed = best_structure_file + ".gz"
 
-#*************************************************************************
+   # Define new filename for best structure
+   rosetta_hydrogens = OUTPath + filename + "_Rosetta_hydrogens.pdb"
 
-# Get the best docked structure from the scores file
-scores_file = "score_local_dock.sc"
-best_structure = getbestresult(scores_file)
-best_structure_file = best_structure
-best_structure_file_compressed = best_structure_file + ".gz"
+   # Decompress best result
+   with gzip.open(f"{outdir}/{best_structure_file_compressed}", "rb") as compressed, open(f"{outdir}/{best_structure_file}", "wb") as decompressed:
+      shutil.copyfileobj(compressed, decompressed)
+   os.remove(f"{outdir}/{best_structure_file_compressed}")
+   # Copy the file contents to new file
+   shutil.copy(f"{outdir}/{best_structure_file}", rosetta_hydrogens)
 
-# Define new filename for best structure
-rosetta_hydrogens = OUTPath + filename + "_Rosetta_hydrogens.pdb"
+   # Strip hydrogens from output file (ProFit doesn't like them)
 
-# Decompress best result
-subprocess.run([f"gunzip {outdir}/{best_structure_file_compressed}"], shell=True)
-# Copy the file contents to new file
-subprocess.run([f"cp {outdir}/{best_structure_file} {rosetta_hydrogens}"], shell=True)
+   # New filename
+   rosetta_out = OUTPath + filename + "_Rosetta_result.pdb"
+   # Strip hydrogens (as pdbhstrip)
+   transform_pdb(rosetta_hydrogens, rosetta_out, [strip_hydrogens()])
 
 #*************************************************************************
 
-# Strip hydrogens from output file (ProFit doesn't like them)
-
-# New filename
-rosetta_out = OUTPath + filename + "_Rosetta_result.pdb"
-# Strip hydrogens using pdbhstrip
-subprocess.run([f"pdbhstrip {rosetta_hydrogens} {rosetta_out}"], shell=True)
-
-#*************************************************************************
\ No newline at end of file
+if __name__ == "__main__":
+   main()
@@ -35,6 +35,7 @@ V1.0   03.12.2021   Original   By: OECH
 
 import os
 from dockingtools_lib import (getantigenchainid, writefile)
+from toolrunner_lib import data_path
 
 #*************************************************************************
 
@@ -91,7 +92,7 @@ def writeprepack_flags(PDBfile):
    # Write list of prepack_flags contents
    flags = [
       # Location of the rosetta database
-      "-database /home/oliverh/DockingSoftware/rosetta/rosetta/main/database", 
+      f"-database {data_path('rosetta_database')}", 
       # Spacer
       "", 
       # Input filename
@@ -145,7 +146,7 @@ def writedocking_flags(PDBfile, nstructures=25, OUTPath='./'):
    # Write list of docking_flags contents
    flags = [
       # Location of the rosetta database
-      "-database /home/oliverh/DockingSoftware/rosetta/rosetta/main/database", 
+      f"-database {data_path('rosetta_database')}", 
       # Spacer
       "", 
       # Input file
@@ -35,8 +35,8 @@ V1.0   04.11.21   Original   By: OECH
 import sys
 import os
 import random
-import subprocess
 from subprocess import PIPE
+from toolrunner_lib import run_tool, run_pipeline
 
 #*************************************************************************
 
@@ -102,7 +102,7 @@ def extractantibodychains(PDBfile):
       return PDBfile + ' has no antigen'
    else:
       #Extract the antibody chains
-      get_antibody_chains = subprocess.run(["pdbgetchain H,L " + PDBfile], shell=True, universal_newlines=True, stdout=subprocess.PIPE)
+      get_antibody_chains = run_tool("pdbgetchain", ["H,L", PDBfile], stdout=PIPE)
    antibody_chains = get_antibody_chains.stdout
    return antibody_chains
 
@@ -127,11 +127,11 @@ def extractantigenchain(PDBfile):
       return PDBfile + ' has no antigen'
    else:
       #Extract the antigen chain
-      get_processed_antigen_chain = subprocess.run(["pdbgetchain " + agchainid + " " + PDBfile
+      get_processed_antigen_chain = run_pipeline([("pdbgetchain", [agchainid, PDBfile]),
       #Rotate the antigen chain by up to 8 degrees in either direction
-      + " | pdbrotate -x " + str((random.randint(-8,8))) + " -y " + str((random.randint(-8,8))) + " -z " + str((random.randint(-8,8)))
+      ("pdbrotate", ["-x", random.randint(-8,8), "-y", random.randint(-8,8), "-z", random.randint(-8,8)]),
       #Translate the antigen chain by between 5 and 10 angstroms
-      + " | pdbtranslate -x " + str((random.randint(5,10))) + " -y " + str((random.randint(5,10))) + " -z " + str((random.randint(5,10)))], stdout=subprocess.PIPE, universal_newlines=True, shell=True)
+      ("pdbtranslate", ["-x", random.randint(5,10), "-y", random.randint(5,10), "-z", random.randint(5,10)])], stdout=PIPE)
    processed_antigen_chain = get_processed_antigen_chain.stdout
    #Return the processed antibody chain
    return processed_antigen_chain
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Program: superpose_lib
+File:    superpose_lib.py
+
+Version:  V1.0
+Date:     19.10.26
+Function:   Library: Least squares superposition and RMSD of many structures at once (Kabsch algorithm).
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+The optimal rotation of one set of coordinates onto another is found with the Kabsch algorithm (singular value decomposition of the covariance matrix). All functions take either a single (atoms, 3) array or a batch of (N, atoms, 3) arrays fitted onto the same target, so that thousands of decoys can be fitted with one batched SVD rather than one ProFit run each. RMSDs can be calculated on the fitted atoms or, after fitting on one set of atoms, on another set (e.g. fit on the antibody, RMSD of the antigen).
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import numpy as np
+
+#*************************************************************************
+
+def _batch(coords):
+   """
+   Return coords as a float64 (N, atoms, 3) array and whether a single structure was given.
+
+   """
+   coords = np.asarray(coords, dtype=np.float64)
+   if coords.ndim == 2:
+      return coords[None], True
+   return coords, False
+
+#*************************************************************************
+
+def kabsch(mobile, target):
+   """
+   Find the rotations R (N, 3, 3) and translations t (N, 3) best fitting each mobile structure onto target, so that mobile @ R.T + t is the fitted structure. mobile is (atoms, 3) or (N, atoms, 3) and target is (atoms, 3).
+
+   >>> target = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 2.0, 0.0], [0.0, 0.0, 3.0]])
+   >>> turn = np.array([[0.0, -1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+   >>> R, t = kabsch(target @ turn.T + 5.0, target)
+   >>> np.allclose((target @ turn.T + 5.0) @ R[0].T + t[0], target)
+   True
+
+   """
+   mobile, _ = _batch(mobile)
+   target = np.asarray(target, dtype=np.float64)
+   mobile_centre = mobile.mean(axis=1)
+   target_centre = target.mean(axis=0)
+   covariance = np.einsum('nai,aj->nij', mobile - mobile_centre[:, None, :], target - target_centre)
+   U, _, Vt = np.linalg.svd(covariance)
+   # Correct for reflections
+   sign = np.sign(np.linalg.det(U @ Vt))
+   D = np.ones((len(mobile), 3))
+   D[:, 2] = sign
+   R = np.einsum('nji,nj,nkj->nik', Vt, D, U)
+   t = target_centre - np.einsum('nij,nj->ni', R, mobile_centre)
+   return R, t
+
+#*************************************************************************
+
+def apply_transform(coords, R, t):
+   """
+   Apply rotations R (N, 3, 3) and translations t (N, 3) to coords ((N, atoms, 3), or (atoms, 3) to be moved by each transform).
+
+   """
+   coords = np.asarray(coords, dtype=np.float64)
+   if coords.ndim == 2:
+      return np.einsum('nij,aj->nai', R, coords) + t[:, None, :]
+   return np.einsum('nij,naj->nai', R, coords) + t[:, None, :]
+
+#*************************************************************************
+
+def rmsd(coords, target):
+   """
+   RMSD of coords ((atoms, 3) or (N, atoms, 3)) from target without fitting.
+
+   >>> float(rmsd(np.zeros((2, 3)), np.ones((2, 3))))
+   1.7320508075688772
+
+   """
+   coords, single = _batch(coords)
+   values = np.sqrt(((coords - np.asarray(target, dtype=np.float64)) ** 2).sum(axis=2).mean(axis=1))
+   return values[0] if single else values
+
+#*************************************************************************
+
+def fit_rmsd(mobile, target):
+   """
+   RMSD of each mobile structure from target after optimal superposition.
+
+   >>> target = np.random.default_rng(0).normal(size=(20, 3))
+   >>> turn = np.array([[0.0, -1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+   >>> fit_rmsd(np.stack([target @ turn.T + 3.0, target + 1.0]), target).round(6).tolist()
+   [0.0, 0.0]
+
+   """
+   mobile, single = _batch(mobile)
+   R, t = kabsch(mobile, target)
+   values = rmsd(apply_transform(mobile, R, t), target)
+   return values[0] if single else values
+
+#*************************************************************************
+
+def fitted_rmsd(mobile_fit, target_fit, mobile_calc, target_calc):
+   """
+   RMSD of mobile_calc from target_calc after fitting mobile_fit onto target_fit (e.g. the ligand RMSD after fitting on the receptor).
+
+   >>> receptor = np.random.default_rng(1).normal(size=(10, 3))
+   >>> ligand = np.random.default_rng(2).normal(size=(5, 3)) + 10.0
+   >>> float(fitted_rmsd(receptor + 2.0, receptor, ligand + [3.0, 2.0, 2.0], ligand).round(6))
+   1.0
+
+   """
+   mobile_fit, single = _batch(mobile_fit)
+   mobile_calc, _ = _batch(mobile_calc)
+   R, t = kabsch(mobile_fit, target_fit)
+   values = rmsd(apply_transform(mobile_calc, R, t), target_calc)
+   return values[0] if single else values
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -3,7 +3,7 @@
 Program: testdockingprogs_master_lib
 File:    testdockingprogs_master_lib.py
 
-Version:  V1.0
+Version:  V1.1
 Date:     12.11.21
 Function: Libray: Library of functions for testdockingprogs_master which splits input file into its antibody/antigen components for input into docking algorithms, run docking algorithm then evaluate the result using ProFit.
 
@@ -26,6 +26,7 @@ testdockingprogs_master.py PDBFile OUTPath
 Revision History:
 =================
 V1.0   25.01.22   Original   By: OECH
+V1.1   19.10.26   Docking scripts run in-process (commands_lib.run_command)   By: OECH
 
 """
 
@@ -33,7 +34,9 @@ V1.0   25.01.22   Original   By: OECH
 
 # Import libraries
 from cProfile import run
-import sys, os, subprocess, time, re, statistics
+import sys, os, shutil, time, re, statistics
+from toolrunner_lib import run_script
+from commands_lib import run_command
 from threading import Timer
 from dockingtools_lib import evaluate_results, getlowestscore, gethighestscore, getnumberhits, writefile, getantigenchainid
 
@@ -55,7 +58,7 @@ def run_megadock(PDBfile, inputfilename, ab_filename, ag_filename, OUTPath_i, do
    dockingresults += [method]
 
    # Run Megadockranked on unblocked antibody/antigen files
-   subprocess.run(["~/ab-docking-scripts/runmegadockranked.py " + ab_filename + " " + ag_filename + " " + OUTPath_i], shell=True)
+   run_command("megadock", [ab_filename, ag_filename, OUTPath_i])
 
    # Define output filename
    megadock_resultfile = OUTPath_i + inputfilename + "_MegadockRanked_result.pdb"
@@ -131,7 +134,7 @@ def run_piper(PDBfile, inputfilename, ab_filename, ag_filename, OUTPath_i, docki
    dockingresults += [method]
 
    # Run piper
-   subprocess.run([f"~/ab-docking-scripts/runpiper.py {PDBfile} {ab_filename} {ag_filename} {OUTPath_i}"], shell=True)
+   run_command("piper", [PDBfile, ab_filename, ag_filename, OUTPath_i])
 
    # Define output filename
    piper_resultfile = OUTPath_i + inputfilename + "_nohydrogens_Piper_result.pdb"
@@ -207,7 +210,7 @@ def run_rosetta(PDBfile, inputfilename, ab_filename, ag_filename, OUTPath_i, doc
    dockingresults += [method]
 
    # Run Rosetta on input files (performing 50 runs within the program)
-   subprocess.run([f"~/ab-docking-scripts/runrosetta.py {PDBfile} {ab_filename} {ag_filename} 50 {OUTPath_i}"], shell=True)
+   run_command("rosetta", [PDBfile, ab_filename, ag_filename, 50, OUTPath_i])
 
    # Define output filename
    rosetta_resultfile = OUTPath_i + inputfilename + "_Rosetta_result.pdb"
@@ -283,7 +286,7 @@ def run_zdock(PDBfile, inputfilename, ab_filename, ag_filename, OUTPath_i, docki
    dockingresults += [method]
 
    # Run zdock ranked on files
-   subprocess.run([f"~/ab-docking-scripts/runzdock.py {ab_filename} {ag_filename} {OUTPath_i}"], shell=True)
+   run_script("runzdock.py", [ab_filename, ag_filename, OUTPath_i])
 
    # Define output filename
    zdock_resultfile = OUTPath_i + inputfilename + "_ZDOCK_ranked_result.pdb"
@@ -363,16 +366,17 @@ def run_haddock(PDBfile, inputfilename, ab_filename, ag_filename, OUTPath_i, doc
    # Define haddock_out directory name
    haddock_out = f"{OUTPath_i}/haddock_out/"
    # Create 'Haddock_out' directory
-   subprocess.run([f"mkdir {haddock_out}"], shell=True)
+   os.makedirs(haddock_out, exist_ok=True)
    # Move input files to haddock_out
-   subprocess.run([f"cp {PDBfile} {ab_filename} {ag_filename} {haddock_out}"], shell=True)
+   for inputfile in [PDBfile, ab_filename, ag_filename]:
+      shutil.copy(inputfile, haddock_out)
    # Find current directory
    cwd = f"{os.getcwd()}/"
    # Change to haddock_out directory
    os.chdir(haddock_out)
    
    # Run Haddock on input files
-   subprocess.run([f"~/ab-docking-scripts/runhaddock.py {ab_filename} {ag_filename} short {haddock_out}"], shell=True)
+   run_command("haddock", [ab_filename, ag_filename, "short", haddock_out])
 
    # Define output waters filename
    haddock_waters_resultfile = haddock_out + inputfilename + "_nohydrogens_Haddock_waters_result.pdb_split_labelled.pdb"
@@ -3,7 +3,7 @@
 Program: testdockingprogs_master
 File:    testdockingprogs_master_v2.py
 
-Version:  V3.0
+Version:  V3.2
 Date:     09.06.23
 Function: Split input file into its antibody/antigen components for input into docking algorithms, run docking algorithm then evaluate the result using ProFit.
 
@@ -21,7 +21,7 @@ NOTE:
 
 Usage:
 ======
-testdockingprogs_master_v2.py PDBFile OUTPath
+testdockingprogs_master_v2.py PDBFile OUTPath [runs] [seed]
 
 --------------------------------------------------------------------------
 
@@ -30,13 +30,16 @@ Revision History:
 V1.0   12.11.21   Original   By: OECH
 V2.0   24.05.23   Modified   By: OECH
 V3.0   09.06.23   Modified   By: OECH
+V3.1   19.10.26   Complex split once, only the antigen moved for each run (replicates_lib); number of runs and seed from command line   By: OECH
+V3.2   19.10.26   Usage message printed if the number of runs or seed is not a whole number   By: OECH
 
 """
 
 #*************************************************************************
 
 # Import Libraries
-import sys, os, subprocess, time, re, statistics
+import sys, os, time, re, statistics
+from replicates_lib import prepare_replicates
 from threading import Timer
 from dockingtools_lib import evaluate_results, getlowestscore, gethighestscore, getnumberhits, writefile, getantigenchainid
 from testdockingprogs_master_lib_v2 import run_megadock, run_piper, run_rosetta, run_haddock
@@ -56,6 +59,17 @@ except IndexError:
    print('No output directory specified, writing files to current directory')
    OUTPath = directory + "/"
 
+# Get number of docking runs (replicates) and random seed of the antigen orientations from command line (if present)
+replicates = 3
+seed = None
+try:
+   if len(sys.argv) > 3:
+      replicates = int(sys.argv[3])
+   if len(sys.argv) > 4:
+      seed = int(sys.argv[4])
+except ValueError:
+   sys.exit("Usage: testdockingprogs_master_v3.py PDBFile OUTPath [runs] [seed]\n(runs and seed must be whole numbers)")
+
 #*************************************************************************
 
 # Filter input file for number of antigen chains, end run if no chains or multiple antigen chains present
@@ -108,33 +122,14 @@ run_haddock_bool = False
 inputfilename = os.path.basename(PDBfile).split('.')[0]
 # Print starting docking
 print(f"Starting docking program on {inputfilename}...", flush=True)
-# Repeat docking 3 times on PDB file, different orientation each time
-for i in range(3):
+# Prepare the input of every run: the complex is stripped of hydrogens and split into antibody and antigen once, then only the antigen is moved (differently) for each run
+replicate_inputs = prepare_replicates(PDBfile, OUTPath, replicates, seed)
+# Repeat docking on PDB file, different orientation each time
+for i, (input_nohydrogens, ab_filename, ag_filename, OUTPath_i) in enumerate(replicate_inputs):
    # Get run number
    run = "Run " +str(i)
    # Print start of run to command line
    print(f"Starting {run}...")
-   # Make new directory to put results in
-   OUTPath_i = OUTPath + f"run{str(i)}/"
-   # Make directory
-   os.mkdir(OUTPath_i)
-
-#*************************************************************************
-
-   # New filename
-   input_nohydrogens = f"{OUTPath_i}{inputfilename}_nohydrogens.pdb"
-   # Strip hydrogens from input file
-   subprocess.run([f"pdbhstrip {PDBfile} {input_nohydrogens}"], shell=True)
-
-#*************************************************************************
-
-   # Split input file into antibody/antigen components (using splitantibodyantigenchains.py)
-   subprocess.run([f"~/ab-docking-scripts/splitantibodyantigenchains.py {input_nohydrogens} {OUTPath_i}"], shell=True)
-   # Define input file no hydrogens filename
-   nohydrogens_filename = f"{inputfilename}_nohydrogens"
-   # Get the filenames for the split antibody/antigen chains
-   ab_filename = OUTPath_i + "%s_ab.pdb" % nohydrogens_filename
-   ag_filename = OUTPath_i + "%s_ag.pdb" % nohydrogens_filename
 
 #*************************************************************************
 
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Program: toolrunner_lib
+File:    toolrunner_lib.py
+
+Version:  V1.6
+Date:     19.10.26
+Function:   Library: Run external programs (BiopTools, docking software and sibling scripts) without a shell.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+All external programs used by the 'Antibody-Antigen Docking' scripts are run through this library. Commands are built as argument lists, so no /bin/sh is started and no '~' expansion or quoting is needed. Tool locations are resolved once from the built-in defaults, optionally overridden by a JSON configuration file. Chains of tools (e.g. pdbgetchain | pdbrotate | pdbtranslate) are connected with in-memory pipes rather than temporary files. The standard error of every tool is captured and returned, and each tool can be given a timeout and a limit on how many copies of it may run at once.
+
+The configuration file is taken from the DOCKINGTOOLS_CONFIG environment variable, or dockingtools_config.json in the scripts directory if present:
+
+{"executable": {"megadock": "/path/to/megadock", ...},
+ "paths":      {"piper_prms": "/path/to/piper/prms", ...},
+ "timeout":    {"piper": 14400, ...},
+ "concurrency": {"megadock": 2, ...},
+ "cpus":       {"megadock": 4, ...}}
+
+The cpus section gives the number of cores reserved for each run of a tool or script by the asyncio orchestrator (see orchestrator_lib.py); tools not listed reserve one core, or the threads of their resource profile. The profiles section changes the resource profiles of the docking methods (see resources_lib.py).
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   CPU reservation of each tool (cpus section, used by orchestrator_lib)   By: OECH
+V1.2   19.10.26   Resource profiles section   By: OECH
+V1.3   19.10.26   Location of the prepared input cache (prep_cache path)   By: OECH
+V1.4   19.10.26   Socket of the evaluation daemon (eval_socket path)   By: OECH
+V1.5   19.10.26   Pipelines killed and reaped on a timeout of any command or a missing program; input fed from a thread   By: OECH
+V1.6   19.10.26   One timeout deadline for the whole pipeline; missing working directory raised rather than taken for a missing program; non-executable program exits 126; all pipes closed when killed   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import sys
+import json
+import time
+import errno
+import shutil
+import threading
+import subprocess
+from subprocess import PIPE
+
+#*************************************************************************
+
+# Directory containing the ab-docking-scripts
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Default tool locations (names without a '/' are looked up in the PATH)
+DEFAULT_EXECUTABLES = {
+   # BiopTools
+   "pdbhstrip": "pdbhstrip",
+   "pdbhadd": "pdbhadd",
+   "pdbgetchain": "pdbgetchain",
+   "pdbrotate": "pdbrotate",
+   "pdbtranslate": "pdbtranslate",
+   "pdbchain": "pdbchain",
+   "pdbrenum": "pdbrenum",
+   "chaincontacts": "chaincontacts",
+   "profit": "profit",
+   "findif": os.path.join(SCRIPT_DIR, "findif.pl"),
+   # Megadock / ZRANK
+   "megadock": "~/DockingSoftware/megadock-4.1.1/megadock",
+   "decoygen": "~/DockingSoftware/megadock-4.1.1/decoygen",
+   "zrank": "~/DockingSoftware/zdock3.0.2/zrank",
+   # Piper
+   "piper": "~/DockingSoftware/piper/piper",
+   "piper_prepare": "~/DockingSoftware/piper/protein_prep/prepare.py",
+   "sblu": "sblu",
+   # Rosetta
+   "rosetta_prepack": "/home/oliverh/DockingSoftware/rosetta/rosetta/main/source/bin/docking_prepack_protocol.default.linuxgccrelease",
+   "rosetta_docking": "/home/oliverh/DockingSoftware/rosetta/rosetta/main/source/bin/docking_protocol.default.linuxgccrelease",
+   # Haddock
+   "haddock": "/home/oliverh/DockingSoftware/haddock2.4/Haddock/RunHaddock.py",
+   "pdb_chain": "/home/oliverh/DockingSoftware/pdb-tools/pdbtools/pdb_chain.py",
+   "pdb_seg": "/home/oliverh/DockingSoftware/pdb-tools/pdbtools/pdb_seg.py",
+   "restrain_bodies": "~/DockingSoftware/haddock-tools/restrain_bodies.py",
+   "molprobity": "~/DockingSoftware/haddock-tools/molprobity.py",
+   # DockQ
+   "dockq": "dockq.sh",
+}
+
+# Default locations of data used by the docking software
+DEFAULT_PATHS = {
+   "piper_prms": "~/DockingSoftware/piper/prms",
+   "rosetta_database": "/home/oliverh/DockingSoftware/rosetta/rosetta/main/database",
+   "haddock_dir": "/home/oliverh/DockingSoftware/haddock2.4",
+   # Cache of prepared docking inputs (see prepcache_lib.py); "" turns it off
+   "prep_cache": "~/.cache/ab-docking-scripts/prepared",
+   # Socket of the evaluation daemon (see evalserver_lib.py); "" turns it off
+   "eval_socket": "~/.cache/ab-docking-scripts/evald.sock",
+}
+
+# Loaded configuration and resolved tool paths (filled on first use)
+_config = None
+_resolved = {}
+_semaphores = {}
+_lock = threading.Lock()
+
+#*************************************************************************
+
+def load_config(config_file=None):
+   """
+   Load the tool configuration, merging the JSON file (if any) over the defaults. The configuration is cached, so the file is only read once per process unless config_file is given.
+
+   >>> config = load_config('/nonexistent.json')
+   >>> config['executable']['profit'], config['timeout'], config['concurrency'], config['cpus']
+   ('profit', {}, {}, {})
+
+   """
+   global _config
+   if _config is not None and config_file is None:
+      return _config
+   if config_file is None:
+      config_file = os.environ.get("DOCKINGTOOLS_CONFIG", os.path.join(SCRIPT_DIR, "dockingtools_config.json"))
+   config = {"executable": dict(DEFAULT_EXECUTABLES), "paths": dict(DEFAULT_PATHS), "timeout": {}, "concurrency": {}, "cpus": {}, "profiles": {}}
+   if os.path.isfile(config_file):
+      with open(config_file) as file:
+         user_config = json.load(file)
+      for section in config:
+         config[section].update(user_config.get(section, {}))
+   with _lock:
+      _config = config
+      _resolved.clear()
+      _semaphores.clear()
+   return config
+
+#*************************************************************************
+
+def tool_path(tool):
+   """
+   Return the resolved path of a tool: '~' is expanded and bare names are looked up in the PATH. Unknown tools are treated as bare program names.
+
+   >>> tool_path('findif') == os.path.join(SCRIPT_DIR, 'findif.pl')
+   True
+
+   """
+   if tool in _resolved:
+      return _resolved[tool]
+   executable = load_config()["executable"].get(tool, tool)
+   executable = os.path.expanduser(executable)
+   if os.sep not in executable:
+      executable = shutil.which(executable) or executable
+   _resolved[tool] = executable
+   return executable
+
+#*************************************************************************
+
+def data_path(name, *parts):
+   """
+   Return the configured location of a data directory (e.g. 'piper_prms'), joined with any further path parts.
+
+   >>> data_path('piper_prms', 'rots.prm') == os.path.expanduser('~/DockingSoftware/piper/prms/rots.prm')
+   True
+
+   """
+   return os.path.join(os.path.expanduser(load_config()["paths"][name]), *parts)
+
+#*************************************************************************
+
+def tool_argv(tool, args=()):
+   """
+   Build the argument list used to run a tool.
+
+   >>> tool_argv('findif', ['-x', 'a.pdb'])[1:]
+   ['-x', 'a.pdb']
+
+   """
+   return [tool_path(tool)] + [str(arg) for arg in args]
+
+#*************************************************************************
+
+def script_argv(script, args=()):
+   """
+   Build the argument list used to run one of the scripts in the ab-docking-scripts directory with the current Python interpreter.
+
+   >>> script_argv('runpiper.py', ['a', 'b'])[1:] == [os.path.join(SCRIPT_DIR, 'runpiper.py'), 'a', 'b']
+   True
+
+   """
+   return [sys.executable, os.path.join(SCRIPT_DIR, script)] + [str(arg) for arg in args]
+
+#*************************************************************************
+
+def _semaphore(tool):
+   """
+   Return the semaphore limiting the number of concurrent runs of a tool, or None if the tool is unlimited.
+
+   """
+   limit = load_config()["concurrency"].get(tool)
+   if not limit:
+      return None
+   with _lock:
+      if tool not in _semaphores:
+         _semaphores[tool] = threading.BoundedSemaphore(int(limit))
+      return _semaphores[tool]
+
+#*************************************************************************
+
+def _open_output(stdout):
+   """
+   Turn the stdout argument of run_tool/run_pipeline into a file handle. Returns (handle, whether it must be closed afterwards). A path opens a file for writing ('>>' style appending when given as ('path', 'a')).
+
+   """
+   if isinstance(stdout, str):
+      return open(stdout, "w"), True
+   if isinstance(stdout, tuple):
+      return open(stdout[0], stdout[1]), True
+   return stdout, False
+
+#*************************************************************************
+
+def _report(process):
+   """
+   Echo the captured standard error of a failed tool so that it is not lost.
+
+   """
+   if process.returncode != 0 and process.stderr:
+      sys.stderr.write(process.stderr)
+      sys.stderr.flush()
+
+#*************************************************************************
+
+def _drain(stream, chunks):
+   """
+   Read a stream to its end into chunks (run in a thread, so that a tool cannot block on a full pipe).
+
+   """
+   try:
+      chunks.append(stream.read())
+      stream.close()
+   except (OSError, ValueError):
+      # Closed by _kill
+      pass
+
+def _feed(stream, data):
+   """
+   Write data to the standard input of a pipeline (run in a thread, as the pipeline can only take it as fast as its output is read). A pipeline that has exited early is not an error.
+
+   """
+   try:
+      stream.write(data)
+      stream.close()
+   except (OSError, ValueError):
+      pass
+
+def _kill(processes):
+   """
+   Kill the processes of a pipeline, wait for them to exit and close all the pipes to and from them.
+
+   """
+   for process in processes:
+      process.kill()
+   for process in processes:
+      process.wait()
+      for stream in (process.stdin, process.stdout, process.stderr):
+         if stream is not None:
+            try:
+               stream.close()
+            except (OSError, ValueError):
+               pass
+
+def _execute(stages, stdout=None, input=None, cwd=None, env=None, check=False):
+   """
+   Run one or more commands, each given as (tool name, argv), connecting consecutive commands with pipes. Returns a CompletedProcess for the last command with the standard error of every command. As in a shell, a program that is not found exits with status 127 and one that cannot be executed with 126; a missing working directory raises FileNotFoundError. The timeout (the longest of those of the tools) is for the whole pipeline.
+
+   >>> run_tool(sys.executable, ['-c', 'print("docked")'], stdout=PIPE, cwd='/nonexistent/run0')
+   Traceback (most recent call last):
+   ...
+   FileNotFoundError: [Errno 2] No such file or directory: '/nonexistent/run0'
+   >>> import tempfile
+   >>> with tempfile.NamedTemporaryFile() as program:
+   ...    run_tool(program.name, stdout=PIPE).returncode
+   126
+
+   """
+   if cwd is not None and not os.path.isdir(cwd):
+      raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), cwd)
+   config = load_config()
+   tools = [tool for tool, argv in stages]
+   timeouts = [config["timeout"][tool] for tool in tools if tool in config["timeout"]]
+   timeout = max(timeouts) if timeouts else None
+   deadline = time.monotonic() + timeout if timeout is not None else None
+   # Acquire concurrency slots in a fixed order so that pipelines cannot deadlock
+   semaphores = [semaphore for semaphore in (_semaphore(tool) for tool in sorted(set(tools))) if semaphore]
+   for semaphore in semaphores:
+      semaphore.acquire()
+   # Make sure anything already printed appears before the tool's output
+   sys.stdout.flush()
+   out_handle, close_out = _open_output(stdout)
+   processes = []
+   stderr_chunks = [[] for stage in stages]
+   # Threads draining stderr of intermediate commands and feeding input to the first
+   threads = []
+   try:
+      previous_stdout = PIPE if input is not None else None
+      for index, (tool, argv) in enumerate(stages):
+         last = index == len(stages) - 1
+         try:
+            process = subprocess.Popen(argv, stdin=previous_stdout, stdout=out_handle if last else PIPE, stderr=PIPE, cwd=cwd, env=env, universal_newlines=True)
+         except (FileNotFoundError, PermissionError) as error:
+            # Behave like a shell: report the missing (127) or non-executable (126) program and carry on
+            _kill(processes)
+            returncode, reason = (127, "command not found") if isinstance(error, FileNotFoundError) else (126, "Permission denied")
+            message = f"{argv[0]}: {reason}\n"
+            result = subprocess.CompletedProcess(argv, returncode, "" if out_handle is PIPE else None, message)
+            _report(result)
+            if check:
+               raise subprocess.CalledProcessError(returncode, argv, result.stdout, message)
+            return result
+         if index > 0:
+            # Let the previous command receive SIGPIPE if this one exits early
+            processes[-1].stdout.close()
+         elif input is not None:
+            first_stdin = process.stdin
+         if not last:
+            # Drain stderr of intermediate commands so that they cannot block
+            reader = threading.Thread(target=_drain, args=(process.stderr, stderr_chunks[index]))
+            reader.daemon = True
+            reader.start()
+            threads += [reader]
+         processes += [process]
+         previous_stdout = process.stdout
+      if input is not None and len(processes) > 1:
+         writer = threading.Thread(target=_feed, args=(first_stdin, input))
+         writer.daemon = True
+         writer.start()
+         threads += [writer]
+         input = None
+      last_process = processes[-1]
+      def remaining():
+         return max(0.0, deadline - time.monotonic()) if deadline is not None else None
+      try:
+         output, last_stderr = last_process.communicate(input=input, timeout=remaining())
+         for process in processes[:-1]:
+            process.wait(timeout=remaining())
+      except BaseException:
+         # A timeout (of any command) or interruption: leave nothing running
+         _kill(processes)
+         raise
+      stderr_chunks[-1].append(last_stderr or "")
+   finally:
+      for thread in threads:
+         thread.join()
+      if close_out:
+         out_handle.close()
+      for semaphore in semaphores:
+         semaphore.release()
+   stderr = "".join("".join(chunks) for chunks in stderr_chunks)
+   # A failure anywhere in a pipeline is reported (as with 'set -o pipefail')
+   returncode = last_process.returncode
+   if returncode == 0:
+      returncode = next((process.returncode for process in processes if process.returncode != 0), 0)
+   result = subprocess.CompletedProcess(stages[-1][1], returncode, output, stderr)
+   _report(result)
+   if check and result.returncode != 0:
+      raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+   return result
+
+#*************************************************************************
+
+def run_tool(tool, args=(), stdout=None, input=None, cwd=None, env=None, check=False):
+   """
+   Run an external tool without a shell.
+   stdout: None (inherit, i.e. print to the terminal/log), subprocess.PIPE (capture, returned as .stdout), a filename ('>' redirection) or (filename, 'a') ('>>' redirection).
+   Standard error is always captured (returned as .stderr and echoed if the tool fails). Raises subprocess.TimeoutExpired if the configured timeout for the tool is exceeded, and CalledProcessError on failure if check is True.
+
+   >>> run_tool('no-such-tool-xyz', stdout=PIPE).returncode
+   127
+
+   """
+   return _execute([(tool, tool_argv(tool, args))], stdout=stdout, input=input, cwd=cwd, env=env, check=check)
+
+#*************************************************************************
+
+def run_pipeline(commands, stdout=None, input=None, cwd=None, env=None, check=False):
+   """
+   Run a pipeline of tools connected by in-memory pipes, commands being a list of (tool, args). Arguments are as for run_tool; the result is that of the last command (with a non-zero return code if any command failed).
+
+   >>> run_pipeline([(sys.executable, ['-c', 'print("b");print("a")']), (sys.executable, ['-c', 'import sys;print(sorted(sys.stdin.read().split()))'])], stdout=PIPE).stdout
+   "['a', 'b']\\n"
+
+   """
+   stages = [(tool, tool_argv(tool, args)) for tool, args in commands]
+   return _execute(stages, stdout=stdout, input=input, cwd=cwd, env=env, check=check)
+
+#*************************************************************************
+
+def run_script(script, args=(), stdout=None, input=None, cwd=None, env=None, check=False):
+   """
+   Run one of the ab-docking-scripts (e.g. 'runpiper.py') in a new Python interpreter, with arguments as for run_tool. Concurrency limits and timeouts are configured under the script's filename.
+
+   """
+   return _execute([(script, script_argv(script, args))], stdout=stdout, input=input, cwd=cwd, env=env, check=check)
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Program: workqueue_lib
+File:    workqueue_lib.py
+
+Version:  V1.1
+Date:     19.10.26
+Function:   Library: A work queue kept on a shared filesystem, letting any number of nodes take complexes from one manifest without a server.
+
+Author: Oliver E. C. Hood
+
+--------------------------------------------------------------------------
+
+Description:
+============
+The queue is a directory on a filesystem mounted by every node. Each item (a complex of the manifest) is claimed by creating claims/<item>.claim with O_CREAT|O_EXCL, which succeeds for exactly one process; the claim holds the host, process and time of the claimant. While an item is being worked on its owner touches the claim file at regular intervals (the heartbeat). When the work is finished, done/<item> is written with the outcome and the claim is removed.
+
+A claim whose heartbeat is older than the stale time belongs to a process that has died (or a node that has gone down). Another process can take it over by renaming the claim file to a name of its own (rename is atomic, so only one process can succeed) and then claiming the item as usual. If the heartbeat turns out to have been renewed just before the rename, the claim is put back and the item left to its owner.
+
+Items are handed out in manifest order, so ordering the manifest longest first keeps nodes busy until the end. Nodes can join or leave at any time: each just claims items until none are left.
+
+--------------------------------------------------------------------------
+
+Revision History:
+=================
+V1.0   19.10.26   Original   By: OECH
+V1.1   19.10.26   complete() refuses items whose claim has been lost   By: OECH
+
+"""
+
+#*************************************************************************
+
+# Import Libraries
+import os
+import time
+import json
+import socket
+
+#*************************************************************************
+
+# Seconds between heartbeats of a claim
+HEARTBEAT = 60
+
+# Seconds after the last heartbeat at which a claim is taken to be abandoned
+STALE_AFTER = 600
+
+#*************************************************************************
+
+def item_names(names):
+   """
+   Return queue item names for a list of complex names, numbered so that repeated complexes are separate items.
+
+   >>> item_names(['1abc_0P', '2xyz_0P', '1abc_0P'])
+   ['00000_1abc_0P', '00001_2xyz_0P', '00002_1abc_0P']
+
+   """
+   return [f"{number:05d}_{name}" for number, name in enumerate(names)]
+
+#*************************************************************************
+
+class WorkQueue:
+   """
+   A work queue of items kept in queue_dir.
+
+   >>> import tempfile
+   >>> with tempfile.TemporaryDirectory() as tmp:
+   ...    first, second = WorkQueue(tmp, ['a', 'b']), WorkQueue(tmp, ['a', 'b'])
+   ...    a, b = first.claim_next(), second.claim_next()
+   ...    c = first.claim_next()
+   ...    _ = first.complete(a, 'ok')
+   ...    a, b, c, first.status()
+   ('a', 'b', None, {'done': 1, 'claimed': 1, 'stale': 0, 'pending': 0})
+
+   """
+   def __init__(self, queue_dir, items, stale_after=STALE_AFTER):
+      self.queue_dir = queue_dir
+      self.items = list(items)
+      self.stale_after = stale_after
+      self.claims_dir = os.path.join(queue_dir, "claims")
+      self.done_dir = os.path.join(queue_dir, "done")
+      os.makedirs(self.claims_dir, exist_ok=True)
+      os.makedirs(self.done_dir, exist_ok=True)
+      self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+   def claim_file(self, item):
+      return os.path.join(self.claims_dir, item + ".claim")
+
+   def done_file(self, item):
+      return os.path.join(self.done_dir, item)
+
+   def _create_claim(self, item):
+      """
+      Claim an item by creating its claim file exclusively. Returns True if this process now owns it.
+
+      """
+      try:
+         fd = os.open(self.claim_file(item), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+      except FileExistsError:
+         return False
+      with os.fdopen(fd, "w") as file:
+         json.dump({"owner": self.owner, "claimed": time.time()}, file)
+      # The item may have been finished between listing and claiming
+      if os.path.exists(self.done_file(item)):
+         os.unlink(self.claim_file(item))
+         return False
+      return True
+
+   def _is_stale(self, path):
+      try:
+         return time.time() - os.stat(path).st_mtime > self.stale_after
+      except FileNotFoundError:
+         return False
+
+   def _take_over(self, item):
+      """
+      Take over the abandoned claim of an item. Returns True if this process now owns it.
+
+      """
+      claim = self.claim_file(item)
+      moved = f"{claim}.stale.{self.owner.replace(':', '.')}"
+      try:
+         os.rename(claim, moved)
+      except FileNotFoundError:
+         return self._create_claim(item)
+      if not self._is_stale(moved):
+         # The owner renewed its heartbeat just before the rename: give the claim back
+         try:
+            os.link(moved, claim)
+         except FileExistsError:
+            pass
+         os.unlink(moved)
+         return False
+      os.unlink(moved)
+      return self._create_claim(item)
+
+   def claim_next(self):
+      """
+      Claim the first item that is neither finished nor claimed (taking over abandoned claims). Returns the item, or None if there is nothing left to claim.
+
+      """
+      for item in self.items:
+         if os.path.exists(self.done_file(item)):
+            continue
+         if self._create_claim(item):
+            return item
+         if self._is_stale(self.claim_file(item)) and self._take_over(item):
+            return item
+      return None
+
+   def heartbeat(self, item):
+      """
+      Renew the claim on an item. Returns False if the claim has been lost (taken over by another process).
+
+      """
+      try:
+         with open(self.claim_file(item)) as file:
+            if json.load(file)["owner"] != self.owner:
+               return False
+         os.utime(self.claim_file(item))
+         return True
+      except (FileNotFoundError, ValueError):
+         return False
+
+   def complete(self, item, outcome):
+      """
+      Mark an item as finished, recording its outcome, and release the claim. Returns False, leaving the item to the process that took it over, if this process no longer owns the claim.
+
+      >>> import tempfile
+      >>> with tempfile.TemporaryDirectory() as tmp:
+      ...    first, second = WorkQueue(tmp, ['a']), WorkQueue(tmp, ['a'], stale_after=0)
+      ...    second.owner = 'othernode:1'
+      ...    a = first.claim_next()
+      ...    time.sleep(0.01)
+      ...    second.claim_next(), first.complete(a, 'ok'), second.complete(a, 'ok'), second.status()
+      ('a', False, True, {'done': 1, 'claimed': 0, 'stale': 0, 'pending': 0})
+
+      """
+      if not self.heartbeat(item):
+         return False
+      with open(self.done_file(item) + ".tmp." + self.owner.replace(':', '.'), "w") as file:
+         json.dump({"owner": self.owner, "finished": time.time(), "outcome": outcome}, file)
+      os.replace(file.name, self.done_file(item))
+      os.unlink(self.claim_file(item))
+      return True
+
+   def status(self):
+      """
+      Count the items that are done, claimed (with a live heartbeat), stale (claimed but abandoned) and pending.
+
+      """
+      counts = {"done": 0, "claimed": 0, "stale": 0, "pending": 0}
+      for item in self.items:
+         if os.path.exists(self.done_file(item)):
+            counts["done"] += 1
+         elif os.path.exists(self.claim_file(item)):
+            counts["stale" if self._is_stale(self.claim_file(item)) else "claimed"] += 1
+         else:
+            counts["pending"] += 1
+      return counts
+
+#*************************************************************************
+
+# Testing functions
+if __name__ == "__main__":
+   import doctest
+   doctest.testmod()